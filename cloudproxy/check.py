@@ -1,3 +1,9 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import requests as requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
@@ -9,6 +15,7 @@ def requests_retry_session(
     backoff_factor=0.3,
     status_forcelist=(500, 502, 504),
     session=None,
+    pool_maxsize=10,
 ):
     session = session or requests.Session()
     retry = Retry(
@@ -18,58 +25,259 @@ def requests_retry_session(
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_maxsize)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
 
 
-def fetch_ip(ip_address):
+class ProbeSessionPool:
+    """
+    Bounded, thread-safe pool of keep-alive sessions keyed by proxy IP.
+
+    Each proxy gets its own session so the TCP connection to the proxy is
+    reused across probes and scheduler ticks. The least recently used
+    session is closed once the pool is full.
+    """
+
+    def __init__(self, max_sessions=256, retries=1, backoff_factor=0.3):
+        self.max_sessions = max_sessions
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+
+    def get(self, ip_address):
+        """Return the pooled session for a proxy IP, creating it if needed."""
+        with self._lock:
+            session = self._sessions.get(ip_address)
+            if session is not None:
+                self._sessions.move_to_end(ip_address)
+                self._reused += 1
+                return session
+
+            session = requests_retry_session(
+                retries=self.retries,
+                backoff_factor=self.backoff_factor,
+                pool_maxsize=2,
+            )
+            self._sessions[ip_address] = session
+            self._created += 1
+
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+                self._evicted += 1
+            return session
+
+    def discard(self, ip_address):
+        """Close and forget the session for a proxy that no longer exists."""
+        with self._lock:
+            session = self._sessions.pop(ip_address, None)
+        if session is not None:
+            session.close()
+
+    def clear(self):
+        """Close every pooled session and reset the statistics."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._created = self._reused = self._evicted = 0
+        for session in sessions:
+            session.close()
+
+    def stats(self):
+        """Return pool usage statistics."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "created": self._created,
+                "reused": self._reused,
+                "evicted": self._evicted,
+            }
+
+
+class ProbeTargets:
+    """
+    Ordered list of echo URLs that probes are sent to, with failover.
+
+    Each target keeps a smoothed latency and a consecutive failure count.
+    Targets that are failing are tried last and the fastest healthy target
+    is tried first, so a slow or rate-limited echo service doesn't make
+    healthy proxies look dead.
+    """
+
+    def __init__(self, urls, smoothing=0.3):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._stats = OrderedDict(
+            (url, {"latency": None, "successes": 0, "failures": 0, "consecutive_failures": 0, "last_error": None})
+            for url in urls
+        )
+
+    def ordered(self):
+        """Return target URLs, healthiest and fastest first."""
+        with self._lock:
+            positions = {url: i for i, url in enumerate(self._stats)}
+            return sorted(
+                self._stats,
+                key=lambda url: (
+                    self._stats[url]["consecutive_failures"],
+                    self._stats[url]["latency"] if self._stats[url]["latency"] is not None else 0.0,
+                    positions[url],
+                ),
+            )
+
+    def record_success(self, url, latency):
+        with self._lock:
+            stats = self._stats.get(url)
+            if stats is None:
+                return
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] += self.smoothing * (latency - stats["latency"])
+            stats["successes"] += 1
+            stats["consecutive_failures"] = 0
+
+    def record_failure(self, url, error):
+        with self._lock:
+            stats = self._stats.get(url)
+            if stats is None:
+                return
+            stats["failures"] += 1
+            stats["consecutive_failures"] += 1
+            stats["last_error"] = str(error)
+
+    def stats(self):
+        """Return per-target statistics in configured order."""
+        with self._lock:
+            return [dict(url=url, **stats) for url, stats in self._stats.items()]
+
+
+probe_sessions = ProbeSessionPool(
+    max_sessions=settings.config["health_check"]["pool_size"],
+    retries=settings.config["health_check"]["retries"],
+)
+probe_targets = ProbeTargets(settings.config["health_check"]["urls"])
+ip_targets = ProbeTargets(settings.config["health_check"]["ip_urls"])
+
+
+def get_proxies(ip_address):
     if settings.config["no_auth"]:
-        proxies = {
+        return {
             "http": "http://" + ip_address + ":8899",
             "https": "http://" + ip_address + ":8899",
         }
-    else:
-        auth = (
-            settings.config["auth"]["username"] + ":" + settings.config["auth"]["password"]
-        )
+    auth = (
+        settings.config["auth"]["username"] + ":" + settings.config["auth"]["password"]
+    )
+    return {
+        "http": "http://" + auth + "@" + ip_address + ":8899",
+        "https": "http://" + auth + "@" + ip_address + ":8899",
+    }
 
-        proxies = {
-            "http": "http://" + auth + "@" + ip_address + ":8899",
-            "https": "http://" + auth + "@" + ip_address + ":8899",
-        }
-    
-    s = requests.Session()
-    s.proxies = proxies
 
-    fetched_ip = requests_retry_session(session=s).get(
-        "https://api.ipify.org", proxies=proxies, timeout=10
-    )
-    return fetched_ip.text
+def fetch_ip(ip_address, timeout=None):
+    if timeout is None:
+        timeout = settings.config["health_check"]["timeout"]
+    proxies = get_proxies(ip_address)
+    session = probe_sessions.get(ip_address)
+    error = None
+    for url in ip_targets.ordered():
+        started = time.monotonic()
+        try:
+            fetched_ip = session.get(url, proxies=proxies, timeout=timeout)
+        except (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout):
+            # The proxy itself is unreachable, another echo target won't help
+            raise
+        except requests.exceptions.RequestException as e:
+            ip_targets.record_failure(url, e)
+            error = e
+            continue
+        ip_targets.record_success(url, time.monotonic() - started)
+        return fetched_ip.text
+    if error is None:
+        raise ValueError("No IP echo URLs configured")
+    raise error
 
 
-def check_alive(ip_address):
-    try:
-        if settings.config["no_auth"]:
-            proxies = {
-                "http": "http://" + ip_address + ":8899",
-                "https": "http://" + ip_address + ":8899",
-            }
-        else:
-            auth = (
-                settings.config["auth"]["username"] + ":" + settings.config["auth"]["password"]
-            )
+def _auth_rejected(error):
+    # A CONNECT answered with 407 only shows up in the error message
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code == 407
+    return re.search(r"\b407\b", str(error)) is not None
 
-            proxies = {
-                "http": "http://" + auth + "@" + ip_address + ":8899",
-                "https": "http://" + auth + "@" + ip_address + ":8899",
-            }
-    
-        result = requests.get("http://ipecho.net/plain", proxies=proxies, timeout=10)
-        if result.status_code in (200, 407):
-            return True
-        else:
-            return False
+
+def check_alive(ip_address, timeout=None):
+    if timeout is None:
+        timeout = settings.config["health_check"]["timeout"]
+    try:
+        proxies = get_proxies(ip_address)
+        session = probe_sessions.get(ip_address)
+        for url in probe_targets.ordered():
+            started = time.monotonic()
+            try:
+                result = session.get(url, proxies=proxies, timeout=timeout)
+            except requests.exceptions.ProxyError as e:
+                # Proxy is up but rejected our credentials for the tunnel
+                if _auth_rejected(e):
+                    return True
+                # The proxy itself is unreachable, another echo target won't help
+                return False
+            except requests.exceptions.ConnectTimeout:
+                return False
+            except Exception as e:
+                probe_targets.record_failure(url, e)
+                continue
+            if result.status_code == 407:
+                # Proxy is up but rejected our credentials; the target wasn't reached
+                return True
+            if result.status_code == 200:
+                probe_targets.record_success(url, time.monotonic() - started)
+                return True
+            probe_targets.record_failure(url, f"HTTP {result.status_code}")
+        return False
     except:
         return False
+
+
+def check_alive_batch(ip_addresses, probe=None, concurrency=None):
+    """
+    Probe many proxies concurrently.
+
+    Args:
+        ip_addresses: Iterable of proxy IP addresses to probe
+        probe: Callable taking a single IP and returning a bool (defaults to check_alive)
+        concurrency: Maximum number of probes in flight at once
+
+    Returns:
+        dict: Mapping of IP address to health result
+    """
+    if probe is None:
+        probe = check_alive
+    if concurrency is None:
+        concurrency = settings.config["health_check"]["concurrency"]
+
+    ips = list(dict.fromkeys(ip_addresses))
+    if not ips:
+        return {}
+
+    def safe_probe(ip_address):
+        try:
+            return bool(probe(ip_address))
+        except Exception:
+            return False
+
+    workers = max(1, min(concurrency, len(ips)))
+    if workers == 1:
+        return {ip: safe_probe(ip) for ip in ips}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cloudproxy-check") as executor:
+        results = executor.map(safe_probe, ips)
+        return dict(zip(ips, results))
@@ -0,0 +1,571 @@
+"""
+Rotating forward-proxy gateway in front of the proxy pool.
+
+Without the gateway every client fetches a proxy from the API, connects to
+its port 8899 itself and has to handle failover when that proxy dies. With
+GATEWAY_ENABLED set, CloudProxy also listens on GATEWAY_PORT as an HTTP
+forward proxy, so clients point at one stable endpoint:
+
+- Each plain HTTP request and each CONNECT tunnel is routed to a pool member
+  picked by the selection strategy (GATEWAY_STRATEGY, or the global
+  PROXY_SELECTION_STRATEGY), leaving out queued, unhealthy and leased
+  proxies like GET /random does.
+- If the upstream proxy cannot be reached or drops the connection before
+  answering, the request is retried on another proxy, up to GATEWAY_RETRIES
+  times. Request bodies are buffered so they can be sent again. Requests
+  with a non-idempotent method (POST, PATCH) are only retried when the
+  connection could not be opened, once sent they may have been acted on.
+- Upstream connections of plain HTTP requests are kept alive and reused by
+  later requests to the same proxy, up to GATEWAY_POOL_SIZE idle
+  connections per proxy.
+- Bytes relayed, requests, tunnels and failures are counted per upstream.
+
+Clients authenticate with the same PROXY_USERNAME and PROXY_PASSWORD as the
+proxies themselves, unless authentication is turned off. An unauthenticated
+gateway would relay anyone's traffic, so it then only listens on 127.0.0.1
+unless GATEWAY_ALLOW_UNAUTHENTICATED is set.
+
+The gateway runs its own asyncio event loop in a background thread. Picking
+an upstream syncs the proxy registry and builds the excluded set, which take
+locks shared with the API and the provider ticks, so both run on the loop's
+default executor rather than on the loop.
+"""
+
+import asyncio
+import base64
+import hmac
+import threading
+import time
+from typing import Callable, Collection, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.registry import proxy_registry
+from cloudproxy.providers.selection import select_proxy
+
+# Port tinyproxy listens on in every proxy
+UPSTREAM_PORT = 8899
+# Longest request or response head accepted
+MAX_HEAD_SIZE = 64 * 1024
+# Largest request body buffered for retries
+MAX_BODY_SIZE = 16 * 1024 * 1024
+RELAY_CHUNK = 64 * 1024
+
+# Methods that may be sent again once an upstream could have received them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE", "CONNECT"}
+# Addresses an unauthenticated gateway may listen on
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+# Headers that only apply to a single hop, never forwarded
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "proxy-connection", "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+Headers = List[Tuple[str, str]]
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def gateway_config() -> Dict:
+    return settings.config.get("gateway", {})
+
+
+def listen_host() -> str:
+    """GATEWAY_HOST, or 127.0.0.1 if clients would not have to authenticate."""
+    config = gateway_config()
+    host = config.get("host", "0.0.0.0")
+    if settings.config["no_auth"] and host not in LOOPBACK_HOSTS and not config.get("allow_unauthenticated"):
+        logger.warning(
+            f"Proxy gateway: authentication is off, listening on 127.0.0.1 instead of {host}. "
+            f"Set GATEWAY_ALLOW_UNAUTHENTICATED=True to expose it anyway"
+        )
+        return "127.0.0.1"
+    return host
+
+
+class GatewayError(Exception):
+    """A client request the gateway answers with an error status."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class UpstreamError(Exception):
+    """An upstream proxy failed before answering, the request can be retried elsewhere."""
+
+
+def _header(headers: Headers, name: str) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _tokens(headers: Headers, name: str) -> Set[str]:
+    value = _header(headers, name) or ""
+    return {token.strip().lower() for token in value.split(",") if token.strip()}
+
+
+def parse_head(head: bytes) -> Tuple[str, Headers]:
+    """Split a request or response head into its start line and headers."""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise GatewayError(400, "Malformed header")
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def build_head(start_line: str, headers: Headers) -> bytes:
+    lines = [start_line] + [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def read_head(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """The next message head, or None if the peer closed the connection cleanly."""
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise
+    except asyncio.LimitOverrunError:
+        raise GatewayError(431, "Request header fields too large")
+
+
+async def read_request_body(reader: asyncio.StreamReader, headers: Headers) -> bytes:
+    """The whole request body, de-chunked."""
+    if "chunked" in _tokens(headers, "transfer-encoding"):
+        body = bytearray()
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readuntil(b"\r\n")) != b"\r\n":
+                    pass
+                return bytes(body)
+            if len(body) + size > MAX_BODY_SIZE:
+                raise GatewayError(413, "Request body too large")
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    length = int(_header(headers, "content-length") or 0)
+    if length > MAX_BODY_SIZE:
+        raise GatewayError(413, "Request body too large")
+    return await reader.readexactly(length)
+
+
+class UpstreamPool:
+    """Idle keep-alive connections to the upstream proxies, used from the gateway's event loop."""
+
+    def __init__(self):
+        self._idle: Dict[str, List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, float]]] = {}
+        self.opened = 0
+        self.reused = 0
+
+    async def connect(self, ip: str, fresh: bool = False) -> Tuple[Connection, bool]:
+        """
+        A connection to an upstream proxy, an idle one if there is any.
+
+        Returns:
+            tuple: ((reader, writer), whether the connection was reused)
+        """
+        idle_timeout = gateway_config().get("idle_timeout", 30)
+        idle = self._idle.get(ip, [])
+        while idle and not fresh:
+            reader, writer, since = idle.pop()
+            if writer.is_closing() or reader.at_eof() or time.monotonic() - since > idle_timeout:
+                writer.close()
+                continue
+            self.reused += 1
+            return (reader, writer), True
+        timeout = gateway_config().get("connect_timeout", 5)
+        try:
+            connection = await asyncio.wait_for(asyncio.open_connection(ip, UPSTREAM_PORT), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise UpstreamError(f"Cannot connect to {ip}: {e!r}")
+        self.opened += 1
+        return connection, False
+
+    def release(self, ip: str, connection: Connection):
+        """Keep a connection for reuse, or close it if the proxy has enough idle ones."""
+        reader, writer = connection
+        idle = self._idle.setdefault(ip, [])
+        if writer.is_closing() or len(idle) >= gateway_config().get("pool_size", 8):
+            writer.close()
+            return
+        idle.append((reader, writer, time.monotonic()))
+
+    def close_all(self):
+        for idle in self._idle.values():
+            for _, writer, _ in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class ProxyGateway:
+    """HTTP and CONNECT forward proxy that spreads connections over the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.pool = UpstreamPool()
+        self.exclude: Callable[[], Collection[str]] = set
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self._upstreams: Dict[str, Dict] = {}
+        self.connections = 0
+        self.errors = 0
+
+    # Lifecycle
+
+    def start(self, exclude: Optional[Callable[[], Collection[str]]] = None) -> bool:
+        """
+        Listen on GATEWAY_HOST:GATEWAY_PORT in a background thread.
+
+        Args:
+            exclude: Returns the IPs not to route to, e.g. queued and leased proxies
+
+        Returns:
+            bool: True if the gateway is running, False if it is disabled
+        """
+        config = gateway_config()
+        if not config.get("enabled"):
+            return False
+        if exclude is not None:
+            self.exclude = exclude
+        with self._lock:
+            if self._thread is not None:
+                return True
+            host = listen_host()
+            loop = asyncio.new_event_loop()
+            server = loop.run_until_complete(asyncio.start_server(
+                self.handle, host, config.get("port", 8080), limit=MAX_HEAD_SIZE
+            ))
+            self._loop, self._server = loop, server
+            self.host, self.port = host, server.sockets[0].getsockname()[1]
+            self._thread = threading.Thread(target=loop.run_forever, name="proxy-gateway", daemon=True)
+            self._thread.start()
+        logger.info(f"Proxy gateway listening on {host}:{self.port}")
+        return True
+
+    def stop(self):
+        with self._lock:
+            loop, thread, server = self._loop, self._thread, self._server
+            self._loop = self._thread = self._server = None
+        if loop is None:
+            return
+
+        async def shutdown():
+            server.close()
+            self.pool.close_all()
+            # Client connections still being served, e.g. waiting on the executor
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_default_executor()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None
+
+    # Upstream selection and statistics
+
+    def _record(self, ip: str, **counts):
+        with self._lock:
+            stats = self._upstreams.setdefault(ip, {
+                "requests": 0, "tunnels": 0, "failures": 0,
+                "bytes_sent": 0, "bytes_received": 0, "active": 0,
+                "first_used": time.time(), "last_used": None,
+            })
+            for key, value in counts.items():
+                stats[key] += value
+            stats["last_used"] = time.time()
+
+    def select_upstream(self, excluded: Collection[str]) -> Optional[str]:
+        # Blocks on the registry lock, run it on an executor from the event loop
+        proxy_registry.sync(settings.config)
+        entry = select_proxy(proxy_registry, gateway_config().get("strategy") or None, exclude=excluded)
+        return entry.ip if entry is not None else None
+
+    def stats(self) -> Dict:
+        """Gateway counters and per-upstream throughput since the first use of each upstream."""
+        now = time.time()
+        with self._lock:
+            upstreams = {}
+            for ip, stats in self._upstreams.items():
+                elapsed = max(now - stats["first_used"], 1e-9)
+                upstreams[ip] = dict(
+                    stats,
+                    bytes_per_second=(stats["bytes_sent"] + stats["bytes_received"]) / elapsed,
+                )
+            return {
+                "running": self._thread is not None,
+                "host": self.host,
+                "port": self.port,
+                "connections": self.connections,
+                "errors": self.errors,
+                "upstream_connections_opened": self.pool.opened,
+                "upstream_connections_reused": self.pool.reused,
+                "upstreams": upstreams,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._upstreams.clear()
+            self.connections = self.errors = 0
+            self.pool.opened = self.pool.reused = 0
+
+    # Client connections
+
+    def _authorized(self, headers: Headers) -> bool:
+        if settings.config["no_auth"]:
+            return True
+        credentials = f"{settings.config['auth']['username']}:{settings.config['auth']['password']}"
+        expected = "Basic " + base64.b64encode(credentials.encode()).decode()
+        given = _header(headers, "proxy-authorization") or ""
+        return hmac.compare_digest(given.encode(), expected.encode())
+
+    def _upstream_auth(self) -> Headers:
+        if settings.config["no_auth"]:
+            return []
+        credentials = f"{settings.config['auth']['username']}:{settings.config['auth']['password']}"
+        return [("Proxy-Authorization", "Basic " + base64.b64encode(credentials.encode()).decode())]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection, which may carry several requests."""
+        with self._lock:
+            self.connections += 1
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                start_line, headers = parse_head(head)
+                parts = start_line.split(" ")
+                if len(parts) != 3:
+                    raise GatewayError(400, "Malformed request line")
+                method, target, version = parts
+                if not self._authorized(headers):
+                    # Consume the body so it is not read as the next request
+                    await read_request_body(reader, headers)
+                    writer.write(build_head(f"{version} 407 Proxy Authentication Required", [
+                        ("Proxy-Authenticate", 'Basic realm="CloudProxy"'), ("Content-Length", "0"),
+                    ]))
+                    await writer.drain()
+                    continue
+                if method.upper() == "CONNECT":
+                    await self._tunnel(reader, writer, target, version)
+                    break
+                if not target.lower().startswith("http://"):
+                    raise GatewayError(400, "Expected an absolute http:// URI")
+                body = await read_request_body(reader, headers)
+                keep_alive = await self._forward(writer, method, target, version, headers, body)
+                if not keep_alive:
+                    break
+        except GatewayError as e:
+            with self._lock:
+                self.errors += 1
+            try:
+                writer.write(build_head(f"HTTP/1.1 {e.status} {e.reason}", [
+                    ("Content-Length", "0"), ("Connection", "close"),
+                ]))
+                await writer.drain()
+            except (OSError, ConnectionError):
+                pass
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug(f"Proxy gateway: client connection ended: {e!r}")
+        finally:
+            writer.close()
+
+    async def _exchange(self, ip: str, request: bytes, idempotent: bool) -> Tuple[Connection, str, Headers]:
+        """
+        Send a request to an upstream and read its response head.
+
+        An idempotent request is sent again on a fresh connection if a reused
+        one turns out to be stale. Other requests always get a fresh
+        connection and are never sent twice, a failure after sending them is
+        answered with 502.
+        """
+        connection, reused = await self.pool.connect(ip, fresh=not idempotent)
+        while True:
+            reader, writer = connection
+            try:
+                writer.write(request)
+                await writer.drain()
+                head = await read_head(reader)
+                if head is None:
+                    raise ConnectionResetError("Upstream closed the connection")
+                status_line, headers = parse_head(head)
+                return connection, status_line, headers
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, GatewayError) as e:
+                writer.close()
+                if not idempotent:
+                    logger.warning(f"Proxy gateway: {ip} failed after a non-idempotent request was sent: {e!r}")
+                    self._record(ip, failures=1)
+                    raise GatewayError(502, "Upstream proxy failed")
+                if not reused:
+                    raise UpstreamError(f"{ip} failed: {e!r}")
+                # The proxy closed an idle connection, not a failure of the proxy
+                connection, reused = await self.pool.connect(ip, fresh=True)
+
+    async def _with_retries(self, request: bytes, method: str) -> Tuple[str, Connection, str, Headers]:
+        """Route a request to upstream proxies until one answers."""
+        loop = asyncio.get_running_loop()
+        excluded = set(await loop.run_in_executor(None, self.exclude))
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retries = max(int(gateway_config().get("retries", 2)), 0)
+        for _ in range(retries + 1):
+            ip = await loop.run_in_executor(None, self.select_upstream, excluded)
+            if ip is None:
+                break
+            try:
+                connection, status_line, headers = await self._exchange(ip, request, idempotent)
+                return ip, connection, status_line, headers
+            except UpstreamError as e:
+                logger.warning(f"Proxy gateway: {e}, retrying on another proxy")
+                self._record(ip, failures=1)
+                excluded.add(ip)
+        raise GatewayError(502, "No upstream proxy available")
+
+    async def _forward(self, writer: asyncio.StreamWriter, method: str, target: str, version: str,
+                       headers: Headers, body: bytes) -> bool:
+        """Relay a plain HTTP request, returns whether the client connection stays open."""
+        client_keep_alive = (
+            "close" not in _tokens(headers, "connection") | _tokens(headers, "proxy-connection")
+            and version == "HTTP/1.1"
+        )
+        forwarded = [(name, value) for name, value in headers
+                     if name.lower() not in HOP_BY_HOP and name.lower() != "content-length"]
+        forwarded += self._upstream_auth()
+        forwarded += [("Content-Length", str(len(body)))] if body or method.upper() in ("POST", "PUT", "PATCH") else []
+        forwarded.append(("Connection", "keep-alive"))
+        request = build_head(f"{method} {target} HTTP/1.1", forwarded) + body
+
+        ip, connection, status_line, response_headers = await self._with_retries(request, method)
+        upstream_reader, upstream_writer = connection
+        status = int(status_line.split(" ")[1])
+        self._record(ip, requests=1, active=1, bytes_sent=len(request))
+        try:
+            framed = True
+            no_body = method.upper() == "HEAD" or status in (204, 304) or 100 <= status < 200
+            chunked = "chunked" in _tokens(response_headers, "transfer-encoding")
+            length = _header(response_headers, "content-length")
+            if not no_body and not chunked and length is None:
+                framed = False
+            keep_alive = client_keep_alive and framed
+            relayed = [(name, value) for name, value in response_headers
+                       if name.lower() not in HOP_BY_HOP - {"transfer-encoding"}]
+            relayed.append(("Connection", "keep-alive" if keep_alive else "close"))
+            response_head = build_head(status_line, relayed)
+            writer.write(response_head)
+            received = len(response_head)
+
+            if no_body:
+                pass
+            elif chunked:
+                while True:
+                    line = await upstream_reader.readuntil(b"\r\n")
+                    writer.write(line)
+                    received += len(line)
+                    size = int(line.split(b";")[0], 16)
+                    if size == 0:
+                        while True:
+                            trailer = await upstream_reader.readuntil(b"\r\n")
+                            writer.write(trailer)
+                            received += len(trailer)
+                            if trailer == b"\r\n":
+                                break
+                        break
+                    chunk = await upstream_reader.readexactly(size + 2)
+                    writer.write(chunk)
+                    received += len(chunk)
+                    await writer.drain()
+            elif length is not None:
+                remaining = int(length)
+                while remaining > 0:
+                    chunk = await upstream_reader.read(min(remaining, RELAY_CHUNK))
+                    if not chunk:
+                        raise ConnectionResetError("Upstream closed mid-response")
+                    writer.write(chunk)
+                    received += len(chunk)
+                    remaining -= len(chunk)
+                    await writer.drain()
+            else:
+                while True:
+                    chunk = await upstream_reader.read(RELAY_CHUNK)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    received += len(chunk)
+                    await writer.drain()
+            await writer.drain()
+        except BaseException:
+            upstream_writer.close()
+            self._record(ip, active=-1)
+            raise
+        self._record(ip, active=-1, bytes_received=received)
+
+        upstream_closes = "close" in _tokens(response_headers, "connection") or not status_line.startswith("HTTP/1.1")
+        if framed and not upstream_closes:
+            self.pool.release(ip, connection)
+        else:
+            upstream_writer.close()
+        return keep_alive
+
+    async def _tunnel(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, target: str, version: str):
+        """Open a CONNECT tunnel through an upstream proxy and relay bytes both ways."""
+        request = build_head(f"CONNECT {target} HTTP/1.1", [("Host", target)] + self._upstream_auth())
+        ip, connection, status_line, response_headers = await self._with_retries(request, "CONNECT")
+        upstream_reader, upstream_writer = connection
+        if status_line.split(" ")[1] != "200":
+            # Pass the proxy's refusal on, e.g. the target is unreachable
+            writer.write(build_head(status_line, [("Content-Length", "0"), ("Connection", "close")]))
+            await writer.drain()
+            upstream_writer.close()
+            self._record(ip, tunnels=1)
+            return
+        writer.write(f"{version} 200 Connection established\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        self._record(ip, tunnels=1, active=1, bytes_sent=len(request))
+
+        async def pipe(source: asyncio.StreamReader, sink: asyncio.StreamWriter, counter: str):
+            try:
+                while True:
+                    chunk = await source.read(RELAY_CHUNK)
+                    if not chunk:
+                        break
+                    sink.write(chunk)
+                    self._record(ip, **{counter: len(chunk)})
+                    await sink.drain()
+                if sink.can_write_eof():
+                    sink.write_eof()
+            except (OSError, ConnectionError):
+                pass
+
+        try:
+            await asyncio.gather(
+                pipe(reader, upstream_writer, "bytes_sent"),
+                pipe(upstream_reader, writer, "bytes_received"),
+            )
+        finally:
+            upstream_writer.close()
+            self._record(ip, active=-1)
+
+
+proxy_gateway = ProxyGateway()
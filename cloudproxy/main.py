@@ -1,16 +1,22 @@
 import os
-import random
 import sys
 import re
+import io
+import csv
+import json
+import hashlib
 import logging
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime, UTC
-from typing import List, Optional, Set, Dict, Any
+from typing import Callable, List, Optional, Set, Dict, Any, Tuple
 
 import uvicorn
 from loguru import logger
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
@@ -20,6 +26,17 @@ from pydantic import BaseModel, IPvAnyAddress, Field, field_validator
 from cloudproxy.providers import settings
 from cloudproxy.providers.settings import delete_queue, restart_queue
 from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.recycle import recycle_schedule, age_limit_jitter
+from cloudproxy.providers.health import health_monitor, health_store, result_max_age
+from cloudproxy.providers.registry import ProxyEntry, proxy_registry
+from cloudproxy.providers.selection import STRATEGIES, select_proxy
+from cloudproxy.providers.leases import Lease, lease_store
+from cloudproxy.providers.changes import change_feed
+from cloudproxy.providers import manager, metrics
+from cloudproxy.providers.scheduler import tick_metrics, reconcile_triggers, request_reconcile, request_reconcile_for_ip
+from cloudproxy.providers.tracing import TickTrace, trace_buffer
+from cloudproxy.check import probe_sessions, probe_targets, ip_targets
+from cloudproxy.gateway import proxy_gateway
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
@@ -125,6 +142,9 @@ def main():
         logging.getLogger(name).handlers = []
         logging.getLogger(name).propagate = True
     
+    # Start the forward-proxy gateway if enabled, routing like GET /random
+    proxy_gateway.start(exclude=checkout_excluded)
+    
     # Start uvicorn with modified logging config
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
 
@@ -157,6 +177,7 @@ class ProxyList(BaseModel):
     metadata: Metadata = Field(default_factory=Metadata)
     total: int
     proxies: List[ProxyAddress]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as cursor to get the next page, null on the last page")
 
 class ProxyResponse(BaseModel):
     metadata: Metadata = Field(default_factory=Metadata)
@@ -175,80 +196,549 @@ def create_proxy_address(ip: str) -> ProxyAddress:
         auth_enabled=not settings.config["no_auth"]
     )
 
-# Updated get_ip_list function
+def entry_to_proxy_address(entry: ProxyEntry) -> ProxyAddress:
+    proxy = create_proxy_address(entry.ip)
+    proxy.provider = entry.provider
+    proxy.instance = entry.instance
+    proxy.display_name = entry.display_name
+    return proxy
+
+def queued_ips() -> Set[str]:
+    """IPs waiting in the delete or restart queue."""
+    return delete_queue | restart_queue
+
+def unavailable_ips() -> Set[str]:
+    """IPs left out of the listings: queued, or failing their latest health monitor probe."""
+    return queued_ips() | health_store.down(result_max_age())
+
+def unavailable_version() -> Tuple:
+    """Changes whenever unavailable_ips() does, without building the set."""
+    return (
+        id(delete_queue), getattr(delete_queue, "version", 0),
+        id(restart_queue), getattr(restart_queue, "version", 0),
+        health_store.down_version(result_max_age()),
+    )
+
+def checkout_excluded() -> Set[str]:
+    """IPs not handed out to clients: unavailable, or held by an exclusive lease."""
+    return unavailable_ips() | lease_store.leased_ips()
+
 def get_ip_list() -> List[ProxyAddress]:
-    ip_list = []
-    for provider_name, provider_config in settings.config["providers"].items():
-        # Handle top-level IPs (for backward compatibility)
-        if "ips" in provider_config:
-            for ip in provider_config["ips"]:
-                if ip not in delete_queue and ip not in restart_queue:
-                    proxy = create_proxy_address(ip)
-                    proxy.provider = provider_name
-                    proxy.instance = "default"  # Assume default instance for top-level IPs
-                    proxy.display_name = provider_config.get("display_name", provider_name)
-                    ip_list.append(proxy)
-                    
-        # Skip providers that don't have an instances field (like azure)
-        if "instances" not in provider_config:
-            continue
-            
-        # Process each instance
-        for instance_name, instance_config in provider_config["instances"].items():
-            if "ips" in instance_config:
-                for ip in instance_config["ips"]:
-                    if ip not in delete_queue and ip not in restart_queue:
-                        proxy = create_proxy_address(ip)
-                        proxy.provider = provider_name
-                        proxy.instance = instance_name
-                        proxy.display_name = instance_config.get("display_name")
-                        ip_list.append(proxy)
-                        
-    return ip_list
+    proxy_registry.sync(settings.config)
+    return [entry_to_proxy_address(entry) for entry in proxy_registry.page(exclude=unavailable_ips())]
+
+# Serialized listing bodies by (route, ETag), without their metadata
+RESPONSE_CACHE_SIZE = 64
+response_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+response_cache_lock = threading.Lock()
+
+def make_etag(*parts) -> str:
+    """A strong ETag from the versions and parameters a response depends on."""
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest() + '"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(",")}
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def conditional_response(request: Request, route: str, parts: Tuple, build: Callable[[], BaseModel]) -> Response:
+    """
+    Serve a listing with an ETag, answering 304 if the client's copy is current.
+    
+    The body is only built and serialized once per ETag, later requests reuse
+    it with fresh metadata.
+    
+    Args:
+        request: The incoming request
+        route: Name of the listing, part of the cache key
+        parts: Everything the body depends on, e.g. versions and query parameters
+        build: Builds the response model on a cache miss
+        
+    Returns:
+        Response: 304 Not Modified, or the JSON body
+    """
+    etag = make_etag(route, *parts)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    key = (route, etag)
+    with response_cache_lock:
+        body = response_cache.get(key)
+        if body is not None:
+            response_cache.move_to_end(key)
+    if body is None:
+        body = build().model_dump_json(exclude={"metadata"}).encode()
+        with response_cache_lock:
+            response_cache[key] = body
+            while len(response_cache) > RESPONSE_CACHE_SIZE:
+                response_cache.popitem(last=False)
+    metadata = b'{"metadata":' + Metadata().model_dump_json().encode()
+    content = metadata + (b"," + body[1:] if body != b"{}" else b"}")
+    return Response(content, media_type="application/json", headers=headers)
+
+def config_fingerprint(*sections: str) -> str:
+    """Cheap digest of config sections, changes whenever any value in them does."""
+    return hashlib.blake2b(
+        repr([settings.config.get(section) for section in sections]).encode(), digest_size=12
+    ).hexdigest()
 
 # Updated API endpoints
 @app.get("/", tags=["Proxies"], response_model=ProxyList)
 def read_root(
+    request: Request,
     offset: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None,
+        pattern=r"^\d+$",
+        description="next_cursor of the previous page, stays consistent while proxies change. Overrides offset"
+    )
 ):
     """
     Get a list of all available proxy servers.
     
+    Pages can be fetched by offset, or by following next_cursor, which does
+    not skip or repeat proxies when proxies before it are added or removed.
+    Supports If-None-Match, the ETag changes with the pool version.
+    
     Args:
         offset: Number of items to skip (pagination)
         limit: Maximum number of items to return
+        cursor: next_cursor of the previous page
         
     Returns:
         ProxyList: A paginated list of proxy servers with metadata
     """
-    all_proxies = get_ip_list()
-    return ProxyList(
-        total=len(all_proxies),
-        proxies=all_proxies[offset:offset + limit]
+    proxy_registry.sync(settings.config)
+
+    def build() -> ProxyList:
+        excluded = unavailable_ips()
+        total = proxy_registry.count(exclude=excluded)
+        if cursor is not None:
+            entries, next_cursor = proxy_registry.after(int(cursor), limit, exclude=excluded)
+        else:
+            entries = proxy_registry.page(offset, limit, exclude=excluded)
+            next_cursor = None
+            if entries and offset + len(entries) < total:
+                next_cursor = proxy_registry.cursor_of(entries[-1].ip)
+        return ProxyList(
+            total=total,
+            proxies=[entry_to_proxy_address(entry) for entry in entries],
+            next_cursor=str(next_cursor) if next_cursor is not None else None
+        )
+
+    parts = (
+        change_feed.version, proxy_registry.syncs, offset, limit, cursor, unavailable_version(),
+        settings.config["no_auth"], config_fingerprint("auth"),
     )
+    return conditional_response(request, "proxies", parts, build)
 
 @app.get("/random", tags=["Proxies"], response_model=ProxyResponse)
-def read_random():
+def read_random(
+    strategy: Optional[str] = Query(
+        None,
+        description=f"Selection strategy, one of {', '.join(STRATEGIES)}. Defaults to PROXY_SELECTION_STRATEGY"
+    )
+):
     """
-    Get a random proxy server from the available pool.
+    Get a proxy server from the available pool, picked by a selection strategy.
     
+    Args:
+        strategy: Selection strategy, defaults to PROXY_SELECTION_STRATEGY
+        
     Returns:
-        ProxyResponse: A single random proxy with metadata
+        ProxyResponse: A single proxy with metadata
         
     Raises:
-        HTTPException: If no proxies are available
+        HTTPException: If the strategy is unknown or no proxies are available
     """
-    proxies = get_ip_list()
-    if not proxies:
+    proxy_registry.sync(settings.config)
+    try:
+        entry = select_proxy(proxy_registry, strategy, exclude=checkout_excluded())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=str(e)
+        )
+    if entry is None:
         raise HTTPException(
             status_code=404,
             detail="No proxies available"
         )
-    proxy = random.choice(proxies)
     return ProxyResponse(
         message="Random proxy retrieved successfully",
-        proxy=proxy
+        proxy=entry_to_proxy_address(entry)
+    )
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "text": "text/plain",
+    "csv": "text/csv",
+}
+EXPORT_CSV_FIELDS = ["ip", "port", "provider", "instance", "display_name", "url"]
+# Proxies read from the registry per lock acquisition while exporting
+EXPORT_CHUNK = 500
+
+def export_lines(format: str, excluded: Set[str]):
+    """Every available proxy, one line each, reading the registry a chunk at a time."""
+    port = ProxyAddress.model_fields["port"].default
+    auth = "" if settings.config["no_auth"] else f"{settings.config['auth']['username']}:{settings.config['auth']['password']}@"
+    if format == "csv":
+        yield ",".join(EXPORT_CSV_FIELDS) + "\n"
+    cursor: Optional[int] = 0
+    while cursor is not None:
+        entries, cursor = proxy_registry.after(cursor, EXPORT_CHUNK, exclude=excluded)
+        lines = []
+        for entry in entries:
+            url = f"http://{auth}{entry.ip}:{port}"
+            if format == "text":
+                lines.append(f"{entry.ip}:{port}\n")
+            elif format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="\n").writerow(
+                    [entry.ip, port, entry.provider, entry.instance, entry.display_name or "", url]
+                )
+                lines.append(buffer.getvalue())
+            else:
+                lines.append(json.dumps({
+                    "ip": entry.ip,
+                    "port": port,
+                    "auth_enabled": not settings.config["no_auth"],
+                    "url": url,
+                    "provider": entry.provider,
+                    "instance": entry.instance,
+                    "display_name": entry.display_name,
+                }) + "\n")
+        yield "".join(lines)
+
+@app.get("/proxies/export", tags=["Proxies"], response_class=StreamingResponse)
+def export_proxies(
+    format: str = Query("ndjson", pattern="^(ndjson|text|csv)$", description="ndjson, text (ip:port per line) or csv")
+):
+    """
+    Stream every available proxy in one response.
+    
+    The export is written as it is read from the registry, so memory use
+    does not grow with the pool.
+    
+    Args:
+        format: ndjson, text (ip:port per line) or csv
+        
+    Returns:
+        StreamingResponse: The whole pool, one proxy per line
+    """
+    proxy_registry.sync(settings.config)
+    return StreamingResponse(
+        export_lines(format, unavailable_ips()),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"inline; filename=proxies.{'txt' if format == 'text' else format}"}
+    )
+
+@app.get("/sticky/{session_key}", tags=["Proxies"], response_model=ProxyResponse)
+def read_sticky(session_key: str):
+    """
+    Get the proxy assigned to a session key.
+    
+    Keys are mapped with consistent hashing, so a key keeps its proxy until
+    the proxy is recycled, and pool changes only remap a small share of keys.
+    
+    Args:
+        session_key: Client-chosen key identifying the session
+        
+    Returns:
+        ProxyResponse: The session's proxy with metadata
+        
+    Raises:
+        HTTPException: If no proxies are available
+    """
+    proxy_registry.sync(settings.config)
+    entry = proxy_registry.sticky(session_key, exclude=checkout_excluded())
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No proxies available"
+        )
+    return ProxyResponse(
+        message="Sticky proxy retrieved successfully",
+        proxy=entry_to_proxy_address(entry)
+    )
+
+def instance_region(instance_config: Dict[str, Any]) -> Optional[str]:
+    """The region, zone or location a provider instance deploys to."""
+    for field in ("region", "zone", "location"):
+        if instance_config.get(field):
+            return instance_config[field]
+    return None
+
+def matching_instances(provider: Optional[str], instance: Optional[str],
+                       region: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """(provider, instance) pairs matching the filters, None if nothing is filtered."""
+    if provider is None and instance is None and region is None:
+        return None
+    return [
+        (provider_name, instance_name)
+        for provider_name, provider_config in settings.config["providers"].items()
+        if provider in (None, provider_name)
+        for instance_name, instance_config in provider_config.get("instances", {}).items()
+        if instance in (None, instance_name) and region in (None, instance_region(instance_config))
+    ]
+
+@app.get("/proxies/sample", tags=["Proxies"], response_model=ProxyList)
+def read_sample(
+    count: int = Query(10, ge=1, le=1000, description="Number of distinct proxies to return"),
+    provider: Optional[str] = Query(None, description="Only return proxies of this provider"),
+    instance: Optional[str] = Query(None, description="Only return proxies of this provider instance"),
+    region: Optional[str] = Query(None, description="Only return proxies in this region, zone or location")
+):
+    """
+    Get several distinct random proxies in one call.
+    
+    Args:
+        count: Number of distinct proxies to return
+        provider: Only return proxies of this provider
+        instance: Only return proxies of this provider instance
+        region: Only return proxies in this region, zone or location
+        
+    Returns:
+        ProxyList: Up to count distinct proxies, fewer if not enough are available
+        
+    Raises:
+        HTTPException: If the provider is not found or no proxies are available
+    """
+    if provider is not None and provider not in settings.config["providers"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Provider '{provider}' not found"
+        )
+    proxy_registry.sync(settings.config)
+    entries = proxy_registry.sample_distinct(
+        count,
+        exclude=checkout_excluded(),
+        instances=matching_instances(provider, instance, region)
+    )
+    if not entries:
+        raise HTTPException(
+            status_code=404,
+            detail="No proxies available"
+        )
+    for entry in entries:
+        proxy_registry.mark_served(entry.ip)
+    return ProxyList(
+        total=len(entries),
+        proxies=[entry_to_proxy_address(entry) for entry in entries]
+    )
+
+class PoolChange(BaseModel):
+    version: int = Field(description="Pool version after this change")
+    type: str = Field(description="add, remove or health")
+    ip: str
+    timestamp: datetime
+    provider: Optional[str] = None
+    instance: Optional[str] = None
+    alive: Optional[bool] = Field(default=None, description="Probe result, for health events")
+
+class PoolChangeList(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    version: int = Field(description="Current pool version")
+    next: int = Field(description="Version to pass as since on the next request")
+    reset: bool = Field(description="Changes after since were dropped, fetch the full listing again")
+    changes: List[PoolChange]
+
+def to_pool_change(event: Dict[str, Any]) -> PoolChange:
+    return PoolChange(**dict(event, timestamp=datetime.fromtimestamp(event["timestamp"], UTC)))
+
+@app.get("/changes", tags=["Proxies"], response_model=PoolChangeList)
+def read_changes(
+    since: int = Query(0, ge=0, description="Last pool version the client has seen"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Get the pool changes after a version.
+    
+    Args:
+        since: Last pool version the client has seen. 0 returns every change
+            while the feed still holds version 1, once older changes were
+            dropped it returns reset, and the full listing should be fetched
+        limit: Maximum number of changes to return
+        
+    Returns:
+        PoolChangeList: Changes oldest first, with the version to ask from next
+    """
+    proxy_registry.sync(settings.config)
+    events, version, reset = change_feed.since(since, limit)
+    if reset:
+        next_version = version
+    else:
+        next_version = events[-1]["version"] if events else since
+    return PoolChangeList(
+        version=version,
+        next=next_version,
+        reset=reset,
+        changes=[to_pool_change(event) for event in events]
+    )
+
+async def stream_changes(since: int, heartbeat: float = 15):
+    """
+    Server-Sent Events of every pool change after since, with a comment line while idle.
+
+    Runs on the event loop, so open streams do not take threads from the pool
+    the sync routes run on while they wait for changes.
+    """
+    version = since
+    while True:
+        await run_in_threadpool(proxy_registry.sync, settings.config)
+        events, current, reset = change_feed.since(version)
+        if reset:
+            yield f"id: {current}\nevent: reset\ndata: {json.dumps({'version': current})}\n\n"
+            version = current
+        for event in events:
+            data = to_pool_change(event).model_dump_json(exclude_none=True)
+            yield f"id: {event['version']}\nevent: {event['type']}\ndata: {data}\n\n"
+            version = event["version"]
+        if not await change_feed.wait_async(version, heartbeat):
+            yield ": keepalive\n\n"
+
+@app.get("/changes/stream", tags=["Proxies"])
+def stream_pool_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Last pool version the client has seen, defaults to the current version")
+):
+    """
+    Follow pool changes as Server-Sent Events.
+    
+    Each event's id is the pool version and its type is add, remove or health.
+    A reconnecting client resumes from its Last-Event-ID. A reset event means
+    changes were missed and the full listing should be fetched again.
+    
+    Args:
+        since: Last pool version the client has seen, defaults to the current version
+        
+    Returns:
+        StreamingResponse: A text/event-stream of pool changes
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = change_feed.version
+    return StreamingResponse(
+        stream_changes(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class LeaseRequest(BaseModel):
+    count: int = Field(1, ge=1, le=1000, description="Number of distinct proxies to lease")
+    ttl: Optional[int] = Field(None, ge=1, description="Seconds until the lease expires, defaults to LEASE_DEFAULT_TTL")
+    provider: Optional[str] = Field(None, description="Only lease proxies of this provider")
+    instance: Optional[str] = Field(None, description="Only lease proxies of this provider instance")
+    region: Optional[str] = Field(None, description="Only lease proxies in this region, zone or location")
+
+class LeaseInfo(BaseModel):
+    id: str
+    proxies: List[ProxyAddress]
+    ttl: int
+    created_at: datetime
+    expires_at: datetime
+
+class LeaseResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    lease: LeaseInfo
+
+class LeaseList(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    total: int
+    leases: List[LeaseInfo]
+
+def lease_to_info(lease: Lease) -> LeaseInfo:
+    return LeaseInfo(
+        id=lease.id,
+        proxies=[entry_to_proxy_address(entry) for entry in lease.proxies],
+        ttl=lease.ttl,
+        created_at=datetime.fromtimestamp(lease.created_at, UTC),
+        expires_at=datetime.fromtimestamp(lease.expires_at, UTC)
+    )
+
+@app.post("/leases", tags=["Leases"], response_model=LeaseResponse, status_code=201)
+def create_lease(request: LeaseRequest):
+    """
+    Check out proxies exclusively until the lease is released or expires.
+    
+    Leased proxies are not served by /random, /proxies/sample or /sticky and
+    are not recycled by rolling deployments while the lease lasts.
+    
+    Args:
+        request: Number of proxies, TTL and filters
+        
+    Returns:
+        LeaseResponse: The lease with its proxies
+        
+    Raises:
+        HTTPException: If the provider is not found or not enough proxies are available
+    """
+    if request.provider is not None and request.provider not in settings.config["providers"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Provider '{request.provider}' not found"
+        )
+    proxy_registry.sync(settings.config)
+    lease = lease_store.acquire(
+        proxy_registry,
+        request.count,
+        ttl=request.ttl,
+        exclude=unavailable_ips(),
+        instances=matching_instances(request.provider, request.instance, request.region)
+    )
+    if lease is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Fewer than {request.count} unleased proxies available"
+        )
+    return LeaseResponse(
+        message="Lease created successfully",
+        lease=lease_to_info(lease)
+    )
+
+@app.get("/leases", tags=["Leases"], response_model=LeaseList)
+def list_leases():
+    """
+    Get all active leases.
+    
+    Returns:
+        LeaseList: Unexpired leases, soonest expiry first
+    """
+    leases = lease_store.leases()
+    return LeaseList(
+        total=len(leases),
+        leases=[lease_to_info(lease) for lease in leases]
+    )
+
+@app.delete("/leases/{lease_id}", tags=["Leases"], response_model=LeaseResponse)
+def release_lease(lease_id: str):
+    """
+    Release a lease, returning its proxies to the pool.
+    
+    Args:
+        lease_id: ID of the lease
+        
+    Returns:
+        LeaseResponse: The released lease
+        
+    Raises:
+        HTTPException: If the lease does not exist or has already expired
+    """
+    lease = lease_store.release(lease_id)
+    if lease is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Lease '{lease_id}' not found"
+        )
+    return LeaseResponse(
+        message="Lease released successfully",
+        lease=lease_to_info(lease)
     )
 
 @app.get("/destroy", tags=["Proxy Management"], response_model=ProxyList)
@@ -282,6 +772,7 @@ async def remove_proxy(ip_address: str):
     try:
         proxy = create_proxy_address(ip_address)
         delete_queue.add(str(proxy.ip))
+        request_reconcile_for_ip(str(proxy.ip))
         return ProxyResponse(
             message=f"Proxy scheduled for deletion",
             proxy=proxy
@@ -323,6 +814,7 @@ async def restart_proxy(ip_address: str):
     try:
         proxy = create_proxy_address(ip_address)
         restart_queue.add(str(proxy.ip))
+        request_reconcile_for_ip(str(proxy.ip))
         return ProxyResponse(
             message=f"Proxy scheduled for restart",
             proxy=proxy
@@ -492,22 +984,26 @@ class ProviderUpdateRequest(BaseModel):
         return v
 
 @app.get("/providers", tags=["Provider Management"], response_model=ProviderList)
-def providers():
+def providers(request: Request):
     """
     Get configuration and status for all providers.
     
+    Supports If-None-Match, the ETag changes with the provider configuration.
+    
     Returns:
         ProviderList: Configuration and status for all providers, excluding sensitive information.
     """
-    providers_data = {}
-    for name, config in settings.config["providers"].items():
-        provider_config = config.copy()
-        provider_config.pop("secrets", None)
-        providers_data[name] = get_provider_model(name, provider_config)
-    
-    return ProviderList(
-        providers=providers_data
-    )
+    def build() -> ProviderList:
+        providers_data = {}
+        for name, config in settings.config["providers"].items():
+            provider_config = config.copy()
+            provider_config.pop("secrets", None)
+            providers_data[name] = get_provider_model(name, provider_config)
+        return ProviderList(
+            providers=providers_data
+        )
+
+    return conditional_response(request, "providers", (config_fingerprint("providers"),), build)
 
 @app.get("/providers/{provider}", tags=["Provider Management"], response_model=ProviderResponse)
 async def get_provider(provider: str):
@@ -600,6 +1096,8 @@ def configure(
             "max_scaling": update.max_scaling
         }
     
+    request_reconcile(provider, "default")
+    
     # Get provider config
     provider_config = settings.config["providers"][provider]
     
@@ -717,6 +1215,8 @@ def configure_instance(
                 "max_scaling": update.max_scaling
             }
     
+    request_reconcile(provider, instance)
+    
     instance_config = settings.config["providers"][provider]["instances"][instance].copy()
     instance_config.pop("secrets", None)
     
@@ -732,47 +1232,89 @@ class RollingDeploymentConfig(BaseModel):
     enabled: bool = Field(description="Whether rolling deployment is enabled")
     min_available: int = Field(ge=0, description="Minimum number of proxies to keep available during recycling")
     batch_size: int = Field(ge=1, description="Maximum number of proxies to recycle simultaneously")
+    max_surge: Optional[int] = Field(
+        default=None, ge=0,
+        description="Replacements provisioned ahead of retiring aged proxies, 0 disables surge recycling"
+    )
+    max_disruption: Optional[int] = Field(
+        default=None, ge=0,
+        description="Maximum proxies recycling at once across the whole pool, 0 for no limit"
+    )
+    max_disruption_per_provider: Optional[int] = Field(
+        default=None, ge=0,
+        description="Maximum proxies recycling at once per provider, 0 for no limit"
+    )
 
 class RollingDeploymentStatus(BaseModel):
     healthy: int = Field(description="Number of healthy proxies")
     pending: int = Field(description="Number of pending proxies")
     pending_recycle: int = Field(description="Number of proxies pending recycling")
     recycling: int = Field(description="Number of proxies currently being recycled")
+    aged: int = Field(default=0, description="Number of aged proxies still serving while awaiting replacement")
     last_update: str = Field(description="Last update timestamp")
     healthy_ips: List[str] = Field(description="List of healthy proxy IPs")
     pending_recycle_ips: List[str] = Field(description="List of IPs pending recycling")
     recycling_ips: List[str] = Field(description="List of IPs currently being recycled")
 
+class DisruptionBudgetStatus(BaseModel):
+    limit: int = Field(description="Maximum proxies recycling at once, 0 for no limit")
+    in_use: int = Field(description="Number of proxies recycling or pending recycling")
+    remaining: Optional[int] = Field(default=None, description="Recycling slots left, null when unlimited")
+    waiting: int = Field(description="Number of aged proxies waiting for a recycling slot")
+
+class RollingBudgetStatus(BaseModel):
+    pool: DisruptionBudgetStatus = Field(description="Budget across all providers and instances")
+    providers: Dict[str, DisruptionBudgetStatus] = Field(description="Budget by provider")
+
 class RollingDeploymentResponse(BaseModel):
     metadata: Metadata = Field(default_factory=Metadata)
     message: str
     config: RollingDeploymentConfig
     status: Dict[str, RollingDeploymentStatus] = Field(description="Status by provider/instance")
+    budget: Optional[RollingBudgetStatus] = Field(default=None, description="Disruption budget consumption")
+
+def current_rolling_config() -> RollingDeploymentConfig:
+    rolling_config = settings.config["rolling_deployment"]
+    return RollingDeploymentConfig(
+        enabled=rolling_config["enabled"],
+        min_available=rolling_config["min_available"],
+        batch_size=rolling_config["batch_size"],
+        max_surge=rolling_config.get("max_surge", 0),
+        max_disruption=rolling_config.get("max_disruption", 0),
+        max_disruption_per_provider=rolling_config.get("max_disruption_per_provider", 0)
+    )
+
+def rolling_budget(provider: Optional[str] = None) -> RollingBudgetStatus:
+    budget = rolling_manager.get_budget_status()
+    providers = budget["providers"]
+    if provider is not None:
+        providers = {name: data for name, data in providers.items() if name == provider}
+    return RollingBudgetStatus(pool=budget["pool"], providers=providers)
 
 @app.get("/rolling", tags=["Rolling Deployment"], response_model=RollingDeploymentResponse)
-def get_rolling_deployment_status():
+def get_rolling_deployment_status(request: Request):
     """
     Get the current rolling deployment configuration and status.
     
+    Supports If-None-Match, the ETag changes with the rolling deployment state.
+    
     Returns:
         RollingDeploymentResponse: Current rolling deployment configuration and status
     """
-    config = RollingDeploymentConfig(
-        enabled=settings.config["rolling_deployment"]["enabled"],
-        min_available=settings.config["rolling_deployment"]["min_available"],
-        batch_size=settings.config["rolling_deployment"]["batch_size"]
-    )
-    
-    raw_status = rolling_manager.get_recycling_status()
-    status = {}
-    for key, data in raw_status.items():
-        status[key] = RollingDeploymentStatus(**data)
-    
-    return RollingDeploymentResponse(
-        message="Rolling deployment status retrieved successfully",
-        config=config,
-        status=status
-    )
+    def build() -> RollingDeploymentResponse:
+        raw_status = rolling_manager.get_recycling_status()
+        status = {}
+        for key, data in raw_status.items():
+            status[key] = RollingDeploymentStatus(**data)
+        return RollingDeploymentResponse(
+            message="Rolling deployment status retrieved successfully",
+            config=current_rolling_config(),
+            status=status,
+            budget=rolling_budget()
+        )
+
+    parts = (rolling_manager.version, len(rolling_manager.states), config_fingerprint("rolling_deployment"))
+    return conditional_response(request, "rolling", parts, build)
 
 @app.patch("/rolling", tags=["Rolling Deployment"], response_model=RollingDeploymentResponse)
 def update_rolling_deployment_config(update: RollingDeploymentConfig):
@@ -789,6 +1331,13 @@ def update_rolling_deployment_config(update: RollingDeploymentConfig):
     settings.config["rolling_deployment"]["enabled"] = update.enabled
     settings.config["rolling_deployment"]["min_available"] = update.min_available
     settings.config["rolling_deployment"]["batch_size"] = update.batch_size
+    if update.max_surge is not None:
+        settings.config["rolling_deployment"]["max_surge"] = update.max_surge
+    if update.max_disruption is not None:
+        settings.config["rolling_deployment"]["max_disruption"] = update.max_disruption
+    if update.max_disruption_per_provider is not None:
+        settings.config["rolling_deployment"]["max_disruption_per_provider"] = update.max_disruption_per_provider
+    update = current_rolling_config()
     
     # Get current status
     raw_status = rolling_manager.get_recycling_status()
@@ -799,7 +1348,8 @@ def update_rolling_deployment_config(update: RollingDeploymentConfig):
     return RollingDeploymentResponse(
         message="Rolling deployment configuration updated successfully",
         config=update,
-        status=status
+        status=status,
+        budget=rolling_budget()
     )
 
 @app.get("/rolling/{provider}", tags=["Rolling Deployment"], response_model=RollingDeploymentResponse)
@@ -822,11 +1372,7 @@ def get_provider_rolling_status(provider: str):
             detail=f"Provider '{provider}' not found"
         )
     
-    config = RollingDeploymentConfig(
-        enabled=settings.config["rolling_deployment"]["enabled"],
-        min_available=settings.config["rolling_deployment"]["min_available"],
-        batch_size=settings.config["rolling_deployment"]["batch_size"]
-    )
+    config = current_rolling_config()
     
     raw_status = rolling_manager.get_recycling_status(provider=provider)
     status = {}
@@ -836,7 +1382,8 @@ def get_provider_rolling_status(provider: str):
     return RollingDeploymentResponse(
         message=f"Rolling deployment status for '{provider}' retrieved successfully",
         config=config,
-        status=status
+        status=status,
+        budget=rolling_budget(provider)
     )
 
 @app.get("/rolling/{provider}/{instance}", tags=["Rolling Deployment"], response_model=RollingDeploymentResponse)
@@ -866,11 +1413,7 @@ def get_instance_rolling_status(provider: str, instance: str):
             detail=f"Provider '{provider}' instance '{instance}' not found"
         )
     
-    config = RollingDeploymentConfig(
-        enabled=settings.config["rolling_deployment"]["enabled"],
-        min_available=settings.config["rolling_deployment"]["min_available"],
-        batch_size=settings.config["rolling_deployment"]["batch_size"]
-    )
+    config = current_rolling_config()
     
     raw_status = rolling_manager.get_recycling_status(provider=provider, instance=instance)
     status = {}
@@ -880,9 +1423,436 @@ def get_instance_rolling_status(provider: str, instance: str):
     return RollingDeploymentResponse(
         message=f"Rolling deployment status for '{provider}/{instance}' retrieved successfully",
         config=config,
-        status=status
+        status=status,
+        budget=rolling_budget(provider)
     )
 
+# Recycle Schedule Models
+class PlannedRecycle(BaseModel):
+    provider: str = Field(description="Provider name")
+    instance: str = Field(description="Provider instance name")
+    id: str = Field(description="Provider identifier of the proxy")
+    ip: Optional[str] = Field(default=None, description="Proxy IP address")
+    created_at: datetime = Field(description="When the proxy was created")
+    expires_at: datetime = Field(description="When the proxy is due to be recycled")
+    seconds_remaining: float = Field(description="Seconds until the proxy is due, 0 if overdue")
+
+class RecycleScheduleResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    age_limit: int = Field(description="Proxy age limit in seconds, 0 if disabled")
+    jitter: float = Field(description="Fraction of the age limit over which recycles are spread")
+    total: int = Field(description="Number of planned recycles returned")
+    proxies: List[PlannedRecycle] = Field(description="Planned recycles, soonest first")
+
+@app.get("/recycle-schedule", tags=["Rolling Deployment"], response_model=RecycleScheduleResponse)
+def get_recycle_schedule(
+    provider: Optional[str] = Query(None, description="Only include this provider"),
+    instance: Optional[str] = Query(None, description="Only include this provider instance"),
+    within: Optional[int] = Query(None, ge=0, description="Only include recycles due within this many seconds")
+):
+    """
+    Get the planned age-limit recycle timeline.
+    
+    Each proxy gets its recycle time the first time a provider tick sees it.
+    
+    Args:
+        provider: Only include this provider
+        instance: Only include this provider instance
+        within: Only include recycles due within this many seconds
+        
+    Returns:
+        RecycleScheduleResponse: Planned recycles, soonest first
+    """
+    planned = recycle_schedule.timeline(provider=provider, instance=instance, within=within)
+    return RecycleScheduleResponse(
+        message="Recycle schedule retrieved successfully",
+        age_limit=settings.config["age_limit"],
+        jitter=age_limit_jitter(),
+        total=len(planned),
+        proxies=[PlannedRecycle(**item) for item in planned]
+    )
+
+# Health Check Models
+class HealthCheckConfig(BaseModel):
+    concurrency: int = Field(description="Maximum number of probes run in parallel per provider instance")
+    timeout: float = Field(description="Timeout in seconds for a single probe")
+    retries: int = Field(description="Retries per probe on connection errors")
+    pool_size: int = Field(description="Maximum number of pooled keep-alive probe sessions")
+    urls: List[str] = Field(description="Echo URLs used to probe proxy health, in failover order")
+    ip_urls: List[str] = Field(description="Echo URLs used to fetch a proxy's egress IP, in failover order")
+
+class ProbePoolStats(BaseModel):
+    sessions: int = Field(description="Number of pooled probe sessions")
+    max_sessions: int = Field(description="Maximum number of pooled probe sessions")
+    created: int = Field(description="Number of sessions created")
+    reused: int = Field(description="Number of probes that reused an existing session")
+    evicted: int = Field(description="Number of sessions evicted from the pool")
+
+class ProbeTargetStats(BaseModel):
+    url: str = Field(description="Echo URL")
+    latency: Optional[float] = Field(description="Smoothed probe latency in seconds")
+    successes: int = Field(description="Number of successful probes through this target")
+    failures: int = Field(description="Number of failed probes attributed to this target")
+    consecutive_failures: int = Field(description="Failures since the last success")
+    last_error: Optional[str] = Field(description="Most recent error seen for this target")
+
+class ProbeStatusResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    config: HealthCheckConfig
+    pool: ProbePoolStats
+    targets: List[ProbeTargetStats] = Field(description="Health probe echo targets")
+    ip_targets: List[ProbeTargetStats] = Field(description="IP lookup echo targets")
+
+@app.get("/echo", tags=["Health Checks"], response_class=PlainTextResponse)
+def echo(request: Request):
+    """
+    Return the caller's IP address as plain text.
+    
+    Add this endpoint's public URL to HEALTH_CHECK_URLS or HEALTH_CHECK_IP_URLS
+    to probe proxies against CloudProxy itself instead of a third-party service.
+    
+    Returns:
+        str: The IP address the request arrived from
+    """
+    return request.client.host if request.client else ""
+
+@app.get("/probes", tags=["Health Checks"], response_model=ProbeStatusResponse)
+def get_probe_status():
+    """
+    Get the health check configuration and probe session pool statistics.
+    
+    Returns:
+        ProbeStatusResponse: Health check configuration and pool usage
+    """
+    return ProbeStatusResponse(
+        message="Probe status retrieved successfully",
+        config=HealthCheckConfig(**settings.config["health_check"]),
+        pool=ProbePoolStats(**probe_sessions.stats()),
+        targets=[ProbeTargetStats(**target) for target in probe_targets.stats()],
+        ip_targets=[ProbeTargetStats(**target) for target in ip_targets.stats()]
+    )
+
+class HealthMonitorConfig(BaseModel):
+    interval: int = Field(description="Seconds between health monitor runs, 0 if the monitor is off")
+    max_age: int = Field(description="Longest interval between probes of a stable proxy, in seconds")
+    history_size: int = Field(description="Number of probe results kept per proxy")
+    pending_timeout: float = Field(description="Probe timeout in seconds for proxies that have never answered")
+
+class HealthMonitorStats(BaseModel):
+    running: bool = Field(description="Whether the health monitor is running")
+    runs: int = Field(description="Number of finished monitor runs")
+    probes: int = Field(description="Number of probes sent by the monitor and provider ticks")
+    reused: int = Field(description="Number of provider tick checks answered from a fresh result")
+    last_run: Optional[datetime] = Field(default=None, description="When the last monitor run finished")
+
+class ProxyHealth(BaseModel):
+    ip: str = Field(description="Proxy IP address")
+    alive: Optional[bool] = Field(default=None, description="Result of the latest probe")
+    checked_at: Optional[datetime] = Field(default=None, description="When the proxy was last probed")
+    latency: Optional[float] = Field(default=None, description="Duration of the latest successful probe in seconds")
+    checks: int = Field(description="Number of probes")
+    failures: int = Field(description="Number of failed probes")
+    consecutive_failures: int = Field(description="Failed probes since the last success")
+    interval: float = Field(default=0.0, description="Seconds between this proxy's probes, adapted to its history")
+    next_due: Optional[datetime] = Field(default=None, description="When the proxy is next probed")
+    samples: int = Field(default=0, description="Number of probe results in the history")
+    success_rate: Optional[float] = Field(default=None, description="Fraction of successful probes in the history")
+    mean_latency: Optional[float] = Field(default=None, description="Mean latency of successful probes in the history")
+    flaps: int = Field(default=0, description="Number of times the result changed within the history")
+
+class HealthMonitorResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    config: HealthMonitorConfig
+    stats: HealthMonitorStats
+    proxies: List[ProxyHealth] = Field(description="Latest probe result per proxy")
+
+@app.get("/probes/proxies", tags=["Health Checks"], response_model=HealthMonitorResponse)
+def get_proxy_health():
+    """
+    Get the health monitor status and the latest probe result of every watched proxy.
+    
+    Returns:
+        HealthMonitorResponse: Monitor configuration, statistics and per-proxy results
+    """
+    stats = health_monitor.stats()
+    if stats["last_run"] is not None:
+        stats["last_run"] = datetime.fromtimestamp(stats["last_run"], UTC)
+    proxies = []
+    for ip, result in sorted(health_store.results().items()):
+        for field in ("checked_at", "next_due"):
+            if result.get(field) is not None:
+                result[field] = datetime.fromtimestamp(result[field], UTC)
+        proxies.append(ProxyHealth(ip=str(ip), **result))
+    return HealthMonitorResponse(
+        message="Proxy health retrieved successfully",
+        config=HealthMonitorConfig(**settings.config["health_monitor"]),
+        stats=HealthMonitorStats(**stats),
+        proxies=proxies
+    )
+
+# Scheduler Models
+class SchedulerConfig(BaseModel):
+    workers: int = Field(description="Number of worker threads running provider ticks")
+    interval: int = Field(description="Default seconds between ticks of a provider instance")
+    jitter: int = Field(description="Maximum random delay in seconds added to each tick")
+    misfire_grace_time: int = Field(description="Seconds a late tick may still start before it counts as missed")
+    trigger_delay: int = Field(description="Seconds after an API change before the affected instance reconciles")
+    trace_size: int = Field(default=100, description="Number of tick traces kept")
+    slow_tick: float = Field(default=0, description="Seconds after which a tick's stack is captured, 0 for never")
+    slow_tick_profile: bool = Field(default=False, description="Whether ticks run under cProfile, keeping the profile of slow ones")
+
+class SchedulerTriggerStats(BaseModel):
+    requested: int = Field(description="Number of reconcile requests from API changes")
+    scheduled: int = Field(description="Number of requests that pulled a tick forward")
+    merged: int = Field(description="Number of requests merged into an already due tick")
+    pending: int = Field(description="Requests waiting for a running tick to finish")
+
+class SchedulerJobStats(BaseModel):
+    id: str = Field(description="Job ID, <provider>-<instance>")
+    interval: Optional[float] = Field(default=None, description="Seconds between ticks")
+    next_run: Optional[datetime] = Field(default=None, description="When the next tick is due")
+    running: bool = Field(default=False, description="Whether a tick is running right now")
+    runs: int = Field(default=0, description="Number of finished ticks")
+    errors: int = Field(default=0, description="Number of ticks that raised")
+    last_duration: Optional[float] = Field(default=None, description="Duration of the last tick in seconds")
+    avg_duration: Optional[float] = Field(default=None, description="Mean tick duration in seconds")
+    max_duration: Optional[float] = Field(default=None, description="Longest tick duration in seconds")
+    last_run: Optional[datetime] = Field(default=None, description="When the last tick finished")
+    last_error: Optional[str] = Field(default=None, description="Error raised by the last failed tick")
+    missed: int = Field(default=0, description="Ticks dropped because they started too late")
+    overlapped: int = Field(default=0, description="Ticks skipped because the previous tick was still running")
+
+class SchedulerStatusResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    config: SchedulerConfig
+    triggers: SchedulerTriggerStats
+    jobs: List[SchedulerJobStats]
+
+@app.get("/scheduler", tags=["Scheduler"], response_model=SchedulerStatusResponse)
+def get_scheduler_status():
+    """
+    Get the scheduler configuration and per provider instance tick metrics.
+    
+    Returns:
+        SchedulerStatusResponse: Scheduler configuration and job statistics
+    """
+    job_stats = tick_metrics.stats()
+    jobs = {}
+    if manager.scheduler is not None:
+        for job in manager.scheduler.get_jobs():
+            interval = getattr(job.trigger, "interval", None)
+            jobs[job.id] = {
+                "id": job.id,
+                "interval": interval.total_seconds() if interval is not None else None,
+                "next_run": job.next_run_time,
+            }
+    for job, stats in job_stats.items():
+        entry = jobs.setdefault(job, {"id": job})
+        entry.update(stats)
+        if entry["last_run"] is not None:
+            entry["last_run"] = datetime.fromtimestamp(entry["last_run"], UTC)
+
+    return SchedulerStatusResponse(
+        message="Scheduler status retrieved successfully",
+        config=SchedulerConfig(**settings.config["scheduler"]),
+        triggers=SchedulerTriggerStats(**reconcile_triggers.stats()),
+        jobs=[SchedulerJobStats(**jobs[job]) for job in sorted(jobs)]
+    )
+
+class TickSpan(BaseModel):
+    name: str = Field(description="Phase function, e.g. aws_check_alive, or provider API call, e.g. aws.list_instances")
+    start: float = Field(description="Seconds after the start of the tick")
+    duration: Optional[float] = Field(default=None, description="Seconds the span took, null if still open")
+    depth: int = Field(description="Nesting depth, 0 for phases called by the tick itself")
+    error: Optional[str] = Field(default=None, description="Error the span raised")
+
+class TickTraceInfo(BaseModel):
+    job: str = Field(description="Job ID, <provider>-<instance> or health-monitor")
+    started_at: datetime
+    duration: Optional[float] = Field(default=None, description="Duration of the tick in seconds")
+    error: Optional[str] = Field(default=None, description="Error raised by the tick")
+    slow: bool = Field(description="Whether the tick took longer than SCHEDULER_SLOW_TICK")
+    spans: List[TickSpan] = Field(description="Spans in the order they started")
+    stack: Optional[str] = Field(default=None, description="The tick's stack once it passed SCHEDULER_SLOW_TICK")
+    profile: Optional[str] = Field(default=None, description="cProfile statistics of a slow tick, with SCHEDULER_SLOW_TICK_PROFILE")
+
+class TickTraceList(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    total: int
+    slow: int = Field(description="Slow ticks recorded since startup")
+    traces: List[TickTraceInfo]
+
+def trace_to_info(trace: TickTrace) -> TickTraceInfo:
+    return TickTraceInfo(
+        job=trace.job,
+        started_at=datetime.fromtimestamp(trace.started_at, UTC),
+        duration=trace.duration,
+        error=trace.error,
+        slow=trace.slow,
+        spans=[TickSpan(**vars(entry)) for entry in trace.spans],
+        stack=trace.stack,
+        profile=trace.profile
+    )
+
+@app.get("/scheduler/traces", tags=["Scheduler"], response_model=TickTraceList)
+def get_tick_traces(
+    job: Optional[str] = Query(None, description="Only traces of this job, e.g. aws-default"),
+    slow: bool = Query(False, description="Only traces of slow ticks"),
+    limit: int = Query(20, ge=1, le=1000)
+):
+    """
+    Get per-phase timings of the latest scheduler ticks, newest first.
+    
+    Args:
+        job: Only traces of this job
+        slow: Only traces of ticks slower than SCHEDULER_SLOW_TICK
+        limit: Maximum number of traces to return
+        
+    Returns:
+        TickTraceList: The tick traces with their spans
+    """
+    traces = trace_buffer.traces(job=job, slow=slow, limit=limit)
+    return TickTraceList(
+        total=len(traces),
+        slow=trace_buffer.slow,
+        traces=[trace_to_info(trace) for trace in traces]
+    )
+
+# Gateway Models
+class GatewayConfig(BaseModel):
+    enabled: bool = Field(description="Whether the forward-proxy gateway is enabled")
+    host: str = Field(description="Address the gateway listens on")
+    port: int = Field(description="Port the gateway listens on")
+    strategy: str = Field(description="Selection strategy for upstream proxies, empty for PROXY_SELECTION_STRATEGY")
+    retries: int = Field(description="Other proxies tried when an upstream proxy fails")
+    connect_timeout: float = Field(description="Seconds to wait for an upstream connection")
+    pool_size: int = Field(description="Idle upstream connections kept per proxy")
+    idle_timeout: float = Field(description="Seconds an idle upstream connection is kept")
+    allow_unauthenticated: bool = Field(
+        default=False, description="Whether the gateway listens on GATEWAY_HOST with authentication off"
+    )
+
+class GatewayUpstreamStats(BaseModel):
+    ip: str
+    requests: int = Field(description="Plain HTTP requests relayed")
+    tunnels: int = Field(description="CONNECT tunnels opened")
+    failures: int = Field(description="Connections that failed and were retried on another proxy")
+    bytes_sent: int = Field(description="Bytes sent to the proxy")
+    bytes_received: int = Field(description="Bytes received from the proxy")
+    bytes_per_second: float = Field(description="Bytes relayed per second since the proxy was first used")
+    active: int = Field(description="Requests and tunnels in progress")
+    first_used: datetime
+    last_used: Optional[datetime] = None
+
+class GatewayStatusResponse(BaseModel):
+    metadata: Metadata = Field(default_factory=Metadata)
+    message: str
+    config: GatewayConfig
+    running: bool
+    host: Optional[str] = Field(default=None, description="Address the running gateway is bound to")
+    port: Optional[int] = Field(default=None, description="Port the running gateway is bound to")
+    connections: int = Field(description="Client connections accepted")
+    errors: int = Field(description="Client requests answered with an error")
+    upstream_connections_opened: int
+    upstream_connections_reused: int
+    upstreams: List[GatewayUpstreamStats]
+
+@app.get("/gateway", tags=["Gateway"], response_model=GatewayStatusResponse)
+def get_gateway_status():
+    """
+    Get the forward-proxy gateway configuration and per-upstream throughput.
+    
+    Returns:
+        GatewayStatusResponse: Gateway configuration and statistics
+    """
+    stats = proxy_gateway.stats()
+    upstreams = []
+    for ip, upstream in sorted(stats.pop("upstreams").items()):
+        upstream["first_used"] = datetime.fromtimestamp(upstream["first_used"], UTC)
+        if upstream["last_used"] is not None:
+            upstream["last_used"] = datetime.fromtimestamp(upstream["last_used"], UTC)
+        upstreams.append(GatewayUpstreamStats(ip=ip, **upstream))
+    return GatewayStatusResponse(
+        message="Gateway status retrieved successfully",
+        config=GatewayConfig(**settings.config["gateway"]),
+        upstreams=upstreams,
+        **stats
+    )
+
+# Pool states in /metrics, a proxy is counted in the first one that applies
+POOL_STATES = ("pending_delete", "pending_restart", "unhealthy", "leased", "available")
+
+def scrape_metrics() -> List[metrics.Metric]:
+    """Gauges and counters read from the current state for one /metrics scrape."""
+    pool = metrics.Gauge(
+        "cloudproxy_pool_proxies", "Proxies in the pool by provider instance and state", ("provider", "instance", "state")
+    )
+    for provider, provider_config in settings.config["providers"].items():
+        for instance, instance_config in provider_config.get("instances", {}).items():
+            if instance_config.get("enabled"):
+                for state in POOL_STATES:
+                    pool.set(0, provider, instance, state)
+    down = health_store.down(result_max_age())
+    leased = lease_store.leased_ips()
+    for entry in proxy_registry.page():
+        if entry.ip in delete_queue:
+            state = "pending_delete"
+        elif entry.ip in restart_queue:
+            state = "pending_restart"
+        elif entry.ip in down:
+            state = "unhealthy"
+        elif entry.ip in leased:
+            state = "leased"
+        else:
+            state = "available"
+        pool.add(1, entry.provider, entry.instance, state)
+
+    queues = metrics.Gauge("cloudproxy_queue_depth", "Proxies waiting in the delete and restart queues", ("queue",))
+    queues.set(len(delete_queue), "delete")
+    queues.set(len(restart_queue), "restart")
+
+    rolling = metrics.Gauge(
+        "cloudproxy_rolling_proxies", "Proxies tracked by rolling deployments by provider instance and state",
+        ("provider", "instance", "state")
+    )
+    with rolling_manager.lock:
+        for (provider, instance), state in rolling_manager.states.items():
+            for name, ips in (
+                ("healthy", state.healthy_proxies), ("pending", state.pending),
+                ("pending_recycle", state.pending_recycle), ("recycling", state.recycling),
+                ("aged", state.aged), ("blocked", state.blocked),
+            ):
+                rolling.set(len(ips), provider, instance, name)
+
+    tick_errors = metrics.Counter("cloudproxy_tick_errors_total", "Scheduler ticks that raised", ("job",))
+    tick_skipped = metrics.Counter(
+        "cloudproxy_tick_skipped_total", "Scheduler ticks skipped because the previous one was still running (overlapped) "
+        "or started too late (missed)", ("job", "reason")
+    )
+    tick_running = metrics.Gauge("cloudproxy_tick_running", "Whether a tick of the job is running", ("job",))
+    for job, stats in tick_metrics.stats().items():
+        tick_errors.inc(job, amount=stats["errors"])
+        tick_skipped.inc(job, "overlapped", amount=stats["overlapped"])
+        tick_skipped.inc(job, "missed", amount=stats["missed"])
+        tick_running.set(int(stats["running"]), job)
+
+    return [pool, queues, rolling, tick_errors, tick_skipped, tick_running]
+
+@app.get("/metrics", tags=["Metrics"], response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Export pool, scheduler, health probe and provider API metrics for Prometheus.
+    
+    Returns:
+        Response: The metrics in the Prometheus text exposition format
+    """
+    proxy_registry.sync(settings.config)
+    return Response(content=metrics.exposition(*scrape_metrics()), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     main()
 
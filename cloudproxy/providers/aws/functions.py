@@ -3,8 +3,12 @@ import os
 import json
 import botocore as botocore
 import botocore.exceptions
+from loguru import logger
 
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.clients import client_registry, credential_fingerprint
 from cloudproxy.providers.config import set_auth
+from cloudproxy.providers.metrics import provider_call
 from cloudproxy.providers.settings import config
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
@@ -21,48 +25,62 @@ def reset_clients():
     global ec2, ec2_client
     ec2 = None
     ec2_client = None
+    client_registry.invalidate("aws")
 
 def get_clients(instance_config=None):
     """
     Initialize and return AWS clients based on the provided configuration.
     
+    Clients are cached per instance and rebuilt when the credentials or region
+    change, so every call reuses the same boto3 connection pool.
+    
     Args:
         instance_config: The specific instance configuration
         
     Returns:
         tuple: (ec2_resource, ec2_client)
     """
-    # Use global variables to allow mocking in tests
-    global ec2, ec2_client
-    
-    # If clients are already set (likely by a test), return them
+    # If clients are set at module level (likely by a test), return them
     if ec2 is not None and ec2_client is not None:
         return ec2, ec2_client
         
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
     
+    instance_id = next(
+        (name for name, inst in config["providers"]["aws"]["instances"].items() 
+         if inst == instance_config), 
+        "default"
+    )
+    
     # Get AWS credentials from the instance configuration
     aws_access_key_id = instance_config["secrets"]["access_key_id"]
     aws_secret_access_key = instance_config["secrets"]["secret_access_key"]
     region_name = instance_config["region"]
     
-    # Create AWS clients using the instance-specific credentials
-    ec2 = boto3.resource(
-        "ec2", 
-        region_name=region_name,
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key
-    )
+    def build_clients():
+        # Create AWS clients using the instance-specific credentials
+        resource = boto3.resource(
+            "ec2", 
+            region_name=region_name,
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key
+        )
+        
+        client = boto3.client(
+            "ec2", 
+            region_name=region_name,
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key
+        )
+        return resource, client
     
-    ec2_client = boto3.client(
-        "ec2", 
-        region_name=region_name,
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key
+    return client_registry.get(
+        "aws",
+        instance_id,
+        credential_fingerprint(aws_access_key_id, aws_secret_access_key, region_name),
+        build_clients,
     )
-    
-    return ec2, ec2_client
 
 def get_tags(instance_config=None):
     """
@@ -98,12 +116,15 @@ def get_tags(instance_config=None):
     return tags, tag_specification
 
 
-def create_proxy(instance_config=None):
+@provider_call("aws")
+def create_proxy(instance_config=None, count=1):
     """
-    Create an AWS proxy instance.
+    Create AWS proxy instances.
     
     Args:
         instance_config: The specific instance configuration
+        count: Number of instances to launch in a single RunInstances call.
+            EC2 may launch fewer (at least one) when capacity is short.
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
@@ -158,7 +179,7 @@ def create_proxy(instance_config=None):
         instance = ec2.create_instances(
             ImageId=instance_config["ami"],
             MinCount=1,
-            MaxCount=1,
+            MaxCount=count,
             InstanceType=instance_config["size"],
             NetworkInterfaces=[
                 {"DeviceIndex": 0, "AssociatePublicIpAddress": True, "Groups": [sg_id]}
@@ -177,7 +198,7 @@ def create_proxy(instance_config=None):
             instance = ec2.create_instances(
                 ImageId=instance_config["ami"],
                 MinCount=1,
-                MaxCount=1,
+                MaxCount=count,
                 InstanceType=instance_config["size"],
                 NetworkInterfaces=[
                     {"DeviceIndex": 0, "AssociatePublicIpAddress": True, "Groups": [sg_id]}
@@ -196,7 +217,7 @@ def create_proxy(instance_config=None):
         instance = ec2.create_instances(
             ImageId=instance_config["ami"],
             MinCount=1,
-            MaxCount=1,
+            MaxCount=count,
             InstanceType=instance_config["size"],
             NetworkInterfaces=[
                 {"DeviceIndex": 0, "AssociatePublicIpAddress": True, "Groups": [sg_id]}
@@ -207,6 +228,32 @@ def create_proxy(instance_config=None):
     return instance
 
 
+@provider_call("aws")
+def create_proxies(count, instance_config=None):
+    """
+    Create several AWS proxy instances with one RunInstances call.
+    
+    Args:
+        count: Number of instances to create
+        instance_config: The specific instance configuration
+        
+    Returns:
+        BatchResult: How many instances were launched and the errors of the rest
+    """
+    result = BatchResult(requested=count)
+    if count < 1:
+        return result
+    try:
+        instances = create_proxy(instance_config, count=count)
+        result.created = len(instances)
+        if result.created < count:
+            result.errors.append(f"requested {count} instances, EC2 launched {result.created}")
+    except botocore.exceptions.ClientError as e:
+        result.errors.append(str(e))
+    return result
+
+
+@provider_call("aws")
 def delete_proxy(instance_id, instance_config=None):
     """
     Delete an AWS proxy instance.
@@ -214,32 +261,72 @@ def delete_proxy(instance_id, instance_config=None):
     Args:
         instance_id: ID of the instance to delete
         instance_config: The specific instance configuration
+        
+    Returns:
+        list: [instance_id] if it is terminating, else an empty list
+    """
+    return delete_proxies([instance_id], instance_config)
+
+
+@provider_call("aws")
+def delete_proxies(instance_ids, instance_config=None):
+    """
+    Delete several AWS proxy instances with one TerminateInstances call.
+    
+    Spot requests of the terminated instances are looked up and cancelled in
+    one call as well. A failed call is logged rather than raised, so the rest
+    of the tick still runs, and the instances are left out of the result.
+    
+    Args:
+        instance_ids: IDs of the instances to delete
+        instance_config: The specific instance configuration
+        
+    Returns:
+        list: IDs of the instances that are terminating
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
     
+    ids = list(instance_ids)
+    if not ids:
+        return []
+    
     # Get clients
     ec2, ec2_client = get_clients(instance_config)
     
-    ids = [instance_id]
-    deleted = ec2.instances.filter(InstanceIds=ids).terminate()
-    if instance_config["spot"]:
-        associated_spot_instance_requests = ec2_client.describe_spot_instance_requests(
-            Filters=[
-                {
-                    'Name': 'instance-id',
-                    'Values': ids
-                }
-            ]
-        )
-        spot_instance_id_list = []
-        for spot_instance in associated_spot_instance_requests["SpotInstanceRequests"]:
-            spot_instance_id_list.append(spot_instance.get("SpotInstanceRequestId"))
-        if spot_instance_id_list:
-            ec2_client.cancel_spot_instance_requests(SpotInstanceRequestIds=spot_instance_id_list)
-    return deleted
+    try:
+        responses = ec2.instances.filter(InstanceIds=ids).terminate()
+    except botocore.exceptions.ClientError as e:
+        logger.error(f"AWS --> Terminating {len(ids)} instances failed: {e}")
+        return []
+    # One TerminateInstances response per batch of IDs
+    terminated = [
+        instance["InstanceId"]
+        for response in responses
+        for instance in response.get("TerminatingInstances", [])
+    ]
+    if instance_config["spot"] and terminated:
+        try:
+            associated_spot_instance_requests = ec2_client.describe_spot_instance_requests(
+                Filters=[
+                    {
+                        'Name': 'instance-id',
+                        'Values': terminated
+                    }
+                ]
+            )
+            spot_instance_id_list = []
+            for spot_instance in associated_spot_instance_requests["SpotInstanceRequests"]:
+                spot_instance_id_list.append(spot_instance.get("SpotInstanceRequestId"))
+            if spot_instance_id_list:
+                ec2_client.cancel_spot_instance_requests(SpotInstanceRequestIds=spot_instance_id_list)
+        except botocore.exceptions.ClientError as e:
+            # The instances are terminating, their spot requests are left open
+            logger.error(f"AWS --> Cancelling the spot requests of {len(terminated)} instances failed: {e}")
+    return terminated
 
 
+@provider_call("aws")
 def stop_proxy(instance_id, instance_config=None):
     """
     Stop an AWS proxy instance.
@@ -259,6 +346,7 @@ def stop_proxy(instance_id, instance_config=None):
     return stopped
 
 
+@provider_call("aws")
 def start_proxy(instance_id, instance_config=None):
     """
     Start an AWS proxy instance.
@@ -284,6 +372,7 @@ def start_proxy(instance_id, instance_config=None):
     return started
 
 
+@provider_call("aws")
 def list_instances(instance_config=None):
     """
     List AWS proxy instances.
@@ -1,64 +1,82 @@
 import datetime
-import itertools
 
 from loguru import logger
 
 from cloudproxy.check import check_alive
 from cloudproxy.providers.aws.functions import (
     list_instances,
-    create_proxy,
-    delete_proxy,
+    create_proxies,
+    delete_proxies,
     stop_proxy,
     start_proxy,
 )
+from cloudproxy.providers.batch import log_batch_result
+from cloudproxy.providers.inventory import Inventory, pick_surplus
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
-from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.rolling import rolling_manager, surge_limit
+from cloudproxy.providers.tracing import traced
 
 
-def aws_deployment(min_scaling, instance_config=None):
+@traced
+def aws_deployment(min_scaling, instance_config=None, inventory=None):
     """
     Deploy AWS instances based on min_scaling requirements.
     
     Args:
         min_scaling: The minimum number of instances to maintain
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
         
-    total_instances = len(list_instances(instance_config))
+    total_instances = len(inventory.get())
     if min_scaling < total_instances:
         logger.info(f"Overprovisioned: AWS {instance_config.get('display_name', 'default')} destroying.....")
-        for instance in itertools.islice(
-            list_instances(instance_config), 0, (total_instances - min_scaling)
-        ):
-            delete_proxy(instance["Instances"][0]["InstanceId"], instance_config)
+        surplus = pick_surplus(
+            inventory.get(), total_instances - min_scaling,
+            lambda instance: instance["Instances"][0].get("PublicIpAddress"),
+            lambda instance: instance["Instances"][0].get("LaunchTime"),
+        )
+        deleted = set(delete_proxies([instance["Instances"][0]["InstanceId"] for instance in surplus], instance_config))
+        for instance in surplus:
+            if instance["Instances"][0]["InstanceId"] not in deleted:
+                continue
             try:
                 msg = instance["Instances"][0]["PublicIpAddress"]
             except KeyError:
                 msg = instance["Instances"][0]["InstanceId"]
 
             logger.info(f"Destroyed: AWS {instance_config.get('display_name', 'default')} -> " + msg)
+        inventory.invalidate()
     if min_scaling - total_instances < 1:
         logger.info(f"Minimum AWS {instance_config.get('display_name', 'default')} instances met")
     else:
         total_deploy = min_scaling - total_instances
         logger.info(f"Deploying: {str(total_deploy)} AWS {instance_config.get('display_name', 'default')} instances")
-        for _ in range(total_deploy):
-            create_proxy(instance_config)
-            logger.info(f"Deployed AWS {instance_config.get('display_name', 'default')} instance")
-    return len(list_instances(instance_config))
+        result = create_proxies(total_deploy, instance_config)
+        log_batch_result(result, f"AWS {instance_config.get('display_name', 'default')}")
+        inventory.invalidate()
+    return len(inventory.get())
 
 
-def aws_check_alive(instance_config=None):
+@traced
+def aws_check_alive(instance_config=None, inventory=None):
     """
     Check if AWS instances are alive and operational.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
     
     # Get instance name for rolling deployment tracking
     instance_name = next(
@@ -70,15 +88,20 @@ def aws_check_alive(instance_config=None):
     ip_ready = []
     pending_ips = []
     instances_to_recycle = []
+    instances_to_probe = []
     
-    # First pass: identify healthy and pending instances
-    for instance in list_instances(instance_config):
+    # First pass: identify pending instances and those that need probing
+    listed = inventory.get()
+    for instance in listed:
         try:
             elapsed = datetime.datetime.now(
                 datetime.timezone.utc
             ) - instance["Instances"][0]["LaunchTime"]
             
-            if config["age_limit"] > 0 and elapsed > datetime.timedelta(seconds=config["age_limit"]):
+            if recycle_schedule.expired(
+                "aws", instance_name, instance["Instances"][0].get("InstanceId"), elapsed,
+                config["age_limit"], ip=instance["Instances"][0].get("PublicIpAddress")
+            ):
                 # Queue for potential recycling
                 instances_to_recycle.append((instance, elapsed))
             elif instance["Instances"][0]["State"]["Name"] == "stopped":
@@ -86,6 +109,7 @@ def aws_check_alive(instance_config=None):
                     f"Waking up: AWS {instance_config.get('display_name', 'default')} -> Instance " + instance["Instances"][0]["InstanceId"]
                 )
                 started = start_proxy(instance["Instances"][0]["InstanceId"], instance_config)
+                inventory.invalidate()
                 if not started:
                     logger.info(
                         "Could not wake up due to IncorrectSpotRequestState, trying again later."
@@ -100,35 +124,104 @@ def aws_check_alive(instance_config=None):
                 )
                 if "PublicIpAddress" in instance["Instances"][0]:
                     pending_ips.append(instance["Instances"][0]["PublicIpAddress"])
-            # Must be "running" if none of the above, check if alive or not.
-            elif check_alive(instance["Instances"][0]["PublicIpAddress"]):
-                logger.info(
-                    f"Alive: AWS {instance_config.get('display_name', 'default')} -> " + instance["Instances"][0]["PublicIpAddress"]
-                )
-                ip_ready.append(instance["Instances"][0]["PublicIpAddress"])
+            # Must be "running" if none of the above, queue it for probing.
             else:
-                if elapsed > datetime.timedelta(minutes=10):
-                    delete_proxy(instance["Instances"][0]["InstanceId"], instance_config)
-                    logger.info(
-                        f"Destroyed: took too long AWS {instance_config.get('display_name', 'default')} -> "
-                        + instance["Instances"][0]["PublicIpAddress"]
-                    )
-                else:
-                    logger.info(
-                        f"Waiting: AWS {instance_config.get('display_name', 'default')} -> " + instance["Instances"][0]["PublicIpAddress"]
-                    )
-                    if "PublicIpAddress" in instance["Instances"][0]:
-                        pending_ips.append(instance["Instances"][0]["PublicIpAddress"])
+                instances_to_probe.append(
+                    (instance, instance["Instances"][0]["PublicIpAddress"], elapsed)
+                )
         except (TypeError, KeyError):
             logger.info(f"Pending: AWS {instance_config.get('display_name', 'default')} -> allocating ip")
+    recycle_schedule.retain(
+        "aws", instance_name, [instance["Instances"][0].get("InstanceId") for instance in listed]
+    )
+    
+    # Oldest first, the disruption budget is handed out by age
+    instances_to_recycle.sort(key=lambda item: item[1], reverse=True)
+    aged_ages = {}
+    for inst, elapsed in instances_to_recycle:
+        instance_ip = inst["Instances"][0].get("PublicIpAddress")
+        if instance_ip:
+            aged_ages[instance_ip] = elapsed.total_seconds()
+    
+    # In surge mode aged instances keep serving until their replacements are healthy
+    surging = surge_limit() > 0
+    aged = []
+    if surging:
+        for inst, elapsed in instances_to_recycle:
+            aged.append((inst, inst["Instances"][0].get("PublicIpAddress")))
+    
+    # Second pass: probe all running instances concurrently, reusing fresh health monitor results
+    alive = health_monitor.check(
+        "aws", instance_name,
+        [ip for _, ip, _ in instances_to_probe] + [ip for _, ip in aged if ip], probe=check_alive
+    )
+    timed_out = []
+    for instance, instance_ip, elapsed in instances_to_probe:
+        if alive.get(instance_ip):
+            logger.info(
+                f"Alive: AWS {instance_config.get('display_name', 'default')} -> " + instance_ip
+            )
+            ip_ready.append(instance_ip)
+        else:
+            if elapsed > datetime.timedelta(minutes=10):
+                timed_out.append((instance, instance_ip))
+            else:
+                logger.info(
+                    f"Waiting: AWS {instance_config.get('display_name', 'default')} -> " + instance_ip
+                )
+                pending_ips.append(instance_ip)
+    
+    if timed_out:
+        deleted = set(delete_proxies([instance["Instances"][0]["InstanceId"] for instance, _ in timed_out], instance_config))
+        inventory.invalidate()
+        for instance, instance_ip in timed_out:
+            if instance["Instances"][0]["InstanceId"] not in deleted:
+                continue
+            logger.info(
+                f"Destroyed: took too long AWS {instance_config.get('display_name', 'default')} -> "
+                + instance_ip
+            )
+    
+    for inst, instance_ip in aged:
+        if instance_ip and alive.get(instance_ip):
+            logger.info(
+                f"Alive: AWS {instance_config.get('display_name', 'default')} aged, awaiting replacement -> " + instance_ip
+            )
+            ip_ready.append(instance_ip)
     
     # Update rolling manager with current proxy health status
-    rolling_manager.update_proxy_health("aws", instance_name, ip_ready, pending_ips)
+    rolling_manager.update_proxy_health(
+        "aws", instance_name, ip_ready, pending_ips,
+        aged=aged_ages
+    )
     
     # Handle rolling deployments for age-limited instances
-    if instances_to_recycle and config["rolling_deployment"]["enabled"]:
+    if aged:
+        retire = rolling_manager.select_surge_retirements(
+            "aws", instance_name,
+            [
+                ((inst, instance_ip), instance_ip, bool(instance_ip and alive.get(instance_ip)))
+                for inst, instance_ip in aged
+            ],
+            total_healthy=len(ip_ready),
+            min_scaling=instance_config["scaling"]["min_scaling"]
+        )
+        if retire:
+            deleted = set(delete_proxies([inst["Instances"][0]["InstanceId"] for inst, _ in retire], instance_config))
+            inventory.invalidate()
+            for inst, instance_ip in retire:
+                if inst["Instances"][0]["InstanceId"] not in deleted:
+                    continue
+                rolling_manager.mark_proxy_recycled("aws", instance_name, instance_ip)
+                if instance_ip in ip_ready:
+                    ip_ready.remove(instance_ip)
+                logger.info(
+                    f"Rolling deployment: Retired AWS {instance_config.get('display_name', 'default')} instance after surge (age limit) -> {instance_ip}"
+                )
+    elif instances_to_recycle and config["rolling_deployment"]["enabled"]:
         rolling_config = config["rolling_deployment"]
         
+        recycle_now = []
         for inst, elapsed in instances_to_recycle:
             if "PublicIpAddress" in inst["Instances"][0]:
                 instance_ip = inst["Instances"][0]["PublicIpAddress"]
@@ -144,21 +237,31 @@ def aws_check_alive(instance_config=None):
                     rolling_enabled=True,
                     min_scaling=instance_config["scaling"]["min_scaling"]
                 ):
-                    # Mark as recycling and delete
+                    # Mark as recycling, the whole batch is terminated together below
                     rolling_manager.mark_proxy_recycling("aws", instance_name, instance_ip)
-                    delete_proxy(inst["Instances"][0]["InstanceId"], instance_config)
-                    rolling_manager.mark_proxy_recycled("aws", instance_name, instance_ip)
-                    logger.info(
-                        f"Rolling deployment: Recycled AWS {instance_config.get('display_name', 'default')} instance (age limit) -> {instance_ip}"
-                    )
+                    recycle_now.append((inst, instance_ip))
                 else:
                     logger.info(
                         f"Rolling deployment: Deferred recycling AWS {instance_config.get('display_name', 'default')} instance -> {instance_ip}"
                     )
+        
+        if recycle_now:
+            deleted = set(delete_proxies([inst["Instances"][0]["InstanceId"] for inst, _ in recycle_now], instance_config))
+            inventory.invalidate()
+            for inst, instance_ip in recycle_now:
+                if inst["Instances"][0]["InstanceId"] not in deleted:
+                    continue
+                rolling_manager.mark_proxy_recycled("aws", instance_name, instance_ip)
+                logger.info(
+                    f"Rolling deployment: Recycled AWS {instance_config.get('display_name', 'default')} instance (age limit) -> {instance_ip}"
+                )
     elif instances_to_recycle and not config["rolling_deployment"]["enabled"]:
         # Standard non-rolling recycling
+        deleted = set(delete_proxies([inst["Instances"][0]["InstanceId"] for inst, _ in instances_to_recycle], instance_config))
+        inventory.invalidate()
         for inst, elapsed in instances_to_recycle:
-            delete_proxy(inst["Instances"][0]["InstanceId"], instance_config)
+            if inst["Instances"][0]["InstanceId"] not in deleted:
+                continue
             if "PublicIpAddress" in inst["Instances"][0]:
                 logger.info(
                     f"Recycling AWS {instance_config.get('display_name', 'default')} instance, reached age limit -> " + inst["Instances"][0]["PublicIpAddress"]
@@ -171,39 +274,57 @@ def aws_check_alive(instance_config=None):
     return ip_ready
 
 
-def aws_check_delete(instance_config=None):
+@traced
+def aws_check_delete(instance_config=None, inventory=None):
     """
     Check if any AWS instances need to be deleted.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
         
-    for instance in list_instances(instance_config):
-        if instance["Instances"][0].get("PublicIpAddress") in delete_queue:
-            delete_proxy(instance["Instances"][0]["InstanceId"], instance_config)
-            logger.info(
-                f"Destroyed: not wanted AWS {instance_config.get('display_name', 'default')} -> "
-                + instance["Instances"][0]["PublicIpAddress"]
-            )
-            delete_queue.remove(instance["Instances"][0]["PublicIpAddress"])
+    # Drain every queued instance with a single terminate call
+    queued = [
+        instance for instance in inventory.get()
+        if instance["Instances"][0].get("PublicIpAddress") in delete_queue
+    ]
+    if not queued:
+        return
+    deleted = set(delete_proxies([instance["Instances"][0]["InstanceId"] for instance in queued], instance_config))
+    inventory.invalidate()
+    for instance in queued:
+        if instance["Instances"][0]["InstanceId"] not in deleted:
+            continue
+        logger.info(
+            f"Destroyed: not wanted AWS {instance_config.get('display_name', 'default')} -> "
+            + instance["Instances"][0]["PublicIpAddress"]
+        )
+        delete_queue.remove(instance["Instances"][0]["PublicIpAddress"])
 
 
-def aws_check_stop(instance_config=None):
+@traced
+def aws_check_stop(instance_config=None, inventory=None):
     """
     Check if any AWS instances need to be stopped.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
         
-    for instance in list_instances(instance_config):
+    for instance in inventory.get():
         if instance["Instances"][0].get("PublicIpAddress") in restart_queue:
             stop_proxy(instance["Instances"][0]["InstanceId"], instance_config)
+            inventory.invalidate()
             logger.info(
                 f"Stopped: getting new IP AWS {instance_config.get('display_name', 'default')} -> "
                 + instance["Instances"][0]["PublicIpAddress"]
@@ -223,9 +344,19 @@ def aws_start(instance_config=None):
     """
     if instance_config is None:
         instance_config = config["providers"]["aws"]["instances"]["default"]
+    
+    # Shared instance snapshot, only re-listed after a phase mutates the provider
+    inventory = Inventory(list_instances, instance_config)
         
-    aws_check_delete(instance_config)
-    aws_check_stop(instance_config)
-    aws_deployment(instance_config["scaling"]["min_scaling"], instance_config)
-    ip_ready = aws_check_alive(instance_config)
+    aws_check_delete(instance_config, inventory)
+    aws_check_stop(instance_config, inventory)
+    instance_name = next(
+        (name for name, inst in config["providers"]["aws"]["instances"].items()
+         if inst == instance_config),
+        "default"
+    )
+    # Includes surge replacements for aged instances when surge recycling is on
+    target = rolling_manager.surge_target("aws", instance_name, instance_config["scaling"]["min_scaling"])
+    aws_deployment(target, instance_config, inventory)
+    ip_ready = aws_check_alive(instance_config, inventory)
     return ip_ready
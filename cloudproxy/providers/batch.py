@@ -0,0 +1,160 @@
+"""
+Batched proxy creation and deletion for CloudProxy.
+
+Scaling a provider instance up or down used to create or delete proxies one
+at a time with a blocking API call each, so large scale-ups and draining a
+long delete queue took several minutes. Providers with a bulk API (EC2
+MinCount/MaxCount and multi-ID terminate, DigitalOcean create_multiple, GCP
+batch requests) use it directly. The others fan their single-proxy call out
+over a bounded thread pool with create_in_parallel() and delete_in_parallel().
+Creations report a BatchResult, so a partially failed scale-up is visible in
+the logs and the missing proxies are retried on the next tick.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.tracing import propagate
+
+
+@dataclass
+class BatchResult:
+    """Outcome of creating several proxies at once."""
+    requested: int
+    created: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def failed(self) -> int:
+        return max(self.requested - self.created, 0)
+
+    @property
+    def complete(self) -> bool:
+        return self.created >= self.requested
+
+    def merge(self, other: "BatchResult"):
+        """Fold the result of a sub-batch into this one."""
+        self.created += other.created
+        self.errors.extend(other.errors)
+
+
+def _map_in_parallel(
+    fn: Callable[[Any], Any],
+    items: Sequence[Any],
+    concurrency: Optional[int] = None,
+) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Call fn for every item on a bounded thread pool.
+
+    Returns:
+        list: (return value, error message) per item, in item order
+    """
+    if not items:
+        return []
+
+    if concurrency is None:
+        concurrency = settings.config["deployment"]["concurrency"]
+    workers = max(1, min(concurrency, len(items)))
+
+    # Provider calls on the worker threads are traced as part of the tick
+    @propagate
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, str(e)
+
+    if workers == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cloudproxy-deploy") as executor:
+        return list(executor.map(call, items))
+
+
+def create_in_parallel(
+    create_fn: Callable[[Optional[Dict]], object],
+    count: int,
+    instance_config: Optional[Dict] = None,
+    concurrency: Optional[int] = None,
+) -> BatchResult:
+    """
+    Call a provider's single-proxy create function count times in parallel.
+
+    A call that raises or returns a falsy value counts as a failed creation.
+
+    Args:
+        create_fn: Provider create function, called as create_fn(instance_config)
+        count: Number of proxies to create
+        instance_config: The specific instance configuration
+        concurrency: Maximum parallel create calls (defaults to DEPLOY_CONCURRENCY)
+
+    Returns:
+        BatchResult: How many proxies were created and the errors of the rest
+    """
+    result = BatchResult(requested=count)
+    outcomes = _map_in_parallel(
+        lambda _: create_fn(instance_config), range(max(count, 0)), concurrency
+    )
+    for created, error in outcomes:
+        if error is not None:
+            result.errors.append(error)
+        elif created:
+            result.created += 1
+        else:
+            result.errors.append("create call reported failure")
+    return result
+
+
+def delete_in_parallel(
+    delete_fn: Callable[[Any, Optional[Dict]], object],
+    items: Sequence[Any],
+    instance_config: Optional[Dict] = None,
+    concurrency: Optional[int] = None,
+) -> List[Tuple[Any, bool]]:
+    """
+    Call a provider's single-proxy delete function for many proxies in parallel.
+
+    A call that raises is logged and counts as not deleted, so one failed
+    deletion never aborts the rest of the batch.
+
+    Args:
+        delete_fn: Provider delete function, called as delete_fn(item, instance_config)
+        items: Proxies (or proxy IDs) to delete
+        instance_config: The specific instance configuration
+        concurrency: Maximum parallel delete calls (defaults to DEPLOY_CONCURRENCY)
+
+    Returns:
+        list: (item, deleted) pairs in item order
+    """
+    items = list(items)
+    outcomes = _map_in_parallel(
+        lambda item: delete_fn(item, instance_config), items, concurrency
+    )
+    results = []
+    for item, (deleted, error) in zip(items, outcomes):
+        if error is not None:
+            logger.error(f"Error deleting proxy {getattr(item, 'id', item)}: {error}")
+        results.append((item, error is None and bool(deleted)))
+    return results
+
+
+def log_batch_result(result: BatchResult, label: str):
+    """
+    Log the outcome of a batched creation.
+
+    Args:
+        result: The batch result
+        label: Provider and instance label used in the log line, e.g. "DO default"
+    """
+    if result.complete:
+        logger.info(f"Deployed {result.created} {label} proxies")
+        return
+    logger.warning(
+        f"Deployed {result.created}/{result.requested} {label} proxies, "
+        f"{result.failed} failed and will be retried next cycle"
+    )
+    for error in sorted(set(result.errors)):
+        logger.warning(f"{label} create error: {error}")
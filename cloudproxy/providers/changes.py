@@ -0,0 +1,123 @@
+"""
+Versioned feed of proxy pool changes.
+
+Clients used to poll the full listings to notice that a proxy was added,
+removed or went down. Every change to the pool now bumps a monotonically
+increasing pool version and is appended to a bounded in-memory log: the
+proxy registry publishes "add" and "remove" events as provider ticks and
+config changes update it, and the health store publishes a "health" event
+whenever a proxy's probe result flips. Clients keep a local copy of the pool
+by fetching the changes since the last version they saw, or by following
+the Server-Sent Events stream.
+
+Only the last CHANGE_FEED_SIZE events are kept. A client that falls further
+behind is told to reset, i.e. to fetch the full listing again.
+
+Streams run on the API's event loop and wait for changes with wait_async(),
+so an idle stream holds no worker thread. Threads can block in wait().
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from cloudproxy.providers import settings
+
+
+def feed_size() -> int:
+    return max(int(settings.config.get("changes", {}).get("history", 10000)), 1)
+
+
+class ChangeFeed:
+    """Thread-safe pool version counter and bounded change log."""
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._events: Deque[Dict] = deque()
+        # (loop, event) of every coroutine in wait_async()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.version = 0
+
+    def publish(self, kind: str, ip: str, **data) -> int:
+        """
+        Record a pool change and wake up waiting streams.
+
+        Args:
+            kind: "add", "remove" or "health"
+            ip: The proxy's IP address
+            **data: Event details, e.g. provider and instance
+
+        Returns:
+            int: The new pool version
+        """
+        with self._changed:
+            self.version += 1
+            self._events.append(dict(data, version=self.version, type=kind, ip=ip, timestamp=time.time()))
+            limit = feed_size()
+            while len(self._events) > limit:
+                self._events.popleft()
+            self._notify()
+            return self.version
+
+    def _notify(self):
+        # Caller holds the lock
+        self._changed.notify_all()
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop is closed
+                pass
+
+    def since(self, version: int, limit: Optional[int] = None) -> Tuple[List[Dict], int, bool]:
+        """
+        Changes after a pool version.
+
+        Args:
+            version: The last version the client has seen
+            limit: Maximum number of events to return, None for all
+
+        Returns:
+            tuple: (events oldest first, current version, whether the client must reset,
+            i.e. fetch the full listing, because events after its version were dropped)
+        """
+        with self._changed:
+            oldest = self._events[0]["version"] if self._events else self.version + 1
+            if version < oldest - 1 or version > self.version:
+                return [], self.version, True
+            start = version - oldest + 1
+            stop = None if limit is None else start + limit
+            return [dict(event) for event in islice(self._events, start, stop)], self.version, False
+
+    def wait(self, version: int, timeout: float) -> bool:
+        """Block until the pool version passes version, returns False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version > version, timeout)
+
+    async def wait_async(self, version: int, timeout: float) -> bool:
+        """Wait on the running event loop until the pool version passes version, returns False on timeout."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._changed:
+            if self.version > version:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._changed:
+                self._waiters.discard(waiter)
+        return self.version > version
+
+    def clear(self):
+        with self._changed:
+            self._events.clear()
+            self.version = 0
+            self._notify()
+
+
+change_feed = ChangeFeed()
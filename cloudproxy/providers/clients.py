@@ -0,0 +1,111 @@
+"""
+Cached provider API clients for CloudProxy.
+
+Provider SDK clients (DigitalOcean managers, Hetzner clients, boto3 clients,
+GCP discovery services) are relatively expensive to build and each one owns
+its own HTTP connection pool. Building a fresh client for every API call
+throws away TLS sessions and keep-alive connections. The ClientRegistry keeps
+one client per (provider, instance) and rebuilds it only when the instance's
+credentials change.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def credential_fingerprint(*values: Any) -> str:
+    """
+    Build a stable fingerprint for a set of credential values.
+
+    The raw secrets are never stored in the registry, only their digest.
+
+    Args:
+        values: Credential values (tokens, keys, regions) the client depends on
+
+    Returns:
+        str: Hex digest identifying the credentials
+    """
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    """Thread-safe cache of provider clients keyed by provider and instance."""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, provider: str, instance: str, fingerprint: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached client for a provider instance, building it if needed.
+
+        A cached client whose credential fingerprint no longer matches is
+        replaced, so rotated credentials take effect on the next call.
+
+        Args:
+            provider: Provider name, e.g. "digitalocean"
+            instance: Provider instance name, e.g. "default"
+            fingerprint: Credential fingerprint from credential_fingerprint()
+            factory: Callable that builds a new client
+
+        Returns:
+            The cached or newly built client
+        """
+        key = (provider, instance)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+
+        # Build outside the lock, some SDKs do network I/O while constructing
+        client = factory()
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                # Another thread built the same client first, keep theirs
+                self.hits += 1
+                return entry[1]
+            self._clients[key] = (fingerprint, client)
+            self.misses += 1
+            return client
+
+    def invalidate(self, provider: Optional[str] = None, instance: Optional[str] = None):
+        """
+        Drop cached clients.
+
+        Args:
+            provider: Only drop clients of this provider (all providers if None)
+            instance: Only drop clients of this instance (all instances if None)
+        """
+        with self._lock:
+            for key in list(self._clients):
+                if provider is not None and key[0] != provider:
+                    continue
+                if instance is not None and key[1] != instance:
+                    continue
+                del self._clients[key]
+
+    def clear(self):
+        """Drop all cached clients and reset the counters."""
+        with self._lock:
+            self._clients.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+client_registry = ClientRegistry()
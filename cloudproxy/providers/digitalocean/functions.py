@@ -1,12 +1,17 @@
 import os
+from urllib.parse import urljoin
 
 import digitalocean
+import requests
 import uuid as uuid
 from loguru import logger
 
 from cloudproxy.check import check_alive
 from cloudproxy.providers import settings
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.clients import client_registry, credential_fingerprint
 from cloudproxy.providers.config import set_auth
+from cloudproxy.providers.metrics import provider_call
 
 # Initialize manager with default instance configuration
 manager = digitalocean.Manager(
@@ -17,6 +22,12 @@ __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file
 # Get default token
 token = settings.config["providers"]["digitalocean"]["instances"]["default"]["secrets"]["access_token"]
 
+# DigitalOcean accepts at most 10 droplet names per multi-create request
+MAX_DROPLETS_PER_REQUEST = 10
+
+# Shared by every instance, the token is sent per request
+api_session = requests.Session()
+
 class DOFirewallExistsException(Exception):
     pass
 
@@ -24,6 +35,8 @@ def get_manager(instance_config=None):
     """
     Get a DigitalOcean manager for the specific instance configuration.
     
+    Managers are cached per instance and rebuilt when the access token changes.
+    
     Args:
         instance_config: The specific instance configuration
         
@@ -33,7 +46,61 @@ def get_manager(instance_config=None):
     if instance_config is None:
         instance_config = settings.config["providers"]["digitalocean"]["instances"]["default"]
     
-    return digitalocean.Manager(token=instance_config["secrets"]["access_token"])
+    instance_id = next(
+        (name for name, inst in settings.config["providers"]["digitalocean"]["instances"].items() 
+         if inst == instance_config), 
+        "default"
+    )
+    access_token = instance_config["secrets"]["access_token"]
+    
+    return client_registry.get(
+        "digitalocean",
+        instance_id,
+        credential_fingerprint(access_token),
+        lambda: digitalocean.Manager(token=access_token),
+    )
+
+@provider_call("digitalocean")
+def api_request(do_manager, method, path, payload=None):
+    """
+    Call the DigitalOcean API with a cached manager's token.
+    
+    The SDK's Droplet.create_multiple and Droplet(...).destroy() build a new
+    session per call, so neither reuses keep-alive connections. Requests go
+    through the module's own session instead, and time out after
+    PROVIDER_API_TIMEOUT seconds.
+    
+    Args:
+        do_manager: Cached manager from get_manager()
+        method: HTTP method
+        path: API path relative to the v2 endpoint, e.g. "droplets"
+        payload: JSON body
+        
+    Returns:
+        dict: The decoded response, empty for responses without a body
+    
+    Raises:
+        digitalocean.NotFoundError: The resource does not exist
+        digitalocean.DataReadError: The API returned any other error
+    """
+    response = api_session.request(
+        method,
+        urljoin(do_manager.end_point, path),
+        headers={"Authorization": f"Bearer {do_manager.token}", "Content-Type": "application/json"},
+        json=payload,
+        timeout=settings.config["deployment"]["api_timeout"],
+    )
+    if response.status_code == 404:
+        raise digitalocean.NotFoundError(f"{path} not found")
+    if not response.ok:
+        try:
+            message = response.json().get("message", response.text)
+        except ValueError:
+            message = response.text
+        raise digitalocean.DataReadError(f"HTTP {response.status_code}: {message}")
+    if response.status_code == 204 or not response.content:
+        return {}
+    return response.json()
 
 def create_proxy(instance_config=None):
     """
@@ -72,59 +139,95 @@ def create_proxy(instance_config=None):
     return True
 
 
+@provider_call("digitalocean")
+def create_proxies(count, instance_config=None):
+    """
+    Create several DigitalOcean proxy droplets with the multi-create API.
+    
+    Droplets are requested in chunks of up to MAX_DROPLETS_PER_REQUEST names,
+    a failed chunk does not stop the remaining ones.
+    
+    Args:
+        count: Number of droplets to create
+        instance_config: The specific instance configuration
+        
+    Returns:
+        BatchResult: How many droplets were created and the errors of the rest
+    """
+    if instance_config is None:
+        instance_config = settings.config["providers"]["digitalocean"]["instances"]["default"]
+    
+    # Get instance name for tagging
+    instance_id = next(
+        (name for name, inst in settings.config["providers"]["digitalocean"]["instances"].items() 
+         if inst == instance_config), 
+        "default"
+    )
+    
+    user_data = set_auth(
+        settings.config["auth"]["username"], settings.config["auth"]["password"]
+    )
+    do_manager = get_manager(instance_config)
+    
+    result = BatchResult(requested=count)
+    for offset in range(0, count, MAX_DROPLETS_PER_REQUEST):
+        names = [
+            f"cloudproxy-{instance_id}-{str(uuid.uuid1())}"
+            for _ in range(min(MAX_DROPLETS_PER_REQUEST, count - offset))
+        ]
+        try:
+            droplets = api_request(do_manager, "POST", "droplets", {
+                "names": names,
+                "region": instance_config["region"],
+                "image": instance_config["image"],
+                "size": instance_config["size"],
+                "backups": False,
+                "user_data": user_data,
+                "tags": ["cloudproxy", f"cloudproxy-{instance_id}"],
+            }).get("droplets", [])
+            result.created += len(droplets)
+            if len(droplets) < len(names):
+                result.errors.append(f"requested {len(names)} droplets, API returned {len(droplets)}")
+        except Exception as e:
+            result.errors.append(str(e))
+    return result
+
+
+@provider_call("digitalocean")
 def delete_proxy(droplet_id, instance_config=None):
     """
     Delete a DigitalOcean proxy droplet.
     
+    The droplet is destroyed by ID straight away, without fetching it first.
+    A droplet that is already gone counts as deleted.
+    
     Args:
-        droplet_id: ID of the droplet to delete
+        droplet_id: ID of the droplet to delete, or the droplet itself
         instance_config: The specific instance configuration
     """
     if instance_config is None:
         instance_config = settings.config["providers"]["digitalocean"]["instances"]["default"]
     
-    # Use instance-specific token
+    # Handle both ID and Droplet object
+    if hasattr(droplet_id, 'id'):
+        droplet_id = droplet_id.id
+    
+    # Use the instance's cached manager and its keep-alive session
     try:
-        # Handle both ID and Droplet object
-        if hasattr(droplet_id, 'id'):
-            # Get a fresh reference to the droplet to ensure we have the latest state
-            do_manager = get_manager(instance_config)
-            try:
-                droplet = do_manager.get_droplet(droplet_id.id)
-                logger.info(f"Found droplet with ID: {droplet_id.id} - executing deletion")
-            except Exception as e:
-                # If we can't get the droplet, it might already be deleted
-                if "not found" in str(e).lower() or "404" in str(e).lower():
-                    logger.info(f"Droplet with ID {droplet_id.id} not found, considering it already deleted")
-                    return True
-                raise  # Re-raise other errors
-                
-            # Now delete the droplet
-            deleted = droplet.destroy()
-            logger.info(f"DigitalOcean deletion API call completed with result: {deleted}")
-            return deleted
-        else:
-            # It's just an ID, not an object
-            do_manager = get_manager(instance_config)
-            try:
-                droplet = do_manager.get_droplet(droplet_id)
-                logger.info(f"Found droplet with ID: {droplet_id} - executing deletion")
-            except Exception as e:
-                # If we can't get the droplet, it might already be deleted
-                if "not found" in str(e).lower() or "404" in str(e).lower():
-                    logger.info(f"Droplet with ID {droplet_id} not found, considering it already deleted")
-                    return True
-                raise  # Re-raise other errors
-                
-            # Now delete the droplet
-            deleted = droplet.destroy()
-            logger.info(f"DigitalOcean deletion API call completed with result: {deleted}")
-            return deleted
+        do_manager = get_manager(instance_config)
+        logger.info(f"Destroying droplet with ID: {droplet_id}")
+        api_request(do_manager, "DELETE", f"droplets/{droplet_id}")
+        logger.info(f"DigitalOcean deletion API call completed for droplet {droplet_id}")
+        return True
     except Exception as e:
         # Log the error but don't fail if the droplet is already gone
-        if "not found" in str(e).lower() or "404" in str(e).lower():
+        if (
+            isinstance(e, digitalocean.NotFoundError)
+            or "not found" in str(e).lower()
+            or "404" in str(e).lower()
+        ):
             # Droplet is already gone, consider it successfully deleted
-            logger.info(f"Droplet deletion exception indicates it's already gone: {str(e)}")
+            logger.info(f"Droplet {droplet_id} not found, considering it already deleted: {str(e)}")
             return True
         else:
             # Re-raise other errors
@@ -132,6 +235,7 @@ def delete_proxy(droplet_id, instance_config=None):
             raise
 
 
+@provider_call("digitalocean")
 def list_droplets(instance_config=None):
     """
     List DigitalOcean proxy droplets.
@@ -180,6 +284,7 @@ def list_droplets(instance_config=None):
     
     return my_droplets
 
+@provider_call("digitalocean")
 def create_firewall(instance_config=None):
     """
     Create a DigitalOcean firewall for proxy droplets.
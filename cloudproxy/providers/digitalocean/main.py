@@ -1,63 +1,81 @@
 import datetime
-import itertools
 
 import dateparser
 from loguru import logger
 
 from cloudproxy.check import check_alive
 from cloudproxy.providers.digitalocean.functions import (
-    create_proxy,
+    create_proxies,
     list_droplets,
     delete_proxy,
     create_firewall,
     DOFirewallExistsException,
 )
 from cloudproxy.providers import settings
+from cloudproxy.providers.batch import delete_in_parallel, log_batch_result
+from cloudproxy.providers.inventory import Inventory, pick_surplus
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
-from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.rolling import rolling_manager, surge_limit
+from cloudproxy.providers.tracing import traced
 
 
-def do_deployment(min_scaling, instance_config=None):
+@traced
+def do_deployment(min_scaling, instance_config=None, inventory=None):
     """
     Deploy DigitalOcean droplets based on min_scaling requirements.
     
     Args:
         min_scaling: The minimum number of droplets to maintain
         instance_config: The specific instance configuration
+        inventory: Optional droplet snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["digitalocean"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_droplets, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
     
-    total_droplets = len(list_droplets(instance_config))
+    total_droplets = len(inventory.get())
     if min_scaling < total_droplets:
         logger.info(f"Overprovisioned: DO {display_name} destroying.....")
-        for droplet in itertools.islice(list_droplets(instance_config), 0, (total_droplets - min_scaling)):
-            delete_proxy(droplet, instance_config)
-            logger.info(f"Destroyed: DO {display_name} -> {str(droplet.ip_address)}")
+        surplus = pick_surplus(
+            inventory.get(), total_droplets - min_scaling,
+            lambda droplet: str(droplet.ip_address),
+            lambda droplet: dateparser.parse(droplet.created_at),
+        )
+        for droplet, deleted in delete_in_parallel(delete_proxy, surplus, instance_config):
+            if deleted:
+                logger.info(f"Destroyed: DO {display_name} -> {str(droplet.ip_address)}")
+        inventory.invalidate()
             
     if min_scaling - total_droplets < 1:
         logger.info(f"Minimum DO {display_name} Droplets met")
     else:
         total_deploy = min_scaling - total_droplets
         logger.info(f"Deploying: {str(total_deploy)} DO {display_name} droplets")
-        for _ in range(total_deploy):
-            create_proxy(instance_config)
-            logger.info(f"Deployed DO {display_name} droplet")
-    return len(list_droplets(instance_config))
+        result = create_proxies(total_deploy, instance_config)
+        log_batch_result(result, f"DO {display_name}")
+        inventory.invalidate()
+    return len(inventory.get())
 
 
-def do_check_alive(instance_config=None):
+@traced
+def do_check_alive(instance_config=None, inventory=None):
     """
     Check if DigitalOcean droplets are alive and operational.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional droplet snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["digitalocean"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_droplets, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -73,8 +91,11 @@ def do_check_alive(instance_config=None):
     pending_ips = []
     droplets_to_recycle = []
     
-    # First pass: identify healthy and pending droplets
-    for droplet in list_droplets(instance_config):
+    droplets_to_probe = []
+    
+    # First pass: identify age-limited droplets and those that need probing
+    listed = inventory.get()
+    for droplet in listed:
         try:
             # Parse the created_at timestamp to a datetime object
             created_at = dateparser.parse(droplet.created_at)
@@ -87,35 +108,87 @@ def do_check_alive(instance_config=None):
             # Calculate elapsed time
             elapsed = datetime.datetime.now(datetime.timezone.utc) - created_at
             
-            # Check if the droplet has reached the age limit
-            if config["age_limit"] > 0 and elapsed > datetime.timedelta(seconds=config["age_limit"]):
+            # Check if the droplet has reached its planned recycle time
+            if recycle_schedule.expired(
+                "digitalocean", instance_name, droplet.id, elapsed, config["age_limit"], ip=str(droplet.ip_address)
+            ):
                 droplets_to_recycle.append((droplet, elapsed))
-            elif check_alive(droplet.ip_address):
-                logger.info(f"Alive: DO {display_name} -> {str(droplet.ip_address)}")
-                ip_ready.append(droplet.ip_address)
             else:
-                # Check if the droplet has been pending for too long
-                if elapsed > datetime.timedelta(minutes=10):
-                    delete_proxy(droplet, instance_config)
-                    logger.info(
-                        f"Destroyed: took too long DO {display_name} -> {str(droplet.ip_address)}"
-                    )
-                else:
-                    logger.info(f"Waiting: DO {display_name} -> {str(droplet.ip_address)}")
-                    pending_ips.append(str(droplet.ip_address))
+                droplets_to_probe.append((droplet, elapsed))
         except TypeError:
             # This happens when dateparser.parse raises a TypeError
             logger.info(f"Pending: DO {display_name} allocating")
             if hasattr(droplet, 'ip_address'):
                 pending_ips.append(str(droplet.ip_address))
+    recycle_schedule.retain("digitalocean", instance_name, [droplet.id for droplet in listed])
+    
+    # Oldest first, the disruption budget is handed out by age
+    droplets_to_recycle.sort(key=lambda item: item[1], reverse=True)
+    # In surge mode aged droplets keep serving until their replacements are healthy
+    surging = surge_limit() > 0
+    aged = droplets_to_recycle if surging else []
+    
+    # Second pass: probe all candidate droplets concurrently, reusing fresh health monitor results
+    alive = health_monitor.check(
+        "digitalocean", instance_name,
+        [droplet.ip_address for droplet, _ in droplets_to_probe + aged], probe=check_alive
+    )
+    timed_out = []
+    for droplet, elapsed in droplets_to_probe:
+        if alive.get(droplet.ip_address):
+            logger.info(f"Alive: DO {display_name} -> {str(droplet.ip_address)}")
+            ip_ready.append(droplet.ip_address)
+        else:
+            # Check if the droplet has been pending for too long
+            if elapsed > datetime.timedelta(minutes=10):
+                timed_out.append(droplet)
+            else:
+                logger.info(f"Waiting: DO {display_name} -> {str(droplet.ip_address)}")
+                pending_ips.append(str(droplet.ip_address))
+    
+    if timed_out:
+        for droplet, deleted in delete_in_parallel(delete_proxy, timed_out, instance_config):
+            if deleted:
+                logger.info(
+                    f"Destroyed: took too long DO {display_name} -> {str(droplet.ip_address)}"
+                )
+        inventory.invalidate()
+    
+    for droplet, elapsed in aged:
+        if alive.get(droplet.ip_address):
+            logger.info(f"Alive: DO {display_name} aged, awaiting replacement -> {str(droplet.ip_address)}")
+            ip_ready.append(droplet.ip_address)
     
     # Update rolling manager with current proxy health status
-    rolling_manager.update_proxy_health("digitalocean", instance_name, ip_ready, pending_ips)
+    rolling_manager.update_proxy_health(
+        "digitalocean", instance_name, ip_ready, pending_ips,
+        aged={str(droplet.ip_address): elapsed.total_seconds() for droplet, elapsed in droplets_to_recycle}
+    )
     
     # Handle rolling deployments for age-limited droplets
-    if droplets_to_recycle and config["rolling_deployment"]["enabled"]:
+    if aged:
+        retire = rolling_manager.select_surge_retirements(
+            "digitalocean", instance_name,
+            [(droplet, str(droplet.ip_address), bool(alive.get(droplet.ip_address))) for droplet, _ in aged],
+            total_healthy=len(ip_ready),
+            min_scaling=instance_config["scaling"]["min_scaling"]
+        )
+        if retire:
+            for droplet, deleted in delete_in_parallel(delete_proxy, retire, instance_config):
+                if not deleted:
+                    continue
+                droplet_ip = str(droplet.ip_address)
+                rolling_manager.mark_proxy_recycled("digitalocean", instance_name, droplet_ip)
+                if droplet.ip_address in ip_ready:
+                    ip_ready.remove(droplet.ip_address)
+                logger.info(
+                    f"Rolling deployment: Retired DO {display_name} droplet after surge (age limit) -> {droplet_ip}"
+                )
+            inventory.invalidate()
+    elif droplets_to_recycle and config["rolling_deployment"]["enabled"]:
         rolling_config = config["rolling_deployment"]
         
+        recycle_now = []
         for droplet, elapsed in droplets_to_recycle:
             droplet_ip = str(droplet.ip_address)
             
@@ -130,37 +203,50 @@ def do_check_alive(instance_config=None):
                 rolling_enabled=True,
                 min_scaling=instance_config["scaling"]["min_scaling"]
             ):
-                # Mark as recycling and delete
+                # Mark as recycling, the whole batch is deleted together below
                 rolling_manager.mark_proxy_recycling("digitalocean", instance_name, droplet_ip)
-                delete_proxy(droplet, instance_config)
-                rolling_manager.mark_proxy_recycled("digitalocean", instance_name, droplet_ip)
-                logger.info(
-                    f"Rolling deployment: Recycled DO {display_name} droplet (age limit) -> {droplet_ip}"
-                )
+                recycle_now.append(droplet)
             else:
                 logger.info(
                     f"Rolling deployment: Deferred recycling DO {display_name} droplet -> {droplet_ip}"
                 )
+        
+        if recycle_now:
+            for droplet, deleted in delete_in_parallel(delete_proxy, recycle_now, instance_config):
+                if not deleted:
+                    continue
+                droplet_ip = str(droplet.ip_address)
+                rolling_manager.mark_proxy_recycled("digitalocean", instance_name, droplet_ip)
+                logger.info(
+                    f"Rolling deployment: Recycled DO {display_name} droplet (age limit) -> {droplet_ip}"
+                )
+            inventory.invalidate()
     elif droplets_to_recycle and not config["rolling_deployment"]["enabled"]:
         # Standard non-rolling recycling
-        for droplet, elapsed in droplets_to_recycle:
-            delete_proxy(droplet, instance_config)
-            logger.info(
-                f"Recycling DO {display_name} droplet, reached age limit -> {str(droplet.ip_address)}"
-            )
+        expired = [droplet for droplet, elapsed in droplets_to_recycle]
+        for droplet, deleted in delete_in_parallel(delete_proxy, expired, instance_config):
+            if deleted:
+                logger.info(
+                    f"Recycling DO {display_name} droplet, reached age limit -> {str(droplet.ip_address)}"
+                )
+        inventory.invalidate()
     
     return ip_ready
 
 
-def do_check_delete(instance_config=None):
+@traced
+def do_check_delete(instance_config=None, inventory=None):
     """
     Check if any DigitalOcean droplets need to be deleted.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional droplet snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["digitalocean"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_droplets, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -169,13 +255,15 @@ def do_check_delete(instance_config=None):
     if delete_queue:
         logger.info(f"Current delete queue contains {len(delete_queue)} IP addresses: {', '.join(delete_queue)}")
     
-    droplets = list_droplets(instance_config)
+    droplets = inventory.get()
     if not droplets:
         logger.info(f"No DigitalOcean {display_name} droplets found to process for deletion")
         return
         
     logger.info(f"Checking {len(droplets)} DigitalOcean {display_name} droplets for deletion")
     
+    # Collect every queued droplet first, then drain the queue in one parallel batch
+    queued = []
     for droplet in droplets:
         try:
             droplet_ip = str(droplet.ip_address)
@@ -183,31 +271,34 @@ def do_check_delete(instance_config=None):
             # Check if this droplet's IP is in the delete or restart queue
             if droplet_ip in delete_queue or droplet_ip in restart_queue:
                 logger.info(f"Found droplet {droplet.id} with IP {droplet_ip} in deletion queue - deleting now")
-                
-                # Attempt to delete the droplet
-                delete_result = delete_proxy(droplet, instance_config)
-                
-                if delete_result:
-                    logger.info(f"Successfully destroyed DigitalOcean {display_name} droplet -> {droplet_ip}")
-                    
-                    # Remove from queues upon successful deletion
-                    if droplet_ip in delete_queue:
-                        delete_queue.remove(droplet_ip)
-                        logger.info(f"Removed {droplet_ip} from delete queue")
-                    if droplet_ip in restart_queue:
-                        restart_queue.remove(droplet_ip)
-                        logger.info(f"Removed {droplet_ip} from restart queue")
-                else:
-                    logger.warning(f"Failed to destroy DigitalOcean {display_name} droplet -> {droplet_ip}")
+                queued.append(droplet)
         except Exception as e:
             logger.error(f"Error processing droplet for deletion: {e}")
             continue
     
+    if queued:
+        for droplet, delete_result in delete_in_parallel(delete_proxy, queued, instance_config):
+            droplet_ip = str(droplet.ip_address)
+            if delete_result:
+                logger.info(f"Successfully destroyed DigitalOcean {display_name} droplet -> {droplet_ip}")
+                
+                # Remove from queues upon successful deletion
+                if droplet_ip in delete_queue:
+                    delete_queue.remove(droplet_ip)
+                    logger.info(f"Removed {droplet_ip} from delete queue")
+                if droplet_ip in restart_queue:
+                    restart_queue.remove(droplet_ip)
+                    logger.info(f"Removed {droplet_ip} from restart queue")
+            else:
+                logger.warning(f"Failed to destroy DigitalOcean {display_name} droplet -> {droplet_ip}")
+        inventory.invalidate()
+    
     # Report on any IPs that remain in the queues but weren't found
     remaining_delete = [ip for ip in delete_queue if any(ip == str(d.ip_address) for d in droplets)]
     if remaining_delete:
         logger.warning(f"IPs remaining in delete queue that weren't found as droplets: {', '.join(remaining_delete)}")
 
+@traced
 def do_fw(instance_config=None):
     """
     Create a DigitalOcean firewall for proxy droplets.
@@ -245,12 +336,22 @@ def do_start(instance_config=None):
     """
     if instance_config is None:
         instance_config = config["providers"]["digitalocean"]["instances"]["default"]
+    
+    # Shared droplet snapshot, only re-listed after a phase mutates the provider
+    inventory = Inventory(list_droplets, instance_config)
         
     do_fw(instance_config)
-    do_check_delete(instance_config)
+    do_check_delete(instance_config, inventory)
     # First check which droplets are alive
-    ip_ready = do_check_alive(instance_config)
+    ip_ready = do_check_alive(instance_config, inventory)
     # Then handle deployment/scaling based on ready droplets
-    do_deployment(instance_config["scaling"]["min_scaling"], instance_config)
+    instance_name = next(
+        (name for name, inst in config["providers"]["digitalocean"]["instances"].items()
+         if inst == instance_config),
+        "default"
+    )
+    # Includes surge replacements for aged droplets when surge recycling is on
+    target = rolling_manager.surge_target("digitalocean", instance_name, instance_config["scaling"]["min_scaling"])
+    do_deployment(target, instance_config, inventory)
     # Final check for alive droplets
-    return do_check_alive(instance_config)
+    return do_check_alive(instance_config, inventory)
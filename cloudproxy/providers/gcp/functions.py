@@ -4,18 +4,28 @@ import uuid
 from loguru import logger
 
 import googleapiclient.discovery
+import googleapiclient.errors
 from google.oauth2 import service_account
 
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.clients import client_registry, credential_fingerprint
 from cloudproxy.providers.config import set_auth
+from cloudproxy.providers.metrics import provider_call
 from cloudproxy.providers.settings import config
 
 gcp = None
 compute = None
 
+# The Compute API accepts at most 1000 calls per batch request
+MAX_BATCH_REQUESTS = 1000
+
 def get_client(instance_config=None):
     """
     Initialize and return a GCP client based on the provided configuration.
     
+    Compute clients are cached per instance and rebuilt when the service
+    account credentials change.
+    
     Args:
         instance_config: The specific instance configuration
     
@@ -23,48 +33,51 @@ def get_client(instance_config=None):
         tuple: (config, gcp_client)
     """
 
-    global gcp, compute
+    # If clients are set at module level (likely by a test), return them
     if gcp is not None and compute is not None:
         return gcp, compute
 
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
 
-    gcp = config["providers"]["gcp"]
-    try:
-        if 'sa_json' in instance_config["secrets"]:
+    instance_id = next(
+        (name for name, inst in config["providers"]["gcp"]["instances"].items() 
+         if inst == instance_config), 
+        "default"
+    )
+    secrets = instance_config["secrets"]
+
+    def build_client():
+        if 'sa_json' in secrets:
             credentials = service_account.Credentials.from_service_account_file(
-                instance_config["secrets"]["sa_json"]
+                secrets["sa_json"]
             )
         else:
             credentials = service_account.Credentials.from_service_account_info(
-                json.loads(instance_config["secrets"]["service_account_key"])
+                json.loads(secrets["service_account_key"])
             )
-        compute = googleapiclient.discovery.build('compute', 'v1', credentials=credentials)
+        return googleapiclient.discovery.build('compute', 'v1', credentials=credentials)
 
-        return gcp, compute
+    try:
+        compute_client = client_registry.get(
+            "gcp",
+            instance_id,
+            credential_fingerprint(secrets.get("sa_json"), secrets.get("service_account_key")),
+            build_client,
+        )
+        return config["providers"]["gcp"], compute_client
     except TypeError:
         logger.error("GCP -> Invalid service account key")
 
 
-def create_proxy(instance_config=None):
+def _instance_body(instance_config, source_disk_image):
     """
-    Create a GCP proxy instance.
+    Build the insert request body for a GCP proxy instance.
     
     Args:
         instance_config: The specific instance configuration
+        source_disk_image: Self link of the boot disk image
     """
-    if instance_config is None:
-        instance_config = config["providers"]["gcp"]["instances"]["default"]
-
-    gcp, compute = get_client(instance_config)
-
-    image_response = compute.images().getFromFamily(
-        project=instance_config["image_project"], 
-        family=instance_config["image_family"]
-    ).execute()
-    source_disk_image = image_response['selfLink']
-
     body = {
         'name': 'cloudproxy-' + str(uuid.uuid4()),
         'machineType': 
@@ -103,13 +116,89 @@ def create_proxy(instance_config=None):
             }]
         }
     }
+    return body
+
+
+@provider_call("gcp")
+def create_proxy(instance_config=None):
+    """
+    Create a GCP proxy instance.
+    
+    Args:
+        instance_config: The specific instance configuration
+    """
+    if instance_config is None:
+        instance_config = config["providers"]["gcp"]["instances"]["default"]
+
+    gcp, compute = get_client(instance_config)
+
+    image_response = compute.images().getFromFamily(
+        project=instance_config["image_project"], 
+        family=instance_config["image_family"]
+    ).execute()
+    source_disk_image = image_response['selfLink']
 
     return compute.instances().insert(
         project=instance_config["project"],
         zone=instance_config["zone"],
-        body=body
+        body=_instance_body(instance_config, source_disk_image)
     ).execute()
 
+@provider_call("gcp")
+def create_proxies(count, instance_config=None):
+    """
+    Create several GCP proxy instances in batched HTTP requests.
+    
+    The boot image is resolved once and the inserts are sent together, up to
+    MAX_BATCH_REQUESTS per batch. Each insert succeeds or fails on its own.
+    
+    Args:
+        count: Number of instances to create
+        instance_config: The specific instance configuration
+        
+    Returns:
+        BatchResult: How many inserts were accepted and the errors of the rest
+    """
+    if instance_config is None:
+        instance_config = config["providers"]["gcp"]["instances"]["default"]
+
+    result = BatchResult(requested=count)
+    if count < 1:
+        return result
+
+    gcp, compute = get_client(instance_config)
+
+    try:
+        image_response = compute.images().getFromFamily(
+            project=instance_config["image_project"], 
+            family=instance_config["image_family"]
+        ).execute()
+    except googleapiclient.errors.HttpError as e:
+        result.errors.append(str(e))
+        return result
+    source_disk_image = image_response['selfLink']
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            result.errors.append(str(exception))
+        else:
+            result.created += 1
+
+    for offset in range(0, count, MAX_BATCH_REQUESTS):
+        batch = compute.new_batch_http_request(callback=on_response)
+        for _ in range(min(MAX_BATCH_REQUESTS, count - offset)):
+            batch.add(compute.instances().insert(
+                project=instance_config["project"],
+                zone=instance_config["zone"],
+                body=_instance_body(instance_config, source_disk_image)
+            ))
+        try:
+            batch.execute()
+        except googleapiclient.errors.HttpError as e:
+            result.errors.append(str(e))
+    return result
+
+@provider_call("gcp")
 def delete_proxy(name, instance_config=None):
     """
     Delete a GCP proxy instance.
@@ -133,6 +222,53 @@ def delete_proxy(name, instance_config=None):
         logger.info(f"GCP --> HTTP Error when trying to delete proxy {name}. Probably has already been deleted.")
         return None
 
+@provider_call("gcp")
+def delete_proxies(names, instance_config=None):
+    """
+    Delete several GCP proxy instances in batched HTTP requests.
+    
+    Deletes are sent up to MAX_BATCH_REQUESTS per batch. A batch that fails as
+    a whole leaves its instances out of the result, the next batch is still sent.
+    
+    Args:
+        names: Names of the instances to delete
+        instance_config: The specific instance configuration
+        
+    Returns:
+        list: Names of the instances whose deletion was accepted
+    """
+    if instance_config is None:
+        instance_config = config["providers"]["gcp"]["instances"]["default"]
+
+    names = list(names)
+    if not names:
+        return []
+
+    gcp, compute = get_client(instance_config)
+
+    deleted = []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            logger.info(f"GCP --> HTTP Error when trying to delete proxy {request_id}. Probably has already been deleted.")
+        else:
+            deleted.append(request_id)
+
+    for offset in range(0, len(names), MAX_BATCH_REQUESTS):
+        batch = compute.new_batch_http_request(callback=on_response)
+        for name in names[offset:offset + MAX_BATCH_REQUESTS]:
+            batch.add(compute.instances().delete(
+                project=instance_config["project"],
+                zone=instance_config["zone"],
+                instance=name
+            ), request_id=name)
+        try:
+            batch.execute()
+        except googleapiclient.errors.HttpError as e:
+            logger.error(f"GCP --> Batch delete of {min(MAX_BATCH_REQUESTS, len(names) - offset)} proxies failed: {e}")
+    return deleted
+
+@provider_call("gcp")
 def stop_proxy(name, instance_config=None):
     """
     Stop a GCP proxy instance.
@@ -144,6 +280,8 @@ def stop_proxy(name, instance_config=None):
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
 
+    gcp, compute = get_client(instance_config)
+
     try:
         return compute.instances().stop(
             project=instance_config["project"],
@@ -154,6 +292,7 @@ def stop_proxy(name, instance_config=None):
         logger.info(f"GCP --> HTTP Error when trying to stop proxy {name}. Probably has already been deleted.")
         return None
 
+@provider_call("gcp")
 def start_proxy(name, instance_config=None):
     """
     Start a GCP proxy instance.
@@ -177,6 +316,7 @@ def start_proxy(name, instance_config=None):
         logger.info(f"GCP --> HTTP Error when trying to start proxy {name}. Probably has already been deleted.")
         return None
 
+@provider_call("gcp")
 def list_instances(instance_config=None):
     """
     List all GCP proxy instances.
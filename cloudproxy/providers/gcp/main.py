@@ -1,59 +1,77 @@
 import datetime
-import itertools
 
 from loguru import logger
 
 from cloudproxy.check import check_alive
 from cloudproxy.providers.gcp.functions import (
     list_instances,
-    create_proxy,
-    delete_proxy,
+    create_proxies,
+    delete_proxies,
     stop_proxy,
     start_proxy,
 )
+from cloudproxy.providers.batch import log_batch_result
+from cloudproxy.providers.inventory import Inventory, pick_surplus
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
-from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.rolling import rolling_manager, surge_limit
+from cloudproxy.providers.tracing import traced
 
-def gcp_deployment(min_scaling, instance_config=None):
+@traced
+def gcp_deployment(min_scaling, instance_config=None, inventory=None):
     """
     Deploy GCP instances based on min_scaling requirements.
     
     Args:
         min_scaling: The minimum number of instances to maintain
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
-    total_instances = len(list_instances(instance_config))
+    total_instances = len(inventory.get())
     if min_scaling < total_instances:
         logger.info("Overprovisioned: GCP destroying.....")
-        for instance in itertools.islice(
-            list_instances(instance_config), 0, (total_instances - min_scaling)
-        ):
+        surplus = pick_surplus(
+            inventory.get(), total_instances - min_scaling,
+            lambda instance: instance['networkInterfaces'][0]['accessConfigs'][0].get('natIP'),
+            lambda instance: datetime.datetime.strptime(instance["creationTimestamp"], '%Y-%m-%dT%H:%M:%S.%f%z'),
+        )
+        deleted = set(delete_proxies([instance['name'] for instance in surplus], instance_config))
+        for instance in surplus:
+            if instance['name'] not in deleted:
+                continue
             access_configs = instance['networkInterfaces'][0]['accessConfigs'][0]
             msg = f"{instance['name']} {access_configs['natIP']}"
-            delete_proxy(instance['name'], instance_config)
             logger.info("Destroyed: GCP -> " + msg)
+        inventory.invalidate()
     if min_scaling - total_instances < 1:
         logger.info("Minimum GCP instances met")
     else:
         total_deploy = min_scaling - total_instances
         logger.info("Deploying: " + str(total_deploy) + " GCP instances")
-        for _ in range(total_deploy):
-            create_proxy(instance_config)
-            logger.info("Deployed")
-    return len(list_instances(instance_config))
+        result = create_proxies(total_deploy, instance_config)
+        log_batch_result(result, "GCP")
+        inventory.invalidate()
+    return len(inventory.get())
 
-def gcp_check_alive(instance_config=None):
+@traced
+def gcp_check_alive(instance_config=None, inventory=None):
     """
     Check if any GCP instances are alive.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
     
     # Get instance name for rolling deployment tracking
     instance_name = next(
@@ -65,20 +83,26 @@ def gcp_check_alive(instance_config=None):
     ip_ready = []
     pending_ips = []
     instances_to_recycle = []
+    instances_to_probe = []
     
-    for instance in list_instances(instance_config):
+    listed = inventory.get()
+    for instance in listed:
         try:
             elapsed = datetime.datetime.now(
                 datetime.timezone.utc
             ) - datetime.datetime.strptime(instance["creationTimestamp"], '%Y-%m-%dT%H:%M:%S.%f%z')
             
-            if config["age_limit"] > 0 and elapsed > datetime.timedelta(seconds=config["age_limit"]):
+            if recycle_schedule.expired(
+                "gcp", instance_name, instance.get("name"), elapsed, config["age_limit"],
+                ip=instance['networkInterfaces'][0]['accessConfigs'][0].get('natIP')
+            ):
                 # Queue for potential recycling
                 instances_to_recycle.append((instance, elapsed))
             
             elif instance['status'] == "TERMINATED":
                 logger.info("Waking up: GCP -> Instance " + instance['name'])
                 started = start_proxy(instance['name'], instance_config)
+                inventory.invalidate()
                 if not started:
                     logger.info("Could not wake up, trying again later.")
             
@@ -94,33 +118,91 @@ def gcp_check_alive(instance_config=None):
                 if 'natIP' in access_configs:
                     pending_ips.append(access_configs['natIP'])
             
-            # If none of the above, check if alive or not.
-            elif check_alive(instance['networkInterfaces'][0]['accessConfigs'][0]['natIP']):
-                access_configs = instance['networkInterfaces'][0]['accessConfigs'][0]
-                msg = f"{instance['name']} {access_configs['natIP']}"
-                logger.info("Alive: GCP -> " + msg)
-                ip_ready.append(access_configs['natIP'])
-            
+            # If none of the above, queue it for probing.
             else:
-                access_configs = instance['networkInterfaces'][0]['accessConfigs'][0]
-                msg = f"{instance['name']} {access_configs['natIP']}"
-                if elapsed > datetime.timedelta(minutes=10):
-                    delete_proxy(instance['name'])
-                    logger.info("Destroyed: took too long GCP -> " + msg)
-                else:
-                    logger.info("Waiting: GCP -> " + msg)
-                    if 'natIP' in access_configs:
-                        pending_ips.append(access_configs['natIP'])
+                instances_to_probe.append(
+                    (instance, instance['networkInterfaces'][0]['accessConfigs'][0]['natIP'], elapsed)
+                )
         except (TypeError, KeyError):
             logger.info("Pending: GCP -> Allocating IP")
+    recycle_schedule.retain("gcp", instance_name, [instance.get("name") for instance in listed])
+    
+    # Oldest first, the disruption budget is handed out by age
+    instances_to_recycle.sort(key=lambda item: item[1], reverse=True)
+    aged_ages = {}
+    for inst, elapsed in instances_to_recycle:
+        instance_ip = inst['networkInterfaces'][0]['accessConfigs'][0].get('natIP')
+        if instance_ip:
+            aged_ages[instance_ip] = elapsed.total_seconds()
+    
+    # In surge mode aged instances keep serving until their replacements are healthy
+    surging = surge_limit() > 0
+    aged = []
+    if surging:
+        for inst, elapsed in instances_to_recycle:
+            aged.append((inst, inst['networkInterfaces'][0]['accessConfigs'][0].get('natIP')))
+    
+    # Probe all running instances concurrently, reusing fresh health monitor results
+    alive = health_monitor.check(
+        "gcp", instance_name,
+        [ip for _, ip, _ in instances_to_probe] + [ip for _, ip in aged if ip], probe=check_alive
+    )
+    timed_out = []
+    for instance, instance_ip, elapsed in instances_to_probe:
+        msg = f"{instance['name']} {instance_ip}"
+        if alive.get(instance_ip):
+            logger.info("Alive: GCP -> " + msg)
+            ip_ready.append(instance_ip)
+        elif elapsed > datetime.timedelta(minutes=10):
+            timed_out.append((instance, msg))
+        else:
+            logger.info("Waiting: GCP -> " + msg)
+            pending_ips.append(instance_ip)
+    
+    if timed_out:
+        deleted = set(delete_proxies([instance['name'] for instance, _ in timed_out], instance_config))
+        inventory.invalidate()
+        for instance, msg in timed_out:
+            if instance['name'] not in deleted:
+                continue
+            logger.info("Destroyed: took too long GCP -> " + msg)
+    
+    for inst, instance_ip in aged:
+        if instance_ip and alive.get(instance_ip):
+            logger.info(f"Alive: GCP aged, awaiting replacement -> {inst['name']} {instance_ip}")
+            ip_ready.append(instance_ip)
     
     # Update rolling manager with current proxy health status
-    rolling_manager.update_proxy_health("gcp", instance_name, ip_ready, pending_ips)
+    rolling_manager.update_proxy_health(
+        "gcp", instance_name, ip_ready, pending_ips,
+        aged=aged_ages
+    )
     
     # Handle rolling deployments for age-limited instances
-    if instances_to_recycle and config["rolling_deployment"]["enabled"]:
+    if aged:
+        retire = rolling_manager.select_surge_retirements(
+            "gcp", instance_name,
+            [
+                ((inst, instance_ip), instance_ip, bool(instance_ip and alive.get(instance_ip)))
+                for inst, instance_ip in aged
+            ],
+            total_healthy=len(ip_ready),
+            min_scaling=instance_config["scaling"]["min_scaling"]
+        )
+        if retire:
+            deleted = set(delete_proxies([inst['name'] for inst, _ in retire], instance_config))
+            inventory.invalidate()
+            for inst, instance_ip in retire:
+                if inst['name'] not in deleted:
+                    continue
+                rolling_manager.mark_proxy_recycled("gcp", instance_name, instance_ip)
+                if instance_ip in ip_ready:
+                    ip_ready.remove(instance_ip)
+                logger.info(f"Rolling deployment: Retired GCP instance after surge (age limit) -> {inst['name']} {instance_ip}")
+    elif instances_to_recycle and config["rolling_deployment"]["enabled"]:
         rolling_config = config["rolling_deployment"]
         
+        recycle_now = []
         for inst, elapsed in instances_to_recycle:
             access_configs = inst['networkInterfaces'][0]['accessConfigs'][0]
             if 'natIP' in access_configs:
@@ -137,56 +219,83 @@ def gcp_check_alive(instance_config=None):
                     rolling_enabled=True,
                     min_scaling=instance_config["scaling"]["min_scaling"]
                 ):
-                    # Mark as recycling and delete
+                    # Mark as recycling, the whole batch is deleted together below
                     rolling_manager.mark_proxy_recycling("gcp", instance_name, instance_ip)
-                    delete_proxy(inst['name'], instance_config)
-                    rolling_manager.mark_proxy_recycled("gcp", instance_name, instance_ip)
-                    logger.info(f"Rolling deployment: Recycled GCP instance (age limit) -> {inst['name']} {instance_ip}")
+                    recycle_now.append((inst, instance_ip))
                 else:
                     logger.info(f"Rolling deployment: Deferred recycling GCP instance -> {inst['name']} {instance_ip}")
+        
+        if recycle_now:
+            deleted = set(delete_proxies([inst['name'] for inst, _ in recycle_now], instance_config))
+            inventory.invalidate()
+            for inst, instance_ip in recycle_now:
+                if inst['name'] not in deleted:
+                    continue
+                rolling_manager.mark_proxy_recycled("gcp", instance_name, instance_ip)
+                logger.info(f"Rolling deployment: Recycled GCP instance (age limit) -> {inst['name']} {instance_ip}")
     elif instances_to_recycle and not config["rolling_deployment"]["enabled"]:
         # Standard non-rolling recycling
+        deleted = set(delete_proxies([inst['name'] for inst, _ in instances_to_recycle], instance_config))
+        inventory.invalidate()
         for inst, elapsed in instances_to_recycle:
+            if inst['name'] not in deleted:
+                continue
             access_configs = inst['networkInterfaces'][0]['accessConfigs'][0]
             msg = f"{inst['name']} {access_configs['natIP'] if 'natIP' in access_configs else ''}"
-            delete_proxy(inst['name'], instance_config)
             logger.info("Recycling instance, reached age limit -> " + msg)
     
     return ip_ready
 
-def gcp_check_delete(instance_config=None):
+@traced
+def gcp_check_delete(instance_config=None, inventory=None):
     """
     Check if any GCP instances need to be deleted.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
-    for instance in list_instances(instance_config):
+    # Drain every queued instance with a single batched request
+    queued = []
+    for instance in inventory.get():
         access_configs = instance['networkInterfaces'][0]['accessConfigs'][0]
         if 'natIP' in  access_configs and access_configs['natIP'] in delete_queue: 
-            msg = f"{instance['name']}, {access_configs['natIP']}"
-            delete_proxy(instance['name'])
-            logger.info("Destroyed: not wanted -> " + msg)
-            delete_queue.remove(access_configs['natIP'])
+            queued.append((instance['name'], access_configs['natIP']))
+    if not queued:
+        return
+    deleted = set(delete_proxies([name for name, _ in queued], instance_config))
+    inventory.invalidate()
+    for name, nat_ip in queued:
+        if name not in deleted:
+            continue
+        logger.info(f"Destroyed: not wanted -> {name}, {nat_ip}")
+        delete_queue.remove(nat_ip)
 
-def gcp_check_stop(instance_config=None):
+@traced
+def gcp_check_stop(instance_config=None, inventory=None):
     """
     Check if any GCP instances need to be stopped.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
-    for instance in list_instances(instance_config):
+    for instance in inventory.get():
         access_configs = instance['networkInterfaces'][0]['accessConfigs'][0]
         if 'natIP' in  access_configs and access_configs['natIP'] in restart_queue:
             msg = f"{instance['name']}, {access_configs['natIP']}"
             stop_proxy(instance['name'], instance_config)
+            inventory.invalidate()
             logger.info("Stopped: getting new IP -> " + msg)
             restart_queue.remove(access_configs['natIP'])
 
@@ -203,8 +312,18 @@ def gcp_start(instance_config=None):
     if instance_config is None:
         instance_config = config["providers"]["gcp"]["instances"]["default"]
 
-    gcp_check_delete(instance_config)
-    gcp_check_stop(instance_config)
-    gcp_deployment(instance_config["scaling"]["min_scaling"], instance_config)
-    ip_ready = gcp_check_alive(instance_config)
+    # Shared instance snapshot, only re-listed after a phase mutates the provider
+    inventory = Inventory(list_instances, instance_config)
+
+    gcp_check_delete(instance_config, inventory)
+    gcp_check_stop(instance_config, inventory)
+    instance_name = next(
+        (name for name, inst in config["providers"]["gcp"]["instances"].items()
+         if inst == instance_config),
+        "default"
+    )
+    # Includes surge replacements for aged instances when surge recycling is on
+    target = rolling_manager.surge_target("gcp", instance_name, instance_config["scaling"]["min_scaling"])
+    gcp_deployment(target, instance_config, inventory)
+    ip_ready = gcp_check_alive(instance_config, inventory)
     return ip_ready
\ No newline at end of file
@@ -0,0 +1,505 @@
+"""
+Continuous proxy health monitor and shared health store.
+
+Provider ticks used to be the only place proxies were probed, between slow
+list, create and delete calls, so a proxy that died right after a tick kept
+being served until the next tick had finished reconciling. The monitor runs
+on its own scheduler, so busy provider ticks never delay it, and publishes
+each probe result to the HealthStore. Provider ticks reuse a proxy's result
+until its next probe is due instead of probing again, and the proxy listings
+leave out proxies whose latest probe failed.
+
+Probe cadence adapts to each proxy's recent history, kept in a fixed-size
+ring buffer per proxy. New and flapping proxies are probed every
+HEALTH_MONITOR_INTERVAL seconds. Each run of consecutive successes doubles a
+stable proxy's interval, up to HEALTH_MONITOR_MAX_AGE. Proxies that have not
+answered yet, such as servers still booting, are probed with exponential
+backoff and a short HEALTH_MONITOR_PENDING_TIMEOUT instead of a full-timeout
+probe on every tick.
+
+Whenever a proxy's probe result flips, a "health" event is published to the
+pool change feed.
+
+With HEALTH_MONITOR_INTERVAL set to 0 the monitor is off and provider ticks
+probe every proxy themselves, as before.
+"""
+
+import inspect
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from loguru import logger
+
+from cloudproxy.check import check_alive, check_alive_batch
+from cloudproxy.providers import settings
+from cloudproxy.providers.changes import change_feed
+from cloudproxy.providers.metrics import probe_duration
+from cloudproxy.providers.scheduler import timed_tick
+
+# (provider, instance)
+InstanceKey = Tuple[str, str]
+
+# Probes a proxy needs before its interval can grow
+NEW_PROXY_SAMPLES = 3
+# Result changes within the history that mark a proxy as flapping
+FLAPPING_CHANGES = 2
+# Consecutive successes that double a stable proxy's interval
+STABLE_RUN = 4
+# Largest interval doubling, keeps the arithmetic bounded
+MAX_DOUBLINGS = 16
+
+
+def monitor_config() -> Dict:
+    return settings.config.get("health_monitor", {})
+
+
+def monitor_interval() -> int:
+    """Seconds between health monitor runs, 0 if the monitor is off."""
+    return monitor_config().get("interval", 0)
+
+
+def result_max_age() -> float:
+    """Seconds a probe result is trusted, 0 while the monitor is off."""
+    if monitor_interval() <= 0:
+        return 0
+    return monitor_config().get("max_age", 0)
+
+
+class HealthHistory:
+    """Fixed-size ring buffer of a proxy's latest probe results and latencies."""
+
+    __slots__ = ("size", "_alive", "_latency", "_next", "_count")
+
+    def __init__(self, size: int = 32):
+        self.size = max(1, size)
+        self._alive = bytearray(self.size)
+        self._latency = array("d", bytes(8 * self.size))
+        self._next = 0
+        self._count = 0
+
+    def append(self, alive: bool, latency: Optional[float] = None):
+        self._alive[self._next] = 1 if alive else 0
+        self._latency[self._next] = latency if alive and latency is not None else 0.0
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _indexes(self) -> Iterable[int]:
+        # Oldest first
+        start = (self._next - self._count) % self.size
+        return ((start + i) % self.size for i in range(self._count))
+
+    def samples(self) -> List[Tuple[bool, Optional[float]]]:
+        """(alive, latency) of each sample, oldest first."""
+        return [
+            (bool(self._alive[i]), self._latency[i] if self._alive[i] else None)
+            for i in self._indexes()
+        ]
+
+    def success_rate(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return sum(self._alive[i] for i in self._indexes()) / self._count
+
+    def mean_latency(self) -> Optional[float]:
+        latencies = [self._latency[i] for i in self._indexes() if self._alive[i]]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def flaps(self) -> int:
+        """Number of times the result changed within the history."""
+        results = [self._alive[i] for i in self._indexes()]
+        return sum(1 for previous, current in zip(results, results[1:]) if previous != current)
+
+    def streak(self) -> Tuple[Optional[bool], int]:
+        """The latest result and how many probes in a row returned it."""
+        if not self._count:
+            return None, 0
+        results = [self._alive[i] for i in self._indexes()]
+        latest = results[-1]
+        run = 0
+        for result in reversed(results):
+            if result != latest:
+                break
+            run += 1
+        return bool(latest), run
+
+    def ever_alive(self) -> bool:
+        return any(self._alive[i] for i in self._indexes())
+
+
+def probe_interval(history: HealthHistory) -> float:
+    """
+    Seconds until a proxy should be probed again, given its history.
+
+    Args:
+        history: The proxy's probe history, including the latest probe
+
+    Returns:
+        float: The interval, 0 while the monitor is off
+    """
+    base = monitor_interval()
+    if base <= 0:
+        return 0.0
+    longest = max(base, monitor_config().get("max_age", base))
+    alive, streak = history.streak()
+    if not history.ever_alive():
+        # Not up yet, back off instead of waiting out a timeout every run
+        doublings = streak - 1
+    elif len(history) < NEW_PROXY_SAMPLES or history.flaps() >= FLAPPING_CHANGES:
+        doublings = 0
+    elif alive:
+        doublings = streak // STABLE_RUN
+    else:
+        doublings = streak - 1
+    return min(base * 2 ** min(max(doublings, 0), MAX_DOUBLINGS), longest)
+
+
+def accepts_timeout(probe: Callable) -> bool:
+    """Whether probe can be called with a timeout keyword argument."""
+    try:
+        parameters = inspect.signature(probe).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(
+        parameter.kind is parameter.VAR_KEYWORD
+        or (parameter.name == "timeout" and parameter.kind is not parameter.VAR_POSITIONAL)
+        for parameter in parameters
+    )
+
+
+class HealthStore:
+    """Thread-safe latest probe result and history of every watched proxy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict] = {}
+        self._history: Dict[str, HealthHistory] = {}
+        # IPs each provider instance asked to have watched
+        self._watched: Dict[InstanceKey, Set[str]] = {}
+        # When each IP whose latest probe failed was probed
+        self._failing: Dict[str, float] = {}
+        # Bumped whenever _failing changes
+        self.version = 0
+
+    def watch(self, provider: str, instance: str, ips: Iterable[str]):
+        """
+        Replace the IPs watched for one provider instance.
+
+        Results of IPs no instance watches any more are dropped.
+
+        Args:
+            provider: The provider name
+            instance: The provider instance name
+            ips: The instance's probed proxy IPs
+        """
+        with self._lock:
+            self._watched[(provider, instance)] = set(ips)
+            self._drop_unwatched()
+
+    def unwatch(self, provider: str, instance: str):
+        """Stop watching a provider instance, e.g. after it was disabled."""
+        with self._lock:
+            self._watched.pop((provider, instance), None)
+            self._drop_unwatched()
+
+    def _drop_unwatched(self):
+        # Caller holds the lock
+        watched = set().union(*self._watched.values()) if self._watched else set()
+        for ip in [ip for ip in self._results if ip not in watched]:
+            del self._results[ip]
+            self._history.pop(ip, None)
+            if self._failing.pop(ip, None) is not None:
+                self.version += 1
+
+    def watched(self) -> Dict[InstanceKey, List[str]]:
+        with self._lock:
+            return {key: sorted(ips) for key, ips in self._watched.items()}
+
+    def record(self, ip: str, alive: bool, latency: Optional[float] = None):
+        """Record the result of one probe and schedule the proxy's next one."""
+        now = time.time()
+        size = monitor_config().get("history_size", 32)
+        with self._lock:
+            history = self._history.get(ip)
+            if history is None or history.size != size:
+                history = self._history[ip] = HealthHistory(size)
+            history.append(alive, latency)
+            result = self._results.setdefault(ip, {
+                "alive": None,
+                "checked_at": None,
+                "latency": None,
+                "checks": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+            })
+            if result["alive"] != alive:
+                change_feed.publish("health", ip, alive=alive)
+            result["alive"] = alive
+            result["checked_at"] = now
+            result["latency"] = latency if alive else None
+            result["checks"] += 1
+            if alive:
+                result["consecutive_failures"] = 0
+                if self._failing.pop(ip, None) is not None:
+                    self.version += 1
+            else:
+                result["failures"] += 1
+                result["consecutive_failures"] += 1
+                self._failing[ip] = now
+                self.version += 1
+            result["interval"] = probe_interval(history)
+            result["next_due"] = now + result["interval"]
+
+    def get(self, ip: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._results.get(ip)
+            return dict(result) if result is not None else None
+
+    def history(self, ip: str) -> List[Tuple[bool, Optional[float]]]:
+        with self._lock:
+            history = self._history.get(ip)
+            return history.samples() if history is not None else []
+
+    def latency(self, ip: str) -> Optional[float]:
+        """Mean latency of the proxy's successful probes in its history."""
+        with self._lock:
+            history = self._history.get(ip)
+            return history.mean_latency() if history is not None else None
+
+    def fresh(self, ip: str) -> Optional[bool]:
+        """The proxy's latest result while its next probe is not yet due, else None."""
+        with self._lock:
+            result = self._results.get(ip)
+            if result is None or time.time() >= result["next_due"]:
+                return None
+            return result["alive"]
+
+    def due(self, ips: Iterable[str], slack: float = 0.0) -> List[str]:
+        """The IPs that have no result or are due for a probe within slack seconds."""
+        cutoff = time.time() + slack
+        with self._lock:
+            return [
+                ip for ip in ips
+                if ip not in self._results or self._results[ip]["next_due"] <= cutoff
+            ]
+
+    def probe_timeout(self, ip: str) -> Optional[float]:
+        """Short timeout for proxies that have never answered, None for the configured one."""
+        with self._lock:
+            history = self._history.get(ip)
+            if history is None or history.ever_alive():
+                return None
+        return monitor_config().get("pending_timeout") or None
+
+    def down(self, max_age: float) -> Set[str]:
+        """IPs whose latest probe, taken within max_age seconds, failed."""
+        if max_age <= 0:
+            return set()
+        cutoff = time.time() - max_age
+        with self._lock:
+            return {ip for ip, checked_at in self._failing.items() if checked_at >= cutoff}
+
+    def down_version(self, max_age: float) -> Tuple[int, int]:
+        """
+        Changes whenever down(max_age) does, without building the set.
+
+        Between two failing or recovering probes the set only shrinks, as
+        failures age out, so the version and the set's size identify it.
+        """
+        if max_age <= 0:
+            return 0, 0
+        cutoff = time.time() - max_age
+        with self._lock:
+            return self.version, sum(1 for checked_at in self._failing.values() if checked_at >= cutoff)
+
+    def results(self) -> Dict[str, Dict]:
+        """Latest result of every proxy, with a summary of its history."""
+        with self._lock:
+            results = {}
+            for ip, result in self._results.items():
+                history = self._history[ip]
+                results[ip] = dict(
+                    result,
+                    success_rate=history.success_rate(),
+                    mean_latency=history.mean_latency(),
+                    flaps=history.flaps(),
+                    samples=len(history),
+                )
+            return results
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._history.clear()
+            self._watched.clear()
+            self._failing.clear()
+            self.version += 1
+
+
+health_store = HealthStore()
+
+
+class HealthMonitor:
+    """Probes watched proxies and serves fresh results to provider ticks."""
+
+    def __init__(self, store: HealthStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.probes = 0
+        self.reused = 0
+        self.last_run: Optional[float] = None
+        self._scheduler = None
+
+    def probe(self, ips: Iterable[str], probe: Callable[[str], bool] = None) -> Dict[str, bool]:
+        """
+        Probe proxies concurrently and record the results.
+
+        Args:
+            ips: Proxy IP addresses to probe
+            probe: Callable taking a single IP and returning a bool (defaults to check_alive).
+                Pending proxies get a short timeout keyword if it accepts one
+
+        Returns:
+            dict: Mapping of IP address to health result
+        """
+        if probe is None:
+            probe = check_alive
+        # Checked once, a probe without the parameter would otherwise fail every call
+        pass_timeout = accepts_timeout(probe)
+
+        def timed_probe(ip: str) -> bool:
+            timeout = self.store.probe_timeout(ip) if pass_timeout else None
+            started = time.monotonic()
+            try:
+                alive = bool(probe(ip) if timeout is None else probe(ip, timeout=timeout))
+            except Exception:
+                alive = False
+            elapsed = time.monotonic() - started
+            self.store.record(ip, alive, elapsed)
+            probe_duration.observe(elapsed, "alive" if alive else "dead")
+            return alive
+
+        results = check_alive_batch(ips, probe=timed_probe)
+        with self._lock:
+            self.probes += len(results)
+        return results
+
+    def check(self, provider: str, instance: str, ips: Iterable[str],
+              probe: Callable[[str], bool] = None) -> Dict[str, bool]:
+        """
+        Health of a provider instance's proxies, probing only those that are due.
+
+        The IPs become the instance's watched set, so the monitor keeps probing
+        them between ticks.
+
+        Args:
+            provider: The provider name
+            instance: The provider instance name
+            ips: The proxy IPs to check
+            probe: Callable taking a single IP and returning a bool (defaults to check_alive)
+
+        Returns:
+            dict: Mapping of IP address to health result
+        """
+        ips = list(dict.fromkeys(ips))
+        self.store.watch(provider, instance, ips)
+        reuse = monitor_interval() > 0
+        results = {}
+        stale = []
+        for ip in ips:
+            alive = self.store.fresh(ip) if reuse else None
+            if alive is None:
+                stale.append(ip)
+            else:
+                results[ip] = alive
+        with self._lock:
+            self.reused += len(results)
+        results.update(self.probe(stale, probe))
+        return results
+
+    def run_once(self) -> int:
+        """
+        Probe the watched proxies of the enabled provider instances that are due.
+
+        Returns:
+            int: Number of proxies probed
+        """
+        providers = settings.config["providers"]
+        ips = set()
+        for (provider, instance), watched in self.store.watched().items():
+            instance_config = providers.get(provider, {}).get("instances", {}).get(instance)
+            if not instance_config or not instance_config.get("enabled"):
+                self.store.unwatch(provider, instance)
+                continue
+            ips.update(watched)
+        # Runs drift by a little, so probe what falls due before the next one
+        results = self.probe(sorted(self.store.due(ips, slack=monitor_interval() / 10)))
+        with self._lock:
+            self.runs += 1
+            self.last_run = time.time()
+        down = [ip for ip, alive in results.items() if not alive]
+        if down:
+            logger.info(f"Health monitor: {len(down)}/{len(results)} proxies not responding: {', '.join(down)}")
+        return len(results)
+
+    def start(self) -> bool:
+        """
+        Run the monitor every HEALTH_MONITOR_INTERVAL seconds on its own scheduler.
+
+        Returns:
+            bool: True if the monitor is running, False if it is turned off
+        """
+        interval = monitor_interval()
+        if interval <= 0:
+            return False
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = BackgroundScheduler(job_defaults={"coalesce": True, "max_instances": 1})
+                self._scheduler.start()
+            self._scheduler.add_job(
+                timed_tick("health-monitor", self.run_once),
+                "interval",
+                seconds=interval,
+                id="health-monitor",
+                name="health-monitor",
+                replace_existing=True,
+            )
+        logger.info(f"Health monitor enabled, probing every {interval}s")
+        return True
+
+    def stop(self):
+        with self._lock:
+            scheduler, self._scheduler = self._scheduler, None
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._scheduler is not None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "running": self._scheduler is not None,
+                "runs": self.runs,
+                "probes": self.probes,
+                "reused": self.reused,
+                "last_run": self.last_run,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.runs = self.probes = self.reused = 0
+            self.last_run = None
+
+
+health_monitor = HealthMonitor(health_store)
@@ -9,7 +9,9 @@ from hcloud.locations.domain import Location
 from loguru import logger
 
 from cloudproxy.providers import settings
+from cloudproxy.providers.clients import client_registry, credential_fingerprint
 from cloudproxy.providers.config import set_auth
+from cloudproxy.providers.metrics import provider_call
 
 # Initialize client with default instance configuration
 client = Client(token=settings.config["providers"]["hetzner"]["instances"]["default"]["secrets"]["access_token"])
@@ -24,6 +26,8 @@ def get_client(instance_config=None):
     """
     Get a Hetzner client for the specific instance configuration.
     
+    Clients are cached per instance and rebuilt when the access token changes.
+    
     Args:
         instance_config: The specific instance configuration
         
@@ -33,9 +37,22 @@ def get_client(instance_config=None):
     if instance_config is None:
         instance_config = settings.config["providers"]["hetzner"]["instances"]["default"]
     
-    return Client(token=instance_config["secrets"]["access_token"])
+    instance_id = next(
+        (name for name, inst in settings.config["providers"]["hetzner"]["instances"].items() 
+         if inst == instance_config), 
+        "default"
+    )
+    access_token = instance_config["secrets"]["access_token"]
+    
+    return client_registry.get(
+        "hetzner",
+        instance_id,
+        credential_fingerprint(access_token),
+        lambda: Client(token=access_token),
+    )
 
 
+@provider_call("hetzner")
 def create_proxy(instance_config=None):
     """
     Create a Hetzner proxy server.
@@ -77,6 +94,7 @@ def create_proxy(instance_config=None):
     return response
 
 
+@provider_call("hetzner")
 def delete_proxy(server_id, instance_config=None):
     """
     Delete a Hetzner proxy server.
@@ -136,6 +154,7 @@ def delete_proxy(server_id, instance_config=None):
             raise
 
 
+@provider_call("hetzner")
 def list_proxies(instance_config=None):
     """
     List Hetzner proxy servers.
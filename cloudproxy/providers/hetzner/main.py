@@ -1,4 +1,3 @@
-import itertools
 import datetime
 
 import dateparser
@@ -7,54 +6,71 @@ from loguru import logger
 from cloudproxy.check import check_alive
 from cloudproxy.providers import settings
 from cloudproxy.providers.hetzner.functions import list_proxies, delete_proxy, create_proxy
+from cloudproxy.providers.batch import create_in_parallel, delete_in_parallel, log_batch_result
+from cloudproxy.providers.inventory import Inventory, pick_surplus
 from cloudproxy.providers.settings import config, delete_queue, restart_queue
-from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.rolling import rolling_manager, surge_limit
+from cloudproxy.providers.tracing import traced
 
 
-def hetzner_deployment(min_scaling, instance_config=None):
+@traced
+def hetzner_deployment(min_scaling, instance_config=None, inventory=None):
     """
     Deploy Hetzner servers based on min_scaling requirements.
     
     Args:
         min_scaling: The minimum number of servers to maintain
         instance_config: The specific instance configuration
+        inventory: Optional server snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["hetzner"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_proxies, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
     
-    total_proxies = len(list_proxies(instance_config))
+    total_proxies = len(inventory.get())
     if min_scaling < total_proxies:
         logger.info(f"Overprovisioned: Hetzner {display_name} destroying.....")
-        for proxy in itertools.islice(
-                list_proxies(instance_config), 0, (total_proxies - min_scaling)
-        ):
-            delete_proxy(proxy, instance_config)
-            logger.info(f"Destroyed: Hetzner {display_name} -> {str(proxy.public_net.ipv4.ip)}")
+        surplus = pick_surplus(
+            inventory.get(), total_proxies - min_scaling,
+            lambda proxy: str(proxy.public_net.ipv4.ip),
+            lambda proxy: dateparser.parse(str(proxy.created)),
+        )
+        for proxy, deleted in delete_in_parallel(delete_proxy, surplus, instance_config):
+            if deleted:
+                logger.info(f"Destroyed: Hetzner {display_name} -> {str(proxy.public_net.ipv4.ip)}")
+        inventory.invalidate()
             
     if min_scaling - total_proxies < 1:
         logger.info(f"Minimum Hetzner {display_name} proxies met")
     else:
         total_deploy = min_scaling - total_proxies
         logger.info(f"Deploying: {str(total_deploy)} Hetzner {display_name} proxy")
-        for _ in range(total_deploy):
-            create_proxy(instance_config)
-            logger.info(f"Deployed Hetzner {display_name} proxy")
+        result = create_in_parallel(create_proxy, total_deploy, instance_config)
+        log_batch_result(result, f"Hetzner {display_name}")
+        inventory.invalidate()
             
-    return len(list_proxies(instance_config))
+    return len(inventory.get())
 
 
-def hetzner_check_alive(instance_config=None):
+@traced
+def hetzner_check_alive(instance_config=None, inventory=None):
     """
     Check if Hetzner servers are alive and operational.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional server snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["hetzner"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_proxies, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -70,33 +86,86 @@ def hetzner_check_alive(instance_config=None):
     pending_ips = []
     proxies_to_recycle = []
     
-    for proxy in list_proxies(instance_config):
+    proxies_to_probe = []
+    
+    listed = inventory.get()
+    for proxy in listed:
         elapsed = datetime.datetime.now(
             datetime.timezone.utc
         ) - dateparser.parse(str(proxy.created))
-        if config["age_limit"] > 0 and elapsed > datetime.timedelta(seconds=config["age_limit"]):
+        if recycle_schedule.expired(
+            "hetzner", instance_name, proxy.id, elapsed, config["age_limit"], ip=str(proxy.public_net.ipv4.ip)
+        ):
             # Queue for potential recycling
             proxies_to_recycle.append((proxy, elapsed))
-        elif check_alive(proxy.public_net.ipv4.ip):
+        else:
+            proxies_to_probe.append((proxy, elapsed))
+    recycle_schedule.retain("hetzner", instance_name, [proxy.id for proxy in listed])
+    
+    # Oldest first, the disruption budget is handed out by age
+    proxies_to_recycle.sort(key=lambda item: item[1], reverse=True)
+    # In surge mode aged servers keep serving until their replacements are healthy
+    surging = surge_limit() > 0
+    aged = proxies_to_recycle if surging else []
+    
+    # Probe all candidate servers concurrently, reusing fresh health monitor results
+    alive = health_monitor.check(
+        "hetzner", instance_name,
+        [proxy.public_net.ipv4.ip for proxy, _ in proxies_to_probe + aged], probe=check_alive
+    )
+    timed_out = []
+    for proxy, elapsed in proxies_to_probe:
+        if alive.get(proxy.public_net.ipv4.ip):
             logger.info(f"Alive: Hetzner {display_name} -> {str(proxy.public_net.ipv4.ip)}")
             ip_ready.append(proxy.public_net.ipv4.ip)
         else:
             if elapsed > datetime.timedelta(minutes=10):
-                delete_proxy(proxy, instance_config)
-                logger.info(
-                    f"Destroyed: Hetzner {display_name} took too long -> {str(proxy.public_net.ipv4.ip)}"
-                )
+                timed_out.append(proxy)
             else:
                 logger.info(f"Waiting: Hetzner {display_name} -> {str(proxy.public_net.ipv4.ip)}")
                 pending_ips.append(str(proxy.public_net.ipv4.ip))
     
+    if timed_out:
+        for proxy, deleted in delete_in_parallel(delete_proxy, timed_out, instance_config):
+            if deleted:
+                logger.info(
+                    f"Destroyed: Hetzner {display_name} took too long -> {str(proxy.public_net.ipv4.ip)}"
+                )
+        inventory.invalidate()
+    
+    for proxy, elapsed in aged:
+        if alive.get(proxy.public_net.ipv4.ip):
+            logger.info(f"Alive: Hetzner {display_name} aged, awaiting replacement -> {str(proxy.public_net.ipv4.ip)}")
+            ip_ready.append(proxy.public_net.ipv4.ip)
+    
     # Update rolling manager with current proxy health status
-    rolling_manager.update_proxy_health("hetzner", instance_name, ip_ready, pending_ips)
+    rolling_manager.update_proxy_health(
+        "hetzner", instance_name, ip_ready, pending_ips,
+        aged={str(proxy.public_net.ipv4.ip): elapsed.total_seconds() for proxy, elapsed in proxies_to_recycle}
+    )
     
     # Handle rolling deployments for age-limited proxies
-    if proxies_to_recycle and config["rolling_deployment"]["enabled"]:
+    if aged:
+        retire = rolling_manager.select_surge_retirements(
+            "hetzner", instance_name,
+            [(proxy, str(proxy.public_net.ipv4.ip), bool(alive.get(proxy.public_net.ipv4.ip))) for proxy, _ in aged],
+            total_healthy=len(ip_ready),
+            min_scaling=instance_config["scaling"]["min_scaling"]
+        )
+        if retire:
+            for prox, deleted in delete_in_parallel(delete_proxy, retire, instance_config):
+                if not deleted:
+                    continue
+                proxy_ip = str(prox.public_net.ipv4.ip)
+                rolling_manager.mark_proxy_recycled("hetzner", instance_name, proxy_ip)
+                if prox.public_net.ipv4.ip in ip_ready:
+                    ip_ready.remove(prox.public_net.ipv4.ip)
+                logger.info(f"Rolling deployment: Retired Hetzner {display_name} proxy after surge (age limit) -> {proxy_ip}")
+            inventory.invalidate()
+    elif proxies_to_recycle and config["rolling_deployment"]["enabled"]:
         rolling_config = config["rolling_deployment"]
         
+        recycle_now = []
         for prox, elapsed in proxies_to_recycle:
             proxy_ip = str(prox.public_net.ipv4.ip)
             
@@ -111,31 +180,44 @@ def hetzner_check_alive(instance_config=None):
                 rolling_enabled=True,
                 min_scaling=instance_config["scaling"]["min_scaling"]
             ):
-                # Mark as recycling and delete
+                # Mark as recycling, the whole batch is deleted together below
                 rolling_manager.mark_proxy_recycling("hetzner", instance_name, proxy_ip)
-                delete_proxy(prox, instance_config)
-                rolling_manager.mark_proxy_recycled("hetzner", instance_name, proxy_ip)
-                logger.info(f"Rolling deployment: Recycled Hetzner {display_name} proxy (age limit) -> {proxy_ip}")
+                recycle_now.append(prox)
             else:
                 logger.info(f"Rolling deployment: Deferred recycling Hetzner {display_name} proxy -> {proxy_ip}")
+        
+        if recycle_now:
+            for prox, deleted in delete_in_parallel(delete_proxy, recycle_now, instance_config):
+                if not deleted:
+                    continue
+                proxy_ip = str(prox.public_net.ipv4.ip)
+                rolling_manager.mark_proxy_recycled("hetzner", instance_name, proxy_ip)
+                logger.info(f"Rolling deployment: Recycled Hetzner {display_name} proxy (age limit) -> {proxy_ip}")
+            inventory.invalidate()
     elif proxies_to_recycle and not config["rolling_deployment"]["enabled"]:
         # Standard non-rolling recycling
-        for prox, elapsed in proxies_to_recycle:
-            delete_proxy(prox, instance_config)
-            logger.info(f"Recycling Hetzner {display_name} proxy, reached age limit -> {str(prox.public_net.ipv4.ip)}")
+        expired = [prox for prox, elapsed in proxies_to_recycle]
+        for prox, deleted in delete_in_parallel(delete_proxy, expired, instance_config):
+            if deleted:
+                logger.info(f"Recycling Hetzner {display_name} proxy, reached age limit -> {str(prox.public_net.ipv4.ip)}")
+        inventory.invalidate()
     
     return ip_ready
 
 
-def hetzner_check_delete(instance_config=None):
+@traced
+def hetzner_check_delete(instance_config=None, inventory=None):
     """
     Check if any Hetzner servers need to be deleted.
     
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional server snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["hetzner"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_proxies, instance_config)
         
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -144,13 +226,15 @@ def hetzner_check_delete(instance_config=None):
     if delete_queue:
         logger.info(f"Current delete queue contains {len(delete_queue)} IP addresses: {', '.join(delete_queue)}")
     
-    servers = list_proxies(instance_config)
+    servers = inventory.get()
     if not servers:
         logger.info(f"No Hetzner {display_name} servers found to process for deletion")
         return
         
     logger.info(f"Checking {len(servers)} Hetzner {display_name} servers for deletion")
     
+    # Collect every queued server first, then drain the queue in one parallel batch
+    queued = []
     for server in servers:
         try:
             server_ip = str(server.public_net.ipv4.ip)
@@ -158,26 +242,28 @@ def hetzner_check_delete(instance_config=None):
             # Check if this server's IP is in the delete or restart queue
             if server_ip in delete_queue or server_ip in restart_queue:
                 logger.info(f"Found server {server.id} with IP {server_ip} in deletion queue - deleting now")
-                
-                # Attempt to delete the server
-                delete_result = delete_proxy(server, instance_config)
-                
-                if delete_result:
-                    logger.info(f"Successfully destroyed Hetzner {display_name} server -> {server_ip}")
-                    
-                    # Remove from queues upon successful deletion
-                    if server_ip in delete_queue:
-                        delete_queue.remove(server_ip)
-                        logger.info(f"Removed {server_ip} from delete queue")
-                    if server_ip in restart_queue:
-                        restart_queue.remove(server_ip)
-                        logger.info(f"Removed {server_ip} from restart queue")
-                else:
-                    logger.warning(f"Failed to destroy Hetzner {display_name} server -> {server_ip}")
+                queued.append(server)
         except Exception as e:
             logger.error(f"Error processing server for deletion: {e}")
             continue
     
+    if queued:
+        for server, delete_result in delete_in_parallel(delete_proxy, queued, instance_config):
+            server_ip = str(server.public_net.ipv4.ip)
+            if delete_result:
+                logger.info(f"Successfully destroyed Hetzner {display_name} server -> {server_ip}")
+                
+                # Remove from queues upon successful deletion
+                if server_ip in delete_queue:
+                    delete_queue.remove(server_ip)
+                    logger.info(f"Removed {server_ip} from delete queue")
+                if server_ip in restart_queue:
+                    restart_queue.remove(server_ip)
+                    logger.info(f"Removed {server_ip} from restart queue")
+            else:
+                logger.warning(f"Failed to destroy Hetzner {display_name} server -> {server_ip}")
+        inventory.invalidate()
+    
     # Report on any IPs that remain in the queues but weren't found
     remaining_delete = [ip for ip in delete_queue if any(ip == str(s.public_net.ipv4.ip) for s in servers)]
     if remaining_delete:
@@ -196,8 +282,18 @@ def hetzner_start(instance_config=None):
     """
     if instance_config is None:
         instance_config = config["providers"]["hetzner"]["instances"]["default"]
+    
+    # Shared server snapshot, only re-listed after a phase mutates the provider
+    inventory = Inventory(list_proxies, instance_config)
         
-    hetzner_check_delete(instance_config)
-    hetzner_deployment(instance_config["scaling"]["min_scaling"], instance_config)
-    ip_ready = hetzner_check_alive(instance_config)
+    hetzner_check_delete(instance_config, inventory)
+    instance_name = next(
+        (name for name, inst in config["providers"]["hetzner"]["instances"].items()
+         if inst == instance_config),
+        "default"
+    )
+    # Includes surge replacements for aged servers when surge recycling is on
+    target = rolling_manager.surge_target("hetzner", instance_name, instance_config["scaling"]["min_scaling"])
+    hetzner_deployment(target, instance_config, inventory)
+    ip_ready = hetzner_check_alive(instance_config, inventory)
     return ip_ready
@@ -0,0 +1,98 @@
+"""
+Per-tick provider inventory snapshots for CloudProxy.
+
+A scheduler tick runs several phases (delete queue, health checks, scaling)
+against the same provider instance. Each phase used to list the provider's
+proxies itself, costing several list API calls per tick. An Inventory is
+fetched once and shared between the phases, and is only refreshed after a
+phase has mutated the provider (created, deleted or stopped proxies).
+
+When an instance has more proxies than it needs, pick_surplus() chooses the
+ones to delete from the snapshot: failing proxies first, then the oldest,
+never one held by an exclusive lease.
+"""
+
+import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from cloudproxy.providers.health import health_store
+from cloudproxy.providers.leases import lease_store
+
+
+class Inventory:
+    """Lazily fetched snapshot of the proxies of one provider instance."""
+
+    def __init__(self, lister: Callable[[Dict], List[Any]], instance_config: Optional[Dict] = None):
+        """
+        Args:
+            lister: Provider list function, called as lister(instance_config)
+            instance_config: The specific instance configuration
+        """
+        self._lister = lister
+        self._instance_config = instance_config
+        self._items: Optional[List[Any]] = None
+        self.fetches = 0
+
+    def get(self) -> List[Any]:
+        """Return the snapshot, listing the provider if it is stale."""
+        if self._items is None:
+            self._items = self._lister(self._instance_config)
+            self.fetches += 1
+        return self._items
+
+    def invalidate(self):
+        """Mark the snapshot stale after the provider has been mutated."""
+        self._items = None
+
+    @property
+    def stale(self) -> bool:
+        return self._items is None
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __len__(self):
+        return len(self.get())
+
+
+def pick_surplus(
+    proxies: List[Any],
+    count: int,
+    ip_of: Callable[[Any], Optional[str]],
+    created_of: Callable[[Any], Optional[datetime.datetime]],
+) -> List[Any]:
+    """
+    Choose the proxies to delete when an instance has count too many.
+
+    Proxies whose latest health probe failed go first, then the oldest,
+    which are the closest to being recycled anyway. Proxies held by an
+    exclusive lease are kept, so fewer than count may be returned, the
+    rest is deleted on a later tick once their leases ended.
+
+    Args:
+        proxies: The instance's proxies, as listed by the provider
+        count: Number of proxies to delete
+        ip_of: Returns a proxy's public IP, None if it has none yet
+        created_of: Returns when a proxy was created, None if unknown
+
+    Returns:
+        list: The proxies to delete, at most count
+    """
+    if count <= 0:
+        return []
+    leased = lease_store.leased_ips()
+
+    def rank(proxy):
+        ip = ip_of(proxy)
+        result = health_store.get(ip) if ip else None
+        failing = result is not None and result["alive"] is False
+        try:
+            created = created_of(proxy)
+            age = created.timestamp() if created is not None else 0.0
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Unknown creation times sort as oldest
+            age = 0.0
+        return not failing, age
+
+    candidates = [proxy for proxy in proxies if ip_of(proxy) not in leased]
+    return sorted(candidates, key=rank)[:count]
@@ -0,0 +1,171 @@
+"""
+Exclusive proxy leases.
+
+Workers that each call GET /random often receive the same proxy and trip
+per-IP rate limits on their targets. A lease checks proxies out exclusively
+for a TTL: leased proxies are not handed out by /random, /proxies/sample or
+/sticky until the lease is released or expires, and the rolling manager
+does not recycle them while they are leased.
+
+Leases are held in memory, indexed by lease ID and by IP, with a heap of
+expiry times. Expired leases are dropped lazily by the next call that
+touches the store, so acquiring, releasing and expiring a lease cost
+O(log n) in the number of leases, plus O(count) to draw the proxies.
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.registry import ProxyEntry, ProxyRegistry
+
+
+def lease_config() -> Dict:
+    return settings.config.get("leases", {})
+
+
+def lease_ttl(ttl: Optional[int] = None) -> int:
+    """The requested TTL in seconds, LEASE_DEFAULT_TTL if unset, capped at LEASE_MAX_TTL."""
+    config = lease_config()
+    if ttl is None:
+        ttl = config.get("default_ttl", 300)
+    max_ttl = config.get("max_ttl", 0)
+    if max_ttl > 0:
+        ttl = min(ttl, max_ttl)
+    return max(int(ttl), 1)
+
+
+@dataclass
+class Lease:
+    """Proxies checked out together until expires_at."""
+    id: str
+    proxies: List[ProxyEntry]
+    created_at: float
+    expires_at: float
+
+    @property
+    def ttl(self) -> int:
+        return round(self.expires_at - self.created_at)
+
+
+class _Unavailable:
+    """Read-only union of excluded and leased IPs, without copying either."""
+
+    def __init__(self, exclude: Collection[str], leased: Dict[str, str]):
+        self.exclude = exclude
+        self.leased = leased
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.leased or ip in self.exclude
+
+    def __len__(self) -> int:
+        return len(self.exclude) + len(self.leased)
+
+
+class LeaseStore:
+    """Thread-safe in-memory index of proxy leases."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases: Dict[str, Lease] = {}
+        # IP -> ID of the lease holding it
+        self._by_ip: Dict[str, str] = {}
+        # (expires_at, lease ID), soonest first
+        self._expiry: List[Tuple[float, str]] = []
+        self.expired = 0
+
+    def _expire(self, now: float):
+        # Caller holds the lock
+        while self._expiry and self._expiry[0][0] <= now:
+            _, lease_id = heapq.heappop(self._expiry)
+            if self._drop(lease_id) is not None:
+                self.expired += 1
+
+    def _drop(self, lease_id: str) -> Optional[Lease]:
+        # Caller holds the lock
+        lease = self._leases.pop(lease_id, None)
+        if lease is not None:
+            for entry in lease.proxies:
+                self._by_ip.pop(entry.ip, None)
+        return lease
+
+    def acquire(self, pool: ProxyRegistry, count: int = 1, ttl: Optional[int] = None,
+                exclude: Collection[str] = (),
+                instances: Optional[Collection[Tuple[str, str]]] = None) -> Optional[Lease]:
+        """
+        Lease count distinct proxies that are not already leased.
+
+        Args:
+            pool: The proxy registry
+            count: Number of proxies to lease
+            ttl: Seconds until the lease expires, None for LEASE_DEFAULT_TTL
+            exclude: IPs that may not be leased, e.g. the delete and restart queues
+            instances: Only lease from these (provider, instance) pairs, None for all
+
+        Returns:
+            Lease: The new lease, or None if fewer than count proxies are available
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entries = pool.sample_distinct(count, exclude=_Unavailable(exclude, self._by_ip), instances=instances)
+            if len(entries) < count:
+                return None
+            lease = Lease(uuid.uuid4().hex, entries, now, now + lease_ttl(ttl))
+            self._leases[lease.id] = lease
+            for entry in entries:
+                self._by_ip[entry.ip] = lease.id
+            heapq.heappush(self._expiry, (lease.expires_at, lease.id))
+            return lease
+
+    def release(self, lease_id: str) -> Optional[Lease]:
+        """
+        Return a lease's proxies to the pool.
+
+        Returns:
+            Lease: The released lease, or None if it does not exist or has expired
+        """
+        with self._lock:
+            self._expire(time.time())
+            lease = self._drop(lease_id)
+            # Released leases leave their heap entry behind, compact once most entries are stale
+            if len(self._expiry) > 2 * len(self._leases) + 64:
+                self._expiry = [(held.expires_at, held.id) for held in self._leases.values()]
+                heapq.heapify(self._expiry)
+            return lease
+
+    def get(self, lease_id: str) -> Optional[Lease]:
+        with self._lock:
+            self._expire(time.time())
+            return self._leases.get(lease_id)
+
+    def leased(self, ip: str) -> bool:
+        """Whether a proxy is held by an unexpired lease."""
+        with self._lock:
+            self._expire(time.time())
+            return ip in self._by_ip
+
+    def leased_ips(self) -> Set[str]:
+        with self._lock:
+            self._expire(time.time())
+            return set(self._by_ip)
+
+    def leases(self) -> List[Lease]:
+        """Unexpired leases, soonest expiry first."""
+        with self._lock:
+            self._expire(time.time())
+            return sorted(self._leases.values(), key=lambda lease: lease.expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._leases.clear()
+            self._by_ip.clear()
+            self._expiry.clear()
+            self.expired = 0
+
+
+lease_store = LeaseStore()
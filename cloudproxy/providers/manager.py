@@ -1,6 +1,18 @@
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from loguru import logger
 from cloudproxy.providers import settings
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.registry import proxy_registry
+from cloudproxy.providers.scheduler import (
+    instance_interval,
+    job_id,
+    reconcile_triggers,
+    record_skipped_run,
+    timed_tick,
+)
+from cloudproxy.providers.versioned import IPList
 from cloudproxy.providers.aws.main import aws_start
 from cloudproxy.providers.gcp.main import gcp_start
 from cloudproxy.providers.digitalocean.main import do_start
@@ -14,7 +26,9 @@ def do_manager(instance_name="default"):
     """
     instance_config = settings.config["providers"]["digitalocean"]["instances"][instance_name]
     ip_list = do_start(instance_config)
-    settings.config["providers"]["digitalocean"]["instances"][instance_name]["ips"] = [ip for ip in ip_list]
+    ips = IPList(ip_list)
+    settings.config["providers"]["digitalocean"]["instances"][instance_name]["ips"] = ips
+    proxy_registry.sync_instance("digitalocean", instance_name, ips, instance_config.get("display_name"))
     return ip_list
 
 
@@ -24,7 +38,9 @@ def aws_manager(instance_name="default"):
     """
     instance_config = settings.config["providers"]["aws"]["instances"][instance_name]
     ip_list = aws_start(instance_config)
-    settings.config["providers"]["aws"]["instances"][instance_name]["ips"] = [ip for ip in ip_list]
+    ips = IPList(ip_list)
+    settings.config["providers"]["aws"]["instances"][instance_name]["ips"] = ips
+    proxy_registry.sync_instance("aws", instance_name, ips, instance_config.get("display_name"))
     return ip_list
 
 
@@ -34,7 +50,9 @@ def gcp_manager(instance_name="default"):
     """
     instance_config = settings.config["providers"]["gcp"]["instances"][instance_name]
     ip_list = gcp_start(instance_config)
-    settings.config["providers"]["gcp"]["instances"][instance_name]["ips"] = [ip for ip in ip_list]
+    ips = IPList(ip_list)
+    settings.config["providers"]["gcp"]["instances"][instance_name]["ips"] = ips
+    proxy_registry.sync_instance("gcp", instance_name, ips, instance_config.get("display_name"))
     return ip_list
 
 
@@ -44,7 +62,9 @@ def hetzner_manager(instance_name="default"):
     """
     instance_config = settings.config["providers"]["hetzner"]["instances"][instance_name]
     ip_list = hetzner_start(instance_config)
-    settings.config["providers"]["hetzner"]["instances"][instance_name]["ips"] = [ip for ip in ip_list]
+    ips = IPList(ip_list)
+    settings.config["providers"]["hetzner"]["instances"][instance_name]["ips"] = ips
+    proxy_registry.sync_instance("hetzner", instance_name, ips, instance_config.get("display_name"))
     return ip_list
 
 
@@ -54,13 +74,31 @@ def vultr_manager(instance_name="default"):
     """
     instance_config = settings.config["providers"]["vultr"]["instances"][instance_name]
     ip_list = vultr_start(instance_config)
-    settings.config["providers"]["vultr"]["instances"][instance_name]["ips"] = [ip for ip in ip_list]
+    ips = IPList(ip_list)
+    settings.config["providers"]["vultr"]["instances"][instance_name]["ips"] = ips
+    proxy_registry.sync_instance("vultr", instance_name, ips, instance_config.get("display_name"))
     return ip_list
 
 
+scheduler = None
+
+
 def init_schedule():
-    sched = BackgroundScheduler()
+    global scheduler
+    sched_config = settings.config["scheduler"]
+    sched = BackgroundScheduler(
+        executors={"default": ThreadPoolExecutor(max_workers=sched_config["workers"])},
+        job_defaults={
+            # Never run two ticks of one instance at once, and run a backlog of
+            # missed ticks only once
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": sched_config["misfire_grace_time"],
+        },
+    )
+    sched.add_listener(record_skipped_run, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
     sched.start()
+    scheduler = sched
     
     # Define provider manager mapping
     provider_managers = {
@@ -88,7 +126,29 @@ def init_schedule():
                     # Preserve the original function name for testing
                     scheduled_func.__name__ = manager_func.__name__
                     
-                    sched.add_job(scheduled_func, "interval", seconds=20)
-                    logger.info(f"{provider_name.capitalize()} {instance_name} enabled")
+                    job = job_id(provider_name, instance_name)
+                    interval = instance_interval(instance_config)
+                    sched.add_job(
+                        timed_tick(job, scheduled_func),
+                        "interval",
+                        seconds=interval,
+                        jitter=sched_config["jitter"] or None,
+                        id=job,
+                        name=job,
+                        replace_existing=True,
+                    )
+                    logger.info(f"{provider_name.capitalize()} {instance_name} enabled, reconciling every {interval}s")
             else:
                 logger.info(f"{provider_name.capitalize()} {instance_name} not enabled")
+
+    # Probe every known proxy between provider ticks
+    if any(
+        instance_config["enabled"]
+        for provider_name, provider_config in settings.config["providers"].items()
+        if provider_name in provider_managers
+        for instance_config in provider_config["instances"].values()
+    ):
+        health_monitor.start()
+
+    # API handlers can now pull these jobs forward
+    reconcile_triggers.attach(sched)
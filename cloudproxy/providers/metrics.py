@@ -0,0 +1,278 @@
+"""
+In-process metrics, exported in the Prometheus text format on GET /metrics.
+
+The pool's health used to be inferred from log lines. Counters and
+histograms are now recorded where the work happens: scheduler ticks, health
+probes, provider API calls and rolling deployment decisions. Each one costs
+a lock and a few additions per observation, no sample is kept. State that
+already exists elsewhere (the pool, the queues, the rolling deployment
+sets) is read when /metrics is scraped instead of being mirrored here.
+
+The exposition format is written directly, there is no client library.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.tracing import span
+
+# Upper bounds in seconds
+TICK_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300)
+PROBE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+API_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+# Set while a provider_call function runs in this thread
+_calls = threading.local()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return _escape(value).replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(name suffix, extra label names, label values, value) of every sample."""
+        raise NotImplementedError
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, extra, values, value in self._samples():
+            labels = _format_labels(self.labels + tuple(extra), values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set, named with its _total suffix."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield "", (), labels, value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Metric):
+    """Current value per label set, usually filled in when /metrics is scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def add(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield "", (), labels, value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    """Observation counts per bucket, with their sum, per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = API_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Label values -> [count per bucket, not cumulative, ..., sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            return int(sum(self._values.get(labels, [0])[:-1]))
+
+    def _samples(self):
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", ("le",), labels + (_format_value(bound),), cumulative
+            yield "_sum", (), labels, counts[-1]
+            yield "_count", (), labels, cumulative
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+tick_duration = Histogram(
+    "cloudproxy_tick_duration_seconds",
+    "Duration of scheduler ticks, per job (<provider>-<instance> or health-monitor)",
+    ("job",), TICK_BUCKETS,
+)
+tick_phase_duration = Histogram(
+    "cloudproxy_tick_phase_duration_seconds",
+    "Duration of the phases of scheduler ticks, per job and phase function (e.g. aws_check_alive)",
+    ("job", "phase"), TICK_BUCKETS,
+)
+probe_duration = Histogram(
+    "cloudproxy_probe_duration_seconds",
+    "Duration of proxy health probes, by result",
+    ("result",), PROBE_BUCKETS,
+)
+provider_api_duration = Histogram(
+    "cloudproxy_provider_api_duration_seconds",
+    "Duration of provider API calls, the count is the number of calls",
+    ("provider", "operation"), API_BUCKETS,
+)
+provider_api_errors = Counter(
+    "cloudproxy_provider_api_errors_total",
+    "Provider API calls that raised, plus failed items of batch calls",
+    ("provider", "operation"),
+)
+rolling_recycles = Counter(
+    "cloudproxy_rolling_recycles_total",
+    "Rolling deployment recycling decisions: started, blocked by the instance's rules, deferred by the disruption budget, or completed",
+    ("provider", "instance", "outcome"),
+)
+
+REGISTRY: List[Metric] = [tick_duration, tick_phase_duration, probe_duration, provider_api_duration, provider_api_errors, rolling_recycles]
+
+
+def provider_call(provider: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording a provider API function's calls, duration and errors.
+
+    The operation label is the function's name. Calls made during a tick are
+    also traced, as a span named "<provider>.<operation>". A decorated
+    function called by another one, e.g. delete_proxy delegating to
+    delete_proxies, is part of the outer call and is not recorded again.
+
+    Args:
+        provider: The provider name, e.g. "aws"
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        operation = func.__name__
+        name = f"{provider}.{operation}"
+
+        @wraps(func)
+        def call(*args, **kwargs):
+            if getattr(_calls, "active", False):
+                return func(*args, **kwargs)
+            _calls.active = True
+            started = time.monotonic()
+            try:
+                with span(name):
+                    result = func(*args, **kwargs)
+            except Exception:
+                provider_api_errors.inc(provider, operation)
+                raise
+            finally:
+                _calls.active = False
+                provider_api_duration.observe(time.monotonic() - started, provider, operation)
+            if isinstance(result, BatchResult) and result.errors:
+                provider_api_errors.inc(provider, operation, amount=len(result.errors))
+            return result
+
+        return call
+
+    return decorator
+
+
+def exposition(*extra: Metric) -> str:
+    """
+    Every registered metric, then extra, in the Prometheus text format.
+
+    Args:
+        *extra: Metrics built for this scrape, e.g. gauges of the current pool
+
+    Returns:
+        str: The exposition, ending with a newline
+    """
+    lines = []
+    for metric in list(REGISTRY) + list(extra):
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+def clear():
+    for metric in REGISTRY:
+        metric.clear()
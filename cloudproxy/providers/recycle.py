@@ -0,0 +1,149 @@
+"""
+Jittered age-limit recycle schedule.
+
+A scale-up creates its proxies within seconds of each other, so with a fixed
+AGE_LIMIT they all cross the limit in the same tick and are recycled
+together: a burst of provider API calls and a drop in capacity, repeating
+every AGE_LIMIT seconds. With AGE_LIMIT_JITTER set, each proxy gets its own
+lifetime of between (1 - jitter) * AGE_LIMIT and AGE_LIMIT the first time a
+tick sees it. Lifetimes are assigned along a golden-ratio sequence per
+provider instance, so any run of proxies registered together lands spread
+evenly across the jitter window rather than clustered the way random
+offsets would. No proxy ever outlives AGE_LIMIT.
+
+The schedule also serves the planned recycle timeline to the API.
+"""
+
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cloudproxy.providers import settings
+
+# Fractional part of the golden ratio, the step of the low-discrepancy sequence
+GOLDEN_STEP = 0.6180339887498949
+
+# (provider, instance)
+InstanceKey = Tuple[str, str]
+
+
+def age_limit_jitter() -> float:
+    """The AGE_LIMIT_JITTER fraction, clamped to [0, 1]."""
+    jitter = settings.config.get("age_limit_jitter", 0)
+    return min(max(float(jitter), 0.0), 1.0)
+
+
+class RecycleSchedule:
+    """Thread-safe planned expiry of every proxy under an age limit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Per instance: proxy key -> {"offset", "created", "ip"}
+        self._proxies: Dict[InstanceKey, Dict[str, Dict]] = {}
+        self._counters: Dict[InstanceKey, int] = {}
+        self._age_limits: Dict[InstanceKey, int] = {}
+
+    def _register(self, instance_key: InstanceKey, key: str, created: datetime.datetime,
+                  ip: Optional[str]) -> Dict:
+        # Caller holds the lock
+        proxies = self._proxies.setdefault(instance_key, {})
+        if key not in proxies:
+            count = self._counters.get(instance_key, 0)
+            self._counters[instance_key] = count + 1
+            proxies[key] = {"offset": (count * GOLDEN_STEP) % 1.0, "created": created, "ip": ip}
+        elif ip:
+            proxies[key]["ip"] = ip
+        return proxies[key]
+
+    @staticmethod
+    def lifetime(offset: float, age_limit: int) -> float:
+        """Seconds a proxy at the given offset in the jitter window may live."""
+        return age_limit * (1.0 - age_limit_jitter() * offset)
+
+    def expired(self, provider: str, instance: str, key: str, elapsed: datetime.timedelta,
+                age_limit: int, ip: Optional[str] = None) -> bool:
+        """
+        Whether a proxy has reached its planned recycle time.
+
+        Args:
+            provider: The provider name
+            instance: The provider instance name
+            key: Stable identifier of the proxy, e.g. its server ID
+            elapsed: Time since the proxy was created
+            age_limit: The AGE_LIMIT in seconds, 0 or less disables recycling
+            ip: The proxy's IP address, if it has one yet
+
+        Returns:
+            bool: True if the proxy should be recycled
+        """
+        if age_limit <= 0:
+            return False
+        instance_key = (provider, instance)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            self._age_limits[instance_key] = age_limit
+            entry = self._register(instance_key, str(key), now - elapsed, ip)
+            return elapsed > datetime.timedelta(seconds=self.lifetime(entry["offset"], age_limit))
+
+    def retain(self, provider: str, instance: str, keys: Iterable[str]):
+        """
+        Forget proxies of an instance that no longer exist.
+
+        Args:
+            provider: The provider name
+            instance: The provider instance name
+            keys: Identifiers of the instance's current proxies
+        """
+        keep = {str(key) for key in keys}
+        with self._lock:
+            proxies = self._proxies.get((provider, instance), {})
+            for key in [key for key in proxies if key not in keep]:
+                del proxies[key]
+
+    def timeline(self, provider: Optional[str] = None, instance: Optional[str] = None,
+                 within: Optional[int] = None) -> List[Dict]:
+        """
+        Planned recycles, soonest first.
+
+        Args:
+            provider: Only include this provider
+            instance: Only include this provider instance
+            within: Only include recycles due in this many seconds
+
+        Returns:
+            list: One dict per proxy with its planned expiry
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        planned = []
+        with self._lock:
+            for (entry_provider, entry_instance), proxies in self._proxies.items():
+                if provider is not None and entry_provider != provider:
+                    continue
+                if instance is not None and entry_instance != instance:
+                    continue
+                age_limit = self._age_limits.get((entry_provider, entry_instance), 0)
+                for key, entry in proxies.items():
+                    lifetime = self.lifetime(entry["offset"], age_limit)
+                    expires_at = entry["created"] + datetime.timedelta(seconds=lifetime)
+                    remaining = (expires_at - now).total_seconds()
+                    if within is not None and remaining > within:
+                        continue
+                    planned.append({
+                        "provider": entry_provider,
+                        "instance": entry_instance,
+                        "id": key,
+                        "ip": entry["ip"],
+                        "created_at": entry["created"],
+                        "expires_at": expires_at,
+                        "seconds_remaining": max(remaining, 0.0),
+                    })
+        return sorted(planned, key=lambda item: item["expires_at"])
+
+    def clear(self):
+        with self._lock:
+            self._proxies.clear()
+            self._counters.clear()
+            self._age_limits.clear()
+
+
+recycle_schedule = RecycleSchedule()
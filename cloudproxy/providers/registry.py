@@ -0,0 +1,436 @@
+"""
+Indexed registry of the proxies CloudProxy is serving.
+
+The proxy listing endpoints used to walk every provider instance in the
+config, check each IP against the delete and restart queues and build a
+model per IP on every request, only to return one page of it. The registry
+keeps the proxies indexed by IP and by provider instance, and is updated
+incrementally: the managers push each instance's new IP list after a tick,
+and sync() picks up any other change to an instance's "ips" list by
+comparing the list's identity and version, which costs one check per
+instance rather than one per IP. The managers store IPLists, which count
+their in-place edits; a plain list put in the config by other code is
+compared by its contents instead. The config is never written to. Queued
+proxies are excluded at read time, since the queues only ever hold a
+handful of IPs. Every proxy added to or removed
+from the index is published to the pool change feed.
+
+For sticky sessions the registry also keeps a consistent hash ring: every
+proxy owns RING_REPLICAS points on a 64-bit ring and a session key maps to
+the first proxy clockwise from its own hash. Adding or removing a proxy only
+moves the keys on its own arcs, about 1/n of them, and a lookup is a binary
+search. The ring is rebuilt from each proxy's cached points on the first
+lookup after the pool changed, so a sync never pays for it.
+"""
+
+import hashlib
+import random
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+from cloudproxy.providers.changes import change_feed
+from cloudproxy.providers.versioned import IPList
+
+# Source of a list of IPs: (provider, instance, legacy top-level list)
+SourceKey = Tuple[str, str, bool]
+
+# Points per proxy on the consistent hash ring, more points even out the arcs
+RING_REPLICAS = 64
+
+
+def _signature(ips: List[str], display_name: Optional[str]) -> Tuple:
+    """What sync() compares to tell whether an IP list changed since it was indexed."""
+    # An IPList counts its edits, a plain list has to be compared by contents
+    version = ips.version if isinstance(ips, IPList) else tuple(ips)
+    return ips, version, display_name
+
+
+def _ring_hash(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+@dataclass(frozen=True)
+class ProxyEntry:
+    """A proxy served by one provider instance."""
+    ip: str
+    provider: str
+    instance: str
+    display_name: Optional[str] = None
+
+
+class ProxyRegistry:
+    """Thread-safe index of proxies by IP, provider and instance."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Listing order, insertion ordered
+        self._entries: Dict[str, ProxyEntry] = {}
+        # Dense IP array for O(1) random selection, with each IP's position
+        self._ips: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # Number of sources listing each IP
+        self._refs: Dict[str, int] = {}
+        self._sources: Dict[SourceKey, List[str]] = {}
+        self._signatures: Dict[SourceKey, Tuple] = {}
+        # Serving order for the selection strategies: a round-robin cursor
+        # into the dense array, and IPs from least to most recently served
+        self._cursor = 0
+        self._served: "OrderedDict[str, None]" = OrderedDict()
+        # Consistent hash ring for sticky sessions, as parallel sorted lists
+        self._points: Dict[str, List[int]] = {}
+        self._ring_hashes: List[int] = []
+        self._ring_ips: List[str] = []
+        self._ring_stale = False
+        # Listing cursors: every proxy gets an increasing sequence number when
+        # added, kept in an append-only list that is compacted as it fills
+        # with removed proxies
+        self._sequence = 0
+        self._seqs: Dict[str, int] = {}
+        self._order: List[int] = []
+        self._order_ips: List[str] = []
+        self.syncs = 0
+
+    def _add(self, entry: ProxyEntry):
+        # Caller holds the lock
+        self._refs[entry.ip] = self._refs.get(entry.ip, 0) + 1
+        if entry.ip in self._entries:
+            return
+        self._entries[entry.ip] = entry
+        self._positions[entry.ip] = len(self._ips)
+        self._ips.append(entry.ip)
+        # Never served, so first in line
+        self._served[entry.ip] = None
+        self._served.move_to_end(entry.ip, last=False)
+        change_feed.publish("add", entry.ip, provider=entry.provider, instance=entry.instance)
+        self._points[entry.ip] = [_ring_hash(f"{entry.ip}#{replica}") for replica in range(RING_REPLICAS)]
+        self._ring_stale = True
+        self._sequence += 1
+        self._seqs[entry.ip] = self._sequence
+        self._order.append(self._sequence)
+        self._order_ips.append(entry.ip)
+
+    def _remove(self, ip: str):
+        # Caller holds the lock
+        self._refs[ip] -= 1
+        if self._refs[ip] > 0:
+            return
+        del self._refs[ip]
+        entry = self._entries.pop(ip)
+        change_feed.publish("remove", ip, provider=entry.provider, instance=entry.instance)
+        del self._served[ip]
+        del self._points[ip]
+        self._ring_stale = True
+        del self._seqs[ip]
+        if len(self._order) > 2 * len(self._seqs) + 64:
+            live = [(seq, order_ip) for seq, order_ip in zip(self._order, self._order_ips)
+                    if self._seqs.get(order_ip) == seq]
+            self._order = [seq for seq, _ in live]
+            self._order_ips = [order_ip for _, order_ip in live]
+        # Swap the last IP into the freed slot
+        position = self._positions.pop(ip)
+        last = self._ips.pop()
+        if last != ip:
+            self._ips[position] = last
+            self._positions[last] = position
+
+    def _set_source(self, key: SourceKey, ips: List[str], display_name: Optional[str]):
+        # Caller holds the lock
+        provider, instance, _ = key
+        old = self._sources.get(key, [])
+        new = list(dict.fromkeys(ips))
+        if old == new and all(self._entries[ip].display_name == display_name for ip in new):
+            return
+        # Add before removing, so proxies listed before and after keep their place
+        for ip in new:
+            self._add(ProxyEntry(ip, provider, instance, display_name))
+        for ip in old:
+            self._remove(ip)
+        for ip in new:
+            entry = self._entries[ip]
+            if (entry.provider, entry.instance) == (provider, instance) and entry.display_name != display_name:
+                self._entries[ip] = ProxyEntry(ip, provider, instance, display_name)
+        if new:
+            self._sources[key] = new
+        else:
+            self._sources.pop(key, None)
+        self.syncs += 1
+
+    def sync_instance(self, provider: str, instance: str, ips: List[str],
+                      display_name: Optional[str] = None, legacy: bool = False):
+        """
+        Replace the IPs served by one provider instance.
+
+        Args:
+            provider: The provider name
+            instance: The instance name
+            ips: The instance's current IP list, as stored in the config
+            display_name: The instance's display name
+            legacy: Whether ips is the provider's top-level "ips" list
+        """
+        key = (provider, instance, legacy)
+        with self._lock:
+            self._set_source(key, ips, display_name)
+            self._signatures[key] = _signature(ips, display_name)
+
+    def sync(self, config: Dict):
+        """
+        Pick up IP lists that were replaced or edited in the config.
+
+        Args:
+            config: The CloudProxy config dict
+        """
+        with self._lock:
+            seen = set()
+            for provider, provider_config in config["providers"].items():
+                instances = provider_config.get("instances", {})
+                default_ips = instances.get("default", {}).get("ips")
+                # The top-level list of the default instance, kept for backward compatibility
+                if "ips" in provider_config and provider_config["ips"] is not default_ips:
+                    seen.add((provider, "default", True))
+                    self._sync_source(
+                        (provider, "default", True),
+                        provider_config["ips"],
+                        provider_config.get("display_name", provider),
+                    )
+                for instance, instance_config in instances.items():
+                    if "ips" in instance_config:
+                        seen.add((provider, instance, False))
+                        self._sync_source(
+                            (provider, instance, False),
+                            instance_config["ips"],
+                            instance_config.get("display_name"),
+                        )
+            for key in [key for key in self._sources if key not in seen]:
+                self._set_source(key, [], None)
+                self._signatures.pop(key, None)
+
+    def _sync_source(self, key: SourceKey, ips: List[str], display_name: Optional[str]):
+        # Caller holds the lock
+        signature = _signature(ips, display_name)
+        previous = self._signatures.get(key)
+        if previous is not None and previous[0] is ips and previous[1:] == signature[1:]:
+            return
+        self._set_source(key, ips, display_name)
+        self._signatures[key] = signature
+
+    def get(self, ip: str) -> Optional[ProxyEntry]:
+        with self._lock:
+            return self._entries.get(ip)
+
+    def count(self, exclude: Collection[str] = ()) -> int:
+        """Number of proxies, not counting the IPs in exclude."""
+        with self._lock:
+            return len(self._entries) - sum(1 for ip in set(exclude) if ip in self._entries)
+
+    def page(self, offset: int = 0, limit: Optional[int] = None,
+             exclude: Collection[str] = ()) -> List[ProxyEntry]:
+        """
+        One page of the proxy listing.
+
+        Args:
+            offset: Number of proxies to skip
+            limit: Maximum number of proxies to return, None for all
+            exclude: IPs to leave out, e.g. the delete and restart queues
+
+        Returns:
+            list: The proxies on the page, in listing order
+        """
+        with self._lock:
+            entries: Iterator[ProxyEntry] = (
+                entry for entry in self._entries.values() if entry.ip not in exclude
+            )
+            stop = None if limit is None else offset + limit
+            return list(islice(entries, offset, stop))
+
+    def after(self, cursor: int = 0, limit: int = 100,
+              exclude: Collection[str] = ()) -> Tuple[List[ProxyEntry], Optional[int]]:
+        """
+        The proxies listed after a cursor, in listing order.
+
+        Unlike offsets, cursors stay valid while proxies are added and removed:
+        a page starts right after the last proxy of the previous page, whether
+        or not proxies before it were removed since.
+
+        Args:
+            cursor: The cursor of the last proxy already seen, 0 to start
+            limit: Maximum number of proxies to return
+            exclude: IPs to leave out
+
+        Returns:
+            tuple: (proxies, cursor for the next page or None if this was the last one)
+        """
+        with self._lock:
+            entries = []
+            for index in range(bisect_right(self._order, cursor), len(self._order)):
+                ip = self._order_ips[index]
+                if self._seqs.get(ip) != self._order[index] or ip in exclude:
+                    continue
+                if len(entries) == limit:
+                    return entries, self._seqs[entries[-1].ip]
+                entries.append(self._entries[ip])
+            return entries, None
+
+    def cursor_of(self, ip: str) -> Optional[int]:
+        """The cursor continuing the listing after a proxy."""
+        with self._lock:
+            return self._seqs.get(ip)
+
+    def random(self, exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+        """
+        A uniformly random proxy not in exclude.
+
+        Returns:
+            ProxyEntry: The chosen proxy, or None if there is none available
+        """
+        with self._lock:
+            if not self._ips:
+                return None
+            # Excluded IPs are rare, so a few draws from the dense array almost always hit
+            for _ in range(8):
+                ip = random.choice(self._ips)
+                if ip not in exclude:
+                    return self._entries[ip]
+            available = [ip for ip in self._ips if ip not in exclude]
+            if not available:
+                return None
+            return self._entries[random.choice(available)]
+
+    def sample(self, count: int, exclude: Collection[str] = ()) -> List[ProxyEntry]:
+        """
+        Up to count uniformly random proxies not in exclude, possibly repeated.
+
+        Args:
+            count: Number of draws
+            exclude: IPs to leave out
+
+        Returns:
+            list: The drawn proxies, empty if there is none available
+        """
+        with self._lock:
+            drawn = []
+            for _ in range(count):
+                entry = self.random(exclude)
+                if entry is None:
+                    break
+                drawn.append(entry)
+            return drawn
+
+    def sample_distinct(self, count: int, exclude: Collection[str] = (),
+                        instances: Optional[Collection[Tuple[str, str]]] = None) -> List[ProxyEntry]:
+        """
+        Up to count distinct, uniformly random proxies not in exclude.
+
+        Draws count + len(exclude) IPs without replacement and drops the
+        excluded ones, so the cost grows with the batch size rather than the
+        pool size. Filtering by instance only walks the matching instances.
+
+        Args:
+            count: Number of proxies wanted
+            exclude: IPs to leave out
+            instances: Only draw from these (provider, instance) pairs, None for all
+
+        Returns:
+            list: The drawn proxies, fewer than count if not enough are available
+        """
+        with self._lock:
+            if instances is None:
+                population = self._ips
+            else:
+                wanted = set(instances)
+                population = list(dict.fromkeys(
+                    ip
+                    for (provider, instance, _), ips in self._sources.items()
+                    if (provider, instance) in wanted
+                    for ip in ips
+                ))
+            drawn = random.sample(population, min(len(population), count + len(exclude)))
+            return [self._entries[ip] for ip in drawn if ip not in exclude][:count]
+
+    def next_in_order(self, exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+        """The next proxy not in exclude in round-robin order."""
+        with self._lock:
+            for _ in range(len(self._ips)):
+                self._cursor %= len(self._ips)
+                ip = self._ips[self._cursor]
+                self._cursor += 1
+                if ip not in exclude:
+                    return self._entries[ip]
+            return None
+
+    def least_recent(self, exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+        """The proxy not in exclude that was served longest ago, or never."""
+        with self._lock:
+            for ip in self._served:
+                if ip not in exclude:
+                    return self._entries[ip]
+            return None
+
+    def mark_served(self, ip: str):
+        """Move a proxy to the back of the least recently served order."""
+        with self._lock:
+            if ip in self._served:
+                self._served.move_to_end(ip)
+
+    def sticky(self, key: str, exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+        """
+        The proxy a session key maps to on the consistent hash ring.
+
+        A key keeps its proxy for as long as the proxy is in the pool. If the
+        proxy is excluded, the key falls through to the next proxy on the ring
+        and returns once the proxy is available again.
+
+        Args:
+            key: The session key
+            exclude: IPs to leave out
+
+        Returns:
+            ProxyEntry: The proxy for the key, or None if there is none available
+        """
+        with self._lock:
+            if self._ring_stale:
+                ring = sorted((point, ip) for ip, points in self._points.items() for point in points)
+                self._ring_hashes = [point for point, _ in ring]
+                self._ring_ips = [ip for _, ip in ring]
+                self._ring_stale = False
+            points = len(self._ring_hashes)
+            start = bisect_right(self._ring_hashes, _ring_hash(key))
+            for offset in range(points):
+                ip = self._ring_ips[(start + offset) % points]
+                if ip not in exclude:
+                    return self._entries[ip]
+            return None
+
+    def by_instance(self, provider: str, instance: Optional[str] = None) -> List[ProxyEntry]:
+        """Proxies of one provider, or of one of its instances."""
+        with self._lock:
+            ips = []
+            for (source_provider, source_instance, _), source_ips in self._sources.items():
+                if source_provider == provider and instance in (None, source_instance):
+                    ips.extend(source_ips)
+            return [self._entries[ip] for ip in dict.fromkeys(ips)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ips.clear()
+            self._positions.clear()
+            self._refs.clear()
+            self._sources.clear()
+            self._signatures.clear()
+            self._served.clear()
+            self._cursor = 0
+            self._points.clear()
+            self._ring_hashes.clear()
+            self._ring_ips.clear()
+            self._ring_stale = False
+            self._seqs.clear()
+            self._order.clear()
+            self._order_ips.clear()
+
+
+proxy_registry = ProxyRegistry()
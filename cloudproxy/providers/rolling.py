@@ -3,14 +3,35 @@ Rolling deployment manager for CloudProxy.
 
 This module handles the logic for rolling deployments, ensuring that a minimum
 number of healthy proxies are always available during recycling operations.
+
+With ROLLING_MAX_SURGE set, recycling surges instead: aged proxies keep
+serving while up to max_surge replacements are provisioned on top of
+min_scaling, and an aged proxy is only retired once enough healthy proxies
+remain without it, so the pool never drops below min_scaling.
+
+The per-instance rules above still let every provider instance recycle a
+full batch at the same time. DisruptionBudget caps how many proxies may be
+recycling at once across the whole pool (ROLLING_MAX_DISRUPTION) and per
+provider (ROLLING_MAX_DISRUPTION_PER_PROVIDER), handing the budget to the
+oldest aged proxies first. A recycled proxy keeps its slot after it was
+deleted, until a replacement is healthy or its instance is back at
+min_scaling, since the pool is short of a proxy until then.
+
+Proxies held by an exclusive lease are not recycled until the lease is
+released or expires, unless they are dead.
 """
 
 import datetime
-from typing import List, Dict, Set, Optional, Tuple
+import threading
+from typing import Any, List, Dict, Set, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 from loguru import logger
 
+from cloudproxy.providers import settings
+from cloudproxy.providers.leases import lease_store
+from cloudproxy.providers.metrics import rolling_recycles
+
 
 class ProxyState(Enum):
     """Represents the state of a proxy in the rolling deployment process."""
@@ -40,6 +61,10 @@ class RollingDeploymentState:
     pending_recycle: Set[str] = field(default_factory=set)
     recycling: Set[str] = field(default_factory=set)
     pending: Set[str] = field(default_factory=set)
+    aged: Dict[str, float] = field(default_factory=dict)  # IP -> age in seconds, past the age limit
+    blocked: Set[str] = field(default_factory=set)  # Aged, but held back by this instance's own rules
+    replacing: Set[str] = field(default_factory=set)  # Recycled, until a replacement is healthy
+    min_scaling: Optional[int] = None  # Latest min_scaling the instance was ticked with
     last_update: datetime.datetime = field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
 
 
@@ -48,12 +73,18 @@ class RollingDeploymentManager:
     
     def __init__(self):
         self.states: Dict[Tuple[str, str], RollingDeploymentState] = {}
+        # Bumped by every state change, lets the API tell whether the status changed
+        self.version = 0
+        # Provider instances tick concurrently and share the disruption budget
+        self.lock = threading.RLock()
+        self.budget = DisruptionBudget(self)
         
     def get_state(self, provider: str, instance: str) -> RollingDeploymentState:
         """Get or create state for a provider instance."""
         key = (provider, instance)
         if key not in self.states:
             self.states[key] = RollingDeploymentState(provider=provider, instance=instance)
+            self.version += 1
         return self.states[key]
     
     def can_recycle_proxy(
@@ -86,8 +117,27 @@ class RollingDeploymentManager:
         if not rolling_enabled:
             # If rolling deployment is disabled, always allow recycling
             return True
-            
+        
+        with self.lock:
+            return self._can_recycle_proxy(
+                provider, instance, proxy_ip, total_healthy, min_available, batch_size, min_scaling
+            )
+    
+    def _can_recycle_proxy(
+        self,
+        provider: str,
+        instance: str,
+        proxy_ip: str,
+        total_healthy: int,
+        min_available: int,
+        batch_size: int,
+        min_scaling: Optional[int]
+    ) -> bool:
+        # Caller holds the lock
         state = self.get_state(provider, instance)
+        self.version += 1
+        if min_scaling is not None:
+            state.min_scaling = min_scaling
         
         # Validate configuration: min_available should not exceed min_scaling
         if min_scaling is not None and min_available >= min_scaling:
@@ -101,6 +151,16 @@ class RollingDeploymentManager:
         else:
             effective_min_available = min_available
         
+        # Leased proxies are in use by a client until the lease ends
+        if lease_store.leased(proxy_ip):
+            logger.info(
+                f"Rolling deployment: Cannot recycle {proxy_ip} for {provider}/{instance}. "
+                f"Proxy is leased"
+            )
+            state.blocked.add(proxy_ip)
+            rolling_recycles.inc(provider, instance, "blocked")
+            return False
+        
         # Check if we're already recycling too many proxies
         currently_recycling = len(state.recycling) + len(state.pending_recycle)
         if currently_recycling >= batch_size:
@@ -108,6 +168,8 @@ class RollingDeploymentManager:
                 f"Rolling deployment: Cannot recycle {proxy_ip} for {provider}/{instance}. "
                 f"Already recycling {currently_recycling}/{batch_size} proxies"
             )
+            state.blocked.add(proxy_ip)
+            rolling_recycles.inc(provider, instance, "blocked")
             return False
         
         # Check if recycling this proxy would violate minimum availability
@@ -117,11 +179,20 @@ class RollingDeploymentManager:
                 f"Rolling deployment: Cannot recycle {proxy_ip} for {provider}/{instance}. "
                 f"Would reduce available proxies below minimum ({available_after_recycle} < {effective_min_available})"
             )
+            state.blocked.add(proxy_ip)
+            rolling_recycles.inc(provider, instance, "blocked")
+            return False
+        
+        # Check the pool-wide and per-provider disruption budgets
+        state.blocked.discard(proxy_ip)
+        if not self.budget.allows(provider, instance, proxy_ip):
+            rolling_recycles.inc(provider, instance, "deferred")
             return False
             
         # Mark proxy as pending recycle
         state.pending_recycle.add(proxy_ip)
         state.healthy_proxies.discard(proxy_ip)
+        rolling_recycles.inc(provider, instance, "started")
         logger.info(
             f"Rolling deployment: Marked {proxy_ip} for recycling in {provider}/{instance}. "
             f"Currently recycling {currently_recycling + 1}/{batch_size} proxies"
@@ -130,19 +201,34 @@ class RollingDeploymentManager:
     
     def mark_proxy_recycling(self, provider: str, instance: str, proxy_ip: str):
         """Mark a proxy as actively being recycled."""
-        state = self.get_state(provider, instance)
-        state.pending_recycle.discard(proxy_ip)
-        state.recycling.add(proxy_ip)
-        state.last_update = datetime.datetime.now(datetime.timezone.utc)
+        with self.lock:
+            state = self.get_state(provider, instance)
+            self.version += 1
+            state.pending_recycle.discard(proxy_ip)
+            state.recycling.add(proxy_ip)
+            state.last_update = datetime.datetime.now(datetime.timezone.utc)
         
     def mark_proxy_recycled(self, provider: str, instance: str, proxy_ip: str):
-        """Mark a proxy as successfully recycled (deleted)."""
-        state = self.get_state(provider, instance)
-        state.pending_recycle.discard(proxy_ip)
-        state.recycling.discard(proxy_ip)
-        state.healthy_proxies.discard(proxy_ip)
-        state.pending.discard(proxy_ip)
-        state.last_update = datetime.datetime.now(datetime.timezone.utc)
+        """
+        Mark a proxy as successfully recycled (deleted).
+        
+        It keeps its disruption budget slot until a replacement is healthy,
+        unless the instance has min_scaling healthy proxies without it.
+        """
+        with self.lock:
+            state = self.get_state(provider, instance)
+            self.version += 1
+            serving = state.healthy_proxies - set(state.aged) - {proxy_ip}
+            if state.min_scaling is None or len(serving) < state.min_scaling:
+                state.replacing.add(proxy_ip)
+            state.pending_recycle.discard(proxy_ip)
+            state.recycling.discard(proxy_ip)
+            state.healthy_proxies.discard(proxy_ip)
+            state.pending.discard(proxy_ip)
+            state.aged.pop(proxy_ip, None)
+            state.blocked.discard(proxy_ip)
+            state.last_update = datetime.datetime.now(datetime.timezone.utc)
+        rolling_recycles.inc(provider, instance, "completed")
         logger.info(f"Rolling deployment: Completed recycling {proxy_ip} in {provider}/{instance}")
     
     def update_proxy_health(
@@ -150,7 +236,8 @@ class RollingDeploymentManager:
         provider: str,
         instance: str,
         healthy_ips: List[str],
-        pending_ips: List[str] = None
+        pending_ips: List[str] = None,
+        aged: Dict[str, float] = None
     ):
         """
         Update the health status of proxies for a provider instance.
@@ -160,22 +247,40 @@ class RollingDeploymentManager:
             instance: The provider instance name
             healthy_ips: List of IPs that are currently healthy
             pending_ips: List of IPs that are pending (newly created)
+            aged: Age in seconds of every proxy past the age limit, by IP
         """
-        state = self.get_state(provider, instance)
-        
-        # Update healthy proxies
-        state.healthy_proxies = set(healthy_ips)
-        
-        # Update pending proxies if provided
-        if pending_ips is not None:
-            state.pending = set(pending_ips)
+        with self.lock:
+            state = self.get_state(provider, instance)
+            self.version += 1
+            previous = state.healthy_proxies
             
-        # Clean up recycling list if proxies no longer exist
-        existing_ips = state.healthy_proxies | state.pending
-        state.recycling = state.recycling & existing_ips
-        state.pending_recycle = state.pending_recycle & existing_ips
-        
-        state.last_update = datetime.datetime.now(datetime.timezone.utc)
+            # Update healthy proxies
+            state.healthy_proxies = set(healthy_ips)
+            
+            # Update pending proxies if provided
+            if pending_ips is not None:
+                state.pending = set(pending_ips)
+            
+            if aged is not None:
+                state.aged = dict(aged)
+                state.blocked &= set(state.aged)
+                
+            # Clean up recycling list if proxies no longer exist
+            existing_ips = state.healthy_proxies | state.pending
+            state.recycling = state.recycling & existing_ips
+            state.pending_recycle = state.pending_recycle & existing_ips
+            
+            # Every proxy that turned healthy replaces one recycled proxy
+            if state.replacing:
+                serving = state.healthy_proxies - set(state.aged)
+                for _ in range(len(serving - previous)):
+                    if not state.replacing:
+                        break
+                    state.replacing.remove(min(state.replacing))
+                if state.min_scaling is not None and len(serving) >= state.min_scaling:
+                    state.replacing.clear()
+            
+            state.last_update = datetime.datetime.now(datetime.timezone.utc)
         
     def get_recycling_status(self, provider: str = None, instance: str = None) -> Dict:
         """
@@ -202,6 +307,7 @@ class RollingDeploymentManager:
                 "pending": len(state.pending),
                 "pending_recycle": len(state.pending_recycle),
                 "recycling": len(state.recycling),
+                "aged": len(state.aged),
                 "last_update": state.last_update.isoformat(),
                 "healthy_ips": list(state.healthy_proxies),
                 "pending_recycle_ips": list(state.pending_recycle),
@@ -229,11 +335,216 @@ class RollingDeploymentManager:
         """
         state = self.get_state(provider, instance)
         
-        # Total expected proxies after recycling completes
-        total_after_recycle = len(state.healthy_proxies) + len(state.pending)
+        # Total expected proxies after recycling completes, aged proxies are on their way out
+        total_after_recycle = len((state.healthy_proxies | state.pending) - set(state.aged))
         
         # We should create replacements if we'll be below min_scaling
         return total_after_recycle < min_scaling
+    
+    def surge_target(self, provider: str, instance: str, min_scaling: int) -> int:
+        """
+        Number of proxies a provider instance should run, including surge replacements.
+        
+        Args:
+            provider: The cloud provider name
+            instance: The provider instance name
+            min_scaling: Minimum number of proxies to maintain
+            
+        Returns:
+            min_scaling plus one replacement per aged proxy, capped at max surge
+        """
+        max_surge = surge_limit()
+        with self.lock:
+            state = self.get_state(provider, instance)
+            if state.min_scaling != min_scaling:
+                self.version += 1
+                state.min_scaling = min_scaling
+            if max_surge <= 0 or not state.aged:
+                return min_scaling
+            
+            surge = min(max_surge, len(state.aged))
+            if self.should_create_replacement(provider, instance, min_scaling):
+                logger.info(
+                    f"Rolling deployment: Surging {provider}/{instance} to {min_scaling + surge} proxies "
+                    f"to replace {len(state.aged)} aged proxies"
+                )
+            return min_scaling + surge
+    
+    def select_surge_retirements(
+        self,
+        provider: str,
+        instance: str,
+        aged: List[Tuple[Any, str, bool]],
+        total_healthy: int,
+        min_scaling: int
+    ) -> List[Any]:
+        """
+        Pick the aged proxies that can be deleted now without dropping below min_scaling.
+        
+        Dead aged proxies are not serving, so they are always retired. Healthy
+        ones that are not leased are retired oldest first while the healthy count stays at or above
+        min_scaling, at most ROLLING_BATCH_SIZE at a time and within the
+        disruption budget. Selected proxies are marked as recycling.
+        
+        Args:
+            provider: The cloud provider name
+            instance: The provider instance name
+            aged: (proxy, ip, alive) for every aged proxy, oldest first
+            total_healthy: Number of healthy proxies, aged ones included
+            min_scaling: Minimum number of proxies to maintain
+            
+        Returns:
+            The proxies to delete
+        """
+        batch_size = settings.config["rolling_deployment"]["batch_size"]
+        retire = []
+        with self.lock:
+            state = self.get_state(provider, instance)
+            self.version += 1
+            state.min_scaling = min_scaling
+            retiring_healthy = len(state.recycling)
+            for proxy, ip, alive in aged:
+                if not alive:
+                    retire.append(proxy)
+                elif lease_store.leased(ip):
+                    logger.info(
+                        f"Rolling deployment: Keeping aged {ip} in {provider}/{instance} until its lease ends"
+                    )
+                    state.blocked.add(ip)
+                    continue
+                elif retiring_healthy >= batch_size:
+                    logger.info(
+                        f"Rolling deployment: Deferred retiring {ip} in {provider}/{instance}, "
+                        f"already recycling {retiring_healthy}/{batch_size} proxies"
+                    )
+                    state.blocked.add(ip)
+                    continue
+                elif total_healthy - retiring_healthy - 1 < min_scaling:
+                    logger.info(
+                        f"Rolling deployment: Keeping aged {ip} in {provider}/{instance} until its "
+                        f"replacement is healthy ({total_healthy - retiring_healthy} healthy, min {min_scaling})"
+                    )
+                    state.blocked.add(ip)
+                    continue
+                else:
+                    state.blocked.discard(ip)
+                    if not self.budget.allows(provider, instance, ip):
+                        continue
+                    retiring_healthy += 1
+                    retire.append(proxy)
+                state.healthy_proxies.discard(ip)
+                state.pending_recycle.discard(ip)
+                state.recycling.add(ip)
+            if retire:
+                state.last_update = datetime.datetime.now(datetime.timezone.utc)
+        return retire
+    
+    def get_budget_status(self) -> Dict:
+        """Disruption budget consumption, pool-wide and per provider."""
+        with self.lock:
+            return self.budget.status()
+
+
+class DisruptionBudget:
+    """Pool-wide and per-provider caps on proxies being recycled at once."""
+    
+    def __init__(self, manager: RollingDeploymentManager):
+        self._manager = manager
+    
+    @staticmethod
+    def limits() -> Tuple[int, int]:
+        """(pool-wide limit, per-provider limit), 0 meaning unlimited."""
+        rolling_config = settings.config["rolling_deployment"]
+        return (
+            rolling_config.get("max_disruption", 0),
+            rolling_config.get("max_disruption_per_provider", 0),
+        )
+    
+    def _states(self, provider: Optional[str] = None) -> List[RollingDeploymentState]:
+        return [
+            state for state in self._manager.states.values()
+            if provider is None or state.provider == provider
+        ]
+    
+    def in_use(self, provider: Optional[str] = None) -> int:
+        """Number of proxies recycling or awaiting replacement, in the pool or one provider."""
+        return sum(
+            len(state.recycling | state.pending_recycle | state.replacing)
+            for state in self._states(provider)
+        )
+    
+    def _waiting(self, provider: Optional[str] = None) -> List[Tuple[float, str]]:
+        """(age, ip) of aged proxies that could be recycled next, oldest first."""
+        waiting = []
+        for state in self._states(provider):
+            in_flight = state.recycling | state.pending_recycle
+            for ip, age in state.aged.items():
+                if ip not in in_flight and ip not in state.blocked:
+                    waiting.append((age, ip))
+        return sorted(waiting, key=lambda item: (-item[0], item[1]))
+    
+    def allows(self, provider: str, instance: str, proxy_ip: str) -> bool:
+        """
+        Whether recycling proxy_ip now stays within the disruption budgets.
+        
+        Remaining budget goes to the oldest waiting proxies first, so a younger
+        proxy is refused while as many older ones are waiting as there is
+        budget left. Proxies their own instance is holding back do not wait.
+        The caller holds the manager lock.
+        
+        Args:
+            provider: The cloud provider name
+            instance: The provider instance name
+            proxy_ip: IP address of the proxy to recycle
+            
+        Returns:
+            True if the proxy may be recycled now
+        """
+        age = self._manager.get_state(provider, instance).aged.get(proxy_ip, 0.0)
+        pool_limit, provider_limit = self.limits()
+        for scope, limit in ((None, pool_limit), (provider, provider_limit)):
+            if limit <= 0:
+                continue
+            label = "pool" if scope is None else f"provider {scope}"
+            remaining = limit - self.in_use(scope)
+            older = sum(
+                1 for other_age, ip in self._waiting(scope)
+                if ip != proxy_ip and (other_age, proxy_ip) > (age, ip)
+            )
+            if remaining <= older:
+                logger.info(
+                    f"Rolling deployment: Deferred recycling {proxy_ip} in {provider}/{instance}, "
+                    f"{label} disruption budget {limit - remaining}/{limit} in use, {older} older proxies waiting"
+                )
+                return False
+        return True
+    
+    def status(self) -> Dict:
+        """Limit, usage and waiting proxies for the pool and for each provider."""
+        pool_limit, provider_limit = self.limits()
+        
+        def scope_status(limit: int, provider: Optional[str] = None) -> Dict:
+            in_use = self.in_use(provider)
+            return {
+                "limit": limit,
+                "in_use": in_use,
+                "remaining": max(limit - in_use, 0) if limit > 0 else None,
+                "waiting": len(self._waiting(provider)),
+            }
+        
+        providers = sorted({state.provider for state in self._manager.states.values()})
+        return {
+            "pool": scope_status(pool_limit),
+            "providers": {provider: scope_status(provider_limit, provider) for provider in providers},
+        }
+
+
+def surge_limit() -> int:
+    """Maximum surge replacements per provider instance, 0 when surge recycling is off."""
+    rolling_config = settings.config["rolling_deployment"]
+    if not rolling_config["enabled"]:
+        return 0
+    return rolling_config.get("max_surge", 0)
 
 
 # Global instance
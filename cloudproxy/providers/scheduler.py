@@ -0,0 +1,284 @@
+"""
+Scheduling policy and tick metrics for the provider reconcile jobs.
+
+Every enabled provider instance gets its own interval job. Jobs run on a
+bounded worker pool, never overlap with themselves (a tick that is still
+running when the next one is due makes the scheduler skip that run rather
+than start a second reconcile of the same instance), coalesce runs missed
+while the pool was busy into one, and can be jittered so that many instances
+do not all hit their provider APIs in the same second. TickMetrics records
+how long each tick took and how many runs were skipped.
+
+API changes (scaling updates, queued deletions) do not have to wait for the
+next interval: ReconcileTriggers pulls the affected instance's next run
+forward to a few seconds from now. Requests arriving within that window
+collapse into the one run, and a request made while a tick is running is
+replayed once that tick finishes instead of being dropped as an overlap.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES
+from loguru import logger
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.metrics import tick_duration, tick_phase_duration
+from cloudproxy.providers.tracing import tick_trace
+
+
+def job_id(provider: str, instance: str) -> str:
+    """Scheduler job ID of a provider instance, e.g. "aws-production"."""
+    return f"{provider}-{instance}"
+
+
+def instance_interval(instance_config: Dict) -> int:
+    """
+    Seconds between ticks of a provider instance.
+
+    Args:
+        instance_config: The specific instance configuration
+
+    Returns:
+        int: The instance's own interval if set, otherwise SCHEDULER_INTERVAL
+    """
+    interval = instance_config.get("interval")
+    if not interval:
+        interval = settings.config["scheduler"]["interval"]
+    return max(1, int(interval))
+
+
+class TickMetrics:
+    """Thread-safe per-job tick duration and skipped-run counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+
+    def _job(self, job: str) -> Dict:
+        # Caller holds the lock
+        if job not in self._jobs:
+            self._jobs[job] = {
+                "runs": 0,
+                "errors": 0,
+                "running": False,
+                "last_duration": None,
+                "avg_duration": None,
+                "max_duration": None,
+                "last_run": None,
+                "last_error": None,
+                "missed": 0,
+                "overlapped": 0,
+            }
+        return self._jobs[job]
+
+    def start(self, job: str):
+        with self._lock:
+            self._job(job)["running"] = True
+
+    def record(self, job: str, duration: float, error: Optional[str] = None):
+        """Record a finished tick."""
+        with self._lock:
+            stats = self._job(job)
+            stats["runs"] += 1
+            stats["running"] = False
+            stats["last_duration"] = duration
+            stats["last_run"] = time.time()
+            if stats["avg_duration"] is None:
+                stats["avg_duration"] = duration
+            else:
+                stats["avg_duration"] += (duration - stats["avg_duration"]) / stats["runs"]
+            stats["max_duration"] = max(stats["max_duration"] or 0.0, duration)
+            if error is not None:
+                stats["errors"] += 1
+                stats["last_error"] = error
+
+    def record_missed(self, job: str):
+        """Record a run dropped because it started later than the misfire grace time."""
+        with self._lock:
+            self._job(job)["missed"] += 1
+
+    def record_overlap(self, job: str):
+        """Record a run skipped because the previous tick was still running."""
+        with self._lock:
+            self._job(job)["overlapped"] += 1
+
+    def is_running(self, job: str) -> bool:
+        with self._lock:
+            return job in self._jobs and self._jobs[job]["running"]
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {job: dict(stats) for job, stats in self._jobs.items()}
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+
+
+tick_metrics = TickMetrics()
+
+
+def timed_tick(job: str, func: Callable[[], object]) -> Callable[[], object]:
+    """
+    Wrap a scheduled function so each run is recorded in tick_metrics and traced.
+
+    Args:
+        job: Scheduler job ID
+        func: Function run on every tick
+
+    Returns:
+        callable: The wrapped function, keeping func's name
+    """
+    @wraps(func)
+    def run():
+        tick_metrics.start(job)
+        started = time.monotonic()
+        trace = None
+        try:
+            with tick_trace(job) as trace:
+                result = func()
+        except Exception as e:
+            tick_metrics.record(job, time.monotonic() - started, str(e))
+            raise
+        else:
+            tick_metrics.record(job, time.monotonic() - started)
+        finally:
+            tick_duration.observe(time.monotonic() - started, job)
+            for entry in trace.spans if trace is not None else ():
+                if entry.phase and entry.duration is not None:
+                    tick_phase_duration.observe(entry.duration, job, entry.name)
+            reconcile_triggers.tick_finished(job)
+        return result
+
+    return run
+
+
+def record_skipped_run(event):
+    """
+    APScheduler listener for EVENT_JOB_MISSED and EVENT_JOB_MAX_INSTANCES.
+
+    Args:
+        event: The scheduler job event
+    """
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        tick_metrics.record_overlap(event.job_id)
+        logger.warning(f"Skipped {event.job_id} tick, previous tick still running")
+    else:
+        tick_metrics.record_missed(event.job_id)
+        logger.warning(f"Missed {event.job_id} tick, worker pool too busy")
+
+
+class ReconcileTriggers:
+    """Debounced, deduplicated on-demand runs of provider instance jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._pending = set()
+        self.requested = 0
+        self.scheduled = 0
+        self.merged = 0
+
+    def attach(self, scheduler):
+        """Use scheduler for triggered runs, called once its jobs exist."""
+        with self._lock:
+            self._scheduler = scheduler
+            self._pending.clear()
+
+    def request(self, provider: str, instance: str) -> bool:
+        """
+        Run a provider instance's job within SCHEDULER_TRIGGER_DELAY seconds.
+
+        Args:
+            provider: The provider name
+            instance: The instance name
+
+        Returns:
+            bool: True if a run is now due soon, False if the instance has no job
+        """
+        job = job_id(provider, instance)
+        with self._lock:
+            self.requested += 1
+            if self._scheduler is None:
+                return False
+            scheduled_job = self._scheduler.get_job(job)
+            if scheduled_job is None or scheduled_job.next_run_time is None:
+                return False
+
+            if tick_metrics.is_running(job):
+                # The running tick may have read the old state, run once more after it
+                if job in self._pending:
+                    self.merged += 1
+                self._pending.add(job)
+                return True
+
+            delay = settings.config["scheduler"]["trigger_delay"]
+            run_at = datetime.now(scheduled_job.next_run_time.tzinfo) + timedelta(seconds=delay)
+            if scheduled_job.next_run_time <= run_at:
+                self.merged += 1
+                return True
+            scheduled_job.modify(next_run_time=run_at)
+            self.scheduled += 1
+        logger.info(f"Reconcile of {job} triggered, running in {delay}s")
+        return True
+
+    def tick_finished(self, job: str):
+        """Replay a request that arrived while the job's tick was running."""
+        with self._lock:
+            if job not in self._pending:
+                return
+            self._pending.discard(job)
+        provider, _, instance = job.partition("-")
+        self.request(provider, instance)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requested": self.requested,
+                "scheduled": self.scheduled,
+                "merged": self.merged,
+                "pending": len(self._pending),
+            }
+
+
+reconcile_triggers = ReconcileTriggers()
+
+
+def request_reconcile(provider: str, instance: Optional[str] = None) -> List[str]:
+    """
+    Trigger an early reconcile of one provider instance, or of all its enabled instances.
+
+    Args:
+        provider: The provider name
+        instance: The instance name, or None for every enabled instance
+
+    Returns:
+        list: Job IDs with a run now due soon
+    """
+    instances = settings.config["providers"].get(provider, {}).get("instances", {})
+    if instance is None:
+        names = [name for name, inst in instances.items() if inst.get("enabled")]
+    else:
+        names = [instance]
+    return [job_id(provider, name) for name in names if reconcile_triggers.request(provider, name)]
+
+
+def request_reconcile_for_ip(ip: str) -> List[str]:
+    """
+    Trigger an early reconcile of the provider instance serving a proxy IP.
+
+    Args:
+        ip: The proxy IP address
+
+    Returns:
+        list: Job IDs with a run now due soon, empty if no instance lists the IP
+    """
+    for provider, provider_config in settings.config["providers"].items():
+        for instance, instance_config in provider_config.get("instances", {}).items():
+            if ip in instance_config.get("ips", []):
+                return request_reconcile(provider, instance)
+    return []
@@ -0,0 +1,139 @@
+"""
+Strategies for picking the proxy GET /random serves.
+
+Uniform random selection returns a slow or overloaded proxy as often as the
+fastest one. The strategies here work on the proxy registry's indexes, so a
+pick costs O(1) however large the pool is:
+
+- random: uniform over the pool
+- round_robin: the next proxy of the registry's dense IP array
+- least_recent: the proxy served longest ago, from an ordered serving log
+- latency: weighted by inverse probe latency among a handful of random draws
+- p2c: the faster of two random draws ("power of two choices")
+
+Latencies are the mean of each proxy's recent successful health probes.
+Proxies without one yet are treated like the other candidates, so new
+proxies still get traffic. The strategy is set globally with
+PROXY_SELECTION_STRATEGY and can be overridden per request.
+"""
+
+import random
+from typing import Callable, Collection, Dict, List, Optional
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.health import health_store
+from cloudproxy.providers.registry import ProxyEntry, ProxyRegistry
+
+# Random draws the latency-weighted strategy chooses between
+LATENCY_CANDIDATES = 8
+
+LatencyLookup = Callable[[str], Optional[float]]
+
+
+class SelectionStrategy:
+    """Picks one proxy from the registry."""
+
+    name = ""
+
+    def select(self, pool: ProxyRegistry, exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+        raise NotImplementedError
+
+
+class RandomStrategy(SelectionStrategy):
+    name = "random"
+
+    def select(self, pool, exclude=()):
+        return pool.random(exclude)
+
+
+class RoundRobinStrategy(SelectionStrategy):
+    name = "round_robin"
+
+    def select(self, pool, exclude=()):
+        return pool.next_in_order(exclude)
+
+
+class LeastRecentStrategy(SelectionStrategy):
+    name = "least_recent"
+
+    def select(self, pool, exclude=()):
+        return pool.least_recent(exclude)
+
+
+class LatencyWeightedStrategy(SelectionStrategy):
+    name = "latency"
+
+    def __init__(self, latency: LatencyLookup = health_store.latency, candidates: int = LATENCY_CANDIDATES):
+        self.latency = latency
+        self.candidates = candidates
+
+    def select(self, pool, exclude=()):
+        drawn = pool.sample(self.candidates, exclude)
+        if not drawn:
+            return None
+        weights = _inverse_latencies([self.latency(entry.ip) for entry in drawn])
+        return random.choices(drawn, weights=weights)[0]
+
+
+class PowerOfTwoStrategy(SelectionStrategy):
+    name = "p2c"
+
+    def __init__(self, latency: LatencyLookup = health_store.latency):
+        self.latency = latency
+
+    def select(self, pool, exclude=()):
+        drawn = pool.sample(2, exclude)
+        if len(drawn) < 2:
+            return drawn[0] if drawn else None
+        first, second = (self.latency(entry.ip) for entry in drawn)
+        if first is None or second is None or first == second:
+            return random.choice(drawn)
+        return drawn[0] if first < second else drawn[1]
+
+
+def _inverse_latencies(latencies: List[Optional[float]]) -> List[float]:
+    """Selection weights, proxies without a latency weigh as much as the average one."""
+    known = [1.0 / max(latency, 1e-3) for latency in latencies if latency is not None]
+    default = sum(known) / len(known) if known else 1.0
+    return [default if latency is None else 1.0 / max(latency, 1e-3) for latency in latencies]
+
+
+STRATEGIES: Dict[str, SelectionStrategy] = {
+    strategy.name: strategy
+    for strategy in (
+        RandomStrategy(),
+        RoundRobinStrategy(),
+        LeastRecentStrategy(),
+        LatencyWeightedStrategy(),
+        PowerOfTwoStrategy(),
+    )
+}
+
+
+def default_strategy() -> str:
+    return settings.config.get("selection", {}).get("strategy", RandomStrategy.name)
+
+
+def select_proxy(pool: ProxyRegistry, strategy: Optional[str] = None,
+                 exclude: Collection[str] = ()) -> Optional[ProxyEntry]:
+    """
+    Pick a proxy and record it as served.
+
+    Args:
+        pool: The proxy registry
+        strategy: Strategy name, None for PROXY_SELECTION_STRATEGY
+        exclude: IPs to leave out, e.g. the delete and restart queues
+
+    Returns:
+        ProxyEntry: The chosen proxy, or None if there is none available
+
+    Raises:
+        ValueError: If the strategy is unknown
+    """
+    name = strategy or default_strategy()
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown selection strategy '{name}', expected one of {', '.join(STRATEGIES)}")
+    entry = STRATEGIES[name].select(pool, exclude)
+    if entry is not None:
+        pool.mark_served(entry.ip)
+    return entry
@@ -1,22 +1,77 @@
 import os
 from dotenv import load_dotenv
 
+from cloudproxy.providers.versioned import IPList, VersionedSet
+
 config = {
     "auth": {"username": "", "password": ""},
     "no_auth": False,
     "only_host_ip": False,
     "age_limit": 0,
+    "age_limit_jitter": 0,
     "rolling_deployment": {
         "enabled": False,
         "min_available": 3,
         "batch_size": 2,
+        "max_surge": 0,
+        "max_disruption": 0,
+        "max_disruption_per_provider": 0,
+    },
+    "health_check": {
+        "concurrency": 20,
+        "timeout": 10,
+        "retries": 1,
+        "pool_size": 256,
+        "urls": ["http://ipecho.net/plain"],
+        "ip_urls": ["https://api.ipify.org"],
+    },
+    "health_monitor": {
+        "interval": 10,
+        "max_age": 30,
+        "history_size": 32,
+        "pending_timeout": 3,
+    },
+    "selection": {
+        "strategy": "random",
+    },
+    "leases": {
+        "default_ttl": 300,
+        "max_ttl": 3600,
+    },
+    "changes": {
+        "history": 10000,
+    },
+    "gateway": {
+        "enabled": False,
+        "host": "0.0.0.0",
+        "port": 8080,
+        "strategy": "",
+        "retries": 2,
+        "connect_timeout": 5,
+        "pool_size": 8,
+        "idle_timeout": 30,
+        "allow_unauthenticated": False,
+    },
+    "deployment": {
+        "concurrency": 10,
+        "api_timeout": 30,
+    },
+    "scheduler": {
+        "workers": 10,
+        "interval": 20,
+        "jitter": 0,
+        "misfire_grace_time": 30,
+        "trigger_delay": 2,
+        "trace_size": 100,
+        "slow_tick": 0,
+        "slow_tick_profile": False,
     },
     "providers": {
         "digitalocean": {
             "instances": {
                 "default": {
             "enabled": False,
-            "ips": [],
+            "ips": IPList(),
             "scaling": {"min_scaling": 0, "max_scaling": 0},
             "size": "",
             "region": "",
@@ -30,7 +85,7 @@ config = {
             "instances": {
                 "default": {
             "enabled": False,
-            "ips": [],
+            "ips": IPList(),
             "scaling": {"min_scaling": 0, "max_scaling": 0},
             "size": "",
             "region": "",
@@ -46,7 +101,7 @@ config = {
                 "default": {
             "enabled": False,
             "project": "",
-            "ips": [],
+            "ips": IPList(),
             "scaling": {"min_scaling": 0, "max_scaling": 0},
             "size": "",
             "zone": "",
@@ -61,7 +116,7 @@ config = {
             "instances": {
                 "default": {
             "enabled": False,
-            "ips": [],
+            "ips": IPList(),
             "scaling": {"min_scaling": 0, "max_scaling": 0},
             "size": "",
             "location": "",
@@ -76,7 +131,7 @@ config = {
             "instances": {
                 "default": {
                     "enabled": False,
-                    "ips": [],
+                    "ips": IPList(),
                     "scaling": {"min_scaling": 0, "max_scaling": 0},
                     "size": "",
                     "location": "",
@@ -95,7 +150,7 @@ config = {
             "instances": {
                 "default": {
                     "enabled": False,
-                    "ips": [],
+                    "ips": IPList(),
                     "scaling": {"min_scaling": 0, "max_scaling": 0},
                     "plan": "",
                     "region": "",
@@ -108,8 +163,8 @@ config = {
     },
 }
 
-delete_queue = set()
-restart_queue = set()
+delete_queue = VersionedSet()
+restart_queue = VersionedSet()
 
 load_dotenv()
 
@@ -117,6 +172,7 @@ load_dotenv()
 config["auth"]["username"] = os.environ.get("PROXY_USERNAME", "changeme")
 config["auth"]["password"] = os.environ.get("PROXY_PASSWORD", "changeme")
 config["age_limit"] = int(os.environ.get('AGE_LIMIT', 0))
+config["age_limit_jitter"] = float(os.environ.get('AGE_LIMIT_JITTER', 0))
 config["no_auth"] = config["auth"]["username"] == "changeme" and config["auth"]["password"] == "changeme"
 config["only_host_ip"] = os.environ.get("ONLY_HOST_IP", False)
 
@@ -124,6 +180,64 @@ config["only_host_ip"] = os.environ.get("ONLY_HOST_IP", False)
 config["rolling_deployment"]["enabled"] = os.environ.get("ROLLING_DEPLOYMENT", "False") == "True"
 config["rolling_deployment"]["min_available"] = int(os.environ.get("ROLLING_MIN_AVAILABLE", 3))
 config["rolling_deployment"]["batch_size"] = int(os.environ.get("ROLLING_BATCH_SIZE", 2))
+config["rolling_deployment"]["max_surge"] = int(os.environ.get("ROLLING_MAX_SURGE", 0))
+config["rolling_deployment"]["max_disruption"] = int(os.environ.get("ROLLING_MAX_DISRUPTION", 0))
+config["rolling_deployment"]["max_disruption_per_provider"] = int(
+    os.environ.get("ROLLING_MAX_DISRUPTION_PER_PROVIDER", 0)
+)
+
+# Set health check configuration
+config["health_check"]["concurrency"] = int(os.environ.get("HEALTH_CHECK_CONCURRENCY", 20))
+config["health_check"]["timeout"] = float(os.environ.get("HEALTH_CHECK_TIMEOUT", 10))
+config["health_check"]["retries"] = int(os.environ.get("HEALTH_CHECK_RETRIES", 1))
+config["health_check"]["pool_size"] = int(os.environ.get("HEALTH_CHECK_POOL_SIZE", 256))
+config["health_check"]["urls"] = [
+    url.strip() for url in os.environ.get("HEALTH_CHECK_URLS", "http://ipecho.net/plain").split(",") if url.strip()
+]
+config["health_check"]["ip_urls"] = [
+    url.strip() for url in os.environ.get("HEALTH_CHECK_IP_URLS", "https://api.ipify.org").split(",") if url.strip()
+]
+
+# Set health monitor configuration
+config["health_monitor"]["interval"] = int(os.environ.get("HEALTH_MONITOR_INTERVAL", 10))
+config["health_monitor"]["max_age"] = int(os.environ.get("HEALTH_MONITOR_MAX_AGE", 30))
+config["health_monitor"]["history_size"] = int(os.environ.get("HEALTH_MONITOR_HISTORY_SIZE", 32))
+config["health_monitor"]["pending_timeout"] = float(os.environ.get("HEALTH_MONITOR_PENDING_TIMEOUT", 3))
+
+# Set proxy selection configuration
+config["selection"]["strategy"] = os.environ.get("PROXY_SELECTION_STRATEGY", "random")
+
+# Set proxy lease configuration
+config["leases"]["default_ttl"] = int(os.environ.get("LEASE_DEFAULT_TTL", 300))
+config["leases"]["max_ttl"] = int(os.environ.get("LEASE_MAX_TTL", 3600))
+
+# Set pool change feed configuration
+config["changes"]["history"] = int(os.environ.get("CHANGE_FEED_SIZE", 10000))
+
+# Set forward-proxy gateway configuration
+config["gateway"]["enabled"] = os.environ.get("GATEWAY_ENABLED", "False") == "True"
+config["gateway"]["host"] = os.environ.get("GATEWAY_HOST", "0.0.0.0")
+config["gateway"]["port"] = int(os.environ.get("GATEWAY_PORT", 8080))
+config["gateway"]["strategy"] = os.environ.get("GATEWAY_STRATEGY", "")
+config["gateway"]["retries"] = int(os.environ.get("GATEWAY_RETRIES", 2))
+config["gateway"]["connect_timeout"] = float(os.environ.get("GATEWAY_CONNECT_TIMEOUT", 5))
+config["gateway"]["pool_size"] = int(os.environ.get("GATEWAY_POOL_SIZE", 8))
+config["gateway"]["idle_timeout"] = float(os.environ.get("GATEWAY_IDLE_TIMEOUT", 30))
+config["gateway"]["allow_unauthenticated"] = os.environ.get("GATEWAY_ALLOW_UNAUTHENTICATED", "False") == "True"
+
+# Set deployment configuration
+config["deployment"]["concurrency"] = int(os.environ.get("DEPLOY_CONCURRENCY", 10))
+config["deployment"]["api_timeout"] = float(os.environ.get("PROVIDER_API_TIMEOUT", 30))
+
+# Set scheduler configuration
+config["scheduler"]["workers"] = int(os.environ.get("SCHEDULER_WORKERS", 10))
+config["scheduler"]["interval"] = int(os.environ.get("SCHEDULER_INTERVAL", 20))
+config["scheduler"]["jitter"] = int(os.environ.get("SCHEDULER_JITTER", 0))
+config["scheduler"]["misfire_grace_time"] = int(os.environ.get("SCHEDULER_MISFIRE_GRACE_TIME", 30))
+config["scheduler"]["trigger_delay"] = int(os.environ.get("SCHEDULER_TRIGGER_DELAY", 2))
+config["scheduler"]["trace_size"] = int(os.environ.get("SCHEDULER_TRACE_SIZE", 100))
+config["scheduler"]["slow_tick"] = float(os.environ.get("SCHEDULER_SLOW_TICK", 0))
+config["scheduler"]["slow_tick_profile"] = os.environ.get("SCHEDULER_SLOW_TICK_PROFILE", "False") == "True"
 
 # Set DigitalOcean config - original format for backward compatibility
 config["providers"]["digitalocean"]["instances"]["default"]["enabled"] = os.environ.get(
@@ -277,6 +391,12 @@ config["providers"]["vultr"]["instances"]["default"]["display_name"] = os.enviro
     "VULTR_DISPLAY_NAME", "Vultr"
 )
 
+# Set per-provider reconcile intervals for the default instances, e.g. AWS_INTERVAL
+for provider_key in config["providers"].keys():
+    interval = os.environ.get(f"{provider_key.upper()}_INTERVAL")
+    if interval:
+        config["providers"][provider_key]["instances"]["default"]["interval"] = int(interval)
+
 # Check for additional provider instances using the new format pattern
 for provider_key in config["providers"].keys():
     provider_upper = provider_key.upper()
@@ -296,7 +416,7 @@ for provider_key in config["providers"].keys():
                 # Clone the default instance configuration as a starting point
                 config["providers"][provider_key]["instances"][instance_name] = {
                     "enabled": True,
-                    "ips": [],
+                    "ips": IPList(),
                     "scaling": {"min_scaling": 0, "max_scaling": 0},
                     "size": "",
                     "display_name": f"{provider_key.capitalize()} {instance_name}",
@@ -332,6 +452,8 @@ for provider_key in config["providers"].keys():
                     elif setting_name in ["size", "region", "zone", "location", "ami", "project", 
                                           "image_project", "image_family", "datacenter", "plan", "image"]:
                         config["providers"][provider_key]["instances"][instance_name][setting_name] = env_value
+                    elif setting_name == "interval":
+                        config["providers"][provider_key]["instances"][instance_name]["interval"] = int(env_value)
                     elif setting_name == "os_id":
                         config["providers"][provider_key]["instances"][instance_name]["os_id"] = int(env_value)
                     elif setting_name == "spot":
@@ -0,0 +1,245 @@
+"""
+Per-phase timing of scheduler ticks.
+
+tick_metrics knows how long a whole tick took, not whether listing, probing,
+deleting or creating was slow. While a tick runs, every phase function
+(*_fw, *_check_delete, *_check_alive, *_check_stop, *_deployment) and every
+provider API call records a span in the tick's trace: its name, when it
+started relative to the tick, how long it took and how deeply it is nested.
+The last SCHEDULER_TRACE_SIZE traces are kept for GET /scheduler/traces.
+
+With SCHEDULER_SLOW_TICK set, a tick still running after that many seconds
+has its stack captured, showing where it is stuck. SCHEDULER_SLOW_TICK_PROFILE
+also runs every tick under cProfile and keeps the profile of the ticks that
+turned out slow. Profiling slows every tick down, so it is off by default.
+
+Spans are recorded through a thread-local, calls outside of a tick (e.g.
+provider calls made by API requests) cost one attribute lookup.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Deque, Iterator, List, Optional
+
+from loguru import logger
+
+from cloudproxy.providers import settings
+
+# Functions listed in a slow tick's profile, by cumulative time
+PROFILE_LINES = 30
+
+_local = threading.local()
+
+
+def trace_size() -> int:
+    return max(int(settings.config["scheduler"].get("trace_size", 100)), 1)
+
+
+def slow_tick_threshold() -> float:
+    """Seconds after which a tick counts as slow, 0 when slow ticks are not captured."""
+    return max(float(settings.config["scheduler"].get("slow_tick", 0)), 0.0)
+
+
+@dataclass
+class Span:
+    """One timed phase or provider call within a tick."""
+    name: str
+    start: float  # Seconds since the tick started
+    depth: int
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    phase: bool = False  # Recorded by a @traced phase function, not a provider call
+
+
+@dataclass
+class TickTrace:
+    """The spans of one tick, and what was captured if it was slow."""
+    job: str
+    started_at: float
+    started: float = field(default_factory=time.monotonic, repr=False)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    slow: bool = False
+    spans: List[Span] = field(default_factory=list)
+    stack: Optional[str] = None
+    profile: Optional[str] = None
+
+
+class TraceBuffer:
+    """Thread-safe ring buffer of the latest tick traces."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._traces: Deque[TickTrace] = deque()
+        self.slow = 0
+
+    def add(self, trace: TickTrace):
+        with self._lock:
+            self._traces.append(trace)
+            if trace.slow:
+                self.slow += 1
+            limit = trace_size()
+            while len(self._traces) > limit:
+                self._traces.popleft()
+
+    def traces(self, job: Optional[str] = None, slow: bool = False,
+               limit: Optional[int] = None) -> List[TickTrace]:
+        """
+        Kept traces, newest first.
+
+        Args:
+            job: Only traces of this job
+            slow: Only traces of slow ticks
+            limit: Maximum number of traces, None for all
+        """
+        with self._lock:
+            traces = list(self._traces)
+        matching = [
+            trace for trace in reversed(traces)
+            if (job is None or trace.job == job) and (not slow or trace.slow)
+        ]
+        return matching if limit is None else matching[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+            self.slow = 0
+
+
+trace_buffer = TraceBuffer()
+
+
+@contextmanager
+def span(name: str, phase: bool = False) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a span of the current thread's tick, if any."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield None
+        return
+    depth = _local.depth
+    entry = Span(name, time.monotonic() - trace.started, depth, phase=phase)
+    # list.append is atomic, spans of parallel calls may share a trace
+    trace.spans.append(entry)
+    _local.depth = depth + 1
+    try:
+        yield entry
+    except Exception as e:
+        entry.error = str(e)
+        raise
+    finally:
+        _local.depth = depth
+        entry.duration = time.monotonic() - trace.started - entry.start
+
+
+def traced(func: Callable) -> Callable:
+    """
+    Decorator recording every call of func as a phase span named after it.
+
+    The durations of a tick's phase spans are also observed in the
+    cloudproxy_tick_phase_duration_seconds histogram once the tick ends.
+    """
+    @wraps(func)
+    def call(*args, **kwargs):
+        with span(func.__name__, phase=True):
+            return func(*args, **kwargs)
+
+    return call
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Bind func to the current thread's tick, for calls run on worker threads.
+
+    Spans recorded by func in another thread are nested under the span
+    that was open when propagate was called.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return func
+    depth = _local.depth
+
+    @wraps(func)
+    def call(*args, **kwargs):
+        previous = (getattr(_local, "trace", None), getattr(_local, "depth", 0))
+        _local.trace, _local.depth = trace, depth
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.trace, _local.depth = previous
+
+    return call
+
+
+def _capture_stack(trace: TickTrace, thread_id: int):
+    # Runs on a timer thread once the tick has been running for the slow tick threshold
+    frame = sys._current_frames().get(thread_id)
+    if frame is not None and trace.duration is None:
+        trace.stack = "".join(traceback.format_stack(frame))
+
+
+def _format_profile(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return output.getvalue()
+
+
+@contextmanager
+def tick_trace(job: str) -> Iterator[TickTrace]:
+    """
+    Record the enclosed tick's spans and add its trace to trace_buffer.
+
+    Args:
+        job: Scheduler job ID
+
+    Yields:
+        TickTrace: The trace being recorded
+    """
+    trace = TickTrace(job, time.time())
+    previous = (getattr(_local, "trace", None), getattr(_local, "depth", 0))
+    _local.trace, _local.depth = trace, 0
+
+    threshold = slow_tick_threshold()
+    timer = profiler = None
+    if threshold > 0:
+        timer = threading.Timer(threshold, _capture_stack, (trace, threading.get_ident()))
+        timer.daemon = True
+        timer.start()
+        if settings.config["scheduler"].get("slow_tick_profile"):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active
+                profiler = None
+    try:
+        yield trace
+    except Exception as e:
+        trace.error = str(e)
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        trace.duration = time.monotonic() - trace.started
+        _local.trace, _local.depth = previous
+        if timer is not None:
+            timer.cancel()
+        if threshold > 0 and trace.duration >= threshold:
+            trace.slow = True
+            if profiler is not None:
+                trace.profile = _format_profile(profiler)
+            phases = sorted(
+                (entry for entry in trace.spans if entry.duration is not None),
+                key=lambda entry: entry.duration, reverse=True
+            )
+            slowest = ", ".join(f"{entry.name} {entry.duration:.1f}s" for entry in phases[:3])
+            logger.warning(f"Slow tick: {job} took {trace.duration:.1f}s ({slowest or 'no spans'})")
+        trace_buffer.add(trace)
@@ -0,0 +1,53 @@
+"""
+Containers that count their own changes.
+
+The proxy listings are cached by ETag, and the registry picks up changes to
+the config's IP lists without comparing them IP by IP. Both need to know
+whether a list or a queue changed since they last looked, on every request.
+Comparing contents costs one check per IP, identity and length miss in-place
+edits. These containers bump a version on every mutating call instead, so a
+change costs one integer comparison to detect. A mutation that leaves the
+contents as they were still bumps the version, which only costs a rebuild.
+"""
+
+from typing import Callable, Iterable
+
+
+def _counting(method: Callable) -> Callable:
+    def call(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.version += 1
+        return result
+
+    call.__name__ = method.__name__
+    call.__doc__ = method.__doc__
+    return call
+
+
+def _count_changes(cls: type, names: Iterable[str]) -> type:
+    for name in names:
+        setattr(cls, name, _counting(getattr(cls.__mro__[1], name)))
+    return cls
+
+
+class IPList(list):
+    """A provider instance's list of proxy IPs, as stored in the config."""
+
+    version = 0
+
+
+class VersionedSet(set):
+    """A set of IPs, e.g. the delete and restart queues."""
+
+    version = 0
+
+
+_count_changes(IPList, (
+    "__setitem__", "__delitem__", "__iadd__", "__imul__",
+    "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+))
+_count_changes(VersionedSet, (
+    "__ior__", "__iand__", "__isub__", "__ixor__",
+    "add", "discard", "remove", "pop", "clear",
+    "update", "difference_update", "intersection_update", "symmetric_difference_update",
+))
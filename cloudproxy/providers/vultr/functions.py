@@ -6,6 +6,7 @@ from loguru import logger
 
 from cloudproxy.providers import settings
 from cloudproxy.providers.config import set_auth
+from cloudproxy.providers.metrics import provider_call
 
 
 class VultrFirewallExistsException(Exception):
@@ -47,6 +48,7 @@ def get_api_headers(instance_config: Optional[Dict] = None) -> Dict[str, str]:
     }
 
 
+@provider_call("vultr")
 def create_proxy(instance_config: Optional[Dict] = None) -> bool:
     """
     Create a Vultr proxy instance.
@@ -115,6 +117,7 @@ def create_proxy(instance_config: Optional[Dict] = None) -> bool:
         return False
 
 
+@provider_call("vultr")
 def delete_proxy(instance: Any,
                  instance_config: Optional[Dict] = None) -> bool:
     """
@@ -166,6 +169,7 @@ def delete_proxy(instance: Any,
         return False
 
 
+@provider_call("vultr")
 def list_instances(
         instance_config: Optional[Dict] = None) -> List[VultrInstance]:
     """
@@ -233,6 +237,7 @@ def list_instances(
         return []
 
 
+@provider_call("vultr")
 def create_firewall(instance_config: Optional[Dict] = None) -> Optional[str]:
     """
     Create a Vultr firewall group for proxy instances.
@@ -1,5 +1,4 @@
 import datetime
-import itertools
 
 import dateparser
 from loguru import logger
@@ -12,32 +11,47 @@ from cloudproxy.providers.vultr.functions import (
     create_firewall,
     VultrFirewallExistsException,
 )
+from cloudproxy.providers.batch import create_in_parallel, delete_in_parallel, log_batch_result
+from cloudproxy.providers.inventory import Inventory, pick_surplus
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
-from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.health import health_monitor
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.rolling import rolling_manager, surge_limit
+from cloudproxy.providers.tracing import traced
 
 
-def vultr_deployment(min_scaling, instance_config=None):
+@traced
+def vultr_deployment(min_scaling, instance_config=None, inventory=None):
     """
     Deploy Vultr instances based on min_scaling requirements.
 
     Args:
         min_scaling: The minimum number of instances to maintain
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["vultr"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
 
-    total_instances = len(list_instances(instance_config))
+    total_instances = len(inventory.get())
     if min_scaling < total_instances:
         logger.info(f"Overprovisioned: Vultr {display_name} destroying.....")
-        for instance in itertools.islice(list_instances(
-                instance_config), 0, (total_instances - min_scaling)):
-            delete_proxy(instance, instance_config)
-            logger.info(
-                f"Destroyed: Vultr {display_name} -> {str(instance.ip_address)}")
+        surplus = pick_surplus(
+            inventory.get(), total_instances - min_scaling,
+            lambda instance: instance.ip_address,
+            lambda instance: dateparser.parse(instance.date_created),
+        )
+        for instance, deleted in delete_in_parallel(
+                delete_proxy, surplus, instance_config):
+            if deleted:
+                logger.info(
+                    f"Destroyed: Vultr {display_name} -> {str(instance.ip_address)}")
+        inventory.invalidate()
 
     if min_scaling - total_instances < 1:
         logger.info(f"Minimum Vultr {display_name} instances met")
@@ -45,21 +59,25 @@ def vultr_deployment(min_scaling, instance_config=None):
         total_deploy = min_scaling - total_instances
         logger.info(
             f"Deploying: {str(total_deploy)} Vultr {display_name} instances")
-        for _ in range(total_deploy):
-            create_proxy(instance_config)
-            logger.info(f"Deployed Vultr {display_name} instance")
-    return len(list_instances(instance_config))
+        result = create_in_parallel(create_proxy, total_deploy, instance_config)
+        log_batch_result(result, f"Vultr {display_name}")
+        inventory.invalidate()
+    return len(inventory.get())
 
 
-def vultr_check_alive(instance_config=None):
+@traced
+def vultr_check_alive(instance_config=None, inventory=None):
     """
     Check if Vultr instances are alive and operational.
 
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["vultr"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -74,8 +92,10 @@ def vultr_check_alive(instance_config=None):
     ip_ready = []
     pending_ips = []
     instances_to_recycle = []
+    instances_to_check = []
     
-    for instance in list_instances(instance_config):
+    listed = inventory.get()
+    for instance in listed:
         try:
             # Parse the created_at timestamp to a datetime object
             created_at = dateparser.parse(instance.date_created)
@@ -89,40 +109,96 @@ def vultr_check_alive(instance_config=None):
             # Calculate elapsed time
             elapsed = datetime.datetime.now(datetime.timezone.utc) - created_at
 
-            # Check if the instance has reached the age limit
-            if config["age_limit"] > 0 and elapsed > datetime.timedelta(
-                    seconds=config["age_limit"]):
+            # Check if the instance has reached its planned recycle time
+            if recycle_schedule.expired(
+                    "vultr", instance_name, instance.id, elapsed,
+                    config["age_limit"], ip=instance.ip_address):
                 # Queue for potential recycling
                 instances_to_recycle.append((instance, elapsed))
-            elif instance.status == "active" and instance.ip_address and check_alive(instance.ip_address):
-                logger.info(
-                    f"Alive: Vultr {display_name} -> {str(instance.ip_address)}")
-                ip_ready.append(instance.ip_address)
             else:
-                # Check if the instance has been pending for too long
-                if elapsed > datetime.timedelta(minutes=10):
-                    delete_proxy(instance, instance_config)
-                    logger.info(
-                        f"Destroyed: took too long Vultr {display_name} -> {str(instance.ip_address)}"
-                    )
-                else:
-                    logger.info(
-                        f"Waiting: Vultr {display_name} -> {str(instance.ip_address)}")
-                    if instance.ip_address:
-                        pending_ips.append(instance.ip_address)
+                instances_to_check.append((instance, elapsed))
         except TypeError:
             # This happens when dateparser.parse raises a TypeError
             logger.info(f"Pending: Vultr {display_name} allocating")
             if hasattr(instance, 'ip_address') and instance.ip_address:
                 pending_ips.append(instance.ip_address)
+    recycle_schedule.retain("vultr", instance_name, [instance.id for instance in listed])
+
+    # Oldest first, the disruption budget is handed out by age
+    instances_to_recycle.sort(key=lambda item: item[1], reverse=True)
+    # In surge mode aged instances keep serving until their replacements are healthy
+    surging = surge_limit() > 0
+    aged = instances_to_recycle if surging else []
+
+    # Probe all active instances concurrently, reusing fresh health monitor results
+    alive = health_monitor.check(
+        "vultr", instance_name,
+        [inst.ip_address for inst, _ in instances_to_check + aged
+         if inst.status == "active" and inst.ip_address],
+        probe=check_alive)
+    timed_out = []
+    for instance, elapsed in instances_to_check:
+        if instance.status == "active" and instance.ip_address and alive.get(instance.ip_address):
+            logger.info(
+                f"Alive: Vultr {display_name} -> {str(instance.ip_address)}")
+            ip_ready.append(instance.ip_address)
+        else:
+            # Check if the instance has been pending for too long
+            if elapsed > datetime.timedelta(minutes=10):
+                timed_out.append(instance)
+            else:
+                logger.info(
+                    f"Waiting: Vultr {display_name} -> {str(instance.ip_address)}")
+                if instance.ip_address:
+                    pending_ips.append(instance.ip_address)
+
+    if timed_out:
+        for instance, deleted in delete_in_parallel(
+                delete_proxy, timed_out, instance_config):
+            if deleted:
+                logger.info(
+                    f"Destroyed: took too long Vultr {display_name} -> {str(instance.ip_address)}"
+                )
+        inventory.invalidate()
+    
+    for inst, elapsed in aged:
+        if inst.ip_address and alive.get(inst.ip_address):
+            logger.info(
+                f"Alive: Vultr {display_name} aged, awaiting replacement -> {str(inst.ip_address)}")
+            ip_ready.append(inst.ip_address)
     
     # Update rolling manager with current proxy health status
-    rolling_manager.update_proxy_health("vultr", instance_name, ip_ready, pending_ips)
+    rolling_manager.update_proxy_health(
+        "vultr", instance_name, ip_ready, pending_ips,
+        aged={str(inst.ip_address): elapsed.total_seconds() for inst, elapsed in instances_to_recycle if inst.ip_address}
+    )
     
     # Handle rolling deployments for age-limited instances
-    if instances_to_recycle and config["rolling_deployment"]["enabled"]:
+    if aged:
+        retire = rolling_manager.select_surge_retirements(
+            "vultr", instance_name,
+            [(inst, str(inst.ip_address), bool(inst.ip_address and alive.get(inst.ip_address)))
+             for inst, _ in aged],
+            total_healthy=len(ip_ready),
+            min_scaling=instance_config["scaling"]["min_scaling"]
+        )
+        if retire:
+            for inst, deleted in delete_in_parallel(
+                    delete_proxy, retire, instance_config):
+                if not deleted:
+                    continue
+                instance_ip = str(inst.ip_address)
+                rolling_manager.mark_proxy_recycled("vultr", instance_name, instance_ip)
+                if inst.ip_address in ip_ready:
+                    ip_ready.remove(inst.ip_address)
+                logger.info(
+                    f"Rolling deployment: Retired Vultr {display_name} instance after surge (age limit) -> {instance_ip}"
+                )
+            inventory.invalidate()
+    elif instances_to_recycle and config["rolling_deployment"]["enabled"]:
         rolling_config = config["rolling_deployment"]
         
+        recycle_now = []
         for inst, elapsed in instances_to_recycle:
             if inst.ip_address:
                 instance_ip = str(inst.ip_address)
@@ -138,37 +214,52 @@ def vultr_check_alive(instance_config=None):
                     rolling_enabled=True,
                     min_scaling=instance_config["scaling"]["min_scaling"]
                 ):
-                    # Mark as recycling and delete
+                    # Mark as recycling, the whole batch is deleted together below
                     rolling_manager.mark_proxy_recycling("vultr", instance_name, instance_ip)
-                    delete_proxy(inst, instance_config)
-                    rolling_manager.mark_proxy_recycled("vultr", instance_name, instance_ip)
-                    logger.info(
-                        f"Rolling deployment: Recycled Vultr {display_name} instance (age limit) -> {instance_ip}"
-                    )
+                    recycle_now.append(inst)
                 else:
                     logger.info(
                         f"Rolling deployment: Deferred recycling Vultr {display_name} instance -> {instance_ip}"
                     )
+
+        if recycle_now:
+            for inst, deleted in delete_in_parallel(
+                    delete_proxy, recycle_now, instance_config):
+                if not deleted:
+                    continue
+                instance_ip = str(inst.ip_address)
+                rolling_manager.mark_proxy_recycled("vultr", instance_name, instance_ip)
+                logger.info(
+                    f"Rolling deployment: Recycled Vultr {display_name} instance (age limit) -> {instance_ip}"
+                )
+            inventory.invalidate()
     elif instances_to_recycle and not config["rolling_deployment"]["enabled"]:
         # Standard non-rolling recycling
-        for inst, elapsed in instances_to_recycle:
-            delete_proxy(inst, instance_config)
-            logger.info(
-                f"Recycling Vultr {display_name} instance, reached age limit -> {str(inst.ip_address)}"
-            )
+        expired = [inst for inst, elapsed in instances_to_recycle]
+        for inst, deleted in delete_in_parallel(
+                delete_proxy, expired, instance_config):
+            if deleted:
+                logger.info(
+                    f"Recycling Vultr {display_name} instance, reached age limit -> {str(inst.ip_address)}"
+                )
+        inventory.invalidate()
     
     return ip_ready
 
 
-def vultr_check_delete(instance_config=None):
+@traced
+def vultr_check_delete(instance_config=None, inventory=None):
     """
     Check if any Vultr instances need to be deleted.
 
     Args:
         instance_config: The specific instance configuration
+        inventory: Optional instance snapshot shared with the other tick phases
     """
     if instance_config is None:
         instance_config = config["providers"]["vultr"]["instances"]["default"]
+    if inventory is None:
+        inventory = Inventory(list_instances, instance_config)
 
     # Get instance display name for logging
     display_name = instance_config.get("display_name", "default")
@@ -178,7 +269,7 @@ def vultr_check_delete(instance_config=None):
         logger.info(
             f"Current delete queue contains {len(delete_queue)} IP addresses: {', '.join(delete_queue)}")
 
-    instances = list_instances(instance_config)
+    instances = inventory.get()
     if not instances:
         logger.info(
             f"No Vultr {display_name} instances found to process for deletion")
@@ -187,6 +278,9 @@ def vultr_check_delete(instance_config=None):
     logger.info(
         f"Checking {len(instances)} Vultr {display_name} instances for deletion")
 
+    # Collect every queued instance first, then drain the queue in one
+    # parallel batch
+    queued = []
     for instance in instances:
         try:
             instance_ip = str(instance.ip_address)
@@ -195,29 +289,32 @@ def vultr_check_delete(instance_config=None):
             if instance_ip in delete_queue or instance_ip in restart_queue:
                 logger.info(
                     f"Found instance {instance.id} with IP {instance_ip} in deletion queue - deleting now")
-
-                # Attempt to delete the instance
-                delete_result = delete_proxy(instance, instance_config)
-
-                if delete_result:
-                    logger.info(
-                        f"Successfully destroyed Vultr {display_name} instance -> {instance_ip}")
-
-                    # Remove from queues upon successful deletion
-                    if instance_ip in delete_queue:
-                        delete_queue.remove(instance_ip)
-                        logger.info(f"Removed {instance_ip} from delete queue")
-                    if instance_ip in restart_queue:
-                        restart_queue.remove(instance_ip)
-                        logger.info(
-                            f"Removed {instance_ip} from restart queue")
-                else:
-                    logger.warning(
-                        f"Failed to destroy Vultr {display_name} instance -> {instance_ip}")
+                queued.append(instance)
         except Exception as e:
             logger.error(f"Error processing instance for deletion: {e}")
             continue
 
+    if queued:
+        for instance, delete_result in delete_in_parallel(
+                delete_proxy, queued, instance_config):
+            instance_ip = str(instance.ip_address)
+            if delete_result:
+                logger.info(
+                    f"Successfully destroyed Vultr {display_name} instance -> {instance_ip}")
+
+                # Remove from queues upon successful deletion
+                if instance_ip in delete_queue:
+                    delete_queue.remove(instance_ip)
+                    logger.info(f"Removed {instance_ip} from delete queue")
+                if instance_ip in restart_queue:
+                    restart_queue.remove(instance_ip)
+                    logger.info(
+                        f"Removed {instance_ip} from restart queue")
+            else:
+                logger.warning(
+                    f"Failed to destroy Vultr {display_name} instance -> {instance_ip}")
+        inventory.invalidate()
+
     # Report on any IPs that remain in the queues but weren't found
     remaining_delete = [
         ip for ip in delete_queue if any(
@@ -228,6 +325,7 @@ def vultr_check_delete(instance_config=None):
             f"IPs remaining in delete queue that weren't found as instances: {', '.join(remaining_delete)}")
 
 
+@traced
 def vultr_fw(instance_config=None):
     """
     Create a Vultr firewall for proxy instances.
@@ -269,13 +367,24 @@ def vultr_start(instance_config=None):
     if instance_config is None:
         instance_config = config["providers"]["vultr"]["instances"]["default"]
 
+    # Shared instance snapshot, only re-listed after a phase mutates the provider
+    inventory = Inventory(list_instances, instance_config)
+
     vultr_fw(instance_config)
-    vultr_check_delete(instance_config)
+    vultr_check_delete(instance_config, inventory)
     # First check which instances are alive
-    vultr_check_alive(instance_config)
+    vultr_check_alive(instance_config, inventory)
     # Then handle deployment/scaling based on ready instances
+    instance_name = next(
+        (name for name, inst in config["providers"]["vultr"]["instances"].items()
+         if inst == instance_config),
+        "default"
+    )
+    # Includes surge replacements for aged instances when surge recycling is on
     vultr_deployment(
-        instance_config["scaling"]["min_scaling"],
-        instance_config)
+        rolling_manager.surge_target(
+            "vultr", instance_name, instance_config["scaling"]["min_scaling"]),
+        instance_config,
+        inventory)
     # Final check for alive instances
-    return vultr_check_alive(instance_config)
+    return vultr_check_alive(instance_config, inventory)
@@ -0,0 +1,68 @@
+import pytest
+
+from cloudproxy.main import response_cache
+from cloudproxy.providers.changes import change_feed
+from cloudproxy.providers.clients import client_registry
+from cloudproxy.providers.health import health_monitor, health_store
+from cloudproxy.providers.leases import lease_store
+from cloudproxy.providers.recycle import recycle_schedule
+from cloudproxy.providers.registry import proxy_registry
+
+
+@pytest.fixture(autouse=True)
+def reset_client_registry():
+    """Drop cached provider clients so patched SDK constructors are honoured."""
+    client_registry.clear()
+    yield
+    client_registry.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_proxy_registry():
+    """Start every test from an empty proxy index, rebuilt from the config on read."""
+    proxy_registry.clear()
+    yield
+    proxy_registry.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_recycle_schedule():
+    """Forget planned recycles so each test assigns lifetimes from a fresh sequence."""
+    recycle_schedule.clear()
+    yield
+    recycle_schedule.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_health_store():
+    """Start every test without cached probe results, so provider ticks probe for real."""
+    health_store.clear()
+    health_monitor.reset()
+    yield
+    health_monitor.stop()
+    health_store.clear()
+    health_monitor.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_lease_store():
+    """Release every lease so leased proxies do not leak between tests."""
+    lease_store.clear()
+    yield
+    lease_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_change_feed():
+    """Start every test at pool version 0."""
+    change_feed.clear()
+    yield
+    change_feed.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_response_cache():
+    """Drop cached listing bodies, pool versions restart from 0 in every test."""
+    response_cache.clear()
+    yield
+    response_cache.clear()
@@ -0,0 +1,96 @@
+"""
+Unit tests for conditional GETs on the listing endpoints.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.rolling import rolling_manager
+from cloudproxy.providers.versioned import VersionedSet
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def pool():
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": ["1.1.1.1", "2.2.2.2"]}}}}
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", set()), patch("cloudproxy.main.restart_queue", set()):
+        yield providers["aws"]["instances"]["default"]
+
+
+def test_root_etag_follows_pool_version(client, pool):
+    """Test GET / answers 304 until the pool changes"""
+    first = client.get("/")
+    etag = first.headers["etag"]
+
+    cached = client.get("/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # The cached body is served with fresh metadata
+    again = client.get("/")
+    assert again.headers["etag"] == etag
+    assert again.json()["proxies"] == first.json()["proxies"]
+    assert again.json()["metadata"]["request_id"] != first.json()["metadata"]["request_id"]
+
+    pool["ips"] = ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    changed = client.get("/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["total"] == 3
+    assert changed.headers["etag"] != etag
+
+
+def test_root_etag_depends_on_page_and_queues(client, pool):
+    """Test pages and queued proxies get their own ETags"""
+    etag = client.get("/").headers["etag"]
+    assert client.get("/", params={"limit": 1}).headers["etag"] != etag
+
+    with patch("cloudproxy.main.delete_queue", {"1.1.1.1"}):
+        response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [proxy["ip"] for proxy in response.json()["proxies"]] == ["2.2.2.2"]
+
+
+def test_root_etag_follows_queue_edits(client, pool):
+    """Test queueing a proxy in place changes the ETag"""
+    queue = VersionedSet()
+    with patch("cloudproxy.main.delete_queue", queue):
+        etag = client.get("/").headers["etag"]
+        queue.add("2.2.2.2")
+        response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [proxy["ip"] for proxy in response.json()["proxies"]] == ["1.1.1.1"]
+
+
+def test_providers_etag_follows_config(client):
+    """Test GET /providers changes its ETag when the scaling changes"""
+    scaling = settings.config["providers"]["aws"]["instances"]["default"]["scaling"]
+    etag = client.get("/providers").headers["etag"]
+    assert client.get("/providers", headers={"If-None-Match": etag}).status_code == 304
+
+    with patch.dict(scaling, {"min_scaling": scaling["min_scaling"] + 1}):
+        response = client.get("/providers", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["providers"]["aws"]["scaling"]["min_scaling"] == scaling["min_scaling"] + 1
+
+
+def test_rolling_etag_follows_manager_state(client):
+    """Test GET /rolling changes its ETag after a rolling state update"""
+    etag = client.get("/rolling").headers["etag"]
+    assert client.get("/rolling", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+    rolling_manager.update_proxy_health("aws", "etag-test", ["1.1.1.1"])
+    try:
+        response = client.get("/rolling", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert "aws/etag-test" in response.json()["status"]
+    finally:
+        rolling_manager.states.pop(("aws", "etag-test"), None)
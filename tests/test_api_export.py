@@ -0,0 +1,62 @@
+"""
+Unit tests for the streaming pool export and cursor pagination.
+"""
+
+import csv
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+
+IPS = [f"10.0.0.{n}" for n in range(1, 8)]
+
+
+@pytest.fixture
+def client():
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": IPS, "display_name": "AWS"}}}}
+    with patch.dict(settings.config, {"providers": providers, "no_auth": True}), \
+         patch("cloudproxy.main.delete_queue", {"10.0.0.2"}), patch("cloudproxy.main.restart_queue", set()):
+        yield TestClient(app)
+
+
+def test_export_ndjson(client):
+    """Test the NDJSON export streams every available proxy"""
+    response = client.get("/proxies/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["ip"] for row in rows] == [ip for ip in IPS if ip != "10.0.0.2"]
+    assert rows[0] == {
+        "ip": "10.0.0.1", "port": 8899, "auth_enabled": False, "url": "http://10.0.0.1:8899",
+        "provider": "aws", "instance": "default", "display_name": "AWS",
+    }
+
+
+def test_export_text_and_csv(client):
+    """Test the plain text and CSV exports"""
+    with patch("cloudproxy.main.EXPORT_CHUNK", 2):
+        text = client.get("/proxies/export", params={"format": "text"})
+        table = client.get("/proxies/export", params={"format": "csv"})
+    assert text.text.splitlines() == [f"{ip}:8899" for ip in IPS if ip != "10.0.0.2"]
+    rows = list(csv.DictReader(io.StringIO(table.text)))
+    assert len(rows) == 6
+    assert rows[-1]["url"] == "http://10.0.0.7:8899"
+    assert client.get("/proxies/export", params={"format": "xml"}).status_code == 422
+
+
+def test_cursor_pagination(client):
+    """Test following next_cursor through GET / lists every proxy once"""
+    page = client.get("/", params={"limit": 4}).json()
+    seen = [proxy["ip"] for proxy in page["proxies"]]
+    while page["next_cursor"]:
+        page = client.get("/", params={"limit": 4, "cursor": page["next_cursor"]}).json()
+        seen += [proxy["ip"] for proxy in page["proxies"]]
+    assert seen == [ip for ip in IPS if ip != "10.0.0.2"]
+    assert page["total"] == 6
+
+    assert client.get("/", params={"cursor": "abc"}).status_code == 422
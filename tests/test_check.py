@@ -2,9 +2,24 @@ import pytest
 from unittest.mock import Mock, patch
 import requests
 
-from cloudproxy.check import requests_retry_session, fetch_ip, check_alive
+from cloudproxy.check import (
+    requests_retry_session,
+    fetch_ip,
+    check_alive,
+    check_alive_batch,
+    probe_sessions,
+    ProbeSessionPool,
+    ProbeTargets,
+)
 from cloudproxy.providers import settings
 
+@pytest.fixture(autouse=True)
+def reset_probe_sessions():
+    """Start every test with an empty probe session pool"""
+    probe_sessions.clear()
+    yield
+    probe_sessions.clear()
+
 @pytest.fixture
 def mock_session():
     """Create a mock session for testing"""
@@ -106,7 +121,7 @@ def test_fetch_ip_with_auth(mock_retry_session):
         settings.config["auth"]["username"] = original_username
         settings.config["auth"]["password"] = original_password
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_success(mock_get):
     """Test check_alive function with a successful response"""
     # Setup for successful response
@@ -130,7 +145,7 @@ def test_check_alive_success(mock_get):
     finally:
         settings.config["no_auth"] = original_no_auth
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_auth_required(mock_get):
     """Test check_alive function with 407 status code"""
     # Setup for auth required response
@@ -144,7 +159,7 @@ def test_check_alive_auth_required(mock_get):
     # Verify
     assert result is True  # Should still return True for 407
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_error_status(mock_get):
     """Test check_alive function with error status code"""
     # Setup for error response
@@ -158,7 +173,7 @@ def test_check_alive_error_status(mock_get):
     # Verify
     assert result is False
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_exception(mock_get):
     """Test check_alive function with exception"""
     # Setup to raise exception
@@ -168,4 +183,188 @@ def test_check_alive_exception(mock_get):
     result = check_alive("10.0.0.1")
     
     # Verify
-    assert result is False 
\ No newline at end of file
+    assert result is False 
+def test_check_alive_batch_returns_result_per_ip():
+    """Test check_alive_batch maps every IP to its probe result"""
+    probe = Mock(side_effect=lambda ip: ip != "10.0.0.2")
+
+    result = check_alive_batch(["10.0.0.1", "10.0.0.2", "10.0.0.3"], probe=probe, concurrency=3)
+
+    assert result == {"10.0.0.1": True, "10.0.0.2": False, "10.0.0.3": True}
+    assert probe.call_count == 3
+
+def test_check_alive_batch_deduplicates_and_handles_empty():
+    """Test check_alive_batch probes each IP once and accepts an empty list"""
+    probe = Mock(return_value=True)
+
+    assert check_alive_batch([], probe=probe) == {}
+    result = check_alive_batch(["10.0.0.1", "10.0.0.1"], probe=probe)
+
+    assert result == {"10.0.0.1": True}
+    probe.assert_called_once_with("10.0.0.1")
+
+def test_check_alive_batch_probe_exception_is_unhealthy():
+    """Test check_alive_batch treats a probe that raises as unhealthy"""
+    def probe(ip):
+        if ip == "10.0.0.1":
+            raise RuntimeError("boom")
+        return True
+
+    result = check_alive_batch(["10.0.0.1", "10.0.0.2"], probe=probe, concurrency=2)
+
+    assert result == {"10.0.0.1": False, "10.0.0.2": True}
+
+def test_check_alive_batch_runs_probes_concurrently():
+    """Test check_alive_batch keeps several probes in flight at once"""
+    import threading
+
+    barrier = threading.Barrier(4, timeout=5)
+
+    def probe(ip):
+        # Only succeeds if all four probes are running at the same time
+        barrier.wait()
+        return True
+
+    ips = [f"10.0.0.{i}" for i in range(4)]
+    result = check_alive_batch(ips, probe=probe, concurrency=4)
+
+    assert all(result[ip] for ip in ips)
+
+@patch('cloudproxy.check.requests.Session.get')
+def test_check_alive_uses_configured_timeout(mock_get):
+    """Test check_alive uses the configured health check timeout"""
+    mock_get.return_value = Mock(status_code=200)
+    original_timeout = settings.config["health_check"]["timeout"]
+    settings.config["health_check"]["timeout"] = 3
+    try:
+        check_alive("10.0.0.1")
+        assert mock_get.call_args.kwargs["timeout"] == 3
+    finally:
+        settings.config["health_check"]["timeout"] = original_timeout
+
+def test_probe_session_pool_reuses_session_per_ip():
+    """Test the probe pool hands out the same session for repeated probes of one IP"""
+    pool = ProbeSessionPool(max_sessions=4)
+
+    first = pool.get("10.0.0.1")
+    second = pool.get("10.0.0.1")
+    other = pool.get("10.0.0.2")
+
+    assert first is second
+    assert other is not first
+    stats = pool.stats()
+    assert stats["sessions"] == 2
+    assert stats["created"] == 2
+    assert stats["reused"] == 1
+
+def test_probe_session_pool_evicts_least_recently_used():
+    """Test the probe pool stays bounded and evicts the oldest session"""
+    pool = ProbeSessionPool(max_sessions=2)
+
+    oldest = pool.get("10.0.0.1")
+    pool.get("10.0.0.2")
+    pool.get("10.0.0.1")  # Refresh 10.0.0.1 so 10.0.0.2 becomes the oldest
+    pool.get("10.0.0.3")
+
+    assert pool.stats()["sessions"] == 2
+    assert pool.stats()["evicted"] == 1
+    assert pool.get("10.0.0.1") is oldest
+    assert pool.stats()["created"] == 3
+
+def test_probe_session_pool_discard_and_clear():
+    """Test sessions can be dropped individually or all at once"""
+    pool = ProbeSessionPool(max_sessions=4)
+    session = pool.get("10.0.0.1")
+    pool.get("10.0.0.2")
+
+    pool.discard("10.0.0.1")
+    assert pool.get("10.0.0.1") is not session
+
+    pool.clear()
+    assert pool.stats() == {
+        "sessions": 0, "max_sessions": 4, "created": 0, "reused": 0, "evicted": 0
+    }
+
+def test_check_alive_reuses_pooled_session():
+    """Test consecutive probes of the same proxy go through one pooled session"""
+    with patch('cloudproxy.check.requests.Session.get') as mock_get:
+        mock_get.return_value = Mock(status_code=200)
+
+        assert check_alive("10.0.0.1") is True
+        assert check_alive("10.0.0.1") is True
+
+    assert probe_sessions.stats()["created"] == 1
+    assert probe_sessions.stats()["reused"] == 1
+
+def test_probe_targets_order_prefers_fast_healthy_targets():
+    """Test echo targets are ordered by failures first, then latency"""
+    targets = ProbeTargets(["http://a/", "http://b/", "http://c/"])
+    assert targets.ordered() == ["http://a/", "http://b/", "http://c/"]
+
+    targets.record_success("http://a/", 0.9)
+    targets.record_success("http://b/", 0.1)
+    targets.record_success("http://c/", 0.2)
+    targets.record_failure("http://b/", "timeout")
+
+    assert targets.ordered() == ["http://c/", "http://a/", "http://b/"]
+    stats = {t["url"]: t for t in targets.stats()}
+    assert stats["http://b/"]["consecutive_failures"] == 1
+    assert stats["http://b/"]["last_error"] == "timeout"
+
+def test_check_alive_fails_over_to_next_target():
+    """Test check_alive tries the next echo target when one is unavailable"""
+    targets = ProbeTargets(["http://primary/", "http://secondary/"])
+
+    def fake_get(url, proxies, timeout):
+        if url == "http://primary/":
+            raise requests.exceptions.ReadTimeout("slow target")
+        return Mock(status_code=200)
+
+    with patch('cloudproxy.check.probe_targets', targets), \
+            patch('cloudproxy.check.requests.Session.get', side_effect=fake_get) as mock_get:
+        assert check_alive("10.0.0.1") is True
+        assert [c.args[0] for c in mock_get.call_args_list] == ["http://primary/", "http://secondary/"]
+
+    # The failing target is now tried last
+    assert targets.ordered() == ["http://secondary/", "http://primary/"]
+
+def test_check_alive_does_not_fail_over_when_proxy_is_down():
+    """Test a proxy connection failure is not blamed on the echo target"""
+    targets = ProbeTargets(["http://primary/", "http://secondary/"])
+
+    with patch('cloudproxy.check.probe_targets', targets), \
+            patch('cloudproxy.check.requests.Session.get',
+                  side_effect=requests.exceptions.ProxyError("refused")) as mock_get:
+        assert check_alive("10.0.0.1") is False
+        assert mock_get.call_count == 1
+
+    assert all(t["failures"] == 0 for t in targets.stats())
+
+def test_check_alive_tunnel_auth_required():
+    """Test a CONNECT answered with 407 counts as alive, as a plain 407 response does"""
+    targets = ProbeTargets(["https://primary/", "https://secondary/"])
+    error = requests.exceptions.ProxyError(
+        "HTTPSConnectionPool(host='primary', port=443): Max retries exceeded with url: / "
+        "(Caused by ProxyError('Unable to connect to proxy', "
+        "OSError('Tunnel connection failed: 407 Proxy Authentication Required')))"
+    )
+
+    with patch('cloudproxy.check.probe_targets', targets), \
+            patch('cloudproxy.check.requests.Session.get', side_effect=error) as mock_get:
+        assert check_alive("10.0.0.1") is True
+        assert mock_get.call_count == 1
+
+    assert all(t["failures"] == 0 for t in targets.stats())
+
+def test_fetch_ip_fails_over_to_next_target():
+    """Test fetch_ip uses the next IP echo target when one errors"""
+    targets = ProbeTargets(["https://first/", "https://second/"])
+
+    def fake_get(url, proxies, timeout):
+        if url == "https://first/":
+            raise requests.exceptions.ConnectionError("reset")
+        return Mock(text="203.0.113.5")
+
+    with patch('cloudproxy.check.ip_targets', targets), \
+            patch('cloudproxy.check.requests.Session.get', side_effect=fake_get):
+        assert fetch_ip("10.0.0.1") == "203.0.113.5"
@@ -2,10 +2,17 @@ import pytest
 from unittest.mock import patch, MagicMock
 import requests
 
-from cloudproxy.check import check_alive, fetch_ip
+from cloudproxy.check import check_alive, fetch_ip, probe_sessions
 from cloudproxy.providers import settings
 
 
+@pytest.fixture(autouse=True)
+def reset_probe_sessions():
+    """Start every test with an empty probe session pool"""
+    probe_sessions.clear()
+    yield
+    probe_sessions.clear()
+
 @pytest.fixture
 def mock_proxy_data():
     """Fixture for mock proxy data from different provider instances."""
@@ -64,7 +71,7 @@ def setup_auth():
     settings.config["no_auth"] = original_no_auth
 
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_for_different_instances(mock_requests_get, mock_proxy_data):
     """Test check_alive function for proxies from different provider instances."""
     # Setup mock response with success status code
@@ -173,7 +180,7 @@ def test_fetch_ip_without_auth_for_different_instances(mock_retry_session, mock_
         mock_retry_session.reset_mock()
 
 
-@patch('cloudproxy.check.requests.get')
+@patch('cloudproxy.check.requests.Session.get')
 def test_check_alive_exception_handling_for_different_instances(mock_get, mock_proxy_data):
     """Test that check_alive properly handles exceptions for proxies from different provider instances."""
     # List of exceptions to test
@@ -0,0 +1,286 @@
+"""
+Unit tests for the rotating forward-proxy gateway.
+"""
+
+import asyncio
+import base64
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy import gateway
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.registry import proxy_registry
+
+
+class FakeProxy:
+    """Stand-in for tinyproxy on several loopback IPs sharing one port."""
+
+    def __init__(self, ips):
+        self.ips = ips
+        self.connections = {ip: 0 for ip in ips}
+        self.requests = []
+        self.tasks = set()
+        self.loop = asyncio.new_event_loop()
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        self.port = probe.getsockname()[1]
+        probe.close()
+        self.servers = [
+            self.loop.run_until_complete(asyncio.start_server(
+                lambda r, w, ip=ip: self.handle(ip, r, w), ip, self.port
+            ))
+            for ip in ips
+        ]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def handle(self, ip, reader, writer):
+        self.connections[ip] += 1
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            while True:
+                head = await gateway.read_head(reader)
+                if head is None:
+                    break
+                start_line, headers = gateway.parse_head(head)
+                self.requests.append((ip, start_line, dict(headers)))
+                method, target, _ = start_line.split(" ")
+                if method == "CONNECT":
+                    writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                    while True:
+                        data = await reader.read(1024)
+                        if not data:
+                            break
+                        writer.write(data.upper())
+                        await writer.drain()
+                    break
+                length = int(dict((k.lower(), v) for k, v in headers).get("content-length", 0))
+                body = await reader.readexactly(length)
+                payload = f"{ip} {target} {body.decode()}".encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(payload), payload))
+                await writer.drain()
+        finally:
+            self.tasks.discard(task)
+            writer.close()
+
+    async def shutdown(self):
+        for server in self.servers:
+            server.close()
+        # Handlers still waiting on open connections must finish on this loop
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+
+
+@pytest.fixture
+def upstreams():
+    proxy = FakeProxy(["127.0.0.1", "127.0.0.2"])
+    yield proxy
+    proxy.close()
+
+
+@pytest.fixture
+def running_gateway(upstreams):
+    """A gateway on a free port routing to the fake proxies"""
+    config = {"enabled": True, "host": "127.0.0.1", "port": 0, "strategy": "round_robin",
+              "retries": 2, "connect_timeout": 2, "pool_size": 8, "idle_timeout": 30}
+    proxy_gateway = gateway.ProxyGateway()
+    with patch.dict(settings.config["gateway"], config), \
+         patch.dict(settings.config, {"no_auth": False, "auth": {"username": "user", "password": "pass"}}), \
+         patch.object(gateway, "UPSTREAM_PORT", upstreams.port):
+        assert proxy_gateway.start(exclude=set)
+        yield proxy_gateway
+        proxy_gateway.stop()
+
+
+def use_pool(*ips):
+    proxy_registry.sync_instance("aws", "default", list(ips))
+    # The gateway syncs the registry from the config on every pick
+    return patch.dict(settings.config, {"providers": {"aws": {"instances": {"default": {"ips": list(ips)}}}}})
+
+
+AUTH = "Proxy-Authorization: Basic " + base64.b64encode(b"user:pass").decode() + "\r\n"
+
+
+def exchange(sock, request):
+    """Send one request and read one Content-Length framed response"""
+    sock.sendall(request.encode())
+    data = b""
+    while b"\r\n\r\n" not in data:
+        data += sock.recv(4096)
+    head, _, body = data.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    while len(body) < length:
+        body += sock.recv(4096)
+    return head.split(b"\r\n")[0].decode(), body.decode()
+
+
+def connect(proxy_gateway):
+    return socket.create_connection(("127.0.0.1", proxy_gateway.port), timeout=5)
+
+
+def test_requests_rotate_and_reuse_upstream_connections(running_gateway, upstreams):
+    """Test plain HTTP requests are spread over the pool on pooled upstream connections"""
+    with use_pool("127.0.0.1", "127.0.0.2"):
+        served = []
+        for _ in range(2):
+            with connect(running_gateway) as sock:
+                for _ in range(2):
+                    status, body = exchange(sock, f"GET http://example.test/a HTTP/1.1\r\nHost: example.test\r\n{AUTH}\r\n")
+                    assert status == "HTTP/1.1 200 OK"
+                    served.append(body.split(" ")[0])
+
+    assert sorted(served) == ["127.0.0.1", "127.0.0.1", "127.0.0.2", "127.0.0.2"]
+    # One upstream connection per proxy, reused by the later requests
+    assert upstreams.connections == {"127.0.0.1": 1, "127.0.0.2": 1}
+    # The gateway authenticates to the upstream proxy
+    assert all(headers["Proxy-Authorization"] == AUTH.split(": ", 1)[1].strip() for _, _, headers in upstreams.requests)
+
+    stats = running_gateway.stats()
+    assert stats["upstream_connections_reused"] == 2
+    assert stats["upstreams"]["127.0.0.1"]["requests"] == 2
+    assert stats["upstreams"]["127.0.0.1"]["bytes_received"] > 0
+
+
+def test_request_body_is_forwarded(running_gateway, upstreams):
+    """Test chunked request bodies are de-chunked and forwarded"""
+    with use_pool("127.0.0.1"), connect(running_gateway) as sock:
+        status, body = exchange(
+            sock,
+            f"POST http://example.test/form HTTP/1.1\r\nHost: example.test\r\n{AUTH}"
+            "Transfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n0\r\n\r\n"
+        )
+    assert body == "127.0.0.1 http://example.test/form hello"
+
+
+def test_failed_upstream_is_retried_on_another_proxy(running_gateway, upstreams):
+    """Test a proxy that refuses connections is skipped"""
+    with use_pool("127.0.0.3", "127.0.0.1"):
+        for _ in range(2):
+            with connect(running_gateway) as sock:
+                status, body = exchange(sock, f"GET http://example.test/ HTTP/1.1\r\nHost: example.test\r\n{AUTH}\r\n")
+            assert status == "HTTP/1.1 200 OK"
+            assert body.startswith("127.0.0.1 ")
+    assert running_gateway.stats()["upstreams"]["127.0.0.3"]["failures"] >= 1
+
+
+@pytest.fixture
+def dropping_upstream(upstreams):
+    """A proxy on 127.0.0.4 that reads each request head and hangs up without answering"""
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await gateway.read_head(reader))
+        writer.close()
+
+    server = asyncio.run_coroutine_threadsafe(
+        asyncio.start_server(handle, "127.0.0.4", upstreams.port), upstreams.loop
+    ).result(timeout=5)
+    yield received
+    upstreams.loop.call_soon_threadsafe(server.close)
+
+
+def test_request_dropped_after_sending_is_retried_if_idempotent(running_gateway, upstreams, dropping_upstream):
+    """Test a GET the proxy hung up on is sent to another proxy"""
+    with use_pool("127.0.0.4", "127.0.0.1"), connect(running_gateway) as sock:
+        status, body = exchange(sock, f"GET http://example.test/ HTTP/1.1\r\nHost: example.test\r\n{AUTH}\r\n")
+    assert status == "HTTP/1.1 200 OK"
+    assert body.startswith("127.0.0.1 ")
+    assert len(dropping_upstream) == 1
+
+
+def test_post_dropped_after_sending_is_not_resent(running_gateway, upstreams, dropping_upstream):
+    """Test a POST the proxy may have forwarded is answered with 502 rather than sent again"""
+    with use_pool("127.0.0.4", "127.0.0.1"), connect(running_gateway) as sock:
+        status, _ = exchange(
+            sock,
+            f"POST http://example.test/order HTTP/1.1\r\nHost: example.test\r\n{AUTH}Content-Length: 2\r\n\r\nok"
+        )
+    assert status == "HTTP/1.1 502 Upstream proxy failed"
+    assert len(dropping_upstream) == 1
+    assert upstreams.requests == []
+
+
+def test_no_available_upstream_is_bad_gateway(running_gateway):
+    """Test the gateway answers 502 when every proxy fails"""
+    with use_pool("127.0.0.3"), connect(running_gateway) as sock:
+        status, _ = exchange(sock, f"GET http://example.test/ HTTP/1.1\r\nHost: example.test\r\n{AUTH}\r\n")
+    assert status == "HTTP/1.1 502 No upstream proxy available"
+
+
+def test_clients_must_authenticate(running_gateway):
+    """Test requests without the proxy credentials are refused"""
+    with use_pool("127.0.0.1"), connect(running_gateway) as sock:
+        status, _ = exchange(sock, "GET http://example.test/ HTTP/1.1\r\nHost: example.test\r\n\r\n")
+    assert status == "HTTP/1.1 407 Proxy Authentication Required"
+
+
+def test_refused_request_body_is_not_read_as_a_request(running_gateway, upstreams):
+    """Test the body of a refused request is skipped rather than served as the next request"""
+    smuggled = f"GET http://smuggled.test/ HTTP/1.1\r\nHost: smuggled.test\r\n{AUTH}\r\n"
+    with use_pool("127.0.0.1"), connect(running_gateway) as sock:
+        status, _ = exchange(
+            sock,
+            f"POST http://example.test/ HTTP/1.1\r\nHost: example.test\r\nContent-Length: {len(smuggled)}\r\n\r\n{smuggled}"
+        )
+        assert status == "HTTP/1.1 407 Proxy Authentication Required"
+        status, body = exchange(sock, f"GET http://example.test/a HTTP/1.1\r\nHost: example.test\r\n{AUTH}\r\n")
+    assert status == "HTTP/1.1 200 OK"
+    assert body.startswith("127.0.0.1 http://example.test/a")
+    assert [request[1] for request in upstreams.requests] == ["GET http://example.test/a HTTP/1.1"]
+
+
+def test_connect_tunnel(running_gateway, upstreams):
+    """Test CONNECT opens a tunnel through an upstream proxy"""
+    with use_pool("127.0.0.2"), connect(running_gateway) as sock:
+        sock.sendall(f"CONNECT example.test:443 HTTP/1.1\r\nHost: example.test:443\r\n{AUTH}\r\n".encode())
+        assert sock.recv(1024).startswith(b"HTTP/1.1 200")
+        sock.sendall(b"ping")
+        assert sock.recv(1024) == b"PING"
+    assert upstreams.requests[0][1] == "CONNECT example.test:443 HTTP/1.1"
+
+
+def test_unauthenticated_gateway_listens_on_loopback_only():
+    """Test turning authentication off does not expose an open relay unless allowed"""
+    with patch.dict(settings.config, {"no_auth": True}):
+        with patch.dict(settings.config["gateway"], {"host": "0.0.0.0", "allow_unauthenticated": False}):
+            assert gateway.listen_host() == "127.0.0.1"
+        with patch.dict(settings.config["gateway"], {"host": "0.0.0.0", "allow_unauthenticated": True}):
+            assert gateway.listen_host() == "0.0.0.0"
+    with patch.dict(settings.config, {"no_auth": False}), \
+         patch.dict(settings.config["gateway"], {"host": "0.0.0.0", "allow_unauthenticated": False}):
+        assert gateway.listen_host() == "0.0.0.0"
+
+
+def test_gateway_disabled_by_default():
+    """Test the gateway does not start unless enabled"""
+    with patch.dict(settings.config["gateway"], {"enabled": False}):
+        assert gateway.ProxyGateway().start() is False
+
+
+def test_gateway_status_endpoint():
+    """Test GET /gateway reports the configuration"""
+    response = TestClient(app).get("/gateway")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["config"]["port"] == settings.config["gateway"]["port"]
+    assert data["running"] is False
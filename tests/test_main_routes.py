@@ -421,4 +421,67 @@ def test_provider_model_selection():
     assert aws_model.instances["default"].ami == "ami-12345"
     assert aws_model.instances["default"].spot is True
     assert aws_model.instances["production"].region == "us-west-2"
-    assert aws_model.instances["production"].display_name == "AWS Production" 
\ No newline at end of file
+    assert aws_model.instances["production"].display_name == "AWS Production" 
+# Tests for the probe status endpoint
+def test_probe_status_endpoint():
+    """Test the probe status endpoint reports config and pool statistics"""
+    response = client.get("/probes")
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["config"]["concurrency"] == config["health_check"]["concurrency"]
+    assert data["config"]["timeout"] == config["health_check"]["timeout"]
+    assert data["pool"]["max_sessions"] == config["health_check"]["pool_size"]
+    assert set(data["pool"]) == {"sessions", "max_sessions", "created", "reused", "evicted"}
+
+def test_probe_status_endpoint_lists_targets():
+    """Test the probe status endpoint reports echo target statistics"""
+    response = client.get("/probes")
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [t["url"] for t in data["targets"]] == config["health_check"]["urls"]
+    assert [t["url"] for t in data["ip_targets"]] == config["health_check"]["ip_urls"]
+
+def test_echo_endpoint_returns_caller_ip():
+    """Test the echo endpoint returns the client IP as plain text"""
+    response = client.get("/echo")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    # The test client doesn't set a peer address, so call the handler directly
+    from cloudproxy.main import echo
+    assert echo(Mock(client=Mock(host="203.0.113.9"))) == "203.0.113.9"
+
+# Tests for the scheduler status endpoint
+def test_scheduler_status_endpoint():
+    """Test the scheduler endpoint reports config and tick metrics"""
+    from cloudproxy.providers.scheduler import tick_metrics
+    tick_metrics.record("aws-default", 1.5)
+    try:
+        response = client.get("/scheduler")
+    finally:
+        tick_metrics.clear()
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["config"]["workers"] == config["scheduler"]["workers"]
+    assert data["config"]["interval"] == config["scheduler"]["interval"]
+    job = next(job for job in data["jobs"] if job["id"] == "aws-default")
+    assert job["runs"] == 1
+    assert job["last_duration"] == 1.5
+
+def test_scale_update_triggers_reconcile():
+    """Test updating an instance's scaling triggers an early reconcile of it"""
+    with patch("cloudproxy.main.request_reconcile") as mock_reconcile:
+        response = client.patch("/providers/digitalocean/default", json={"min_scaling": 2, "max_scaling": 3})
+    assert response.status_code == 200
+    mock_reconcile.assert_called_once_with("digitalocean", "default")
+
+def test_destroy_triggers_reconcile():
+    """Test queueing a proxy for deletion triggers an early reconcile"""
+    with patch("cloudproxy.main.request_reconcile_for_ip") as mock_reconcile, \
+            patch("cloudproxy.main.delete_queue", set()):
+        response = client.delete("/destroy?ip_address=192.168.1.10")
+    assert response.status_code == 200
+    mock_reconcile.assert_called_once_with("192.168.1.10")
@@ -8,6 +8,8 @@ import sys
 from cloudproxy.providers import settings
 from cloudproxy.providers.aws.functions import (
     create_proxy,
+    create_proxies,
+    delete_proxies,
     delete_proxy,
     stop_proxy,
     start_proxy,
@@ -273,7 +275,7 @@ def test_delete_proxy(mock_get_clients):
     
     # Create a mock for the instances collection
     instances_collection = MagicMock()
-    terminated_instances = [{'InstanceId': 'i-12345', 'CurrentState': {'Name': 'shutting-down'}}]
+    terminated_instances = [{'TerminatingInstances': [{'InstanceId': 'i-12345', 'CurrentState': {'Name': 'shutting-down'}}]}]
     
     # Mock the instances collection filter method
     instances = MagicMock()
@@ -292,7 +294,7 @@ def test_delete_proxy(mock_get_clients):
     mock_get_clients.assert_called_once()
     instances_collection.filter.assert_called_once_with(InstanceIds=[instance_id])
     instances.terminate.assert_called_once()
-    assert result == terminated_instances
+    assert result == ['i-12345']
 
 @patch('cloudproxy.providers.aws.functions.get_clients')
 def test_delete_proxy_with_instance_config(mock_get_clients, test_instance_config):
@@ -304,7 +306,7 @@ def test_delete_proxy_with_instance_config(mock_get_clients, test_instance_confi
     
     # Create a mock for the instances collection
     instances_collection = MagicMock()
-    terminated_instances = [{'InstanceId': 'i-12345', 'CurrentState': {'Name': 'shutting-down'}}]
+    terminated_instances = [{'TerminatingInstances': [{'InstanceId': 'i-12345', 'CurrentState': {'Name': 'shutting-down'}}]}]
     
     # Mock the instances collection filter method
     instances = MagicMock()
@@ -323,7 +325,7 @@ def test_delete_proxy_with_instance_config(mock_get_clients, test_instance_confi
     mock_get_clients.assert_called_once_with(test_instance_config)
     instances_collection.filter.assert_called_once_with(InstanceIds=[instance_id])
     instances.terminate.assert_called_once()
-    assert result == terminated_instances
+    assert result == ['i-12345']
 
 @patch('cloudproxy.providers.aws.functions.get_clients')
 def test_stop_proxy(mock_get_clients):
@@ -493,4 +495,103 @@ def test_list_instances_with_instance_config(mock_get_clients, mock_instances_re
         assert result == mock_instances_response["Reservations"]
     finally:
         # Restore original config
-        settings.config["providers"]["aws"]["instances"] = original_instances 
\ No newline at end of file
+        settings.config["providers"]["aws"]["instances"] = original_instances 
+
+
+@patch('cloudproxy.providers.aws.functions.get_clients')
+def test_create_proxies_single_run_instances_call(mock_get_clients, mock_vpc_response, mock_sg_response, test_instance_config):
+    """Test bulk creation launches all instances with one MaxCount request"""
+    mock_ec2 = MagicMock()
+    mock_ec2_client = MagicMock()
+    mock_get_clients.return_value = (mock_ec2, mock_ec2_client)
+    vpc_mock = Mock()
+    vpc_mock.id = "vpc-12345"
+    mock_ec2.vpcs.filter.return_value = [vpc_mock]
+    mock_ec2_client.describe_vpcs.return_value = mock_vpc_response
+    mock_ec2_client.describe_security_groups.return_value = mock_sg_response
+    mock_ec2.create_instances.return_value = [Mock(), Mock(), Mock()]
+
+    result = create_proxies(5, test_instance_config)
+
+    mock_ec2.create_instances.assert_called_once()
+    kwargs = mock_ec2.create_instances.call_args[1]
+    assert kwargs["MinCount"] == 1
+    assert kwargs["MaxCount"] == 5
+    assert result.created == 3
+    assert result.failed == 2
+    assert "EC2 launched 3" in result.errors[0]
+
+
+@patch('cloudproxy.providers.aws.functions.create_proxy')
+def test_create_proxies_client_error(mock_create_proxy, test_instance_config):
+    """Test an EC2 API error is reported instead of raised"""
+    mock_create_proxy.side_effect = ClientError(
+        {"Error": {"Code": "InsufficientInstanceCapacity", "Message": "no capacity"}}, "RunInstances"
+    )
+
+    result = create_proxies(2, test_instance_config)
+
+    assert result.created == 0
+    assert result.failed == 2
+    assert "InsufficientInstanceCapacity" in result.errors[0]
+
+
+@patch('cloudproxy.providers.aws.functions.get_clients')
+def test_delete_proxies_single_terminate_call(mock_get_clients, test_instance_config):
+    """Test bulk deletion terminates all instances and cancels their spot requests together"""
+    mock_ec2 = MagicMock()
+    mock_ec2_client = MagicMock()
+    mock_get_clients.return_value = (mock_ec2, mock_ec2_client)
+    mock_ec2_client.describe_spot_instance_requests.return_value = {
+        "SpotInstanceRequests": [
+            {"SpotInstanceRequestId": "sir-1"},
+            {"SpotInstanceRequestId": "sir-2"},
+        ]
+    }
+    mock_ec2.instances.filter.return_value.terminate.return_value = [
+        {"TerminatingInstances": [{"InstanceId": f"i-{n}"} for n in (1, 2, 3)]}
+    ]
+    test_instance_config["spot"] = "one-time"
+
+    assert delete_proxies(["i-1", "i-2", "i-3"], test_instance_config) == ["i-1", "i-2", "i-3"]
+
+    mock_ec2.instances.filter.assert_called_once_with(InstanceIds=["i-1", "i-2", "i-3"])
+    mock_ec2.instances.filter.return_value.terminate.assert_called_once()
+    mock_ec2_client.cancel_spot_instance_requests.assert_called_once_with(
+        SpotInstanceRequestIds=["sir-1", "sir-2"]
+    )
+
+
+@patch('cloudproxy.providers.aws.functions.get_clients')
+def test_delete_proxies_nothing_to_do(mock_get_clients, test_instance_config):
+    """Test bulk deletion of an empty list makes no API calls"""
+    assert delete_proxies([], test_instance_config) == []
+    mock_get_clients.assert_not_called()
+
+
+
+@patch('cloudproxy.providers.aws.functions.get_clients')
+def test_delete_proxies_terminate_failure(mock_get_clients, test_instance_config):
+    """Test a failed terminate call is logged and reports nothing terminated"""
+    mock_ec2 = MagicMock()
+    mock_ec2_client = MagicMock()
+    mock_get_clients.return_value = (mock_ec2, mock_ec2_client)
+    mock_ec2.instances.filter.return_value.terminate.side_effect = ClientError(
+        {"Error": {"Code": "UnauthorizedOperation", "Message": "Denied"}}, "TerminateInstances"
+    )
+    test_instance_config["spot"] = "one-time"
+
+    assert delete_proxies(["i-1", "i-2"], test_instance_config) == []
+    mock_ec2_client.cancel_spot_instance_requests.assert_not_called()
+
+
+@patch('cloudproxy.providers.aws.functions.get_clients')
+def test_delete_proxies_returns_only_terminating(mock_get_clients, test_instance_config):
+    """Test only the instances AWS reports as terminating are returned"""
+    mock_ec2 = MagicMock()
+    mock_get_clients.return_value = (mock_ec2, MagicMock())
+    mock_ec2.instances.filter.return_value.terminate.return_value = [
+        {"TerminatingInstances": [{"InstanceId": "i-2"}]}
+    ]
+
+    assert delete_proxies(["i-1", "i-2"], test_instance_config) == ["i-2"]
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, ANY
 import datetime
 from datetime import timezone
 import time
@@ -11,6 +11,8 @@ from cloudproxy.providers.aws.main import (
     aws_check_stop,
     aws_start
 )
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.inventory import Inventory
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
 
 # Setup fixtures
@@ -80,96 +82,93 @@ def test_instance_config():
     }
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_scale_up(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_scale_up(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test scaling up AWS instances"""
     # Setup - Only 2 instances, need to scale up to 4
     mock_list_instances.return_value = setup_instances
-    mock_create_proxy.return_value = True
+    mock_create_proxies.return_value = BatchResult(requested=2, created=2)
     
     # Execute
     min_scaling = 4
     result = aws_deployment(min_scaling)
     
-    # Verify
-    assert mock_create_proxy.call_count == 2  # Should create 2 new instances
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
+    # Verify - both missing instances are launched in one batched call
+    mock_create_proxies.assert_called_once()
+    assert mock_create_proxies.call_args[0][0] == 2
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
     assert result == 2  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_with_instance_config(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances, test_instance_config):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_with_instance_config(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances, test_instance_config):
     """Test scaling up AWS instances with specific instance configuration"""
     # Setup - Only 2 instances, need to scale up to 4
     mock_list_instances.return_value = setup_instances
-    mock_create_proxy.return_value = True
+    mock_create_proxies.return_value = BatchResult(requested=2, created=2)
     
     # Execute
     min_scaling = 4
     result = aws_deployment(min_scaling, test_instance_config)
     
-    # Verify
-    assert mock_create_proxy.call_count == 2  # Should create 2 new instances
-    
-    # Check that create_proxy was called with the test_instance_config
-    for call in mock_create_proxy.call_args_list:
-        assert call[0][0] == test_instance_config
+    # Verify - both missing instances are launched with the test_instance_config
+    mock_create_proxies.assert_called_once_with(2, test_instance_config)
     
     # Check that list_instances was called with the test_instance_config
     mock_list_instances.assert_called_with(test_instance_config)
     
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
     assert result == 2  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_scale_down(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_scale_down(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test scaling down AWS instances"""
     # Setup - 2 instances, need to scale down to 1
     mock_list_instances.return_value = setup_instances
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.side_effect = lambda ids, *args: ids
     
     # Execute
     min_scaling = 1
     result = aws_deployment(min_scaling)
     
     # Verify
-    assert mock_delete_proxy.call_count == 1  # Should delete 1 instance
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    assert mock_delete_proxies.call_count == 1  # Should delete 1 instance
+    assert mock_create_proxies.call_count == 0  # Should not create any
     assert result == 2  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_scale_down_with_instance_config(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances, test_instance_config):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_scale_down_with_instance_config(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances, test_instance_config):
     """Test scaling down AWS instances with specific instance configuration"""
     # Setup - 2 instances, need to scale down to 1
     mock_list_instances.return_value = setup_instances
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.side_effect = lambda ids, *args: ids
     
     # Execute
     min_scaling = 1
     result = aws_deployment(min_scaling, test_instance_config)
     
     # Verify
-    assert mock_delete_proxy.call_count == 1  # Should delete 1 instance
+    assert mock_delete_proxies.call_count == 1  # Should delete 1 instance
     
-    # Check that delete_proxy was called with the correct instance ID and config
-    mock_delete_proxy.assert_called_once_with(
-        setup_instances[0]["Instances"][0]["InstanceId"], 
+    # Check that delete_proxies was called with the correct instance ID and config
+    mock_delete_proxies.assert_called_once_with(
+        [setup_instances[0]["Instances"][0]["InstanceId"]], 
         test_instance_config
     )
     
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    assert mock_create_proxies.call_count == 0  # Should not create any
     assert result == 2  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_no_change(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_no_change(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test when no scaling change is needed"""
     # Setup - 2 instances, need to keep 2
     mock_list_instances.return_value = setup_instances
@@ -179,14 +178,14 @@ def test_aws_deployment_no_change(mock_delete_proxy, mock_create_proxy, mock_lis
     result = aws_deployment(min_scaling)
     
     # Verify
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
+    assert mock_create_proxies.call_count == 0  # Should not create any
     assert result == 2  # Returns number of instances
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.create_proxy')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_deployment_no_change_with_instance_config(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances, test_instance_config):
+@patch('cloudproxy.providers.aws.main.create_proxies')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_deployment_no_change_with_instance_config(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances, test_instance_config):
     """Test when no scaling change is needed with specific instance configuration"""
     # Setup - 2 instances, need to keep 2
     mock_list_instances.return_value = setup_instances
@@ -196,8 +195,8 @@ def test_aws_deployment_no_change_with_instance_config(mock_delete_proxy, mock_c
     result = aws_deployment(min_scaling, test_instance_config)
     
     # Verify
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
+    assert mock_create_proxies.call_count == 0  # Should not create any
     
     # Check that list_instances was called with the test_instance_config
     mock_list_instances.assert_called_with(test_instance_config)
@@ -210,7 +209,7 @@ def test_aws_check_alive_running_directly():
     # but intercepts calls to dependencies with mocks
     with patch('cloudproxy.providers.aws.main.list_instances') as mock_list_instances:
         with patch('cloudproxy.providers.aws.main.check_alive') as mock_check_alive:
-            with patch('cloudproxy.providers.aws.main.delete_proxy') as mock_delete_proxy:
+            with patch('cloudproxy.providers.aws.main.delete_proxies') as mock_delete_proxies:
                 with patch('cloudproxy.providers.aws.main.start_proxy') as mock_start_proxy:
                     # Setup mocks
                     recent_time = datetime.datetime.now(timezone.utc)
@@ -229,14 +228,14 @@ def test_aws_check_alive_running_directly():
                     
                     # Verify
                     assert "1.2.3.4" in result
-                    assert mock_delete_proxy.call_count == 0  # Shouldn't delete recent instances
+                    assert mock_delete_proxies.call_count == 0  # Shouldn't delete recent instances
                     assert mock_start_proxy.call_count == 0  # Shouldn't start running instances
 
 @patch('cloudproxy.providers.aws.main.check_alive')
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
 @patch('cloudproxy.providers.aws.main.start_proxy')
-def test_aws_check_alive_with_instance_config(mock_start_proxy, mock_delete_proxy, mock_list_instances, 
+def test_aws_check_alive_with_instance_config(mock_start_proxy, mock_delete_proxies, mock_list_instances, 
                                              mock_check_alive, setup_instances, test_instance_config):
     """Test checking alive for instances with specific instance configuration"""
     # Setup
@@ -258,9 +257,9 @@ def test_aws_check_alive_with_instance_config(mock_start_proxy, mock_delete_prox
 
 @patch('cloudproxy.providers.aws.main.check_alive')
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
 @patch('cloudproxy.providers.aws.main.start_proxy')
-def test_aws_check_alive_stopped(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_aws_check_alive_stopped(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for stopped instances"""
     # Setup
     mock_list_instances.return_value = [setup_instances[1]]  # Just the stopped instance
@@ -272,7 +271,7 @@ def test_aws_check_alive_stopped(mock_start_proxy, mock_delete_proxy, mock_list_
     
     # Verify
     mock_start_proxy.call_count == 1  # Should start the stopped instance
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
     assert len(result) == 0  # No IPs ready yet as instance was just started
 
 def test_aws_check_alive_age_limit_exceeded_directly():
@@ -290,7 +289,7 @@ def test_aws_check_alive_age_limit_exceeded_directly():
         # Create a mock instance with a launch time far in the past
         with patch('cloudproxy.providers.aws.main.list_instances') as mock_list_instances:
             with patch('cloudproxy.providers.aws.main.check_alive') as mock_check_alive:
-                with patch('cloudproxy.providers.aws.main.delete_proxy') as mock_delete_proxy:
+                with patch('cloudproxy.providers.aws.main.delete_proxies') as mock_delete_proxies:
                     with patch('cloudproxy.providers.aws.main.start_proxy') as mock_start_proxy:
                         # Setup mocks with an old instance (from year 2000)
                         very_old_time = datetime.datetime(2000, 1, 1, tzinfo=timezone.utc)
@@ -303,13 +302,13 @@ def test_aws_check_alive_age_limit_exceeded_directly():
                             }]
                         }]
                         mock_check_alive.return_value = True
-                        mock_delete_proxy.return_value = True
+                        mock_delete_proxies.return_value = ["i-12345"]
                         
                         # Execute
                         result = aws_check_alive()
                         
                         # Verify
-                        assert mock_delete_proxy.call_count == 1  # Should delete the expired instance
+                        assert mock_delete_proxies.call_count == 1  # Should delete the expired instance
                         assert len(result) == 0  # No IPs in result as the instance was deleted
     finally:
         # Restore original settings
@@ -317,28 +316,43 @@ def test_aws_check_alive_age_limit_exceeded_directly():
         config["rolling_deployment"]["enabled"] = original_rolling
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_check_delete(mock_delete_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_check_delete(mock_delete_proxies, mock_list_instances, setup_instances):
     """Test checking for instances to delete"""
     # Setup
     mock_list_instances.return_value = setup_instances
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.side_effect = lambda ids, *args: ids
     delete_queue.add("1.2.3.4")  # Add IP to delete queue
     
     # Execute
     aws_check_delete()
     
     # Verify
-    assert mock_delete_proxy.call_count == 1  # Should delete the instance in delete queue
+    assert mock_delete_proxies.call_count == 1  # Should delete the instance in delete queue
     assert "1.2.3.4" not in delete_queue  # IP should be removed from queue
 
 @patch('cloudproxy.providers.aws.main.list_instances')
-@patch('cloudproxy.providers.aws.main.delete_proxy')
-def test_aws_check_delete_with_instance_config(mock_delete_proxy, mock_list_instances, setup_instances, test_instance_config):
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_check_delete_keeps_failed_in_queue(mock_delete_proxies, mock_list_instances, setup_instances):
+    """Test instances that were not terminated stay queued for the next tick"""
+    mock_list_instances.return_value = setup_instances
+    mock_delete_proxies.return_value = ["i-67890"]
+    delete_queue.add("1.2.3.4")
+    delete_queue.add("5.6.7.8")
+
+    aws_check_delete()
+
+    mock_delete_proxies.assert_called_once_with(["i-12345", "i-67890"], ANY)
+    assert "1.2.3.4" in delete_queue
+    assert "5.6.7.8" not in delete_queue
+
+@patch('cloudproxy.providers.aws.main.list_instances')
+@patch('cloudproxy.providers.aws.main.delete_proxies')
+def test_aws_check_delete_with_instance_config(mock_delete_proxies, mock_list_instances, setup_instances, test_instance_config):
     """Test checking for instances to delete with specific instance configuration"""
     # Setup
     mock_list_instances.return_value = setup_instances
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.side_effect = lambda ids, *args: ids
     delete_queue.add("1.2.3.4")  # Add IP to delete queue
     
     # Execute with instance config
@@ -348,8 +362,8 @@ def test_aws_check_delete_with_instance_config(mock_delete_proxy, mock_list_inst
     mock_list_instances.assert_called_once_with(test_instance_config)
     
     # Should delete the instance with the instance config
-    mock_delete_proxy.assert_called_once_with(
-        setup_instances[0]["Instances"][0]["InstanceId"], 
+    mock_delete_proxies.assert_called_once_with(
+        [setup_instances[0]["Instances"][0]["InstanceId"]], 
         test_instance_config
     )
     
@@ -418,7 +432,7 @@ def test_aws_start(mock_aws_deployment, mock_aws_check_alive, mock_aws_check_sto
         
         # Check deployment was called with the correct min_scaling from the instance config and the instance config itself
         default_config = config["providers"]["aws"]["instances"]["default"]
-        mock_aws_deployment.assert_called_once_with(3, default_config)
+        mock_aws_deployment.assert_called_once_with(3, default_config, ANY)
         
         assert result == ["1.2.3.4", "5.6.7.8"]  # Should return IPs from check_alive
     finally:
@@ -439,14 +453,22 @@ def test_aws_start_with_instance_config(mock_aws_deployment, mock_aws_check_aliv
     result = aws_start(test_instance_config)
     
     # Verify all methods were called with the instance config
-    mock_aws_check_delete.assert_called_once_with(test_instance_config)
-    mock_aws_check_stop.assert_called_once_with(test_instance_config)
-    mock_aws_check_alive.assert_called_once_with(test_instance_config)
+    mock_aws_check_delete.assert_called_once_with(test_instance_config, ANY)
+    mock_aws_check_stop.assert_called_once_with(test_instance_config, ANY)
+    mock_aws_check_alive.assert_called_once_with(test_instance_config, ANY)
     
     # Check deployment was called with the correct min_scaling from the instance config
     mock_aws_deployment.assert_called_once_with(
         test_instance_config["scaling"]["min_scaling"],
-        test_instance_config
+        test_instance_config,
+        ANY
     )
     
+    # All phases share one inventory snapshot
+    inventory = mock_aws_check_delete.call_args[0][1]
+    assert isinstance(inventory, Inventory)
+    assert mock_aws_check_stop.call_args[0][1] is inventory
+    assert mock_aws_deployment.call_args[0][2] is inventory
+    assert mock_aws_check_alive.call_args[0][1] is inventory
+    
     assert result == ["1.2.3.4", "5.6.7.8"]  # Should return IPs from check_alive 
\ No newline at end of file
@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from cloudproxy.providers.batch import BatchResult, create_in_parallel, delete_in_parallel, log_batch_result
+from cloudproxy.providers.digitalocean.main import do_check_delete
+from cloudproxy.providers.hetzner.main import hetzner_deployment
+from cloudproxy.providers.inventory import Inventory
+
+
+def test_batch_result_counts():
+    result = BatchResult(requested=5, created=3, errors=["a", "b"])
+    assert result.failed == 2
+    assert not result.complete
+
+    result.merge(BatchResult(requested=2, created=2))
+    assert result.created == 5
+    assert result.complete
+
+
+def test_create_in_parallel_all_succeed():
+    calls = []
+
+    def create(instance_config):
+        calls.append(instance_config)
+        return True
+
+    result = create_in_parallel(create, 4, {"name": "test"}, concurrency=2)
+
+    assert result.created == 4
+    assert result.errors == []
+    assert calls == [{"name": "test"}] * 4
+
+
+def test_create_in_parallel_reports_partial_failure():
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    def create(instance_config):
+        with lock:
+            counter["n"] += 1
+            n = counter["n"]
+        if n == 2:
+            raise RuntimeError("quota exceeded")
+        if n == 3:
+            return False
+        return True
+
+    result = create_in_parallel(create, 4, concurrency=1)
+
+    assert result.requested == 4
+    assert result.created == 2
+    assert result.failed == 2
+    assert "quota exceeded" in result.errors
+
+
+def test_create_in_parallel_bounds_concurrency():
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def create(instance_config):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return True
+
+    result = create_in_parallel(create, 10, concurrency=3)
+
+    assert result.created == 10
+    assert 1 < active["peak"] <= 3
+
+
+def test_create_in_parallel_nothing_to_do():
+    result = create_in_parallel(lambda config: pytest.fail("should not be called"), 0)
+    assert result.created == 0
+    assert result.complete
+
+
+@patch('cloudproxy.providers.batch.logger')
+def test_log_batch_result(mock_logger):
+    log_batch_result(BatchResult(requested=2, created=2), "Hetzner default")
+    mock_logger.info.assert_called_once()
+    mock_logger.warning.assert_not_called()
+
+    log_batch_result(BatchResult(requested=2, created=1, errors=["boom"]), "Hetzner default")
+    assert mock_logger.warning.call_count == 2
+
+
+@patch('cloudproxy.providers.hetzner.main.create_proxy')
+def test_hetzner_deployment_creates_all_missing_in_one_tick(mock_create_proxy):
+    mock_create_proxy.side_effect = [True, Exception("server limit reached"), True]
+    instance_config = {"display_name": "test"}
+    inventory = Inventory(lambda config: [], instance_config)
+
+    hetzner_deployment(3, instance_config, inventory)
+
+    assert mock_create_proxy.call_count == 3
+    # Listed once before the scale-up and once after it
+    assert inventory.fetches == 2
+
+
+def test_delete_in_parallel_isolates_failures():
+    def delete(item, instance_config):
+        if item == "b":
+            raise RuntimeError("API error")
+        return item != "c"
+
+    results = delete_in_parallel(delete, ["a", "b", "c", "d"], {"name": "test"}, concurrency=4)
+
+    assert results == [("a", True), ("b", False), ("c", False), ("d", True)]
+
+
+def test_delete_in_parallel_nothing_to_do():
+    assert delete_in_parallel(lambda item, config: pytest.fail("should not be called"), []) == []
+
+
+@patch('cloudproxy.providers.digitalocean.main.delete_proxy')
+@patch('cloudproxy.providers.digitalocean.main.list_droplets')
+def test_do_check_delete_drains_queue_in_one_batch(mock_list_droplets, mock_delete_proxy):
+    droplets = [MagicMock(id=i, ip_address=f"10.0.0.{i}") for i in range(1, 6)]
+    mock_list_droplets.return_value = droplets
+    mock_delete_proxy.side_effect = lambda droplet, config: droplet.id != 3
+    queue = {f"10.0.0.{i}" for i in range(1, 6)}
+
+    with patch('cloudproxy.providers.digitalocean.main.delete_queue', queue), \
+            patch('cloudproxy.providers.digitalocean.main.restart_queue', set()):
+        do_check_delete({"display_name": "test"})
+
+    assert mock_delete_proxy.call_count == 5
+    # Only the droplet whose deletion failed stays queued for the next tick
+    assert queue == {"10.0.0.3"}
+
@@ -0,0 +1,110 @@
+"""
+Unit tests for the pool version and change feed.
+"""
+
+import asyncio
+import threading
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app, stream_changes
+from cloudproxy.providers import settings
+from cloudproxy.providers.changes import ChangeFeed, change_feed
+from cloudproxy.providers.health import HealthStore
+from cloudproxy.providers.registry import ProxyRegistry
+
+
+def test_feed_returns_changes_since_version():
+    """Test changes are returned after a version, in pages"""
+    feed = ChangeFeed()
+    for i in range(5):
+        feed.publish("add", f"10.0.0.{i}")
+
+    events, version, reset = feed.since(2)
+    assert [event["version"] for event in events] == [3, 4, 5]
+    assert version == 5 and not reset
+    assert [event["ip"] for event in feed.since(0, limit=2)[0]] == ["10.0.0.0", "10.0.0.1"]
+    assert feed.since(5)[0] == []
+
+
+def test_feed_asks_lagging_clients_to_reset():
+    """Test clients behind the retained history, or ahead of it, must reset"""
+    feed = ChangeFeed()
+    with patch.dict(settings.config["changes"], {"history": 3}):
+        for i in range(5):
+            feed.publish("add", f"10.0.0.{i}")
+
+    assert feed.since(1) == ([], 5, True)
+    assert not feed.since(2)[2]
+    assert feed.since(9)[2]
+
+
+def test_registry_publishes_only_real_changes():
+    """Test resyncing an instance only publishes the proxies that changed"""
+    registry = ProxyRegistry()
+    registry.sync_instance("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    start = change_feed.version
+
+    registry.sync_instance("aws", "default", ["2.2.2.2", "3.3.3.3"])
+
+    events, _, _ = change_feed.since(start)
+    assert [(event["type"], event["ip"]) for event in events] == [("add", "3.3.3.3"), ("remove", "1.1.1.1")]
+    assert events[0]["provider"] == "aws"
+    # Unchanged proxies keep their place in the listing
+    assert [entry.ip for entry in registry.page()] == ["2.2.2.2", "3.3.3.3"]
+
+
+def test_health_flips_are_published():
+    """Test only changes of a proxy's probe result are published"""
+    store = HealthStore()
+    for alive in (True, True, False, False, True):
+        store.record("1.1.1.1", alive)
+
+    events, _, _ = change_feed.since(0)
+    assert [(event["type"], event["alive"]) for event in events] == [
+        ("health", True), ("health", False), ("health", True)
+    ]
+
+
+def test_changes_endpoint_and_stream():
+    """Test GET /changes and the event stream follow the pool"""
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": ["1.1.1.1"]}}}}
+    client = TestClient(app)
+    with patch.dict(settings.config, {"providers": providers}):
+        data = client.get("/changes").json()
+        assert data["version"] == data["next"] == 1
+        assert data["changes"][0]["type"] == "add"
+        assert data["changes"][0]["ip"] == "1.1.1.1"
+
+        providers["aws"]["instances"]["default"]["ips"] = ["1.1.1.1", "2.2.2.2"]
+        data = client.get("/changes", params={"since": 1}).json()
+        assert [change["ip"] for change in data["changes"]] == ["2.2.2.2"]
+        assert data["next"] == 2
+        assert client.get("/changes", params={"since": 50}).json()["reset"] is True
+
+        async def follow():
+            stream = stream_changes(1, heartbeat=0.01)
+            assert (await anext(stream)).startswith("id: 2\nevent: add\n")
+            assert await anext(stream) == ": keepalive\n\n"
+            providers["aws"]["instances"]["default"]["ips"] = ["2.2.2.2"]
+            assert (await anext(stream)).startswith("id: 3\nevent: remove\n")
+            await stream.aclose()
+
+        asyncio.run(follow())
+
+
+def test_wait_async_wakes_up_on_publish_from_another_thread():
+    """Test a waiting stream is woken by a change published by a provider tick thread"""
+    feed = ChangeFeed()
+
+    async def wait():
+        timer = threading.Timer(0.05, feed.publish, ("add", "1.1.1.1"))
+        timer.start()
+        changed = await feed.wait_async(0, 5)
+        timer.join()
+        return changed
+
+    assert asyncio.run(wait()) is True
+    assert asyncio.run(feed.wait_async(1, 0.01)) is False
+    assert asyncio.run(feed.wait_async(0, 0.01)) is True
@@ -0,0 +1,137 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.clients import ClientRegistry, client_registry, credential_fingerprint
+from cloudproxy.providers.aws.functions import get_clients
+from cloudproxy.providers.digitalocean.functions import get_manager
+from cloudproxy.providers.hetzner.functions import get_client as get_hetzner_client
+
+
+def test_credential_fingerprint_is_stable_and_hides_secrets():
+    fingerprint = credential_fingerprint("secret-token", "us-east-1")
+    assert fingerprint == credential_fingerprint("secret-token", "us-east-1")
+    assert fingerprint != credential_fingerprint("other-token", "us-east-1")
+    assert "secret-token" not in fingerprint
+
+
+def test_registry_reuses_client_for_same_fingerprint():
+    registry = ClientRegistry()
+    factory = MagicMock(side_effect=lambda: object())
+
+    first = registry.get("digitalocean", "default", "fp", factory)
+    second = registry.get("digitalocean", "default", "fp", factory)
+
+    assert first is second
+    assert factory.call_count == 1
+    assert registry.stats() == {"clients": 1, "hits": 1, "misses": 1}
+
+
+def test_registry_rebuilds_client_when_credentials_change():
+    registry = ClientRegistry()
+    factory = MagicMock(side_effect=lambda: object())
+
+    first = registry.get("hetzner", "default", "fp-1", factory)
+    second = registry.get("hetzner", "default", "fp-2", factory)
+
+    assert first is not second
+    assert factory.call_count == 2
+    assert registry.stats()["clients"] == 1
+
+
+def test_registry_keeps_instances_separate():
+    registry = ClientRegistry()
+    factory = MagicMock(side_effect=lambda: object())
+
+    default = registry.get("aws", "default", "fp", factory)
+    secondary = registry.get("aws", "secondary", "fp", factory)
+
+    assert default is not secondary
+    assert registry.stats()["clients"] == 2
+
+
+def test_registry_invalidate_by_provider():
+    registry = ClientRegistry()
+    registry.get("aws", "default", "fp", object)
+    registry.get("gcp", "default", "fp", object)
+
+    registry.invalidate("aws")
+
+    assert registry.stats()["clients"] == 1
+    factory = MagicMock(return_value="new-client")
+    assert registry.get("aws", "default", "fp", factory) == "new-client"
+
+
+def test_registry_concurrent_callers_share_one_client():
+    registry = ClientRegistry()
+    results = []
+
+    def worker():
+        results.append(registry.get("digitalocean", "default", "fp", object))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in results}) == 1
+
+
+@patch('cloudproxy.providers.digitalocean.functions.digitalocean.Manager')
+def test_get_manager_is_cached_until_token_changes(mock_manager):
+    mock_manager.side_effect = lambda token: MagicMock(token=token)
+    instance_config = {"secrets": {"access_token": "token-a"}}
+
+    first = get_manager(instance_config)
+    second = get_manager(instance_config)
+    assert first is second
+    assert mock_manager.call_count == 1
+
+    instance_config["secrets"]["access_token"] = "token-b"
+    third = get_manager(instance_config)
+    assert third is not first
+    assert third.token == "token-b"
+    assert mock_manager.call_count == 2
+
+
+@patch('cloudproxy.providers.hetzner.functions.Client')
+def test_get_hetzner_client_is_cached(mock_client):
+    mock_client.side_effect = lambda token: MagicMock(token=token)
+
+    first = get_hetzner_client()
+    second = get_hetzner_client()
+
+    assert first is second
+    mock_client.assert_called_once_with(
+        token=settings.config["providers"]["hetzner"]["instances"]["default"]["secrets"]["access_token"]
+    )
+
+
+@patch('cloudproxy.providers.aws.functions.boto3.resource')
+@patch('cloudproxy.providers.aws.functions.boto3.client')
+def test_get_aws_clients_cached_per_instance(mock_boto3_client, mock_boto3_resource):
+    mock_boto3_resource.side_effect = lambda *args, **kwargs: MagicMock()
+    mock_boto3_client.side_effect = lambda *args, **kwargs: MagicMock()
+    default_config = {
+        "region": "us-east-1",
+        "secrets": {"access_key_id": "key", "secret_access_key": "secret"},
+    }
+    other_config = {
+        "region": "eu-west-1",
+        "secrets": {"access_key_id": "key", "secret_access_key": "secret"},
+    }
+    original_instances = settings.config["providers"]["aws"]["instances"].copy()
+    try:
+        settings.config["providers"]["aws"]["instances"]["other"] = other_config
+
+        first = get_clients(default_config)
+        assert get_clients(default_config) == first
+        other = get_clients(other_config)
+
+        assert other != first
+        assert mock_boto3_resource.call_count == 2
+        assert mock_boto3_client.call_count == 2
+    finally:
+        settings.config["providers"]["aws"]["instances"] = original_instances
+        client_registry.clear()
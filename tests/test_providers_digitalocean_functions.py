@@ -1,5 +1,5 @@
 import pytest
-from cloudproxy.providers.digitalocean.functions import create_proxy, delete_proxy, list_droplets, get_manager
+from cloudproxy.providers.digitalocean.functions import create_proxy, create_proxies, delete_proxy, list_droplets, get_manager
 import os
 import json
 from unittest.mock import MagicMock, patch
@@ -109,28 +109,22 @@ def test_create_proxy(mocker, droplet_id):
     assert create_proxy() == True
 
 
-def test_delete_proxy(mocker, droplets):
-    """Test deleting a proxy."""
+def test_delete_proxy(droplets, cached_manager, api_session):
+    """Test deleting a proxy destroys it by ID without re-fetching it."""
     assert len(droplets) > 0
     droplet_id = droplets[0].id
-    
-    # Mock the Manager and get_droplet method to avoid real API calls
-    mock_manager = mocker.patch('cloudproxy.providers.digitalocean.functions.get_manager')
-    mock_manager_instance = mocker.MagicMock()
-    mock_manager.return_value = mock_manager_instance
-    
-    # Mock the droplet that will be returned by get_droplet
-    mock_droplet = mocker.MagicMock()
-    mock_droplet.destroy.return_value = True
-    mock_manager_instance.get_droplet.return_value = mock_droplet
+    api_session.request.return_value = api_response(204)
     
     # Test the delete_proxy function
     assert delete_proxy(droplet_id) == True
     
-    # Verify our mock was called correctly
-    mock_manager.assert_called_once()
-    mock_manager_instance.get_droplet.assert_called_once_with(droplet_id)
-    mock_droplet.destroy.assert_called_once()
+    # Verify the droplet was destroyed directly, with the configured timeout
+    api_session.request.assert_called_once()
+    assert api_session.request.call_args[0] == (
+        "DELETE", f"https://api.digitalocean.com/v2/droplets/{droplet_id}"
+    )
+    assert api_session.request.call_args[1]["timeout"] == settings.config["deployment"]["api_timeout"]
+    cached_manager.get_droplet.assert_not_called()
 
 
 @patch('cloudproxy.providers.digitalocean.functions.digitalocean.Manager')
@@ -204,25 +198,17 @@ def test_create_proxy_with_instance_config(mock_droplet, test_instance_config):
         settings.config["providers"]["digitalocean"]["instances"] = original_config
 
 
-@patch('cloudproxy.providers.digitalocean.functions.get_manager')
-def test_delete_proxy_with_instance_config(mock_get_manager, mocker, test_instance_config):
+def test_delete_proxy_with_instance_config(test_instance_config, api_session):
     """Test deleting a proxy with a specific instance configuration."""
-    # Setup mock
-    mock_manager = mocker.MagicMock()
-    mock_get_manager.return_value = mock_manager
-    
-    # Mock the droplet that will be returned by get_droplet
-    mock_droplet = mocker.MagicMock()
-    mock_droplet.destroy.return_value = True
-    mock_manager.get_droplet.return_value = mock_droplet
+    manager = MagicMock(token="test-token-useast", end_point="https://api.digitalocean.com/v2/")
+    api_session.request.return_value = api_response(204)
     
-    # Call function under test
-    result = delete_proxy(1234, test_instance_config)
+    with patch('cloudproxy.providers.digitalocean.functions.get_manager', return_value=manager) as mock_get_manager:
+        result = delete_proxy(1234, test_instance_config)
     
-    # Verify
+    # Verify the instance's cached manager and token are used
     mock_get_manager.assert_called_once_with(test_instance_config)
-    mock_manager.get_droplet.assert_called_once_with(1234)
-    mock_droplet.destroy.assert_called_once()
+    assert api_session.request.call_args[1]["headers"]["Authorization"] == "Bearer test-token-useast"
     assert result == True
 
 
@@ -307,3 +293,60 @@ def test_list_droplets_with_instance_config_specific(mock_get_manager, instance_
     finally:
         # Restore original config
         settings.config["providers"]["digitalocean"]["instances"] = original_config
+
+
+def api_response(status_code, body=None):
+    """Mock requests response from the DigitalOcean API."""
+    response = MagicMock(status_code=status_code, ok=status_code < 400, content=b"{}" if body else b"")
+    response.json.return_value = body or {}
+    return response
+
+
+@pytest.fixture
+def cached_manager():
+    """The cached manager get_manager() returns, with a real token and endpoint."""
+    manager = MagicMock(token="test-token-useast", end_point="https://api.digitalocean.com/v2/")
+    with patch('cloudproxy.providers.digitalocean.functions.get_manager', return_value=manager):
+        yield manager
+
+
+@pytest.fixture
+def api_session():
+    """The module's HTTP session for DigitalOcean API requests."""
+    with patch('cloudproxy.providers.digitalocean.functions.api_session') as session:
+        yield session
+
+
+def test_create_proxies_chunks_multi_create_requests(cached_manager, api_session, test_instance_config):
+    """Test bulk creation sends at most 10 droplet names per request on the module's session."""
+    api_session.request.side_effect = lambda method, url, **kwargs: api_response(
+        202, {"droplets": [{} for _ in kwargs["json"]["names"]]}
+    )
+    
+    result = create_proxies(23, test_instance_config)
+    
+    assert result.created == 23
+    assert result.complete
+    calls = api_session.request.call_args_list
+    assert [len(call[1]["json"]["names"]) for call in calls] == [10, 10, 3]
+    method, url = calls[0][0]
+    assert (method, url) == ("POST", "https://api.digitalocean.com/v2/droplets")
+    kwargs = calls[0][1]
+    assert kwargs["headers"]["Authorization"] == "Bearer test-token-useast"
+    assert kwargs["json"]["region"] == test_instance_config["region"]
+    assert "cloudproxy" in kwargs["json"]["tags"]
+
+
+def test_create_proxies_reports_failed_chunk(cached_manager, api_session, test_instance_config):
+    """Test a failed multi-create request does not stop the other chunks."""
+    api_session.request.side_effect = [
+        api_response(202, {"droplets": [{} for _ in range(10)]}),
+        api_response(422, {"message": "droplet limit exceeded"}),
+    ]
+    
+    result = create_proxies(15, test_instance_config)
+    
+    assert result.created == 10
+    assert result.failed == 5
+    assert result.errors == ["HTTP 422: droplet limit exceeded"]
+
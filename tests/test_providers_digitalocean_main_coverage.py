@@ -19,11 +19,11 @@ from cloudproxy.providers.settings import delete_queue, restart_queue, config
 class TestDigitalOceanMainCoverage(unittest.TestCase):
 
     @patch("cloudproxy.providers.digitalocean.main.list_droplets")
-    @patch("cloudproxy.providers.digitalocean.main.create_proxy")
+    @patch("cloudproxy.providers.digitalocean.main.create_proxies")
     @patch("cloudproxy.providers.digitalocean.main.delete_proxy")
     @patch("cloudproxy.providers.digitalocean.main.config", new_callable=MagicMock)
     def test_do_deployment_deploy_new(
-        self, mock_config, mock_delete_proxy, mock_create_proxy, mock_list_droplets
+        self, mock_config, mock_delete_proxy, mock_create_proxies, mock_list_droplets
     ):
         mock_config["providers"]["digitalocean"]["instances"]["default"] = {
             "scaling": {"min_scaling": 3}
@@ -32,15 +32,16 @@ class TestDigitalOceanMainCoverage(unittest.TestCase):
 
         do_deployment(3)
 
-        self.assertEqual(mock_create_proxy.call_count, 1)  # Should create 1 new droplet
+        mock_create_proxies.assert_called_once()  # Should create 1 new droplet in one batch
+        self.assertEqual(mock_create_proxies.call_args[0][0], 1)
         mock_delete_proxy.assert_not_called()
 
     @patch("cloudproxy.providers.digitalocean.main.list_droplets")
-    @patch("cloudproxy.providers.digitalocean.main.create_proxy")
+    @patch("cloudproxy.providers.digitalocean.main.create_proxies")
     @patch("cloudproxy.providers.digitalocean.main.delete_proxy")
     @patch("cloudproxy.providers.digitalocean.main.config", new_callable=MagicMock)
     def test_do_deployment_destroy_overprovisioned(
-        self, mock_config, mock_delete_proxy, mock_create_proxy, mock_list_droplets
+        self, mock_config, mock_delete_proxy, mock_create_proxies, mock_list_droplets
     ):
         mock_config["providers"]["digitalocean"]["instances"]["default"] = {
             "scaling": {"min_scaling": 1}
@@ -53,14 +54,14 @@ class TestDigitalOceanMainCoverage(unittest.TestCase):
         do_deployment(1)
 
         self.assertEqual(mock_delete_proxy.call_count, 1)  # Should delete 1 droplet
-        mock_create_proxy.assert_not_called()
+        mock_create_proxies.assert_not_called()
 
     @patch("cloudproxy.providers.digitalocean.main.list_droplets")
-    @patch("cloudproxy.providers.digitalocean.main.create_proxy")
+    @patch("cloudproxy.providers.digitalocean.main.create_proxies")
     @patch("cloudproxy.providers.digitalocean.main.delete_proxy")
     @patch("cloudproxy.providers.digitalocean.main.config", new_callable=MagicMock)
     def test_do_deployment_min_scaling_met(
-        self, mock_config, mock_delete_proxy, mock_create_proxy, mock_list_droplets
+        self, mock_config, mock_delete_proxy, mock_create_proxies, mock_list_droplets
     ):
         mock_config["providers"]["digitalocean"]["instances"]["default"] = {
             "scaling": {"min_scaling": 2}
@@ -72,7 +73,7 @@ class TestDigitalOceanMainCoverage(unittest.TestCase):
 
         do_deployment(2)
 
-        mock_create_proxy.assert_not_called()
+        mock_create_proxies.assert_not_called()
         mock_delete_proxy.assert_not_called()
 
     @patch("cloudproxy.providers.digitalocean.main.list_droplets")
@@ -29,6 +29,8 @@ def mock_gcp_environment():
 # Now import the functions that use the mocked module
 from cloudproxy.providers.gcp.functions import (
     create_proxy, 
+    create_proxies,
+    delete_proxies,
     delete_proxy, 
     stop_proxy, 
     start_proxy, 
@@ -263,4 +265,114 @@ def test_list_instances_no_instances(mock_get_client, mock_gcp_environment):
     result = list_instances()
     
     # Verify
-    assert result == [] 
\ No newline at end of file
+    assert result == [] 
+
+@patch('cloudproxy.providers.gcp.functions.get_client')
+def test_create_proxies_uses_batch_request(mock_get_client, mock_gcp_environment):
+    """Test bulk creation resolves the image once and sends one batch of inserts"""
+    mock_get_client.return_value = (None, mock_gcp_environment)
+    mock_compute = mock_gcp_environment
+    mock_compute.images().getFromFamily().execute.return_value = {"selfLink": "image-link"}
+    batch = MagicMock()
+    callbacks = {}
+
+    def new_batch(callback):
+        callbacks["callback"] = callback
+        return batch
+    mock_compute.new_batch_http_request.side_effect = new_batch
+
+    def execute():
+        callbacks["callback"]("1", {"name": "op-1"}, None)
+        callbacks["callback"]("2", {"name": "op-2"}, None)
+        callbacks["callback"]("3", None, Exception("quota exceeded"))
+    batch.execute.side_effect = execute
+
+    result = create_proxies(3)
+
+    assert batch.add.call_count == 3
+    batch.execute.assert_called_once()
+    assert result.created == 2
+    assert result.errors == ["quota exceeded"]
+
+@patch('cloudproxy.providers.gcp.functions.get_client')
+def test_delete_proxies_uses_batch_request(mock_get_client, mock_gcp_environment):
+    """Test bulk deletion sends every delete in one batch and tolerates missing instances"""
+    mock_get_client.return_value = (None, mock_gcp_environment)
+    mock_compute = mock_gcp_environment
+    batch = MagicMock()
+    callbacks = {}
+
+    def new_batch(callback):
+        callbacks["callback"] = callback
+        return batch
+    mock_compute.new_batch_http_request.side_effect = new_batch
+
+    def execute():
+        callbacks["callback"]("cloudproxy-1", {}, None)
+        callbacks["callback"]("cloudproxy-2", None, Exception("404 not found"))
+    batch.execute.side_effect = execute
+
+    deleted = delete_proxies(["cloudproxy-1", "cloudproxy-2"])
+
+    assert batch.add.call_count == 2
+    assert [call[1]["request_id"] for call in batch.add.call_args_list] == ["cloudproxy-1", "cloudproxy-2"]
+    assert deleted == ["cloudproxy-1"]
+
+
+@patch('cloudproxy.providers.gcp.functions.get_client')
+def test_create_proxies_splits_large_batches(mock_get_client, mock_gcp_environment):
+    """Test inserts are split into batches of at most MAX_BATCH_REQUESTS, a failed batch does not stop the rest"""
+    mock_get_client.return_value = (None, mock_gcp_environment)
+    mock_compute = mock_gcp_environment
+    mock_compute.images().getFromFamily().execute.return_value = {"selfLink": "image-link"}
+    batches = []
+
+    def new_batch(callback):
+        batch = MagicMock()
+        added = []
+        batch.add.side_effect = lambda request: added.append(request)
+
+        def execute():
+            if len(batches) == 1:
+                raise googleapiclient.errors.HttpError(MagicMock(status=503), b"backend error")
+            for index in range(len(added)):
+                callback(str(index), {}, None)
+        batch.execute.side_effect = execute
+        batches.append(batch)
+        return batch
+    mock_compute.new_batch_http_request.side_effect = new_batch
+
+    with patch('cloudproxy.providers.gcp.functions.MAX_BATCH_REQUESTS', 2):
+        result = create_proxies(5)
+
+    assert [batch.add.call_count for batch in batches] == [2, 2, 1]
+    assert result.created == 3
+    assert len(result.errors) == 1
+
+@patch('cloudproxy.providers.gcp.functions.get_client')
+def test_delete_proxies_splits_batches_and_survives_a_failed_batch(mock_get_client, mock_gcp_environment):
+    """Test deletes are split into batches and a failed batch only loses its own instances"""
+    mock_get_client.return_value = (None, mock_gcp_environment)
+    mock_compute = mock_gcp_environment
+    batches = []
+
+    def new_batch(callback):
+        batch = MagicMock()
+        added = []
+        batch.add.side_effect = lambda request, request_id: added.append(request_id)
+
+        def execute():
+            if len(batches) == 1:
+                raise googleapiclient.errors.HttpError(MagicMock(status=503), b"backend error")
+            for request_id in added:
+                callback(request_id, {}, None)
+        batch.execute.side_effect = execute
+        batches.append(batch)
+        return batch
+    mock_compute.new_batch_http_request.side_effect = new_batch
+
+    with patch('cloudproxy.providers.gcp.functions.MAX_BATCH_REQUESTS', 2):
+        deleted = delete_proxies(["p1", "p2", "p3", "p4", "p5"])
+
+    assert [batch.add.call_count for batch in batches] == [2, 2, 1]
+    assert deleted == ["p3", "p4", "p5"]
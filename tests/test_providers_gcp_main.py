@@ -11,6 +11,7 @@ from cloudproxy.providers.gcp.main import (
     gcp_check_stop,
     gcp_start
 )
+from cloudproxy.providers.batch import BatchResult
 from cloudproxy.providers.settings import delete_queue, restart_queue, config
 
 # Setup fixtures
@@ -72,45 +73,48 @@ def setup_instances():
     restart_queue.update(original_restart_queue)
 
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.create_proxy')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
-def test_gcp_deployment_scale_up(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.gcp.main.create_proxies')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
+def test_gcp_deployment_scale_up(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test scaling up GCP instances"""
     # Setup - Only 2 instances (running and terminated), need to scale up to 4
     mock_list_instances.return_value = [setup_instances[0], setup_instances[1]]
-    mock_create_proxy.return_value = True
+    mock_create_proxies.return_value = BatchResult(requested=2, created=2)
 
     # Execute
     min_scaling = 4
     result = gcp_deployment(min_scaling)
 
-    # Verify
-    assert mock_create_proxy.call_count == 2  # Should create 2 new instances
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
+    # Verify - both missing instances are requested in one batch
+    mock_create_proxies.assert_called_once()
+    assert mock_create_proxies.call_args[0][0] == 2
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
     assert result == 2  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.create_proxy')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
-def test_gcp_deployment_scale_down(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.gcp.main.create_proxies')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
+def test_gcp_deployment_scale_down(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test scaling down GCP instances"""
     # Setup - 3 instances (running, terminated, stopping), need to scale down to 1
     mock_list_instances.return_value = [setup_instances[0], setup_instances[1], setup_instances[2]]
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.side_effect = lambda names, *args: names
 
     # Execute
     min_scaling = 1
     result = gcp_deployment(min_scaling)
 
     # Verify
-    assert mock_delete_proxy.call_count == 2  # Should delete 2 instances
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    # Should delete 2 instances in one batched call
+    mock_delete_proxies.assert_called_once()
+    assert mock_delete_proxies.call_args[0][0] == [setup_instances[0]['name'], setup_instances[1]['name']]
+    assert mock_create_proxies.call_count == 0  # Should not create any
     assert result == 3  # Returns number of instances after deployment
 
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.create_proxy')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
-def test_gcp_deployment_no_change(mock_delete_proxy, mock_create_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.gcp.main.create_proxies')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
+def test_gcp_deployment_no_change(mock_delete_proxies, mock_create_proxies, mock_list_instances, setup_instances):
     """Test when no scaling change is needed"""
     # Setup - 2 instances (running and terminated), need to keep 2
     mock_list_instances.return_value = [setup_instances[0], setup_instances[1]]
@@ -120,15 +124,15 @@ def test_gcp_deployment_no_change(mock_delete_proxy, mock_create_proxy, mock_lis
     result = gcp_deployment(min_scaling)
 
     # Verify
-    assert mock_delete_proxy.call_count == 0  # Should not delete any
-    assert mock_create_proxy.call_count == 0  # Should not create any
+    assert mock_delete_proxies.call_count == 0  # Should not delete any
+    assert mock_create_proxies.call_count == 0  # Should not create any
     assert result == 2  # Returns number of instances
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_running(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_running(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for running instances"""
     # Setup
     mock_list_instances.return_value = [setup_instances[0]] # Just the running instance
@@ -139,14 +143,14 @@ def test_gcp_check_alive_running(mock_start_proxy, mock_delete_proxy, mock_list_
 
     # Verify
     assert "1.2.3.4" in result
-    assert mock_delete_proxy.call_count == 0
+    assert mock_delete_proxies.call_count == 0
     assert mock_start_proxy.call_count == 0
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_terminated(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_terminated(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for terminated instances"""
     # Setup
     mock_list_instances.return_value = [setup_instances[1]] # Just the terminated instance
@@ -158,14 +162,14 @@ def test_gcp_check_alive_terminated(mock_start_proxy, mock_delete_proxy, mock_li
 
     # Verify
     mock_start_proxy.call_count == 1 # Should start the terminated instance
-    assert mock_delete_proxy.call_count == 0
+    assert mock_delete_proxies.call_count == 0
     assert len(result) == 0 # No IPs ready yet as instance was just started
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_stopping(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_stopping(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for stopping instances"""
     # Setup
     mock_list_instances.return_value = [setup_instances[2]] # Just the stopping instance
@@ -176,14 +180,14 @@ def test_gcp_check_alive_stopping(mock_start_proxy, mock_delete_proxy, mock_list
 
     # Verify
     assert mock_start_proxy.call_count == 0
-    assert mock_delete_proxy.call_count == 0
+    assert mock_delete_proxies.call_count == 0
     assert len(result) == 0
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_provisioning_staging(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_provisioning_staging(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for provisioning/staging instances"""
     # Setup
     mock_list_instances.return_value = [setup_instances[3], setup_instances[4]] # Provisioning and Staging instances
@@ -194,14 +198,14 @@ def test_gcp_check_alive_provisioning_staging(mock_start_proxy, mock_delete_prox
 
     # Verify
     assert mock_start_proxy.call_count == 0
-    assert mock_delete_proxy.call_count == 0
+    assert mock_delete_proxies.call_count == 0
     assert len(result) == 0
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_not_alive_too_long(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_not_alive_too_long(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for instances not alive for too long"""
     # Setup
     # Create a mock instance with a creation time far in the past (more than 10 minutes)
@@ -215,7 +219,7 @@ def test_gcp_check_alive_not_alive_too_long(mock_start_proxy, mock_delete_proxy,
     }
     mock_list_instances.return_value = [old_instance]
     mock_check_alive.return_value = False # Instance is not alive
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.return_value = ["old-instance"]
 
     # Disable rolling deployment
     original_rolling = config["rolling_deployment"]["enabled"]
@@ -226,16 +230,16 @@ def test_gcp_check_alive_not_alive_too_long(mock_start_proxy, mock_delete_proxy,
         result = gcp_check_alive()
 
         # Verify
-        assert mock_delete_proxy.call_count == 1 # Should delete the instance
+        assert mock_delete_proxies.call_count == 1 # Should delete the instance
         assert len(result) == 0
     finally:
         config["rolling_deployment"]["enabled"] = original_rolling
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_age_limit_exceeded(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive, setup_instances):
+def test_gcp_check_alive_age_limit_exceeded(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive, setup_instances):
     """Test checking alive for instances exceeding age limit"""
     # Save original values
     original_age_limit = config["age_limit"]
@@ -257,13 +261,13 @@ def test_gcp_check_alive_age_limit_exceeded(mock_start_proxy, mock_delete_proxy,
         }
         mock_list_instances.return_value = [old_instance]
         mock_check_alive.return_value = True # Instance is alive but old
-        mock_delete_proxy.return_value = True
+        mock_delete_proxies.return_value = ["old-instance-age"]
 
         # Execute
         result = gcp_check_alive()
 
         # Verify
-        assert mock_delete_proxy.call_count == 1 # Should delete the instance
+        assert mock_delete_proxies.call_count == 1 # Should delete the instance
         assert len(result) == 0
     finally:
         # Restore original settings
@@ -272,9 +276,9 @@ def test_gcp_check_alive_age_limit_exceeded(mock_start_proxy, mock_delete_proxy,
 
 @patch('cloudproxy.providers.gcp.main.check_alive')
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
 @patch('cloudproxy.providers.gcp.main.start_proxy')
-def test_gcp_check_alive_type_key_error(mock_start_proxy, mock_delete_proxy, mock_list_instances, mock_check_alive):
+def test_gcp_check_alive_type_key_error(mock_start_proxy, mock_delete_proxies, mock_list_instances, mock_check_alive):
     """Test handling TypeError/KeyError in gcp_check_alive"""
     # Setup with an instance missing required keys
     invalid_instance = {
@@ -298,28 +302,44 @@ def test_gcp_check_alive_type_key_error(mock_start_proxy, mock_delete_proxy, moc
 
         # Verify
         assert mock_start_proxy.call_count == 0
-        assert mock_delete_proxy.call_count == 0
+        assert mock_delete_proxies.call_count == 0
         assert len(result) == 0 # No IPs should be added
     finally:
         config["rolling_deployment"]["enabled"] = original_rolling
         config["age_limit"] = original_age_limit
 
 @patch('cloudproxy.providers.gcp.main.list_instances')
-@patch('cloudproxy.providers.gcp.main.delete_proxy')
-def test_gcp_check_delete(mock_delete_proxy, mock_list_instances, setup_instances):
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
+def test_gcp_check_delete(mock_delete_proxies, mock_list_instances, setup_instances):
     """Test checking for instances to delete"""
     # Setup
     mock_list_instances.return_value = [setup_instances[0]] # Just the running instance
-    mock_delete_proxy.return_value = True
+    mock_delete_proxies.return_value = ["instance-1"]
     delete_queue.add("1.2.3.4") # Add IP to delete queue
 
     # Execute
     gcp_check_delete()
 
     # Verify
-    assert mock_delete_proxy.call_count == 1 # Should delete the instance in delete queue
+    assert mock_delete_proxies.call_count == 1 # Should delete the instance in delete queue
     assert "1.2.3.4" not in delete_queue # IP should be removed from queue
 
+@patch('cloudproxy.providers.gcp.main.list_instances')
+@patch('cloudproxy.providers.gcp.main.delete_proxies')
+def test_gcp_check_delete_keeps_failed_in_queue(mock_delete_proxies, mock_list_instances, setup_instances):
+    """Test instances whose delete was not accepted stay queued for the next tick"""
+    mock_list_instances.return_value = setup_instances[:2]
+    mock_delete_proxies.return_value = ["instance-2"]
+    delete_queue.add("1.2.3.4")
+    delete_queue.add("5.6.7.8")
+
+    gcp_check_delete()
+
+    mock_delete_proxies.assert_called_once()
+    assert mock_delete_proxies.call_args[0][0] == ["instance-1", "instance-2"]
+    assert "1.2.3.4" in delete_queue
+    assert "5.6.7.8" not in delete_queue
+
 @patch('cloudproxy.providers.gcp.main.list_instances')
 @patch('cloudproxy.providers.gcp.main.stop_proxy')
 def test_gcp_check_stop(mock_stop_proxy, mock_list_instances, setup_instances):
@@ -356,7 +376,7 @@ def test_gcp_start(mock_gcp_deployment, mock_gcp_check_alive, mock_gcp_check_sto
         # Verify
         mock_gcp_check_delete.assert_called_once()
         mock_gcp_check_stop.assert_called_once()
-        mock_gcp_deployment.assert_called_once_with(3, ANY)
+        mock_gcp_deployment.assert_called_once_with(3, ANY, ANY)
         mock_gcp_check_alive.assert_called_once()
 
         assert result == ["1.2.3.4", "5.6.7.8"] # Should return IPs from check_alive
@@ -0,0 +1,262 @@
+"""
+Unit tests for the continuous health monitor and the shared health store.
+"""
+
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.check import check_alive
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.health import (
+    HealthHistory,
+    HealthMonitor,
+    HealthStore,
+    accepts_timeout,
+    health_store,
+    probe_interval,
+    result_max_age,
+)
+
+
+@pytest.fixture
+def monitor_config():
+    """Monitor every 10s, trusting results for 30s"""
+    original = dict(settings.config["health_monitor"])
+    settings.config["health_monitor"].update({"interval": 10, "max_age": 30})
+    yield settings.config["health_monitor"]
+    settings.config["health_monitor"].clear()
+    settings.config["health_monitor"].update(original)
+
+
+@pytest.fixture
+def aws_instances():
+    """Enable the AWS default instance, disable the GCP one"""
+    aws = settings.config["providers"]["aws"]["instances"]["default"]
+    gcp = settings.config["providers"]["gcp"]["instances"]["default"]
+    original = (aws["enabled"], gcp["enabled"], list(aws["ips"]))
+    aws["enabled"], gcp["enabled"] = True, False
+    yield aws
+    aws["enabled"], gcp["enabled"], aws["ips"] = original
+
+
+def test_check_reuses_fresh_results(monitor_config):
+    """Test a provider tick only probes proxies without a fresh result"""
+    monitor = HealthMonitor(HealthStore())
+    probe = Mock(return_value=True)
+
+    assert monitor.check("aws", "default", ["1.1.1.1", "2.2.2.2"], probe=probe) == {"1.1.1.1": True, "2.2.2.2": True}
+    assert monitor.check("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], probe=probe) == {
+        "1.1.1.1": True, "2.2.2.2": True, "3.3.3.3": True
+    }
+
+    assert sorted(call.args[0] for call in probe.call_args_list) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    assert monitor.stats()["reused"] == 2
+
+
+def test_check_probes_everything_with_monitor_off(monitor_config):
+    """Test results are not reused when the monitor is turned off"""
+    monitor_config["interval"] = 0
+    monitor = HealthMonitor(HealthStore())
+    probe = Mock(return_value=True)
+
+    monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+    monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+
+    assert probe.call_count == 2
+    assert result_max_age() == 0
+
+
+def test_stale_results_are_probed_again(monitor_config):
+    """Test a result is not reused once the proxy is due again"""
+    monitor = HealthMonitor(HealthStore())
+    probe = Mock(return_value=False)
+
+    with patch("cloudproxy.providers.health.time.time", return_value=1000.0):
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+    with patch("cloudproxy.providers.health.time.time", return_value=1031.0):
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+
+    assert probe.call_count == 2
+    assert monitor.store.get("1.1.1.1")["consecutive_failures"] == 2
+
+
+def test_store_drops_unwatched_proxies():
+    """Test results of deleted proxies are forgotten"""
+    store = HealthStore()
+    store.watch("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    store.record("1.1.1.1", True, 0.1)
+    store.record("2.2.2.2", False)
+
+    store.watch("aws", "default", ["2.2.2.2"])
+
+    assert store.get("1.1.1.1") is None
+    assert store.down(30) == {"2.2.2.2"}
+
+
+def test_down_version_follows_down_set():
+    """Test the down version changes with failures, recoveries and aging"""
+    store = HealthStore()
+    store.watch("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    store.record("1.1.1.1", True, 0.1)
+    version = store.down_version(30)
+
+    store.record("1.1.1.1", True, 0.1)
+    assert store.down_version(30) == version
+
+    store.record("2.2.2.2", False)
+    failing = store.down_version(30)
+    assert failing != version
+
+    with patch("cloudproxy.providers.health.time.time", return_value=time.time() + 60):
+        assert store.down_version(30) != failing
+        assert store.down(30) == set()
+
+    store.record("2.2.2.2", True, 0.1)
+    assert store.down_version(30) != failing
+
+
+def test_run_once_probes_watched_proxies_of_enabled_instances(aws_instances):
+    """Test the monitor probes enabled instances and stops watching disabled ones"""
+    store = HealthStore()
+    monitor = HealthMonitor(store)
+    store.watch("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    store.watch("gcp", "default", ["3.3.3.3"])
+
+    with patch("cloudproxy.providers.health.check_alive", side_effect=lambda ip: ip == "1.1.1.1") as probe:
+        assert monitor.run_once() == 2
+
+    assert sorted(call.args[0] for call in probe.call_args_list) == ["1.1.1.1", "2.2.2.2"]
+    assert ("gcp", "default") not in store.watched()
+    assert store.get("1.1.1.1")["alive"] is True
+    assert store.get("2.2.2.2")["alive"] is False
+    assert monitor.stats()["runs"] == 1
+
+
+def test_start_is_off_without_interval(monitor_config):
+    """Test the monitor does not start with HEALTH_MONITOR_INTERVAL=0"""
+    monitor_config["interval"] = 0
+    monitor = HealthMonitor(HealthStore())
+    assert monitor.start() is False
+    assert not monitor.running
+
+
+def test_listings_skip_proxies_failing_monitor_probe(monitor_config, aws_instances):
+    """Test /, /random and the health endpoint use the shared store"""
+    aws_instances["ips"] = ["1.1.1.1", "2.2.2.2"]
+    health_store.watch("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    health_store.record("1.1.1.1", True, 0.2)
+    health_store.record("2.2.2.2", False)
+    client = TestClient(app)
+
+    listed = [proxy["ip"] for proxy in client.get("/", params={"limit": 100}).json()["proxies"]]
+    assert "1.1.1.1" in listed
+    assert "2.2.2.2" not in listed
+    for _ in range(10):
+        assert client.get("/random").json()["proxy"]["ip"] != "2.2.2.2"
+
+    data = client.get("/probes/proxies").json()
+    assert data["config"]["interval"] == 10
+    assert data["config"]["max_age"] == 30
+    assert {proxy["ip"]: proxy["alive"] for proxy in data["proxies"]} == {"1.1.1.1": True, "2.2.2.2": False}
+
+
+def history_of(*results):
+    history = HealthHistory(32)
+    for alive in results:
+        history.append(alive, 0.1 if alive else None)
+    return history
+
+
+def test_history_ring_buffer_keeps_latest_samples():
+    """Test the history overwrites its oldest samples once full"""
+    history = HealthHistory(4)
+    for i in range(6):
+        history.append(i % 3 != 0, float(i))
+
+    assert len(history) == 4
+    assert history.samples() == [(True, 2.0), (False, None), (True, 4.0), (True, 5.0)]
+    assert history.success_rate() == 0.75
+    assert history.mean_latency() == pytest.approx(11 / 3)
+    assert history.flaps() == 2
+    assert history.streak() == (True, 2)
+
+
+def test_probe_interval_adapts_to_history(monitor_config):
+    """Test stable proxies back off, new and flapping ones are probed every run"""
+    monitor_config["max_age"] = 80
+
+    # New proxy
+    assert probe_interval(history_of(True)) == 10
+    # Stable proxy doubles its interval every 4 successes, up to max_age
+    assert probe_interval(history_of(*[True] * 4)) == 20
+    assert probe_interval(history_of(*[True] * 8)) == 40
+    assert probe_interval(history_of(*[True] * 30)) == 80
+    # Flapping proxy
+    assert probe_interval(history_of(True, True, True, False, True, True, True, True)) == 10
+    # Never answered, exponential backoff
+    assert probe_interval(history_of(False)) == 10
+    assert probe_interval(history_of(False, False, False)) == 40
+    # Monitor off
+    monitor_config["interval"] = 0
+    assert probe_interval(history_of(True)) == 0
+
+
+def test_pending_proxy_backs_off_with_short_timeout(monitor_config):
+    """Test a proxy that has not answered yet is probed less often and with a short timeout"""
+    monitor_config["pending_timeout"] = 2
+    store = HealthStore()
+    monitor = HealthMonitor(store)
+    probe = Mock(return_value=False)
+
+    now = 1000.0
+    with patch("cloudproxy.providers.health.time.time", side_effect=lambda: now):
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+        probe.assert_called_once_with("1.1.1.1")
+        now = 1011.0
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+        assert probe.call_args.kwargs == {"timeout": 2}
+        # Third probe waits 20s rather than 10s
+        now = 1022.0
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+        assert probe.call_count == 2
+        now = 1032.0
+        monitor.check("aws", "default", ["1.1.1.1"], probe=probe)
+        assert probe.call_count == 3
+
+
+def test_pending_timeout_skips_probes_without_timeout_parameter(monitor_config):
+    """Test a probe taking only an IP is still called once the short timeout applies"""
+    monitor_config["pending_timeout"] = 2
+    store = HealthStore()
+    monitor = HealthMonitor(store)
+    calls = []
+
+    def probe(ip):
+        calls.append(ip)
+        return True
+
+    store.record("1.1.1.1", False)
+    assert store.probe_timeout("1.1.1.1") == 2
+    assert monitor.probe(["1.1.1.1"], probe=probe) == {"1.1.1.1": True}
+    assert calls == ["1.1.1.1"]
+    assert accepts_timeout(check_alive)
+    assert not accepts_timeout(probe)
+
+
+def test_run_once_skips_stable_proxies_not_due(aws_instances, monitor_config):
+    """Test the monitor only probes proxies whose adaptive interval has passed"""
+    store = HealthStore()
+    monitor = HealthMonitor(store)
+    store.watch("aws", "default", ["1.1.1.1", "2.2.2.2"])
+    for _ in range(4):
+        store.record("1.1.1.1", True, 0.1)
+
+    with patch("cloudproxy.providers.health.check_alive", return_value=True) as probe:
+        monitor.run_once()
+
+    assert [call.args[0] for call in probe.call_args_list] == ["2.2.2.2"]
+    assert store.get("1.1.1.1")["interval"] == 20
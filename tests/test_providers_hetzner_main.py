@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 import datetime
 
 from cloudproxy.providers.hetzner.main import (
@@ -284,7 +284,11 @@ class TestHetznerMain(unittest.TestCase):
         ready_ips = hetzner_start(mock_instance_config)
 
         # Use the instance config directly in assertions
-        mock_hetzner_check_delete.assert_called_once_with(mock_instance_config)
-        mock_hetzner_deployment.assert_called_once_with(1, mock_instance_config)
-        mock_hetzner_check_alive.assert_called_once_with(mock_instance_config)
+        mock_hetzner_check_delete.assert_called_once_with(mock_instance_config, ANY)
+        mock_hetzner_deployment.assert_called_once_with(1, mock_instance_config, ANY)
+        mock_hetzner_check_alive.assert_called_once_with(mock_instance_config, ANY)
+        # All phases share one inventory snapshot
+        inventory = mock_hetzner_check_delete.call_args[0][1]
+        self.assertIs(mock_hetzner_deployment.call_args[0][2], inventory)
+        self.assertIs(mock_hetzner_check_alive.call_args[0][1], inventory)
         self.assertEqual(ready_ips, ["1.1.1.1"])
\ No newline at end of file
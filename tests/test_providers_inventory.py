@@ -0,0 +1,103 @@
+import datetime
+from unittest.mock import Mock, patch
+
+from cloudproxy.providers.health import health_store
+from cloudproxy.providers.inventory import Inventory, pick_surplus
+from cloudproxy.providers.digitalocean.main import do_deployment, do_start
+
+
+def test_inventory_lists_once_until_invalidated():
+    """Test the snapshot is fetched lazily and reused until invalidated"""
+    lister = Mock(side_effect=[["a", "b"], ["a"]])
+    instance_config = {"display_name": "test"}
+    inventory = Inventory(lister, instance_config)
+
+    assert inventory.stale
+    assert inventory.get() == ["a", "b"]
+    assert len(inventory) == 2
+    assert list(inventory) == ["a", "b"]
+    lister.assert_called_once_with(instance_config)
+
+    inventory.invalidate()
+    assert inventory.stale
+    assert inventory.get() == ["a"]
+    assert inventory.fetches == 2
+
+
+class FakeDroplet:
+    def __init__(self, id, ip_address):
+        self.id = id
+        self.ip_address = ip_address
+        self.created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+@patch('cloudproxy.providers.digitalocean.main.delete_queue', set())
+@patch('cloudproxy.providers.digitalocean.main.restart_queue', set())
+@patch('cloudproxy.providers.digitalocean.main.do_fw')
+@patch('cloudproxy.providers.digitalocean.main.check_alive', return_value=True)
+@patch('cloudproxy.providers.digitalocean.main.create_proxies')
+@patch('cloudproxy.providers.digitalocean.main.delete_proxy')
+@patch('cloudproxy.providers.digitalocean.main.list_droplets')
+def test_do_start_lists_droplets_once_when_steady(mock_list, mock_delete, mock_create, mock_check, mock_fw):
+    """Test a tick with nothing to change lists the provider only once"""
+    mock_list.return_value = [FakeDroplet(1, "1.1.1.1"), FakeDroplet(2, "2.2.2.2")]
+    instance_config = {"display_name": "test", "scaling": {"min_scaling": 2, "max_scaling": 2}}
+
+    result = do_start(instance_config)
+
+    assert mock_list.call_count == 1
+    assert sorted(result) == ["1.1.1.1", "2.2.2.2"]
+    mock_create.assert_not_called()
+    mock_delete.assert_not_called()
+
+
+@patch('cloudproxy.providers.digitalocean.main.delete_queue', set())
+@patch('cloudproxy.providers.digitalocean.main.restart_queue', set())
+@patch('cloudproxy.providers.digitalocean.main.do_fw')
+@patch('cloudproxy.providers.digitalocean.main.check_alive', return_value=True)
+@patch('cloudproxy.providers.digitalocean.main.create_proxies')
+@patch('cloudproxy.providers.digitalocean.main.delete_proxy')
+@patch('cloudproxy.providers.digitalocean.main.list_droplets')
+def test_do_start_refreshes_after_scaling(mock_list, mock_delete, mock_create, mock_check, mock_fw):
+    """Test the snapshot is refreshed once after the deployment phase creates droplets"""
+    before = [FakeDroplet(1, "1.1.1.1")]
+    after = before + [FakeDroplet(2, "2.2.2.2")]
+    mock_list.side_effect = [before, after]
+    instance_config = {"display_name": "test", "scaling": {"min_scaling": 2, "max_scaling": 2}}
+
+    result = do_start(instance_config)
+
+    assert mock_list.call_count == 2
+    mock_create.assert_called_once_with(1, instance_config)
+    assert sorted(result) == ["1.1.1.1", "2.2.2.2"]
+
+
+def test_pick_surplus_prefers_failing_then_oldest_and_skips_leased():
+    """Test scale-down deletes failing proxies, then the oldest, never a leased one"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    proxies = [
+        ("1.1.1.1", now - datetime.timedelta(hours=1)),
+        ("2.2.2.2", now - datetime.timedelta(hours=5)),
+        ("3.3.3.3", now),
+        ("4.4.4.4", now - datetime.timedelta(hours=9)),
+    ]
+    health_store.record("3.3.3.3", False)
+
+    with patch("cloudproxy.providers.inventory.lease_store", Mock(leased_ips=Mock(return_value={"4.4.4.4"}))):
+        surplus = pick_surplus(proxies, 2, lambda proxy: proxy[0], lambda proxy: proxy[1])
+
+    assert [ip for ip, _ in surplus] == ["3.3.3.3", "2.2.2.2"]
+
+
+@patch('cloudproxy.providers.digitalocean.main.delete_proxy', return_value=True)
+@patch('cloudproxy.providers.digitalocean.main.create_proxies')
+@patch('cloudproxy.providers.digitalocean.main.list_droplets')
+def test_do_deployment_deletes_oldest_surplus(mock_list, mock_create, mock_delete):
+    """Test an overprovisioned instance deletes its oldest droplet, not the first listed"""
+    newer, older = FakeDroplet(1, "1.1.1.1"), FakeDroplet(2, "2.2.2.2")
+    older.created_at = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)).isoformat()
+    mock_list.return_value = [newer, older]
+
+    do_deployment(1, {"display_name": "test"})
+
+    assert [call.args[0] for call in mock_delete.call_args_list] == [older]
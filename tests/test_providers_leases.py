@@ -0,0 +1,119 @@
+"""
+Unit tests for exclusive proxy leases.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.leases import LeaseStore, lease_store, lease_ttl
+from cloudproxy.providers.registry import ProxyRegistry
+from cloudproxy.providers.rolling import RollingDeploymentManager
+
+
+@pytest.fixture
+def pool():
+    registry = ProxyRegistry()
+    registry.sync_instance("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"])
+    return registry
+
+
+def test_leases_are_exclusive_until_released(pool):
+    """Test a leased proxy is not leased again until its lease is released"""
+    store = LeaseStore()
+    first = store.acquire(pool, 2)
+    second = store.acquire(pool, 1, exclude={"9.9.9.9"})
+
+    leased = [entry.ip for entry in first.proxies + second.proxies]
+    assert sorted(leased) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    assert store.acquire(pool, 1) is None
+
+    assert store.release(first.id) is first
+    assert store.release(first.id) is None
+    assert store.leased_ips() == {second.proxies[0].ip}
+    assert len(store.acquire(pool, 2).proxies) == 2
+
+
+def test_leases_expire_after_ttl(pool):
+    """Test expired leases release their proxies"""
+    store = LeaseStore()
+    with patch("cloudproxy.providers.leases.time.time", return_value=1000.0):
+        lease = store.acquire(pool, 3, ttl=60)
+    assert lease.ttl == 60
+
+    with patch("cloudproxy.providers.leases.time.time", return_value=1059.0):
+        assert store.leased("1.1.1.1")
+    with patch("cloudproxy.providers.leases.time.time", return_value=1060.0):
+        assert not store.leased("1.1.1.1")
+        assert store.get(lease.id) is None
+        assert store.release(lease.id) is None
+    assert store.expired == 1
+
+
+def test_ttl_defaults_and_cap():
+    """Test the TTL falls back to LEASE_DEFAULT_TTL and is capped by LEASE_MAX_TTL"""
+    with patch.dict(settings.config["leases"], {"default_ttl": 120, "max_ttl": 600}):
+        assert lease_ttl() == 120
+        assert lease_ttl(30) == 30
+        assert lease_ttl(10 ** 6) == 600
+
+
+def test_released_leases_do_not_grow_the_expiry_heap(pool):
+    """Test the expiry heap is compacted under high lease churn"""
+    store = LeaseStore()
+    for _ in range(1000):
+        store.release(store.acquire(pool, 1).id)
+    assert len(store._expiry) <= 64
+
+
+def test_rolling_manager_keeps_leased_proxies():
+    """Test rolling recycling and surge retirements skip leased proxies"""
+    registry = ProxyRegistry()
+    registry.sync_instance("aws", "default", ["1.1.1.1"])
+    lease = lease_store.acquire(registry, 1)
+    manager = RollingDeploymentManager()
+
+    assert not manager.can_recycle_proxy(
+        "aws", "default", "1.1.1.1", total_healthy=5, min_available=1, batch_size=2,
+        rolling_enabled=True, min_scaling=5
+    )
+    retire = manager.select_surge_retirements(
+        "aws", "default", [("p1", "1.1.1.1", True), ("p2", "2.2.2.2", False)], total_healthy=5, min_scaling=2
+    )
+    # Dead proxies are retired even when leased, they serve nothing
+    assert retire == ["p2"]
+    assert "1.1.1.1" in manager.get_state("aws", "default").blocked
+
+    lease_store.release(lease.id)
+    assert manager.can_recycle_proxy(
+        "aws", "default", "1.1.1.1", total_healthy=5, min_available=1, batch_size=2,
+        rolling_enabled=True, min_scaling=5
+    )
+
+
+def test_lease_endpoints():
+    """Test leasing, listing and releasing through the API"""
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": ["1.1.1.1", "2.2.2.2"]}}}}
+    client = TestClient(app)
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", set()), patch("cloudproxy.main.restart_queue", set()):
+        response = client.post("/leases", json={"count": 1, "ttl": 30})
+        assert response.status_code == 201
+        lease = response.json()["lease"]
+        assert lease["ttl"] == 30
+        leased_ip = lease["proxies"][0]["ip"]
+
+        # Leased proxies are not handed out to anyone else
+        for _ in range(5):
+            assert client.get("/random").json()["proxy"]["ip"] != leased_ip
+        assert client.get("/sticky/any-session").json()["proxy"]["ip"] != leased_ip
+        assert client.post("/leases", json={"count": 2}).status_code == 409
+
+        assert client.get("/leases").json()["total"] == 1
+        assert client.delete(f"/leases/{lease['id']}").status_code == 200
+        assert client.delete(f"/leases/{lease['id']}").status_code == 404
+        assert client.post("/leases", json={"count": 2}).status_code == 201
+        assert client.post("/leases", json={"provider": "linode"}).status_code == 404
@@ -229,4 +229,36 @@ def test_init_schedule_multiple_providers_with_instances(mock_scheduler_class, s
         function_names.add(func.__name__)
     
     # There should be closures for both provider types
-    assert len(function_names) > 0 
\ No newline at end of file
+    assert len(function_names) > 0 
+@patch('cloudproxy.providers.manager.BackgroundScheduler')
+def test_init_schedule_scheduler_policy(mock_scheduler_class, setup_provider_config):
+    """Test jobs get a bounded pool, no overlap, per-instance intervals and jitter"""
+    mock_scheduler = Mock()
+    mock_scheduler_class.return_value = mock_scheduler
+    original_scheduler = settings.config["scheduler"].copy()
+    settings.config["scheduler"].update({"workers": 4, "interval": 30, "jitter": 5})
+
+    settings.config["providers"]["aws"]["instances"] = {
+        "default": {"enabled": True, "display_name": "Default AWS"},
+        "production": {"enabled": True, "interval": 60, "display_name": "Production AWS"},
+    }
+    for provider in ["digitalocean", "gcp", "hetzner", "vultr"]:
+        settings.config["providers"][provider]["instances"]["default"]["enabled"] = False
+
+    try:
+        init_schedule()
+    finally:
+        settings.config["scheduler"] = original_scheduler
+
+    kwargs = mock_scheduler_class.call_args[1]
+    assert kwargs["executors"]["default"]._pool._max_workers == 4
+    assert kwargs["job_defaults"]["max_instances"] == 1
+    assert kwargs["job_defaults"]["coalesce"] is True
+    mock_scheduler.add_listener.assert_called_once()
+
+    jobs = {call[1]["id"]: call for call in mock_scheduler.add_job.call_args_list}
+    assert {"aws-default", "aws-production"} <= set(jobs)
+    assert jobs["aws-default"][1]["seconds"] == 30
+    assert jobs["aws-production"][1]["seconds"] == 60
+    assert jobs["aws-production"][1]["jitter"] == 5
+    assert jobs["aws-production"][0][0].__name__ == "aws_manager"
@@ -283,4 +283,16 @@ def test_aws_manager_custom_instance_exception(mock_aws_start, setup_manager_tes
     
     # Execute - this should catch the exception and return an empty list
     with pytest.raises(Exception):
-        aws_manager("prod") 
\ No newline at end of file
+        aws_manager("prod") 
+
+@patch('cloudproxy.providers.manager.hetzner_start')
+def test_manager_updates_proxy_registry(mock_hetzner_start, setup_manager_test):
+    """Test a manager tick pushes the instance's IPs into the proxy registry"""
+    from cloudproxy.providers.registry import proxy_registry
+    mock_hetzner_start.return_value = ["10.20.30.40"]
+
+    hetzner_manager()
+
+    entry = proxy_registry.get("10.20.30.40")
+    assert entry.provider == "hetzner"
+    assert entry.instance == "default"
@@ -0,0 +1,159 @@
+"""
+Unit tests for the in-process metrics and the GET /metrics endpoint.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import metrics, settings
+from cloudproxy.providers.batch import BatchResult
+from cloudproxy.providers.health import HealthMonitor, HealthStore
+from cloudproxy.providers.leases import lease_store
+from cloudproxy.providers.registry import proxy_registry
+from cloudproxy.providers.rolling import RollingDeploymentManager
+from cloudproxy.providers.scheduler import timed_tick
+from cloudproxy.providers.tracing import traced
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+def test_histogram_exposition():
+    """Test histogram buckets are cumulative and label values are escaped"""
+    histogram = metrics.Histogram("test_seconds", "A test histogram", ("name",), buckets=(1, 5))
+    histogram.observe(0.5, 'a"b')
+    histogram.observe(1, 'a"b')
+    histogram.observe(7, 'a"b')
+
+    assert histogram.expose() == [
+        "# HELP test_seconds A test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{name="a\\"b",le="1"} 2',
+        'test_seconds_bucket{name="a\\"b",le="5"} 2',
+        'test_seconds_bucket{name="a\\"b",le="+Inf"} 3',
+        'test_seconds_sum{name="a\\"b"} 8.5',
+        'test_seconds_count{name="a\\"b"} 3',
+    ]
+
+
+def test_provider_calls_are_counted():
+    """Test provider API calls record their duration, exceptions and failed batch items"""
+    @metrics.provider_call("aws")
+    def create_proxies(count):
+        return BatchResult(requested=count, created=1, errors=["quota"] * (count - 1))
+
+    @metrics.provider_call("aws")
+    def list_instances():
+        raise RuntimeError("throttled")
+
+    assert create_proxies.__name__ == "create_proxies"
+    create_proxies(3)
+    with pytest.raises(RuntimeError):
+        list_instances()
+
+    assert metrics.provider_api_duration.count("aws", "create_proxies") == 1
+    assert metrics.provider_api_errors.value("aws", "create_proxies") == 2
+    assert metrics.provider_api_errors.value("aws", "list_instances") == 1
+
+
+def test_nested_provider_calls_are_counted_once():
+    """Test a decorated function delegating to another one records a single call"""
+    @metrics.provider_call("aws")
+    def delete_proxies(ids):
+        raise RuntimeError("throttled")
+
+    @metrics.provider_call("aws")
+    def delete_proxy(instance_id):
+        return delete_proxies([instance_id])
+
+    with pytest.raises(RuntimeError):
+        delete_proxy("i-1")
+
+    assert metrics.provider_api_duration.count("aws", "delete_proxy") == 1
+    assert metrics.provider_api_duration.count("aws", "delete_proxies") == 0
+    assert metrics.provider_api_errors.value("aws", "delete_proxy") == 1
+    assert metrics.provider_api_errors.value("aws", "delete_proxies") == 0
+
+    # The guard is released, a later direct call is recorded
+    with pytest.raises(RuntimeError):
+        delete_proxies(["i-2"])
+    assert metrics.provider_api_duration.count("aws", "delete_proxies") == 1
+
+
+def test_counter_type_lines_use_the_sample_name():
+    """Test a counter's HELP and TYPE lines name the _total samples they describe"""
+    counter = metrics.Counter("test_events_total", "A test counter", ("name",))
+    counter.inc("a")
+    assert counter.expose() == [
+        "# HELP test_events_total A test counter",
+        "# TYPE test_events_total counter",
+        'test_events_total{name="a"} 1',
+    ]
+
+
+def test_ticks_probes_and_rolling_decisions_are_recorded():
+    """Test the scheduler, health monitor and rolling manager feed their metrics"""
+    timed_tick("aws-default", lambda: None)()
+    assert metrics.tick_duration.count("aws-default") == 1
+
+    HealthMonitor(HealthStore()).probe(["1.1.1.1", "2.2.2.2"], probe=lambda ip: ip == "1.1.1.1")
+    assert metrics.probe_duration.count("alive") == 1
+    assert metrics.probe_duration.count("dead") == 1
+
+    manager = RollingDeploymentManager()
+    for ip in ("1.1.1.1", "2.2.2.2"):
+        manager.can_recycle_proxy(
+            "aws", "default", ip, total_healthy=5, min_available=1, batch_size=1, rolling_enabled=True
+        )
+    manager.mark_proxy_recycled("aws", "default", "1.1.1.1")
+    assert metrics.rolling_recycles.value("aws", "default", "started") == 1
+    assert metrics.rolling_recycles.value("aws", "default", "blocked") == 1
+    assert metrics.rolling_recycles.value("aws", "default", "completed") == 1
+
+
+def test_tick_phases_are_observed_per_job():
+    """Test every @traced phase of a tick lands in the phase histogram"""
+    @traced
+    def aws_check_alive():
+        pass
+
+    @traced
+    def aws_deployment():
+        aws_check_alive()
+
+    timed_tick("aws-default", aws_deployment)()
+    aws_check_alive()
+
+    assert metrics.tick_phase_duration.count("aws-default", "aws_deployment") == 1
+    # Calls outside of a tick are not observed
+    assert metrics.tick_phase_duration.count("aws-default", "aws_check_alive") == 1
+
+
+def test_metrics_endpoint():
+    """Test GET /metrics reports pool states and queue depths"""
+    providers = {"aws": {"instances": {
+        "default": {"enabled": True, "ips": ["1.1.1.1", "2.2.2.2", "3.3.3.3"]},
+        "production": {"enabled": True, "ips": []},
+    }}}
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", {"1.1.1.1"}), patch("cloudproxy.main.restart_queue", set()):
+        proxy_registry.sync(settings.config)
+        lease_store.acquire(proxy_registry, 1, exclude={"1.1.1.1", "3.3.3.3"})
+        response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert 'cloudproxy_pool_proxies{provider="aws",instance="default",state="pending_delete"} 1' in lines
+    assert 'cloudproxy_pool_proxies{provider="aws",instance="default",state="leased"} 1' in lines
+    assert 'cloudproxy_pool_proxies{provider="aws",instance="default",state="available"} 1' in lines
+    assert 'cloudproxy_pool_proxies{provider="aws",instance="production",state="available"} 0' in lines
+    assert 'cloudproxy_queue_depth{queue="delete"} 1' in lines
+    assert "# TYPE cloudproxy_tick_duration_seconds histogram" in lines
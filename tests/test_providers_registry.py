@@ -0,0 +1,188 @@
+import pytest
+from unittest.mock import patch
+
+from cloudproxy.providers.registry import ProxyRegistry
+from cloudproxy.providers.versioned import IPList
+
+
+def make_config(do_ips=None, aws_ips=None, aws_prod_ips=None):
+    """Minimal config with DigitalOcean and two AWS instances"""
+    return {
+        "providers": {
+            "digitalocean": {
+                "instances": {
+                    "default": {"ips": do_ips or [], "display_name": "DO"},
+                },
+            },
+            "aws": {
+                "instances": {
+                    "default": {"ips": aws_ips or [], "display_name": "AWS"},
+                    "production": {"ips": aws_prod_ips or [], "display_name": "AWS Production"},
+                },
+            },
+        }
+    }
+
+
+def test_sync_indexes_instances():
+    """Test sync indexes every instance's IPs with provider and instance"""
+    registry = ProxyRegistry()
+    registry.sync(make_config(["1.1.1.1"], ["2.2.2.2"], ["3.3.3.3", "4.4.4.4"]))
+
+    assert registry.count() == 4
+    entry = registry.get("3.3.3.3")
+    assert (entry.provider, entry.instance, entry.display_name) == ("aws", "production", "AWS Production")
+    assert [e.ip for e in registry.by_instance("aws")] == ["2.2.2.2", "3.3.3.3", "4.4.4.4"]
+    assert [e.ip for e in registry.by_instance("aws", "production")] == ["3.3.3.3", "4.4.4.4"]
+
+
+def test_sync_skips_unchanged_instances():
+    """Test an unchanged config does not rebuild any instance"""
+    registry = ProxyRegistry()
+    config = make_config(["1.1.1.1"], ["2.2.2.2"])
+    registry.sync(config)
+    syncs = registry.syncs
+
+    registry.sync(config)
+    assert registry.syncs == syncs
+
+    config["providers"]["aws"]["instances"]["default"]["ips"] = ["5.5.5.5"]
+    registry.sync(config)
+    assert registry.syncs == syncs + 1
+    assert registry.get("2.2.2.2") is None
+    assert registry.get("5.5.5.5").provider == "aws"
+
+
+def test_sync_picks_up_in_place_edits():
+    """Test a same-length in-place edit of an IP list is picked up"""
+    registry = ProxyRegistry()
+    ips = IPList(["2.2.2.2", "3.3.3.3"])
+    config = make_config(aws_ips=ips)
+    registry.sync(config)
+
+    ips[1] = "6.6.6.6"
+    registry.sync(config)
+
+    assert registry.get("3.3.3.3") is None
+    assert registry.get("6.6.6.6").instance == "default"
+    # The registry only reads the config
+    assert config["providers"]["aws"]["instances"]["default"]["ips"] is ips
+
+
+def test_sync_compares_plain_lists_by_contents():
+    """Test an in-place edit of a plain list is picked up without replacing the list"""
+    registry = ProxyRegistry()
+    ips = ["2.2.2.2", "3.3.3.3"]
+    config = make_config(aws_ips=ips)
+    registry.sync(config)
+    syncs = registry.syncs
+
+    registry.sync(config)
+    assert registry.syncs == syncs
+
+    ips[1] = "6.6.6.6"
+    registry.sync(config)
+
+    assert registry.get("3.3.3.3") is None
+    assert registry.get("6.6.6.6").instance == "default"
+    assert type(config["providers"]["aws"]["instances"]["default"]["ips"]) is list
+
+
+def test_sync_drops_removed_instances():
+    """Test proxies of an instance removed from the config are dropped"""
+    registry = ProxyRegistry()
+    config = make_config(aws_ips=["2.2.2.2"], aws_prod_ips=["3.3.3.3"])
+    registry.sync(config)
+
+    del config["providers"]["aws"]["instances"]["production"]
+    registry.sync(config)
+
+    assert registry.get("3.3.3.3") is None
+    assert registry.count() == 1
+
+
+def test_sync_instance_updates_incrementally():
+    """Test a manager push replaces only that instance's proxies"""
+    registry = ProxyRegistry()
+    registry.sync(make_config(["1.1.1.1"], ["2.2.2.2"]))
+
+    registry.sync_instance("aws", "default", ["2.2.2.2", "6.6.6.6"], "AWS")
+
+    assert registry.count() == 3
+    assert registry.get("1.1.1.1").provider == "digitalocean"
+    assert registry.get("6.6.6.6").instance == "default"
+
+
+def test_page_and_count_exclude_queued():
+    """Test pagination and totals leave out excluded IPs"""
+    registry = ProxyRegistry()
+    registry.sync_instance("hetzner", "default", [f"10.0.0.{i}" for i in range(10)])
+
+    excluded = {"10.0.0.1", "10.0.0.2", "192.0.2.1"}
+    assert registry.count(exclude=excluded) == 8
+    page = registry.page(offset=1, limit=3, exclude=excluded)
+    assert [e.ip for e in page] == ["10.0.0.3", "10.0.0.4", "10.0.0.5"]
+    assert registry.page(offset=8, limit=5, exclude=excluded) == []
+
+
+def test_random_respects_exclusions():
+    """Test random selection never returns an excluded IP"""
+    registry = ProxyRegistry()
+    registry.sync_instance("vultr", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"])
+
+    for _ in range(50):
+        assert registry.random(exclude={"1.1.1.1", "2.2.2.2"}).ip == "3.3.3.3"
+    assert registry.random(exclude={"1.1.1.1", "2.2.2.2", "3.3.3.3"}) is None
+    assert ProxyRegistry().random() is None
+
+
+def test_removal_keeps_random_index_dense():
+    """Test removing proxies keeps the random selection array consistent"""
+    registry = ProxyRegistry()
+    registry.sync_instance("gcp", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3", "4.4.4.4"])
+    registry.sync_instance("gcp", "default", ["4.4.4.4", "2.2.2.2"])
+
+    seen = {registry.random().ip for _ in range(100)}
+    assert seen == {"2.2.2.2", "4.4.4.4"}
+
+
+def test_ip_listed_by_two_sources_is_kept_until_both_drop_it():
+    """Test an IP in the legacy top-level list and an instance list is indexed once"""
+    registry = ProxyRegistry()
+    registry.sync_instance("digitalocean", "default", ["1.1.1.1"])
+    registry.sync_instance("digitalocean", "default", ["1.1.1.1"], legacy=True)
+    assert registry.count() == 1
+
+    registry.sync_instance("digitalocean", "default", [])
+    assert registry.get("1.1.1.1") is not None
+    registry.sync_instance("digitalocean", "default", [], legacy=True)
+    assert registry.get("1.1.1.1") is None
+
+
+def test_cursor_pages_survive_churn():
+    """Test cursor pages neither skip nor repeat proxies when earlier ones are removed"""
+    registry = ProxyRegistry()
+    ips = [f"10.0.0.{n}" for n in range(1, 11)]
+    registry.sync_instance("aws", "default", ips)
+
+    first, cursor = registry.after(0, 4)
+    assert [entry.ip for entry in first] == ips[:4]
+    assert cursor == registry.cursor_of(ips[3])
+
+    # Removing seen proxies and adding new ones does not shift the next page
+    registry.sync_instance("aws", "default", ips[4:] + ["10.0.0.11"])
+    second, cursor = registry.after(cursor, 4, exclude={"10.0.0.6"})
+    assert [entry.ip for entry in second] == ["10.0.0.5", "10.0.0.7", "10.0.0.8", "10.0.0.9"]
+
+    rest, cursor = registry.after(cursor, 4)
+    assert [entry.ip for entry in rest] == ["10.0.0.10", "10.0.0.11"]
+    assert cursor is None
+
+
+def test_cursor_index_is_compacted():
+    """Test removed proxies do not grow the cursor index without bound"""
+    registry = ProxyRegistry()
+    for n in range(500):
+        registry.sync_instance("aws", "default", [f"10.0.{n // 250}.{n % 250}"])
+    assert len(registry._order) <= 2 * registry.count() + 65
+    assert [entry.ip for entry in registry.after()[0]] == ["10.0.1.249"]
@@ -0,0 +1,176 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.scheduler import (
+    ReconcileTriggers,
+    TickMetrics,
+    instance_interval,
+    job_id,
+    reconcile_triggers,
+    record_skipped_run,
+    request_reconcile_for_ip,
+    tick_metrics,
+    timed_tick,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_tick_metrics():
+    tick_metrics.clear()
+    yield
+    tick_metrics.clear()
+
+
+def test_job_id():
+    """Test job IDs combine provider and instance name"""
+    assert job_id("aws", "production") == "aws-production"
+
+
+def test_instance_interval_defaults_to_scheduler_interval():
+    """Test instances without their own interval use SCHEDULER_INTERVAL"""
+    assert instance_interval({"enabled": True}) == settings.config["scheduler"]["interval"]
+
+
+def test_instance_interval_override():
+    """Test an instance interval overrides the scheduler default"""
+    assert instance_interval({"enabled": True, "interval": 45}) == 45
+    assert instance_interval({"enabled": True, "interval": "0"}) == 1
+
+
+def test_tick_metrics_durations():
+    """Test tick metrics keep last, mean and max durations"""
+    metrics = TickMetrics()
+    metrics.record("aws-default", 2.0)
+    metrics.record("aws-default", 4.0)
+    metrics.record("aws-default", 3.0, error="boom")
+
+    stats = metrics.stats()["aws-default"]
+    assert stats["runs"] == 3
+    assert stats["errors"] == 1
+    assert stats["last_error"] == "boom"
+    assert stats["last_duration"] == 3.0
+    assert stats["avg_duration"] == pytest.approx(3.0)
+    assert stats["max_duration"] == 4.0
+    assert stats["running"] is False
+
+
+def test_timed_tick_records_run_and_keeps_name():
+    """Test the tick wrapper records the run and keeps the function name"""
+    def do_manager():
+        return ["1.1.1.1"]
+
+    wrapped = timed_tick("digitalocean-default", do_manager)
+
+    assert wrapped.__name__ == "do_manager"
+    assert wrapped() == ["1.1.1.1"]
+    assert tick_metrics.stats()["digitalocean-default"]["runs"] == 1
+
+
+def test_timed_tick_records_errors():
+    """Test a tick that raises is recorded as an error and re-raised"""
+    def failing():
+        raise RuntimeError("API down")
+
+    with pytest.raises(RuntimeError):
+        timed_tick("hetzner-default", failing)()
+
+    stats = tick_metrics.stats()["hetzner-default"]
+    assert stats["errors"] == 1
+    assert stats["last_error"] == "API down"
+    assert stats["running"] is False
+
+
+def test_record_skipped_run():
+    """Test skipped and missed runs are counted separately"""
+    record_skipped_run(Mock(code=EVENT_JOB_MAX_INSTANCES, job_id="gcp-default"))
+    record_skipped_run(Mock(code=EVENT_JOB_MAX_INSTANCES, job_id="gcp-default"))
+    record_skipped_run(Mock(code=EVENT_JOB_MISSED, job_id="gcp-default"))
+
+    stats = tick_metrics.stats()["gcp-default"]
+    assert stats["overlapped"] == 2
+    assert stats["missed"] == 1
+
+
+def make_scheduler(next_run_in=20):
+    """Mock scheduler holding one job due next_run_in seconds from now"""
+    job = Mock()
+    job.next_run_time = datetime.now(timezone.utc) + timedelta(seconds=next_run_in)
+    scheduler = Mock()
+    scheduler.get_job.return_value = job
+    return scheduler, job
+
+
+def test_trigger_pulls_next_run_forward():
+    """Test a reconcile request moves the job's next run to the trigger delay"""
+    scheduler, job = make_scheduler(next_run_in=600)
+    triggers = ReconcileTriggers()
+    triggers.attach(scheduler)
+
+    assert triggers.request("aws", "production") is True
+
+    scheduler.get_job.assert_called_with("aws-production")
+    job.modify.assert_called_once()
+    run_at = job.modify.call_args[1]["next_run_time"]
+    assert run_at - datetime.now(timezone.utc) <= timedelta(seconds=settings.config["scheduler"]["trigger_delay"])
+    assert triggers.stats()["scheduled"] == 1
+
+
+def test_trigger_merges_requests_into_due_run():
+    """Test requests are not rescheduled when a run is already due soon"""
+    scheduler, job = make_scheduler(next_run_in=600)
+    triggers = ReconcileTriggers()
+    triggers.attach(scheduler)
+
+    triggers.request("aws", "default")
+    job.next_run_time = job.modify.call_args[1]["next_run_time"]
+    triggers.request("aws", "default")
+    triggers.request("aws", "default")
+
+    assert job.modify.call_count == 1
+    assert triggers.stats() == {"requested": 3, "scheduled": 1, "merged": 2, "pending": 0}
+
+
+def test_trigger_during_running_tick_is_replayed():
+    """Test a request made while the tick runs is replayed once it finishes"""
+    scheduler, job = make_scheduler(next_run_in=600)
+    triggers = ReconcileTriggers()
+    triggers.attach(scheduler)
+
+    with patch("cloudproxy.providers.scheduler.reconcile_triggers", triggers):
+        def tick():
+            triggers.request("hetzner", "default")
+            triggers.request("hetzner", "default")
+            job.modify.assert_not_called()
+
+        timed_tick("hetzner-default", tick)()
+
+    job.modify.assert_called_once()
+    assert triggers.stats()["pending"] == 0
+
+
+def test_trigger_without_scheduler_or_job():
+    """Test requests are ignored when there is no scheduler or job"""
+    triggers = ReconcileTriggers()
+    assert triggers.request("aws", "default") is False
+
+    scheduler = Mock()
+    scheduler.get_job.return_value = None
+    triggers.attach(scheduler)
+    assert triggers.request("aws", "missing") is False
+
+
+def test_request_reconcile_for_ip_finds_instance():
+    """Test an IP is mapped to the instance that serves it"""
+    original = settings.config["providers"]["hetzner"]["instances"]["default"].get("ips", [])
+    settings.config["providers"]["hetzner"]["instances"]["default"]["ips"] = ["10.9.8.7"]
+    try:
+        with patch.object(reconcile_triggers, "request", return_value=True) as mock_request:
+            assert request_reconcile_for_ip("10.9.8.7") == ["hetzner-default"]
+            mock_request.assert_called_once_with("hetzner", "default")
+            assert request_reconcile_for_ip("192.0.2.1") == []
+    finally:
+        settings.config["providers"]["hetzner"]["instances"]["default"]["ips"] = original
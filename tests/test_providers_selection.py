@@ -0,0 +1,195 @@
+"""
+Unit tests for the GET /random proxy selection strategies.
+"""
+
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.registry import ProxyRegistry
+from cloudproxy.providers.selection import (
+    LatencyWeightedStrategy,
+    PowerOfTwoStrategy,
+    select_proxy,
+)
+
+
+@pytest.fixture
+def pool():
+    registry = ProxyRegistry()
+    registry.sync_instance("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"])
+    return registry
+
+
+def test_round_robin_cycles_and_skips_excluded(pool):
+    """Test round-robin serves every proxy in turn"""
+    picked = [select_proxy(pool, "round_robin").ip for _ in range(6)]
+    assert picked == ["1.1.1.1", "2.2.2.2", "3.3.3.3"] * 2
+
+    picked = [select_proxy(pool, "round_robin", exclude={"2.2.2.2"}).ip for _ in range(4)]
+    assert "2.2.2.2" not in picked
+    assert set(picked) == {"1.1.1.1", "3.3.3.3"}
+
+
+def test_least_recent_prefers_new_and_unserved(pool):
+    """Test least-recently-served rotates and puts new proxies first"""
+    first_round = [select_proxy(pool, "least_recent").ip for _ in range(3)]
+    assert sorted(first_round) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    assert [select_proxy(pool, "least_recent").ip for _ in range(3)] == first_round
+    # Serving through another strategy counts too
+    pool.mark_served(first_round[0])
+    assert select_proxy(pool, "least_recent").ip == first_round[1]
+
+    pool.sync_instance("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3", "4.4.4.4"])
+    assert select_proxy(pool, "least_recent").ip == "4.4.4.4"
+
+    pool.sync_instance("aws", "default", ["1.1.1.1"])
+    assert select_proxy(pool, "least_recent").ip == "1.1.1.1"
+
+
+def test_power_of_two_picks_faster_candidate(pool):
+    """Test p2c returns the lower latency of its two draws"""
+    latencies = {"1.1.1.1": 0.1, "2.2.2.2": 0.5, "3.3.3.3": 2.0}
+    strategy = PowerOfTwoStrategy(latency=latencies.get)
+
+    counts = Counter(strategy.select(pool).ip for _ in range(600))
+
+    # The slowest proxy only wins when drawn twice, about 1 in 9
+    assert counts["1.1.1.1"] > counts["2.2.2.2"] > counts["3.3.3.3"]
+    assert counts["3.3.3.3"] < 120
+
+
+def test_latency_weighted_favours_fast_proxies(pool):
+    """Test the latency strategy weighs proxies by inverse latency"""
+    latencies = {"1.1.1.1": 0.1, "2.2.2.2": 1.0}
+    strategy = LatencyWeightedStrategy(latency=latencies.get)
+
+    counts = Counter(strategy.select(pool, exclude={"3.3.3.3"}).ip for _ in range(500))
+
+    assert counts["1.1.1.1"] > 3 * counts["2.2.2.2"]
+
+
+def test_unknown_latency_still_served(pool):
+    """Test proxies without a probe latency yet are not starved"""
+    strategy = LatencyWeightedStrategy(latency={"1.1.1.1": 0.2, "2.2.2.2": 0.2}.get)
+    counts = Counter(strategy.select(pool).ip for _ in range(300))
+    assert counts["3.3.3.3"] > 50
+
+
+def test_empty_pool_and_unknown_strategy():
+    """Test selection on an empty pool and with a bad strategy name"""
+    registry = ProxyRegistry()
+    for strategy in ("random", "round_robin", "least_recent", "latency", "p2c"):
+        assert select_proxy(registry, strategy) is None
+    with pytest.raises(ValueError):
+        select_proxy(registry, "fastest")
+
+
+def test_random_endpoint_strategies():
+    """Test GET /random takes a per-request strategy and falls back to the global one"""
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": ["1.1.1.1", "2.2.2.2"]}}}}
+    client = TestClient(app)
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", set()), patch("cloudproxy.main.restart_queue", set()):
+        first = client.get("/random", params={"strategy": "round_robin"}).json()["proxy"]["ip"]
+        second = client.get("/random", params={"strategy": "round_robin"}).json()["proxy"]["ip"]
+        assert {first, second} == {"1.1.1.1", "2.2.2.2"}
+
+        with patch.dict(settings.config["selection"], {"strategy": "least_recent"}):
+            third = client.get("/random").json()["proxy"]["ip"]
+        assert third == first
+
+        response = client.get("/random", params={"strategy": "fastest"})
+        assert response.status_code == 422
+
+
+def test_sample_distinct_skips_excluded_and_filters_instances(pool):
+    """Test batch sampling returns distinct proxies from the chosen instances"""
+    pool.sync_instance("gcp", "eu", ["4.4.4.4", "5.5.5.5"])
+
+    for _ in range(20):
+        drawn = [entry.ip for entry in pool.sample_distinct(3, exclude={"2.2.2.2"})]
+        assert len(drawn) == len(set(drawn)) == 3
+        assert "2.2.2.2" not in drawn
+
+    assert len(pool.sample_distinct(10)) == 5
+    assert {entry.ip for entry in pool.sample_distinct(10, instances=[("gcp", "eu")])} == {"4.4.4.4", "5.5.5.5"}
+    assert pool.sample_distinct(10, instances=[]) == []
+
+
+def test_sample_endpoint_filters_by_region():
+    """Test GET /proxies/sample returns distinct proxies of the matching instances"""
+    providers = {
+        "aws": {"instances": {
+            "default": {"enabled": True, "region": "eu-west-2", "ips": ["1.1.1.1", "2.2.2.2", "3.3.3.3"]},
+            "us": {"enabled": True, "region": "us-east-1", "ips": ["4.4.4.4"]},
+        }},
+        "gcp": {"instances": {"default": {"enabled": True, "zone": "us-east-1", "ips": ["5.5.5.5"]}}},
+    }
+    client = TestClient(app)
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", {"3.3.3.3"}), patch("cloudproxy.main.restart_queue", set()):
+        data = client.get("/proxies/sample", params={"count": 10}).json()
+        assert data["total"] == 4
+        assert sorted(proxy["ip"] for proxy in data["proxies"]) == ["1.1.1.1", "2.2.2.2", "4.4.4.4", "5.5.5.5"]
+
+        data = client.get("/proxies/sample", params={"count": 10, "region": "us-east-1"}).json()
+        assert {proxy["ip"] for proxy in data["proxies"]} == {"4.4.4.4", "5.5.5.5"}
+
+        data = client.get("/proxies/sample", params={"count": 1, "provider": "aws", "instance": "default"}).json()
+        assert data["proxies"][0]["ip"] in {"1.1.1.1", "2.2.2.2"}
+
+        assert client.get("/proxies/sample", params={"region": "ap-south-1"}).status_code == 404
+        assert client.get("/proxies/sample", params={"provider": "linode"}).status_code == 404
+
+
+def test_sticky_keys_keep_their_proxy_and_remap_minimally():
+    """Test consistent hashing only moves the sessions of added or removed proxies"""
+    registry = ProxyRegistry()
+    ips = [f"10.0.0.{i}" for i in range(10)]
+    registry.sync_instance("aws", "default", ips)
+    keys = [f"session-{i}" for i in range(2000)]
+    before = {key: registry.sticky(key).ip for key in keys}
+    assert all(registry.sticky(key).ip == before[key] for key in keys[:100])
+    assert len(set(before.values())) == 10
+
+    registry.sync_instance("aws", "default", ips + ["10.0.0.10"])
+    after = {key: registry.sticky(key).ip for key in keys}
+    moved = [key for key in keys if after[key] != before[key]]
+    # About 1/11 of the keys move, all of them to the new proxy
+    assert 0 < len(moved) < len(keys) / 5
+    assert {after[key] for key in moved} == {"10.0.0.10"}
+
+    registry.sync_instance("aws", "default", ips[1:] + ["10.0.0.10"])
+    removed = {key: registry.sticky(key).ip for key in keys}
+    assert all(removed[key] == after[key] for key in keys if after[key] != "10.0.0.0")
+
+
+def test_sticky_skips_excluded_proxy_until_available():
+    """Test a session falls through while its proxy is unavailable and then returns"""
+    registry = ProxyRegistry()
+    registry.sync_instance("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"])
+    home = registry.sticky("cart-42").ip
+
+    fallback = registry.sticky("cart-42", exclude={home}).ip
+    assert fallback != home
+    assert registry.sticky("cart-42").ip == home
+    assert registry.sticky("cart-42", exclude={"1.1.1.1", "2.2.2.2", "3.3.3.3"}) is None
+    assert ProxyRegistry().sticky("cart-42") is None
+
+
+def test_sticky_endpoint():
+    """Test GET /sticky/{session_key} returns the same proxy for the same key"""
+    providers = {"aws": {"instances": {"default": {"enabled": True, "ips": ["1.1.1.1", "2.2.2.2", "3.3.3.3"]}}}}
+    client = TestClient(app)
+    with patch.dict(settings.config, {"providers": providers}), \
+         patch("cloudproxy.main.delete_queue", set()), patch("cloudproxy.main.restart_queue", set()):
+        first = client.get("/sticky/login-7").json()["proxy"]["ip"]
+        assert all(client.get("/sticky/login-7").json()["proxy"]["ip"] == first for _ in range(5))
+
+        providers["aws"]["instances"]["default"]["ips"] = []
+        assert client.get("/sticky/login-7").status_code == 404
@@ -0,0 +1,114 @@
+"""
+Unit tests for per-phase tick tracing and slow tick capture.
+"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.batch import delete_in_parallel
+from cloudproxy.providers.metrics import provider_call
+from cloudproxy.providers.scheduler import timed_tick
+from cloudproxy.providers.tracing import trace_buffer, traced
+
+
+@pytest.fixture(autouse=True)
+def clear_traces():
+    trace_buffer.clear()
+    yield
+    trace_buffer.clear()
+
+
+@provider_call("aws")
+def list_instances(instance_config=None):
+    return []
+
+
+@provider_call("aws")
+def delete_proxy(instance_id, instance_config=None):
+    if instance_id == "bad":
+        raise RuntimeError("throttled")
+    return True
+
+
+@traced
+def aws_check_delete(instance_config=None):
+    list_instances(instance_config)
+    delete_in_parallel(delete_proxy, ["i-1", "bad"], instance_config, concurrency=2)
+
+
+@traced
+def aws_deployment(min_scaling):
+    raise ValueError("quota exceeded")
+
+
+def test_tick_phases_and_provider_calls_are_traced():
+    """Test a tick records its phases, the provider calls within them and their errors"""
+    def tick():
+        aws_check_delete()
+        aws_deployment(2)
+
+    with pytest.raises(ValueError):
+        timed_tick("aws-default", tick)()
+
+    trace = trace_buffer.traces()[0]
+    assert trace.job == "aws-default"
+    assert trace.error == "quota exceeded"
+    names = [(entry.name, entry.depth) for entry in trace.spans]
+    assert names[:2] == [("aws_check_delete", 0), ("aws.list_instances", 1)]
+    # Deletes on the worker threads are nested under the phase that started them
+    assert sorted(names[2:4]) == [("aws.delete_proxy", 1), ("aws.delete_proxy", 1)]
+    assert names[4] == ("aws_deployment", 0)
+    assert [entry.error for entry in trace.spans if entry.error] == ["throttled", "quota exceeded"]
+    assert all(entry.duration is not None for entry in trace.spans)
+    assert trace.slow is False and trace.stack is None
+
+
+def test_calls_outside_ticks_are_not_traced():
+    """Test phases called outside of a tick record nothing"""
+    aws_check_delete()
+    assert trace_buffer.traces() == []
+
+
+def test_trace_buffer_is_bounded():
+    """Test only the last SCHEDULER_TRACE_SIZE traces are kept"""
+    with patch.dict(settings.config["scheduler"], {"trace_size": 3}):
+        for job in ("a-1", "a-2", "a-3", "a-4"):
+            timed_tick(job, lambda: None)()
+    assert [trace.job for trace in trace_buffer.traces()] == ["a-4", "a-3", "a-2"]
+    assert [trace.job for trace in trace_buffer.traces(job="a-3")] == ["a-3"]
+
+
+def test_slow_tick_captures_stack_and_profile():
+    """Test a tick over SCHEDULER_SLOW_TICK keeps its stack and, if enabled, its profile"""
+    def slow_phase():
+        time.sleep(0.3)
+
+    with patch.dict(settings.config["scheduler"], {"slow_tick": 0.05, "slow_tick_profile": True}):
+        timed_tick("gcp-default", slow_phase)()
+        timed_tick("gcp-default", lambda: None)()
+
+    slow = trace_buffer.traces(slow=True)
+    assert len(slow) == 1
+    assert "slow_phase" in slow[0].stack
+    assert "slow_phase" in slow[0].profile
+    assert trace_buffer.slow == 1
+
+
+def test_traces_endpoint():
+    """Test GET /scheduler/traces returns the newest traces with their spans"""
+    timed_tick("aws-default", aws_check_delete)()
+    timed_tick("aws-production", lambda: None)()
+
+    client = TestClient(app)
+    data = client.get("/scheduler/traces").json()
+    assert data["total"] == 2
+    assert data["traces"][0]["job"] == "aws-production"
+
+    data = client.get("/scheduler/traces", params={"job": "aws-default"}).json()
+    assert data["traces"][0]["spans"][0]["name"] == "aws_check_delete"
+    assert client.get("/scheduler/traces", params={"slow": True}).json()["total"] == 0
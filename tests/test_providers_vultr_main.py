@@ -1,6 +1,6 @@
 import pytest
 import datetime
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import MagicMock, patch, call, ANY
 from cloudproxy.providers.vultr.main import (
     vultr_deployment,
     vultr_check_alive,
@@ -279,11 +279,16 @@ class TestVultrMain:
         
         # Assertions
         mock_fw.assert_called_once_with(mock_instance_config)
-        mock_check_delete.assert_called_once_with(mock_instance_config)
+        mock_check_delete.assert_called_once_with(mock_instance_config, ANY)
         mock_deployment.assert_called_once_with(
             mock_instance_config["scaling"]["min_scaling"], 
-            mock_instance_config
+            mock_instance_config,
+            ANY
         )
+        # All phases share one inventory snapshot
+        inventory = mock_check_delete.call_args[0][1]
+        assert mock_deployment.call_args[0][2] is inventory
+        assert all(c[0][1] is inventory for c in mock_check_alive.call_args_list)
         assert mock_check_alive.call_count == 2
         assert result == ["192.168.1.1", "192.168.1.2"]
     
@@ -0,0 +1,144 @@
+"""
+Unit tests for the jittered age-limit recycle schedule.
+"""
+
+import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.recycle import RecycleSchedule, age_limit_jitter, recycle_schedule
+
+
+@pytest.fixture
+def jitter():
+    """Spread recycles over the last half of the age limit"""
+    original = settings.config.get("age_limit_jitter", 0)
+    settings.config["age_limit_jitter"] = 0.5
+    yield
+    settings.config["age_limit_jitter"] = original
+
+
+def seconds(value):
+    return datetime.timedelta(seconds=value)
+
+
+def test_no_jitter_matches_age_limit():
+    """Test without jitter a proxy expires exactly past the age limit"""
+    schedule = RecycleSchedule()
+    assert not schedule.expired("aws", "default", "i-1", seconds(3600), 3600)
+    assert schedule.expired("aws", "default", "i-1", seconds(3601), 3600)
+
+
+def test_disabled_age_limit_never_expires():
+    """Test an age limit of 0 disables recycling and plans nothing"""
+    schedule = RecycleSchedule()
+    assert not schedule.expired("aws", "default", "i-1", seconds(10 ** 6), 0)
+    assert schedule.timeline() == []
+
+
+def test_jitter_is_clamped():
+    """Test the jitter fraction stays within [0, 1]"""
+    with patch.dict(settings.config, {"age_limit_jitter": 3}):
+        assert age_limit_jitter() == 1.0
+    with patch.dict(settings.config, {"age_limit_jitter": -1}):
+        assert age_limit_jitter() == 0.0
+
+
+def test_batch_is_spread_evenly_over_window(jitter):
+    """Test proxies created together get distinct lifetimes spread across the window"""
+    schedule = RecycleSchedule()
+    for i in range(10):
+        schedule.expired("aws", "default", f"i-{i}", seconds(0), 1000)
+
+    expiries = sorted(item["seconds_remaining"] for item in schedule.timeline())
+
+    # Lifetimes lie within [500, 1000] and no two are closer than a fifth of an even spacing
+    assert expiries[0] >= 499 and expiries[-1] <= 1000
+    gaps = [b - a for a, b in zip(expiries, expiries[1:])]
+    assert min(gaps) > 500 / 10 / 5
+    # Each fifth of the window gets two proxies
+    buckets = [int((1000 - remaining) // 100.001) for remaining in expiries]
+    assert sorted(buckets) == [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]
+
+
+def test_lifetime_is_stable_and_never_exceeds_age_limit(jitter):
+    """Test a proxy keeps its planned expiry across ticks"""
+    schedule = RecycleSchedule()
+    schedule.expired("aws", "default", "i-0", seconds(0), 1000)
+    schedule.expired("aws", "default", "i-1", seconds(0), 1000)
+
+    # i-1 is planned at 1000 * (1 - 0.5 * 0.618), about 691 seconds
+    assert not schedule.expired("aws", "default", "i-1", seconds(690), 1000)
+    assert schedule.expired("aws", "default", "i-1", seconds(692), 1000)
+    assert schedule.expired("aws", "default", "i-0", seconds(1001), 1000)
+
+
+def test_retain_forgets_deleted_proxies():
+    """Test proxies no longer listed drop out of the timeline"""
+    schedule = RecycleSchedule()
+    schedule.expired("aws", "default", "i-1", seconds(0), 1000, ip="1.1.1.1")
+    schedule.expired("aws", "default", "i-2", seconds(0), 1000, ip="2.2.2.2")
+    schedule.expired("gcp", "default", "vm-1", seconds(0), 1000)
+
+    schedule.retain("aws", "default", ["i-2"])
+
+    assert [item["id"] for item in schedule.timeline(provider="aws")] == ["i-2"]
+    assert len(schedule.timeline()) == 2
+
+
+def test_timeline_filters_and_orders():
+    """Test the timeline is ordered by expiry and filtered by horizon"""
+    schedule = RecycleSchedule()
+    schedule.expired("aws", "default", "young", seconds(100), 1000)
+    schedule.expired("aws", "default", "old", seconds(900), 1000)
+
+    timeline = schedule.timeline()
+    assert [item["id"] for item in timeline] == ["old", "young"]
+    assert [item["id"] for item in schedule.timeline(within=200)] == ["old"]
+
+
+def test_hetzner_check_alive_uses_schedule(jitter):
+    """Test a provider tick recycles by planned expiry rather than the raw age limit"""
+    from cloudproxy.providers.hetzner import main as hetzner_main
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    servers = []
+    for i in range(2):
+        server = type("Server", (), {})()
+        server.id = i
+        server.created = (now - datetime.timedelta(seconds=800)).isoformat()
+        server.public_net = type("Net", (), {})()
+        server.public_net.ipv4 = type("IPv4", (), {"ip": f"10.0.0.{i}"})()
+        servers.append(server)
+
+    with patch.object(hetzner_main, "list_proxies", return_value=servers), \
+         patch.object(hetzner_main, "check_alive", return_value=False), \
+         patch.object(hetzner_main, "delete_in_parallel", return_value=[]) as delete, \
+         patch.dict(hetzner_main.config, {"age_limit": 1000}), \
+         patch.dict(hetzner_main.config["rolling_deployment"], {"enabled": False}):
+        hetzner_main.hetzner_check_alive()
+
+    # Server 0 lives the full 1000s, server 1 is due after about 691s
+    expired = delete.call_args_list[-1].args[1]
+    assert [server.id for server in expired] == [1]
+    assert {item["ip"] for item in recycle_schedule.timeline(provider="hetzner")} == {"10.0.0.0", "10.0.0.1"}
+
+
+def test_recycle_schedule_endpoint(jitter):
+    """Test the planned timeline is served by the API"""
+    recycle_schedule.expired("aws", "default", "i-1", seconds(0), 1000, ip="1.1.1.1")
+    recycle_schedule.expired("gcp", "default", "vm-1", seconds(0), 1000, ip="2.2.2.2")
+    client = TestClient(app)
+
+    response = client.get("/recycle-schedule", params={"provider": "aws"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["jitter"] == 0.5
+    assert data["total"] == 1
+    assert data["proxies"][0]["ip"] == "1.1.1.1"
+    assert data["proxies"][0]["seconds_remaining"] == pytest.approx(1000, abs=5)
@@ -0,0 +1,183 @@
+"""
+Unit tests for the pool-wide and per-provider rolling disruption budgets.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cloudproxy.main import app
+from cloudproxy.providers import settings
+from cloudproxy.providers.rolling import RollingDeploymentManager
+
+
+@pytest.fixture
+def budget_config():
+    """Enable rolling deployment with generous per-instance limits"""
+    original = settings.config["rolling_deployment"].copy()
+    settings.config["rolling_deployment"].update({
+        "enabled": True,
+        "min_available": 0,
+        "batch_size": 10,
+        "max_disruption": 0,
+        "max_disruption_per_provider": 0,
+    })
+    yield settings.config["rolling_deployment"]
+    settings.config["rolling_deployment"].clear()
+    settings.config["rolling_deployment"].update(original)
+
+
+def can_recycle(manager, provider, instance, ip, batch_size=10):
+    return manager.can_recycle_proxy(
+        provider=provider,
+        instance=instance,
+        proxy_ip=ip,
+        total_healthy=10,
+        min_available=0,
+        batch_size=batch_size,
+        rolling_enabled=True,
+    )
+
+
+def test_pool_budget_spans_providers_and_instances(budget_config):
+    """Test the pool-wide budget counts recycling proxies of every instance"""
+    budget_config["max_disruption"] = 2
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 300})
+    manager.update_proxy_health("aws", "eu", [], [], aged={"2.2.2.2": 200})
+    manager.update_proxy_health("gcp", "default", [], [], aged={"3.3.3.3": 100})
+
+    assert can_recycle(manager, "aws", "default", "1.1.1.1")
+    assert can_recycle(manager, "aws", "eu", "2.2.2.2")
+    assert not can_recycle(manager, "gcp", "default", "3.3.3.3")
+
+    manager.mark_proxy_recycled("aws", "default", "1.1.1.1")
+    assert not can_recycle(manager, "gcp", "default", "3.3.3.3")
+
+    # The slot is given back once the replacement is healthy
+    manager.update_proxy_health("aws", "default", ["4.4.4.4"], [], aged={})
+    assert can_recycle(manager, "gcp", "default", "3.3.3.3")
+
+
+def test_provider_budget_is_per_provider(budget_config):
+    """Test the per-provider budget does not hold back other providers"""
+    budget_config["max_disruption_per_provider"] = 1
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 300})
+    manager.update_proxy_health("aws", "eu", [], [], aged={"2.2.2.2": 200})
+    manager.update_proxy_health("gcp", "default", [], [], aged={"3.3.3.3": 100})
+
+    assert can_recycle(manager, "aws", "default", "1.1.1.1")
+    assert not can_recycle(manager, "aws", "eu", "2.2.2.2")
+    assert can_recycle(manager, "gcp", "default", "3.3.3.3")
+
+
+def test_budget_goes_to_oldest_proxy_first(budget_config):
+    """Test a younger proxy is deferred while an older one is waiting for the slot"""
+    budget_config["max_disruption"] = 1
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 100})
+    manager.update_proxy_health("gcp", "default", [], [], aged={"2.2.2.2": 500})
+
+    # The AWS tick runs first, but the GCP proxy is older
+    assert not can_recycle(manager, "aws", "default", "1.1.1.1")
+    assert can_recycle(manager, "gcp", "default", "2.2.2.2")
+
+
+def test_blocked_proxy_does_not_hold_up_budget(budget_config):
+    """Test a proxy held back by its own instance's rules gives up its turn"""
+    budget_config["max_disruption"] = 1
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 100})
+    manager.update_proxy_health("gcp", "default", [], [], aged={"2.2.2.2": 500})
+
+    # The older GCP proxy cannot go yet because its instance is at its batch size
+    manager.mark_proxy_recycling("gcp", "default", "9.9.9.9")
+    assert not can_recycle(manager, "gcp", "default", "2.2.2.2", batch_size=1)
+    manager.mark_proxy_recycled("gcp", "default", "9.9.9.9")
+    manager.update_proxy_health("gcp", "default", ["8.8.8.8"], [], aged={"2.2.2.2": 500})
+
+    assert can_recycle(manager, "aws", "default", "1.1.1.1")
+
+
+def test_recycled_proxy_holds_budget_until_replaced(budget_config):
+    """Test a finished recycle keeps its slot on the next tick until the instance is back at min_scaling"""
+    budget_config["max_disruption"] = 1
+    manager = RollingDeploymentManager()
+    healthy = ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    manager.update_proxy_health("aws", "default", healthy, [], aged={"1.1.1.1": 300, "2.2.2.2": 200})
+    manager.surge_target("aws", "default", 3)
+
+    # First tick recycles the oldest proxy and deletes it right away
+    assert can_recycle(manager, "aws", "default", "1.1.1.1")
+    manager.mark_proxy_recycling("aws", "default", "1.1.1.1")
+    manager.mark_proxy_recycled("aws", "default", "1.1.1.1")
+
+    # Second tick: the replacement is still booting
+    manager.update_proxy_health("aws", "default", ["2.2.2.2", "3.3.3.3"], ["4.4.4.4"], aged={"2.2.2.2": 260})
+    assert manager.budget.in_use() == 1
+    assert not can_recycle(manager, "aws", "default", "2.2.2.2")
+
+    # Third tick: the replacement is healthy, the instance is back at min_scaling
+    manager.update_proxy_health("aws", "default", ["2.2.2.2", "3.3.3.3", "4.4.4.4"], [], aged={"2.2.2.2": 320})
+    assert manager.budget.in_use() == 0
+    assert can_recycle(manager, "aws", "default", "2.2.2.2")
+
+
+def test_surge_retirements_respect_budget(budget_config):
+    """Test healthy aged proxies are retired within the budget, dead ones regardless"""
+    budget_config["max_disruption"] = 1
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health(
+        "aws", "default", ["1.1.1.1", "2.2.2.2", "4.4.4.4", "5.5.5.5"], [],
+        aged={"1.1.1.1": 300, "2.2.2.2": 200, "3.3.3.3": 100}
+    )
+
+    aged = [("a", "1.1.1.1", True), ("b", "2.2.2.2", True), ("c", "3.3.3.3", False)]
+    retire = manager.select_surge_retirements("aws", "default", aged, total_healthy=4, min_scaling=1)
+
+    assert retire == ["a", "c"]
+
+
+def test_budget_status(budget_config):
+    """Test budget consumption is reported for the pool and each provider"""
+    budget_config["max_disruption"] = 3
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 300, "2.2.2.2": 200})
+    manager.update_proxy_health("gcp", "default", [], [])
+    manager.mark_proxy_recycling("aws", "default", "1.1.1.1")
+
+    status = manager.get_budget_status()
+
+    assert status["pool"] == {"limit": 3, "in_use": 1, "remaining": 2, "waiting": 1}
+    assert status["providers"]["aws"] == {"limit": 0, "in_use": 1, "remaining": None, "waiting": 1}
+    assert status["providers"]["gcp"]["in_use"] == 0
+
+
+def test_rolling_endpoints_report_budget(budget_config):
+    """Test the /rolling endpoints expose and update the disruption budgets"""
+    client = TestClient(app)
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", [], [], aged={"1.1.1.1": 300})
+    manager.update_proxy_health("gcp", "default", [], [], aged={"2.2.2.2": 300})
+
+    with patch("cloudproxy.main.rolling_manager", manager):
+        response = client.patch("/rolling", json={
+            "enabled": True,
+            "min_available": 0,
+            "batch_size": 10,
+            "max_disruption": 5,
+            "max_disruption_per_provider": 2,
+        })
+        assert response.status_code == 200
+        assert response.json()["config"]["max_disruption"] == 5
+        assert budget_config["max_disruption_per_provider"] == 2
+
+        response = client.get("/rolling")
+        budget = response.json()["budget"]
+        assert budget["pool"] == {"limit": 5, "in_use": 0, "remaining": 5, "waiting": 2}
+        assert set(budget["providers"]) == {"aws", "gcp"}
+
+        response = client.get("/rolling/aws")
+        assert set(response.json()["budget"]["providers"]) == {"aws"}
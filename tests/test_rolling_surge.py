@@ -0,0 +1,133 @@
+"""
+Unit tests for surge rolling recycling.
+"""
+
+import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from cloudproxy.providers import settings
+from cloudproxy.providers.rolling import RollingDeploymentManager, surge_limit
+
+
+@pytest.fixture
+def surge_config():
+    """Enable rolling deployment with a surge of 2 and a batch size of 2"""
+    original = settings.config["rolling_deployment"].copy()
+    settings.config["rolling_deployment"].update({"enabled": True, "max_surge": 2, "batch_size": 2})
+    yield settings.config["rolling_deployment"]
+    settings.config["rolling_deployment"].clear()
+    settings.config["rolling_deployment"].update(original)
+
+
+def test_surge_limit_off_unless_rolling_enabled(surge_config):
+    """Test surge is only active with rolling deployment enabled"""
+    assert surge_limit() == 2
+    surge_config["enabled"] = False
+    assert surge_limit() == 0
+
+
+def test_surge_target_adds_replacements_for_aged(surge_config):
+    """Test the deployment target grows by one per aged proxy, capped at max surge"""
+    manager = RollingDeploymentManager()
+    assert manager.surge_target("aws", "default", 3) == 3
+
+    manager.update_proxy_health("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], [], aged={"1.1.1.1": 0.0})
+    assert manager.surge_target("aws", "default", 3) == 4
+
+    manager.update_proxy_health("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], [],
+                                aged={"1.1.1.1": 0.0, "2.2.2.2": 0.0, "3.3.3.3": 0.0})
+    assert manager.surge_target("aws", "default", 3) == 5
+
+
+def test_surge_target_without_surge(surge_config):
+    """Test the target is min_scaling when surge recycling is off"""
+    surge_config["max_surge"] = 0
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", ["1.1.1.1"], [], aged={"1.1.1.1": 0.0})
+    assert manager.surge_target("aws", "default", 3) == 3
+
+
+def test_should_create_replacement_discounts_aged():
+    """Test aged proxies do not count towards the pool after recycling"""
+    manager = RollingDeploymentManager()
+    manager.update_proxy_health("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], [], aged={"1.1.1.1": 0.0})
+    assert manager.should_create_replacement("aws", "default", 3) is True
+    manager.update_proxy_health("aws", "default", ["1.1.1.1", "2.2.2.2", "3.3.3.3"], ["4.4.4.4"], aged={"1.1.1.1": 0.0})
+    assert manager.should_create_replacement("aws", "default", 3) is False
+
+
+def test_aged_proxy_kept_until_replacement_healthy(surge_config):
+    """Test a healthy aged proxy is not retired while it is needed for min_scaling"""
+    manager = RollingDeploymentManager()
+    aged = [("proxy-a", "1.1.1.1", True)]
+
+    # Replacement still booting, only 3 healthy proxies for a min_scaling of 3
+    assert manager.select_surge_retirements("hetzner", "default", aged, total_healthy=3, min_scaling=3) == []
+
+    # Replacement healthy, the aged proxy can go
+    assert manager.select_surge_retirements("hetzner", "default", aged, total_healthy=4, min_scaling=3) == ["proxy-a"]
+    assert "1.1.1.1" in manager.get_state("hetzner", "default").recycling
+
+
+def test_dead_aged_proxies_always_retired(surge_config):
+    """Test aged proxies that fail their probe are retired without waiting"""
+    manager = RollingDeploymentManager()
+    aged = [("proxy-a", "1.1.1.1", False), ("proxy-b", "2.2.2.2", True)]
+
+    retire = manager.select_surge_retirements("vultr", "default", aged, total_healthy=3, min_scaling=3)
+    assert retire == ["proxy-a"]
+
+
+def test_surge_retirements_respect_batch_size(surge_config):
+    """Test at most batch_size healthy aged proxies are retired per tick"""
+    manager = RollingDeploymentManager()
+    aged = [(f"proxy-{i}", f"1.1.1.{i}", True) for i in range(4)]
+
+    retire = manager.select_surge_retirements("gcp", "default", aged, total_healthy=10, min_scaling=3)
+    assert retire == ["proxy-0", "proxy-1"]
+
+
+class MockHetznerProxy:
+    def __init__(self, ip, age_seconds):
+        self.id = ip
+        self.public_net = MagicMock()
+        self.public_net.ipv4.ip = ip
+        self.created = (
+            datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=age_seconds)
+        ).isoformat()
+
+
+@patch("cloudproxy.providers.hetzner.main.delete_proxy")
+@patch("cloudproxy.providers.hetzner.main.check_alive", return_value=True)
+@patch("cloudproxy.providers.hetzner.main.rolling_manager", new_callable=RollingDeploymentManager)
+def test_hetzner_surge_cycle(mock_rolling, mock_check_alive, mock_delete_proxy, surge_config):
+    """Test an aged Hetzner server serves until its surge replacement is healthy"""
+    from cloudproxy.providers.hetzner import main as hetzner_main
+
+    mock_delete_proxy.return_value = True
+    instance_config = {"display_name": "Hetzner", "scaling": {"min_scaling": 2, "max_scaling": 2}}
+    old = MockHetznerProxy("10.0.0.1", 7200)
+    fresh = MockHetznerProxy("10.0.0.2", 60)
+    original_age_limit = hetzner_main.config["age_limit"]
+    hetzner_main.config["age_limit"] = 3600
+    try:
+        inventory = MagicMock()
+        inventory.get.return_value = [old, fresh]
+        ready = hetzner_main.hetzner_check_alive(instance_config, inventory)
+
+        # Aged server keeps serving and a replacement is requested
+        assert sorted(ready) == ["10.0.0.1", "10.0.0.2"]
+        mock_delete_proxy.assert_not_called()
+        assert mock_rolling.surge_target("hetzner", "default", 2) == 3
+
+        # Replacement is up, the aged server is retired
+        replacement = MockHetznerProxy("10.0.0.3", 30)
+        inventory.get.return_value = [old, fresh, replacement]
+        ready = hetzner_main.hetzner_check_alive(instance_config, inventory)
+
+        assert sorted(ready) == ["10.0.0.2", "10.0.0.3"]
+        mock_delete_proxy.assert_called_once_with(old, instance_config)
+    finally:
+        hetzner_main.config["age_limit"] = original_age_limit